@@ -0,0 +1,187 @@
+# agregados_hil.py — Agregados incrementais e estado persistente do relatório HIL
+#
+# Em vez de recalcular todas as estatísticas do relatório a partir de
+# todos_resultados em cada execução, cada cenário mantém agregados que são
+# actualizados dia a dia (O(1) por dia):
+#   - contagem C0 / C1+C2 por semana (Secção 4)
+#   - nº de dias com feedback (Secção 4)
+#   - nº de dias na dead zone sem feedback (Secção 5)
+#
+# O estado fica em resultados_hil/estado_relatorio.json, ao lado dos CSV:
+#   {
+#     'cenarios': {
+#       '3': {
+#         'agregados'      : dict   — AgregadosCenario.para_dict()
+#         'tempos'         : [t_load_ms, t_inf_ms]
+#         'digest'         : str    — sha1 dos resultados do cenário
+#         'seccao_md'      : list[str] — linhas já renderizadas da Secção 3
+#         'digest_seccao'  : str    — chave_seccao() usada para renderizar
+#                                     seccao_md (resultados + texto do
+#                                     cenário + versão do modelo da secção)
+#         'digest_grafico' : str    — digest usado para o último PNG
+#       }, ...
+#     }
+#   }
+#
+# Ao executar apenas um cenário (--cenario N), as secções e gráficos dos
+# outros cenários são reaproveitados do estado — só o que mudou é refeito.
+
+import os
+import json
+import hashlib
+
+
+# Limites da dead zone do feedback (Secção 5 do relatório)
+DEAD_ZONE_MIN = 40.0
+DEAD_ZONE_MAX = 90.0
+
+# Dias por semana na análise do aprendizado online (Secção 4)
+DIAS_SEMANA = 7
+
+
+class AgregadosCenario:
+    """Estatísticas de um cenário, actualizadas a cada dia concluído."""
+
+    def __init__(self):
+        self.n_dias     = 0
+        self.semanas    = []   # [[c0, c12], ...] — uma entrada por semana
+        self.n_feedback = 0
+        self.n_dead     = 0
+
+    def actualizar_dia(self, classe_final, tensao_6h_kpa, houve_feedback):
+        semana = self.n_dias // DIAS_SEMANA
+        if semana >= len(self.semanas):
+            self.semanas.append([0, 0])
+        if classe_final == 0:
+            self.semanas[semana][0] += 1
+        else:
+            self.semanas[semana][1] += 1
+
+        if houve_feedback:
+            self.n_feedback += 1
+        elif DEAD_ZONE_MIN < tensao_6h_kpa <= DEAD_ZONE_MAX:
+            self.n_dead += 1
+        self.n_dias += 1
+
+    @classmethod
+    def de_resultados(cls, resultados):
+        """Reconstrói os agregados a partir de um ResultadosColunares completo."""
+        agg = cls()
+        for c, t, fb in zip(resultados['classe_final'].tolist(),
+                            resultados['tensao_6h_kpa'].tolist(),
+                            resultados['houve_feedback'].tolist()):
+            agg.actualizar_dia(c, t, fb)
+        return agg
+
+    def pct_c12_semanas(self):
+        """% de dias C1+C2 em cada semana."""
+        return [c12 / (c0 + c12) * 100 for c0, c12 in self.semanas if c0 + c12]
+
+    def para_dict(self):
+        return {
+            'n_dias'    : self.n_dias,
+            'semanas'   : [list(s) for s in self.semanas],
+            'n_feedback': self.n_feedback,
+            'n_dead'    : self.n_dead,
+        }
+
+    @classmethod
+    def de_dict(cls, d):
+        agg = cls()
+        agg.n_dias     = int(d.get('n_dias', 0))
+        agg.semanas    = [list(s) for s in d.get('semanas', [])]
+        agg.n_feedback = int(d.get('n_feedback', 0))
+        agg.n_dead     = int(d.get('n_dead', 0))
+        return agg
+
+
+def chave_seccao(digest, *textos):
+    """
+    Chave da Secção 3 em cache: digest dos resultados mais tudo o que entra
+    no texto renderizado (nome/descrição do cenário, versão do modelo da
+    secção). Mudar qualquer um invalida a secção guardada.
+    """
+    h = hashlib.sha1(str(digest).encode('utf-8'))
+    for t in textos:
+        h.update(b'\x00')
+        h.update(str(t).encode('utf-8'))
+    return h.hexdigest()
+
+
+class EstadoRelatorio:
+    """
+    Estado persistente do relatório: agregados, tempos, secções renderizadas
+    e digests dos gráficos por cenário. Gravado em JSON ao lado dos CSV.
+    """
+
+    NOME_FICHEIRO = 'estado_relatorio.json'
+
+    def __init__(self, output_dir):
+        self.caminho  = os.path.join(output_dir, self.NOME_FICHEIRO)
+        self.cenarios = {}
+
+    @classmethod
+    def carregar(cls, output_dir):
+        """Carrega o estado anterior; começa vazio se não existir ou estiver corrompido."""
+        estado = cls(output_dir)
+        try:
+            with open(estado.caminho, encoding='utf-8') as f:
+                dados = json.load(f)
+            estado.cenarios = {int(k): v for k, v in dados.get('cenarios', {}).items()}
+        except (OSError, ValueError):
+            pass
+        return estado
+
+    def guardar(self):
+        os.makedirs(os.path.dirname(self.caminho), exist_ok=True)
+        with open(self.caminho, 'w', encoding='utf-8') as f:
+            json.dump({'cenarios': {str(k): v for k, v in sorted(self.cenarios.items())}},
+                      f, indent=2, ensure_ascii=False)
+
+    def _entrada(self, id_cenario):
+        return self.cenarios.setdefault(id_cenario, {})
+
+    # ------ Agregados e tempos ------
+
+    def registar_cenario(self, id_cenario, agregados, tempos, digest):
+        e = self._entrada(id_cenario)
+        e['agregados'] = agregados.para_dict()
+        e['tempos']    = list(tempos)
+        e['digest']    = digest
+
+    def agregados(self, id_cenario):
+        e = self.cenarios.get(id_cenario)
+        if not e or 'agregados' not in e:
+            return None
+        return AgregadosCenario.de_dict(e['agregados'])
+
+    def tempos(self):
+        return {k: tuple(v['tempos']) for k, v in sorted(self.cenarios.items())
+                if 'tempos' in v}
+
+    def ids(self):
+        return sorted(self.cenarios)
+
+    # ------ Secções renderizadas ------
+
+    def seccao(self, id_cenario, digest):
+        """Linhas em cache da Secção 3 se foram renderizadas com este digest."""
+        e = self.cenarios.get(id_cenario, {})
+        if e.get('digest_seccao') == digest and 'seccao_md' in e:
+            return e['seccao_md']
+        return None
+
+    def guardar_seccao(self, id_cenario, digest, linhas):
+        e = self._entrada(id_cenario)
+        e['seccao_md']     = list(linhas)
+        e['digest_seccao'] = digest
+
+    # ------ Gráficos ------
+
+    def grafico_actual(self, id_cenario, digest, caminho_png):
+        """True se o PNG existe e foi gerado a partir deste digest."""
+        e = self.cenarios.get(id_cenario, {})
+        return e.get('digest_grafico') == digest and os.path.exists(caminho_png)
+
+    def marcar_grafico(self, id_cenario, digest):
+        self._entrada(id_cenario)['digest_grafico'] = digest
@@ -19,6 +19,7 @@
 #     'n_rules_pruned'     : int
 #     'created_at'         : str (ISO)
 #     'saved_at'           : str (ISO)
+#     'telemetria'         : dict (opcional) — contadores de eventos, ver abaixo
 #   }
 #
 # Activação: Cauchy sem scatter — 1 / (1 + dist² / r_threshold²)
@@ -28,6 +29,20 @@
 #   M2 — Protecção de regras com alto activation count (anti-esquecimento)
 #   M3 — Garantia de min_rules_per_class por classe
 #
+# Telemetria do banco de regras (modelo.telemetria()):
+#   mantida incrementalmente — predict só soma len(rules) às activações,
+#   learn/pruning/M1/M3 actualizam contagens no próprio passo; nada volta
+#   a percorrer as regras só para medir.
+#   Eventos (acumulados, gravados no pkl em 'telemetria'):
+#     absorcoes, criacoes       — learn: absorvida numa regra vs regra nova
+#     fusoes_m1                 — pares fundidos pela M1
+#     sinteticas_m3             — regras duplicadas pela M3
+#     podadas_idade             — removidas no pruning por idade
+#   Estado (recontado no carregamento, mantido depois):
+#     regras_por_classe, protegidas_m2 (idade >= age_limit mas mantidas
+#     pela M2), activacao_media, hist_idade (buckets log2 da idade:
+#     bucket 0 = idade 0, bucket k = [2^(k-1), 2^k))
+#
 # Interface pública:
 #   modelo.predict(x)               → int
 #   modelo.predict_com_confianca(x) → (int, float)
@@ -38,6 +53,7 @@
 #   modelo.salvar(path)             → None
 #   modelo.info()                   → str
 #   modelo.distribuicao_regras()    → dict
+#   modelo.telemetria()             → dict (snapshot dos contadores)
 
 import numpy as np
 import pickle
@@ -56,12 +72,60 @@ class ALMMo0:
     # Fracção de r_threshold abaixo da qual duas regras são fundidas (M1)
     _M1_FUSAO_FATOR = 0.5
 
+    # Buckets log2 do histograma de idades (2^14 = 16384 ciclos no último)
+    _N_BUCKETS_IDADE = 16
+
+    _EVENTOS = ('absorcoes', 'criacoes', 'fusoes_m1', 'sinteticas_m3', 'podadas_idade')
+
     def __init__(self, estado):
         """
         Não usar directamente — usar ALMMo0.carregar() ou carregar_modelo().
         'estado' é o dict completo do pkl.
         """
         self._s = estado
+        tel = self._s.setdefault('telemetria', {})
+        for evento in self._EVENTOS:
+            tel.setdefault(evento, 0)
+        self._recontar()
+
+    # ------------------------------------------------------------------
+    # TELEMETRIA — contadores mantidos incrementalmente
+    # ------------------------------------------------------------------
+
+    def _recontar(self):
+        """Estado da telemetria a partir das regras (só no carregamento)."""
+        self._por_classe = {i: 0 for i in range(self._s['n_classes'])}
+        self._hist_idade = [0] * self._N_BUCKETS_IDADE
+        self._soma_activ = 0
+        self._protegidas = 0
+        for r in self._s['rules']:
+            c = int(r['consequent'])
+            self._por_classe[c] = self._por_classe.get(c, 0) + 1
+            self._hist_idade[self._bucket_idade(r['age'])] += 1
+            self._soma_activ += int(r['activations'])
+            self._protegidas += self._protegida(r)
+
+    def _bucket_idade(self, idade):
+        return min(int(idade).bit_length(), self._N_BUCKETS_IDADE - 1)
+
+    def _protegida(self, r):
+        """1 se a regra só sobrevive ao pruning por causa da M2."""
+        return int(r['age'] >= self._s['age_limit']
+                   and r['activations'] >= self._M2_ACTIVATIONS_PROTEGIDAS)
+
+    def telemetria(self):
+        """Snapshot dos contadores do banco de regras (O(classes + buckets))."""
+        n = len(self._s['rules'])
+        snap = dict(self._s['telemetria'])
+        snap.update({
+            'n_regras'         : n,
+            'regras_por_classe': dict(self._por_classe),
+            'protegidas_m2'    : self._protegidas,
+            'activacao_media'  : round(self._soma_activ / n, 2) if n else 0.0,
+            'hist_idade'       : list(self._hist_idade),
+            'n_samples_seen'   : self._s['n_samples_seen'],
+        })
+        return snap
 
     # ------------------------------------------------------------------
     # PROPRIEDADES PÚBLICAS
@@ -131,6 +195,7 @@ class ALMMo0:
             act = self._activacao(x_norm, rule['center'])
             scores[rule['consequent']] += act
             rule['activations'] += 1
+        self._soma_activ += len(self._s['rules'])
 
         return int(np.argmax(scores))
 
@@ -146,6 +211,7 @@ class ALMMo0:
             act = self._activacao(x_norm, rule['center'])
             scores[rule['consequent']] += act
             rule['activations'] += 1
+        self._soma_activ += len(self._s['rules'])
 
         total = scores.sum()
         if total < 1e-10:
@@ -201,6 +267,8 @@ class ALMMo0:
             melhor_regra['center']      = np.asarray(melhor_regra['center']) + delta / n
             melhor_regra['activations'] = n
             melhor_regra['age']         = 0  # renovar ao ser actualizada
+            self._soma_activ += 1
+            self._s['telemetria']['absorcoes'] += 1
         else:
             # Criar nova regra
             self._s['rules'].append({
@@ -211,6 +279,9 @@ class ALMMo0:
                 'created_at' : datetime.now().isoformat(),
             })
             self._s['n_rules_created'] += 1
+            self._por_classe[label] = self._por_classe.get(label, 0) + 1
+            self._soma_activ += 1
+            self._s['telemetria']['criacoes'] += 1
 
         # Pruning + melhorias
         self._pruning_por_idade()
@@ -225,14 +296,31 @@ class ALMMo0:
         """
         Remove regras antigas COM poucas activações.
         M2: regras com activations >= _M2_ACTIVATIONS_PROTEGIDAS são imunes.
+        No mesmo passo refaz o histograma de idades e a contagem M2 (as
+        idades mudaram todas) e desconta as regras removidas.
         """
-        antes = len(self._s['rules'])
-        self._s['rules'] = [
-            r for r in self._s['rules']
-            if (r['age'] < self._s['age_limit']
-                or r['activations'] >= self._M2_ACTIVATIONS_PROTEGIDAS)
-        ]
-        self._s['n_rules_pruned'] += antes - len(self._s['rules'])
+        age_limit  = self._s['age_limit']
+        hist       = [0] * self._N_BUCKETS_IDADE
+        protegidas = 0
+        mantidas   = []
+        for r in self._s['rules']:
+            if r['age'] < age_limit:
+                mantidas.append(r)
+            elif r['activations'] >= self._M2_ACTIVATIONS_PROTEGIDAS:
+                mantidas.append(r)
+                protegidas += 1
+            else:
+                self._por_classe[int(r['consequent'])] -= 1
+                self._soma_activ -= int(r['activations'])
+                continue
+            hist[self._bucket_idade(r['age'])] += 1
+
+        removidas = len(self._s['rules']) - len(mantidas)
+        self._s['rules'] = mantidas
+        self._s['n_rules_pruned'] += removidas
+        self._s['telemetria']['podadas_idade'] += removidas
+        self._hist_idade = hist
+        self._protegidas = protegidas
 
     # ------------------------------------------------------------------
     # M1 — Fusão de regras similares
@@ -263,15 +351,25 @@ class ALMMo0:
                     if dist < limite:
                         ni, nj = ri['activations'], rj['activations']
                         total  = ni + nj
-                        self._s['rules'][i] = {
+                        fundida = {
                             'center'     : (ni * ci + nj * cj) / total,
                             'consequent' : ri['consequent'],
                             'age'        : min(ri['age'], rj['age']),
                             'activations': total,
                             'created_at' : ri.get('created_at', ''),
                         }
+                        self._s['rules'][i] = fundida
                         self._s['rules'].pop(j)
                         self._s['n_rules_pruned'] += 1
+
+                        # Telemetria: 2 regras → 1 (soma das activações igual)
+                        self._por_classe[int(ri['consequent'])] -= 1
+                        self._hist_idade[self._bucket_idade(ri['age'])] -= 1
+                        self._hist_idade[self._bucket_idade(rj['age'])] -= 1
+                        self._hist_idade[self._bucket_idade(fundida['age'])] += 1
+                        self._protegidas += (self._protegida(fundida)
+                                             - self._protegida(ri) - self._protegida(rj))
+                        self._s['telemetria']['fusoes_m1'] += 1
                         feito = True
                         break
                 if feito:
@@ -287,11 +385,14 @@ class ALMMo0:
         duplica a regra mais activa com pequena perturbação.
         """
         for classe in range(self._s['n_classes']):
+            # Contador por classe: só percorre as regras se houver défice
+            deficit = self._s['min_rules_per_class'] - self._por_classe.get(classe, 0)
+            if deficit <= 0:
+                continue
+
             regras_classe = [r for r in self._s['rules']
                              if r['consequent'] == classe]
-            deficit = self._s['min_rules_per_class'] - len(regras_classe)
-
-            if deficit <= 0 or not regras_classe:
+            if not regras_classe:
                 continue
 
             melhor = max(regras_classe, key=lambda r: r['activations'])
@@ -307,6 +408,10 @@ class ALMMo0:
                     'created_at' : datetime.now().isoformat(),
                 })
                 self._s['n_rules_created'] += 1
+                self._por_classe[classe] += 1
+                self._hist_idade[0]      += 1
+                self._soma_activ         += 1
+                self._s['telemetria']['sinteticas_m3'] += 1
 
     # ------------------------------------------------------------------
     # SERIALIZAÇÃO — preserva formato dict original
@@ -323,10 +428,8 @@ class ALMMo0:
     # ------------------------------------------------------------------
 
     def distribuicao_regras(self):
-        dist = {i: 0 for i in range(self._s['n_classes'])}
-        for r in self._s['rules']:
-            dist[r['consequent']] = dist.get(r['consequent'], 0) + 1
-        return dist
+        """Regras por classe (contador mantido — não percorre as regras)."""
+        return dict(self._por_classe)
 
     def info(self):
         dist = self.distribuicao_regras()
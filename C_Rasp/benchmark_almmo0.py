@@ -0,0 +1,350 @@
+# benchmark_almmo0.py — Benchmark de regressão dos caminhos quentes do ALMMo-0
+#
+# Mede latência e alocações por chamada de:
+#   ALMMo0.predict / predict_com_confianca   — uma vez por decisão (06h00)
+#   ALMMo0.learn                             — uma vez por feedback de campo
+#   ALMMo0._m1_fusao_regras                  — dentro de cada learn()
+#   ALMMo0.cold_start (cold_start_v8.py)     — cada retreino (opcional)
+#
+# Bancos de regras (fixtures):
+#   v7, v8      — memoria_cold_start_v7.pkl / _v8.pkl (pasta actual ou ..)
+#   sint_N      — bancos sintéticos com N regras (10 … 1000; 5000 só com
+#                 --grandes), centros numa grelha com espaçamento
+#                 r_threshold (sem fusões M1), para o custo medir só o
+#                 varrimento das regras
+#
+# Cada execução acrescenta uma linha a resultados_bench/historico.jsonl
+# (commit, máquina, medidas) e compara com resultados_bench/baseline_<host>.json.
+# Sai com código 1 se algum caso ficar mais lento (ou alocar mais) do que
+# o baseline além do limiar — usar antes/depois de cada optimização.
+#
+# Uso:
+#   python3 benchmark_almmo0.py                    — medir e comparar
+#   python3 benchmark_almmo0.py --gravar-baseline  — medir e fixar o baseline
+#   python3 benchmark_almmo0.py --grandes          — inclui o banco de 5000 regras
+#                                                    (learn/M1 ≈ 1–2 min por chamada)
+#   python3 benchmark_almmo0.py --casos predict learn
+
+import os
+import sys
+import copy
+import json
+import time
+import pickle
+import socket
+import argparse
+import platform
+import tracemalloc
+import subprocess
+import numpy as np
+from datetime import datetime
+
+from almmo0 import ALMMo0
+
+AQUI = os.path.dirname(os.path.abspath(__file__))
+
+# cold_start do v8 (na raiz do repositório) — opcional: no Pi não existe
+sys.path.append(os.path.dirname(AQUI))
+try:
+    from cold_start_v8 import ALMMo0 as ALMMo0ColdStart
+    COLD_START_OK = True
+except ImportError:
+    COLD_START_OK = False
+
+# ==========================================================================
+# CONFIGURAÇÃO
+# ==========================================================================
+
+PKLS = {
+    'v7': 'memoria_cold_start_v7.pkl',
+    'v8': 'memoria_cold_start_v8.pkl',
+}
+# Por omissão até 1000 regras: o gate por commit corre em segundos. Com
+# 5000 regras uma só chamada de learn ou M1 leva mais de um minuto.
+TAMANHOS_SINTETICOS = [10, 100, 1000]
+TAMANHOS_GRANDES    = [5000]
+
+N_COLD_START = 1000        # amostras do dataset sintético do cold start
+DIST_CLASSES = [0.94, 0.04, 0.02]
+
+TEMPO_MIN_S  = 0.5         # tempo mínimo medido por caso
+TEMPO_MAX_S  = 30.0        # pára as repetições (não interrompe uma chamada)
+REP_MIN      = 5
+REP_MAX      = 2000
+
+# Regressão: mais lento que baseline × (1 + LIMIAR_TEMPO) e acima do ruído
+LIMIAR_TEMPO  = 0.25
+RUIDO_MIN_US  = 5.0
+LIMIAR_ALOC   = 0.25
+RUIDO_ALOC_KB = 1.0
+
+PASTA_BENCH = os.path.join(AQUI, 'resultados_bench')
+SEMENTE     = 42
+
+
+# ==========================================================================
+# FIXTURES — bancos de regras
+# ==========================================================================
+
+def banco_sintetico(n_regras, n_classes=3, n_inputs=4, r_threshold=0.5,
+                    semente=SEMENTE):
+    """
+    Estado no formato do pkl do cold start com n_regras regras.
+    Centros em pontos distintos de uma grelha de passo r_threshold
+    (> limite de fusão M1), consequentes com DIST_CLASSES.
+    """
+    rng = np.random.RandomState(semente)
+    lado = int(np.ceil(n_regras ** (1 / n_inputs))) + 1
+    pontos = rng.choice(lado ** n_inputs, size=n_regras, replace=False)
+    centros = (np.stack(np.unravel_index(pontos, (lado,) * n_inputs), axis=1)
+               - lado / 2) * r_threshold
+    p = np.asarray(DIST_CLASSES[:n_classes]) / sum(DIST_CLASSES[:n_classes])
+    consequentes = rng.choice(n_classes, size=n_regras, p=p)
+    consequentes[:n_classes] = np.arange(n_classes)   # todas as classes presentes
+
+    return {
+        'rules': [{'center': c.astype(float), 'consequent': int(k),
+                   'age': int(rng.randint(0, 50)),
+                   'activations': int(rng.randint(1, 20)),
+                   'created_at': ''}
+                  for c, k in zip(centros, consequentes)],
+        'input_mean': np.zeros(n_inputs),
+        'input_std': np.ones(n_inputs),
+        'r_threshold': r_threshold,
+        'max_rules': max(50, n_regras),
+        'age_limit': 100,
+        'n_inputs': n_inputs,
+        'n_classes': n_classes,
+        'min_rules_per_class': 3,
+        'n_samples_seen': 0,
+        'n_rules_created': n_regras,
+        'n_rules_pruned': 0,
+    }
+
+
+def carregar_banco(ficheiro):
+    """Estado de um pkl do cold start (pasta actual ou raiz); None se não existir."""
+    for pasta in (AQUI, os.path.dirname(AQUI)):
+        caminho = os.path.join(pasta, ficheiro)
+        if os.path.exists(caminho):
+            with open(caminho, 'rb') as f:
+                return pickle.load(f)
+    return None
+
+
+def fixtures(grandes=False):
+    bancos = {}
+    for nome, ficheiro in PKLS.items():
+        estado = carregar_banco(ficheiro)
+        if estado is not None:
+            bancos[nome] = estado
+        else:
+            print(f"  [fixture] {ficheiro} não encontrado — ignorado")
+    for n in TAMANHOS_SINTETICOS + (TAMANHOS_GRANDES if grandes else []):
+        bancos[f'sint_{n}'] = banco_sintetico(n)
+    return bancos
+
+
+def amostras(estado, n=256, semente=SEMENTE):
+    """Entradas (não normalizadas) e rótulos à volta da distribuição do banco."""
+    rng = np.random.RandomState(semente)
+    d = len(estado['input_mean'])
+    X = np.asarray(estado['input_mean']) + np.asarray(estado['input_std']) * rng.randn(n, d)
+    p = np.asarray(DIST_CLASSES[:estado['n_classes']])
+    y = rng.choice(estado['n_classes'], size=n, p=p / p.sum())
+    return X, y
+
+
+# ==========================================================================
+# MEDIÇÃO
+# ==========================================================================
+
+def medir(preparar, chamar, tempo_min_s=TEMPO_MIN_S, rep_min=REP_MIN, rep_max=REP_MAX,
+          tempo_max_s=TEMPO_MAX_S):
+    """
+    Tempo de chamar(preparar()) — preparar() fica fora da medição.
+    Repete até tempo_min_s e rep_min (limitado a rep_max e tempo_max_s);
+    depois uma chamada extra sob tracemalloc para as alocações.
+    """
+    tempos = []
+    total = 0.0
+    while not tempos or (len(tempos) < rep_max and total < tempo_max_s
+                         and (len(tempos) < rep_min or total < tempo_min_s)):
+        arg = preparar()
+        t0 = time.perf_counter_ns()
+        chamar(arg)
+        dt = (time.perf_counter_ns() - t0) / 1e3
+        tempos.append(dt)
+        total += dt / 1e6
+
+    arg = preparar()
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    base, _ = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    chamar(arg)
+    _, pico = tracemalloc.get_traced_memory()
+    depois = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    sem_tracemalloc = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    blocos = sum(s.count_diff for s in depois.filter_traces(sem_tracemalloc).compare_to(
+        antes.filter_traces(sem_tracemalloc), 'filename'))
+
+    t = np.asarray(tempos)
+    return {
+        'mediana_us'   : round(float(np.median(t)), 2),
+        'p90_us'       : round(float(np.percentile(t, 90)), 2),
+        'min_us'       : round(float(t.min()), 2),
+        'repeticoes'   : len(tempos),
+        'pico_alloc_kb': round((pico - base) / 1024, 2),
+        'blocos_retidos': int(blocos),
+    }
+
+
+def _ciclo(X, y):
+    """Iterador infinito sobre as amostras (uma por chamada)."""
+    i = 0
+    while True:
+        yield X[i % len(X)], int(y[i % len(y)])
+        i += 1
+
+
+def casos_banco(estado):
+    """(caso, preparar, chamar) para um banco de regras."""
+    X, y = amostras(estado)
+    fluxo = _ciclo(X, y)
+    modelo = ALMMo0(copy.deepcopy(estado))   # predict só mexe em 'activations'
+
+    def novo_modelo():
+        return ALMMo0(copy.deepcopy(estado)), next(fluxo)
+
+    return [
+        ('predict', lambda: next(fluxo)[0], modelo.predict),
+        ('predict_com_confianca', lambda: next(fluxo)[0], modelo.predict_com_confianca),
+        ('learn', novo_modelo, lambda a: a[0].learn(*a[1])),
+        ('m1_fusao_regras', lambda: ALMMo0(copy.deepcopy(estado)),
+         lambda m: m._m1_fusao_regras()),
+    ]
+
+
+def caso_cold_start(n=N_COLD_START, semente=SEMENTE):
+    rng = np.random.RandomState(semente)
+    X = rng.randn(n, 4)
+    y = rng.choice(3, size=n, p=DIST_CLASSES)
+
+    def preparar():
+        return ALMMo0ColdStart(n_inputs=4, r_threshold=0.5, n_classes=3)
+
+    return ('cold_start', preparar, lambda m: m.cold_start(X, y))
+
+
+# ==========================================================================
+# HISTÓRICO E BASELINE
+# ==========================================================================
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=AQUI,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _caminho_baseline():
+    return os.path.join(PASTA_BENCH, f"baseline_{socket.gethostname()}.json")
+
+
+def comparar(resultados, baseline, limiar_tempo=LIMIAR_TEMPO, limiar_aloc=LIMIAR_ALOC):
+    """Lista de (chave, descrição) dos casos que regrediram face ao baseline."""
+    regressoes = []
+    for chave, r in resultados.items():
+        b = baseline.get(chave)
+        if b is None:
+            continue
+        if (r['mediana_us'] > b['mediana_us'] * (1 + limiar_tempo)
+                and r['mediana_us'] - b['mediana_us'] > RUIDO_MIN_US):
+            regressoes.append((chave, f"tempo {b['mediana_us']:.1f} → {r['mediana_us']:.1f} µs "
+                                      f"(+{100 * (r['mediana_us'] / b['mediana_us'] - 1):.0f}%)"))
+        if (r['pico_alloc_kb'] > b['pico_alloc_kb'] * (1 + limiar_aloc)
+                and r['pico_alloc_kb'] - b['pico_alloc_kb'] > RUIDO_ALOC_KB):
+            regressoes.append((chave, f"alocação {b['pico_alloc_kb']:.1f} → "
+                                      f"{r['pico_alloc_kb']:.1f} KiB"))
+    return regressoes
+
+
+# ==========================================================================
+# PONTO DE ENTRADA
+# ==========================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark de regressão — ALMMo-0')
+    parser.add_argument('--gravar-baseline', action='store_true',
+                        help='Gravar esta execução como baseline da máquina')
+    parser.add_argument('--grandes', action='store_true',
+                        help=f'Incluir bancos de {TAMANHOS_GRANDES} regras (lento)')
+    parser.add_argument('--casos', nargs='+',
+                        help='Executar só estes casos (ex.: predict learn)')
+    parser.add_argument('--limiar', type=float, default=LIMIAR_TEMPO,
+                        help='Regressão de tempo tolerada (fracção, omissão 0.25)')
+    args = parser.parse_args()
+
+    print("=" * 72)
+    print("BENCHMARK ALMMo-0 — caminhos quentes")
+    print("=" * 72)
+
+    tarefas = []
+    for nome, estado in fixtures(args.grandes).items():
+        for caso, preparar, chamar in casos_banco(estado):
+            tarefas.append((f"{caso}[{nome}]", caso, preparar, chamar))
+    if COLD_START_OK:
+        caso, preparar, chamar = caso_cold_start()
+        tarefas.append((f"{caso}[sint_{N_COLD_START}]", caso, preparar, chamar))
+    else:
+        print("  [cold_start] cold_start_v8.py indisponível — caso ignorado")
+    if args.casos:
+        tarefas = [t for t in tarefas if t[1] in args.casos]
+
+    np.random.seed(SEMENTE)   # M3 perturba com np.random
+    resultados = {}
+    print(f"\n  {'caso':38s} {'mediana µs':>11s} {'p90 µs':>10s} {'rep':>5s} "
+          f"{'pico KiB':>9s} {'blocos':>7s}")
+    for chave, _, preparar, chamar in tarefas:
+        r = resultados[chave] = medir(preparar, chamar)
+        print(f"  {chave:38s} {r['mediana_us']:11.1f} {r['p90_us']:10.1f} "
+              f"{r['repeticoes']:5d} {r['pico_alloc_kb']:9.1f} {r['blocos_retidos']:7d}")
+
+    os.makedirs(PASTA_BENCH, exist_ok=True)
+    registo = {
+        'quando'  : datetime.now().isoformat(timespec='seconds'),
+        'commit'  : _commit(),
+        'maquina' : socket.gethostname(),
+        'cpu'     : platform.machine(),
+        'python'  : platform.python_version(),
+        'numpy'   : np.__version__,
+        'casos'   : resultados,
+    }
+    with open(os.path.join(PASTA_BENCH, 'historico.jsonl'), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(registo) + '\n')
+
+    caminho = _caminho_baseline()
+    if args.gravar_baseline or not os.path.exists(caminho):
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(registo, f, indent=1)
+        print(f"\n  Baseline gravado: {caminho}")
+        return 0
+
+    with open(caminho, encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressoes = comparar(resultados, baseline['casos'], args.limiar)
+    print(f"\n  Baseline: {caminho} (commit {baseline.get('commit')}, {baseline.get('quando')})")
+    if regressoes:
+        print(f"  ✗ {len(regressoes)} regressão(ões):")
+        for chave, desc in regressoes:
+            print(f"    {chave:38s} {desc}")
+        return 1
+    print("  ✓ Sem regressões face ao baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -52,5 +52,12 @@ HORA_ACCAO   = 18   # 18h00
 import os
 BASE_DIR      = os.path.dirname(os.path.abspath(__file__))
 RESULTADOS_DIR = os.path.join(BASE_DIR, "resultados_hil")
-LOG_SISTEMA   = os.path.join(BASE_DIR, "log_sistema.txt")
+LOG_SISTEMA   = os.path.join(BASE_DIR, "log_sistema.jsonl")
 CACHE_METEO   = os.path.join(BASE_DIR, "cache_meteo.json")
+
+# === REGISTO DE DECISÕES (LOG_SISTEMA, JSON-lines) ===
+LOG_MAX_BYTES      = 5_000_000   # roda o ficheiro ao passar este tamanho
+LOG_N_ROTACOES     = 5           # log_sistema.jsonl.1 … .5
+LOG_FLUSH_REGISTOS = 32          # escreve no disco a cada N registos …
+LOG_FLUSH_SEGUNDOS = 5.0         # … ou a cada N segundos
+CONSOLE_DIARIO     = True        # linha por dia no console (--silencioso desliga)
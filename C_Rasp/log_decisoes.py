@@ -0,0 +1,118 @@
+# log_decisoes.py — Registo estruturado das decisões (JSON-lines, buffer + rotação)
+#
+# Um registo JSON por linha em config_hil.LOG_SISTEMA. Cada linha tem
+# 'ts' (ISO) e 'tipo'; as decisões diárias ('decisao') levam entradas,
+# normalização, classe, confiança, motivo 18h, ajustes do feedback e a
+# telemetria do banco de regras (ALMMo0.telemetria()) — o suficiente para
+# ferramentas de replay/retreino reconstruírem cada ciclo sem o console.
+#
+# Escrita:
+#   - os registos ficam num buffer em memória e vão para o disco a cada
+#     flush_registos linhas ou flush_segundos (o que vier primeiro), e
+#     sempre em fechar()/flush()
+#   - ao passar max_bytes o ficheiro roda: log → log.1 → … → log.N
+#     (o mais antigo é apagado), como logging.handlers.RotatingFileHandler
+#
+# Leitura (replay):
+#   for reg in ler_registos(LOG_SISTEMA, tipo='decisao'): ...
+#   lê log.N … log.1, log — do mais antigo para o mais recente
+
+import os
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+
+
+def _json_padrao(obj):
+    """Tipos NumPy → nativos (json.dumps default)."""
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"não serializável: {type(obj).__name__}")
+
+
+class RegistoDecisoes:
+    """Escritor JSON-lines com buffer, flush configurável e rotação por tamanho."""
+
+    def __init__(self, caminho, max_bytes=5_000_000, n_rotacoes=5,
+                 flush_registos=32, flush_segundos=5.0):
+        self.caminho        = caminho
+        self.max_bytes      = max_bytes
+        self.n_rotacoes     = n_rotacoes
+        self.flush_registos = flush_registos
+        self.flush_segundos = flush_segundos
+        self._buffer        = []
+        self._bytes_buffer  = 0
+        self._t_flush       = time.monotonic()
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        try:
+            self._tamanho = os.path.getsize(caminho)
+        except OSError:
+            self._tamanho = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+        return False
+
+    def registar(self, tipo, **campos):
+        """Acrescenta um registo ao buffer; escreve se o limite de flush for atingido."""
+        linha = json.dumps({'ts': datetime.now().isoformat(timespec='seconds'),
+                            'tipo': tipo, **campos},
+                           ensure_ascii=False, default=_json_padrao) + '\n'
+        self._buffer.append(linha)
+        self._bytes_buffer += len(linha.encode('utf-8'))
+        if (len(self._buffer) >= self.flush_registos
+                or time.monotonic() - self._t_flush >= self.flush_segundos):
+            self.flush()
+
+    def flush(self):
+        if self._buffer:
+            if self.max_bytes and self._tamanho and \
+                    self._tamanho + self._bytes_buffer > self.max_bytes:
+                self._rodar()
+            with open(self.caminho, 'a', encoding='utf-8') as f:
+                f.writelines(self._buffer)
+            self._tamanho += self._bytes_buffer
+            self._buffer.clear()
+            self._bytes_buffer = 0
+        self._t_flush = time.monotonic()
+
+    def fechar(self):
+        self.flush()
+
+    def _rodar(self):
+        """log.N-1 → log.N, …, log → log.1 (log.N anterior é descartado)."""
+        if self.n_rotacoes <= 0:
+            os.remove(self.caminho)
+        else:
+            for i in range(self.n_rotacoes - 1, 0, -1):
+                origem = f"{self.caminho}.{i}"
+                if os.path.exists(origem):
+                    os.replace(origem, f"{self.caminho}.{i + 1}")
+            os.replace(self.caminho, f"{self.caminho}.1")
+        self._tamanho = 0
+
+
+def ficheiros_log(caminho, n_rotacoes=99):
+    """Ficheiros existentes do log, do mais antigo para o mais recente."""
+    rodados = [f"{caminho}.{i}" for i in range(n_rotacoes, 0, -1)]
+    return [c for c in rodados + [caminho] if os.path.exists(c)]
+
+
+def ler_registos(caminho, tipo=None):
+    """Gerador dos registos (dicts) por ordem cronológica; linhas truncadas são ignoradas."""
+    for ficheiro in ficheiros_log(caminho):
+        with open(ficheiro, encoding='utf-8') as f:
+            for linha in f:
+                try:
+                    reg = json.loads(linha)
+                except ValueError:
+                    continue
+                if tipo is None or reg.get('tipo') == tipo:
+                    yield reg
@@ -8,14 +8,20 @@
 #   python3 main_hil.py                  — todos os cenários
 #   python3 main_hil.py --cenario 3      — apenas o cenário 3
 #   python3 main_hil.py --sem-api        — sem chamar Open-Meteo (offline)
+#   python3 main_hil.py --silencioso     — sem a linha diária no console
 #
 # Outputs:
 #   resultados_hil/cenario_N_nome.csv    — dados diários por cenário
 #   resultados_hil/relatorio_hil.md      — relatório gerado automaticamente
+#   resultados_hil/estado_relatorio.json — agregados e secções em cache
+#                                          (só cenários alterados são refeitos)
+#   resultados_hil/perfil_etapas.json    — tempos por etapa do ciclo
+#                                          (histogramas, ver perfil_hil.py)
+#   log_sistema.jsonl                    — um registo JSON por decisão
+#                                          (LOG_SISTEMA, ver log_decisoes.py)
 
 import os
 import sys
-import csv
 import time
 import json
 import pickle
@@ -29,13 +35,19 @@ from config_hil import (
     TENSAO_RANGE_MAX, TENSAO_ENCHARCADO,
     VOLUMES_MM, NORM_N_INICIAL,
     FEEDBACK_JANELA_DIAS, FEEDBACK_MIN_OCORRENCIAS,
-    LATITUDE, LONGITUDE
+    LATITUDE, LONGITUDE,
+    LOG_SISTEMA, LOG_MAX_BYTES, LOG_N_ROTACOES,
+    LOG_FLUSH_REGISTOS, LOG_FLUSH_SEGUNDOS, CONSOLE_DIARIO
 )
 from almmo0 import ALMMo0, carregar_modelo
 from simulador_sensor import (
     SimuladorSensor, SimuladorChuva,
     umidade_para_tensao_kpa, decidir_accao_18h
 )
+from resultados_colunares import ResultadosColunares
+from agregados_hil import AgregadosCenario, EstadoRelatorio, chave_seccao
+from perfil_hil import PerfilEtapas
+from log_decisoes import RegistoDecisoes
 
 # Importações opcionais (não disponíveis em todos os ambientes)
 try:
@@ -47,6 +59,23 @@ except ImportError:
     MATPLOTLIB_OK = False
     print("[INFO] matplotlib não disponível — gráficos não serão gerados")
 
+# Serviço de gráficos partilhado (servico_graficos.py, na raiz do repositório
+# ou copiado para a pasta do projecto no Pi). Sem ele, render em série.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    from servico_graficos import FiguraSpec, renderizar_figuras
+    SERVICO_GRAFICOS_OK = True
+except ImportError:
+    SERVICO_GRAFICOS_OK = False
+
+# Núcleo ETo FAO-56 (eto_fao56.py, só NumPy): a geometria solar de
+# Imperatriz é tabelada uma vez e reutilizada em cada consulta meteorológica
+try:
+    import eto_fao56
+    ETO_FAO56_OK = True
+except ImportError:
+    ETO_FAO56_OK = False
+
 
 # ==============================================================================
 # NORMALIZADOR ONLINE (Welford)
@@ -102,12 +131,14 @@ class FeedbackStressHidrico:
     """
 
     def __init__(self, janela_dias=FEEDBACK_JANELA_DIAS,
-                 min_ocorrencias=FEEDBACK_MIN_OCORRENCIAS):
+                 min_ocorrencias=FEEDBACK_MIN_OCORRENCIAS, perfil=None):
         self.janela_dias      = janela_dias
         self.min_ocorrencias  = min_ocorrencias
         self.buffer           = []
         # Chave: classe_real → contagem de erros pendentes
         self.historico_erros  = {}
+        # Span 'learn' (PerfilEtapas); sem perfil, spans vazios
+        self.perfil           = perfil or PerfilEtapas(activo=False)
 
     def registar_decisao(self, x, classe, tensao):
         """Chamar no momento da decisão (06h00)."""
@@ -152,7 +183,8 @@ class FeedbackStressHidrico:
                     self.historico_erros.get(chave, 0) + 1
 
                 if self.historico_erros[chave] >= self.min_ocorrencias:
-                    modelo.learn(entrada['input'], classe_real)
+                    with self.perfil.span('learn'):
+                        modelo.learn(entrada['input'], classe_real)
                     self.historico_erros[chave] = 0  # reset após aprender
                     ajustes.append({
                         'classe_pred': entrada['classe'],
@@ -300,7 +332,8 @@ def obter_dados_meteorologicos(lat=LATITUDE, lon=LONGITUDE,
             url = "https://api.open-meteo.com/v1/forecast"
             params = {
                 "latitude": lat, "longitude": lon,
-                "daily": ["precipitation_sum", "temperature_2m_max"],
+                "daily": ["precipitation_sum", "temperature_2m_max",
+                          "temperature_2m_min"],
                 "timezone": "America/Fortaleza",
                 "past_days": 3, "forecast_days": 1,
             }
@@ -318,6 +351,15 @@ def obter_dados_meteorologicos(lat=LATITUDE, lon=LONGITUDE,
                 "latencia_ms"     : latencia_ms,
                 "timestamp"       : datetime.now().isoformat(),
             }
+            if ETO_FAO56_OK and data.get("temperature_2m_min"):
+                # ETo Hargreaves-Samani dos 3 dias (Ra lido da tabela por DOY)
+                doy = [datetime.strptime(d, "%Y-%m-%d").timetuple().tm_yday
+                       for d in data["time"][-4:-1]]
+                eto = eto_fao56.eto_hargreaves_samani(
+                    np.array(data["temperature_2m_max"][-4:-1], dtype=float),
+                    np.array(data["temperature_2m_min"][-4:-1], dtype=float),
+                    np.array(doy), lat)
+                resultado["eto_acum_3d_mm"] = round(float(np.nansum(eto)), 1)
             with open(cache_path, 'w') as f:
                 json.dump(resultado, f, indent=2)
             return resultado
@@ -349,7 +391,9 @@ def obter_dados_meteorologicos(lat=LATITUDE, lon=LONGITUDE,
 # ==============================================================================
 
 def executar_cenario(cenario, modelo, feedback, normalizador,
-                     dados_meteo, sensor_chuva, usar_api=True):
+                     dados_meteo, sensor_chuva, usar_api=True,
+                     agregados=None, perfil=None, registo=None,
+                     verbose=CONSOLE_DIARIO):
     """
     Executa um cenário HIL completo.
 
@@ -358,24 +402,34 @@ def executar_cenario(cenario, modelo, feedback, normalizador,
       18h00 — dupla confirmação (sensor chuva + tensão actual)
       19h00 — acção (bomba ligada X segundos — simulada)
 
+    Se `agregados` (AgregadosCenario) for dado, é actualizado a cada dia
+    — o relatório não precisa de voltar a percorrer os resultados.
+    Se `perfil` (PerfilEtapas) for dado, cada etapa do dia é medida num
+    span nomeado; 'ciclo' é o dia completo sem o print de progresso.
+    Se `registo` (RegistoDecisoes) for dado, cada dia gera um registo
+    'decisao' no log estruturado; verbose=False omite a linha diária.
+
     Returns:
-        list[dict] — resultados linha a linha (um por dia)
+        ResultadosColunares — uma coluna tipada por campo, um valor por dia
     """
     sensor          = SimuladorSensor(theta_inicial=cenario['theta_inicial'])
-    resultados      = []
+    resultados      = ResultadosColunares(capacidade=cenario['dias'])
     irrigou_ontem   = 0.0
     chuva_ontem     = 0.0
     sensor_chuva.reset_diario()
+    perfil          = perfil or PerfilEtapas(activo=False)
 
     print(f"\n{'='*60}")
     print(f"  CENÁRIO {cenario.get('id', '?')} — {cenario['nome']}")
     print(f"  {cenario['descricao']}")
     print(f"{'='*60}")
-    print(f"  {'Dia':>3} | {'kPa':>6} | {'Cls':>3} | {'Irr':>5} | "
-          f"{'Motivo18h':<28} | {'Regras':>6} | Flags")
-    print(f"  {'-'*80}")
+    if verbose:
+        print(f"  {'Dia':>3} | {'kPa':>6} | {'Cls':>3} | {'Irr':>5} | "
+              f"{'Motivo18h':<28} | {'Regras':>6} | Flags")
+        print(f"  {'-'*80}")
 
     for dia in range(cenario['dias']):
+        t0_ciclo  = time.perf_counter_ns()
         dap       = cenario['dap_inicial'] + dia
         chuva_dia = cenario['precipitacao_diaria'][dia]
         tmax_dia  = cenario['tmax_diaria'][dia]
@@ -383,28 +437,32 @@ def executar_cenario(cenario, modelo, feedback, normalizador,
         # ------ 06h00: LEITURA SENSOR ------
         # Nota: o sensor lê o estado do solo que reflecte
         # irrigação e chuva do dia ANTERIOR (delay físico real)
-        theta_6h  = sensor.ler_theta(
-            irrigou_mm=irrigou_ontem,
-            chuva_mm=chuva_ontem,
-            dap=dap,
-            adicionar_ruido=True
-        )
-        tensao_6h = umidade_para_tensao_kpa(theta_6h)
+        with perfil.span('sensor'):
+            theta_6h  = sensor.ler_theta(
+                irrigou_mm=irrigou_ontem,
+                chuva_mm=chuva_ontem,
+                dap=dap,
+                adicionar_ruido=True
+            )
+            tensao_6h = umidade_para_tensao_kpa(theta_6h)
 
         # ------ 06h00: FEATURE VECTOR ------
         # chuva_3d: usa dados da API (histórico real dos 3 dias anteriores)
         # No HIL, aproximamos com a janela do cenário
-        chuva_3d = sum(cenario['precipitacao_diaria'][max(0, dia - 2):dia])
-        tmax_3d  = max(cenario['tmax_diaria'][max(0, dia - 2):dia + 1])
+        with perfil.span('features'):
+            chuva_3d = sum(cenario['precipitacao_diaria'][max(0, dia - 2):dia])
+            tmax_3d  = max(cenario['tmax_diaria'][max(0, dia - 2):dia + 1])
 
-        x = np.array([tensao_6h, chuva_3d, tmax_3d, float(dap)])
+            x = np.array([tensao_6h, chuva_3d, tmax_3d, float(dap)])
 
         # ------ 06h00: NORMALIZAR + INFERÊNCIA ------
-        normalizador.actualizar(x)
-        modelo.input_mean = normalizador.media.copy()
-        modelo.input_std  = normalizador.std.copy()
+        with perfil.span('normalizador'):
+            normalizador.actualizar(x)
+            modelo.input_mean = normalizador.media.copy()
+            modelo.input_std  = normalizador.std.copy()
 
-        classe_manha, confianca = modelo.predict_com_confianca(x)
+        with perfil.span('predict'):
+            classe_manha, confianca = modelo.predict_com_confianca(x)
 
         # ------ 06h00: REGISTAR DECISÃO NO FEEDBACK ------
         feedback.registar_decisao(x, classe_manha, tensao_6h)
@@ -413,63 +471,96 @@ def executar_cenario(cenario, modelo, feedback, normalizador,
         # ------ 18h00: DUPLA CONFIRMAÇÃO ------
         # Usa um segundo SimuladorSensor internamente para a leitura das 18h
         # (o sensor principal continua com o estado do início do dia)
-        sensor_18h = SimuladorSensor(theta_inicial=theta_6h)
-        decisao_18h = decidir_accao_18h(
-            classe_manha  = classe_manha,
-            sensor_chuva  = sensor_chuva,
-            sensor_solo   = sensor_18h,
-            chuva_real_mm = chuva_dia,
-            irrigou_ontem_mm = irrigou_ontem,
-            chuva_ontem_mm   = chuva_ontem,
-            dap           = dap
-        )
-        sensor_chuva.reset_diario()
+        with perfil.span('confirmacao_18h'):
+            sensor_18h = SimuladorSensor(theta_inicial=theta_6h)
+            decisao_18h = decidir_accao_18h(
+                classe_manha  = classe_manha,
+                sensor_chuva  = sensor_chuva,
+                sensor_solo   = sensor_18h,
+                chuva_real_mm = chuva_dia,
+                irrigou_ontem_mm = irrigou_ontem,
+                chuva_ontem_mm   = chuva_ontem,
+                dap           = dap
+            )
+            sensor_chuva.reset_diario()
 
         classe_final = decisao_18h['classe_final']
         irrigou_mm   = decisao_18h['irrigou_mm']
         motivo_18h   = decisao_18h['motivo']
 
         # ------ FEEDBACK: AVALIAR DECISÕES ANTERIORES ------
-        ajustes = feedback.avaliar_e_retreinar(modelo)
+        with perfil.span('feedback'):
+            ajustes = feedback.avaliar_e_retreinar(modelo)
 
         # ------ ESTADO DAS REGRAS ------
-        dist_regras = modelo.distribuicao_regras()
-        acima_range = tensao_6h > TENSAO_RANGE_MAX
-
-        # ------ REGISTAR RESULTADO ------
-        resultado = {
-            'dia'                : dia + 1,
-            'dap'                : dap,
-            'theta_6h'           : round(theta_6h, 4),
-            'tensao_6h_kpa'      : round(tensao_6h, 1),
-            'theta_18h'          : round(decisao_18h['theta_18h'], 4),
-            'tensao_18h_kpa'     : decisao_18h['tensao_18h'],
-            'chuva_3d_mm'        : round(chuva_3d, 1),
-            'tmax_3d_c'          : round(tmax_3d, 1),
-            'chuva_dia_mm'       : chuva_dia,
-            'choveu_sensor'      : decisao_18h['choveu'],
-            'mm_chuva_sensor'    : decisao_18h['mm_chuva'],
-            'classe_manha'       : classe_manha,
-            'confianca_manha'    : round(confianca, 3),
-            'classe_final'       : classe_final,
-            'irrigou_mm'         : irrigou_mm,
-            'motivo_18h'         : motivo_18h,
-            'n_regras'           : len(modelo.rules),
-            'regras_c0'          : dist_regras[0],
-            'regras_c1'          : dist_regras[1],
-            'regras_c2'          : dist_regras[2],
-            'houve_feedback'     : len(ajustes) > 0,
-            'n_ajustes'          : len(ajustes),
-            'tensao_acima_range' : acima_range,
-            'fonte_meteo'        : dados_meteo.get('fonte', 'n/a'),
-        }
-        resultados.append(resultado)
+        with perfil.span('registo'):
+            dist_regras = modelo.distribuicao_regras()
+            acima_range = tensao_6h > TENSAO_RANGE_MAX
+
+            # ------ REGISTAR RESULTADO ------
+            resultados.adicionar(
+                dia                = dia + 1,
+                dap                = dap,
+                theta_6h           = round(theta_6h, 4),
+                tensao_6h_kpa      = round(tensao_6h, 1),
+                theta_18h          = round(decisao_18h['theta_18h'], 4),
+                tensao_18h_kpa     = decisao_18h['tensao_18h'],
+                chuva_3d_mm        = round(chuva_3d, 1),
+                tmax_3d_c          = round(tmax_3d, 1),
+                chuva_dia_mm       = chuva_dia,
+                choveu_sensor      = decisao_18h['choveu'],
+                mm_chuva_sensor    = decisao_18h['mm_chuva'],
+                classe_manha       = classe_manha,
+                confianca_manha    = round(confianca, 3),
+                classe_final       = classe_final,
+                irrigou_mm         = irrigou_mm,
+                motivo_18h         = motivo_18h,
+                n_regras           = len(modelo.rules),
+                regras_c0          = dist_regras[0],
+                regras_c1          = dist_regras[1],
+                regras_c2          = dist_regras[2],
+                houve_feedback     = len(ajustes) > 0,
+                n_ajustes          = len(ajustes),
+                tensao_acima_range = acima_range,
+                fonte_meteo        = dados_meteo.get('fonte', 'n/a'),
+            )
+            if agregados is not None:
+                agregados.actualizar_dia(classe_final, round(tensao_6h, 1),
+                                         len(ajustes) > 0)
+            if registo is not None:
+                registo.registar(
+                    'decisao',
+                    cenario         = cenario.get('id'),
+                    dia             = dia + 1,
+                    dap             = dap,
+                    x               = x,
+                    input_mean      = modelo.input_mean,
+                    input_std       = modelo.input_std,
+                    theta_6h        = theta_6h,
+                    tensao_6h_kpa   = tensao_6h,
+                    classe_manha    = classe_manha,
+                    confianca       = confianca,
+                    classe_final    = classe_final,
+                    irrigou_mm      = irrigou_mm,
+                    motivo_18h      = motivo_18h,
+                    tensao_18h_kpa  = decisao_18h['tensao_18h'],
+                    choveu_sensor   = decisao_18h['choveu'],
+                    mm_chuva_sensor = decisao_18h['mm_chuva'],
+                    ajustes         = ajustes,
+                    n_regras        = len(modelo.rules),
+                    telemetria      = modelo.telemetria(),
+                    acima_range     = acima_range,
+                    fonte_meteo     = dados_meteo.get('fonte', 'n/a'),
+                )
 
         # Preparar para próximo dia
         irrigou_ontem = irrigou_mm
         chuva_ontem   = chuva_dia
+        perfil.registar('ciclo', time.perf_counter_ns() - t0_ciclo)
 
-        # Print em tempo real
+        # Print em tempo real (opcional — o registo estruturado é o log)
+        if not verbose:
+            continue
         flags = ""
         if acima_range:
             flags += "⚠️ "
@@ -493,14 +584,10 @@ def executar_cenario(cenario, modelo, feedback, normalizador,
 # ==============================================================================
 
 def salvar_csv(resultados, caminho):
-    """Guarda lista de resultados em CSV."""
+    """Guarda o armazenamento colunar de um cenário em CSV."""
     if not resultados:
         return
-    os.makedirs(os.path.dirname(caminho), exist_ok=True)
-    with open(caminho, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=resultados[0].keys())
-        writer.writeheader()
-        writer.writerows(resultados)
+    resultados.salvar_csv(caminho)
     print(f"  → CSV guardado: {caminho}")
 
 
@@ -508,81 +595,122 @@ def salvar_csv(resultados, caminho):
 # GRÁFICOS (se matplotlib disponível)
 # ==============================================================================
 
-def gerar_graficos(todos_resultados, output_dir):
-    """Gera gráficos PNG para cada cenário e o gráfico chave do Cenário 3."""
+# Colunas usadas nos gráficos — o digest delas decide se o PNG é refeito
+CAMPOS_GRAFICO = ['dia', 'tensao_6h_kpa', 'classe_final', 'irrigou_mm',
+                  'regras_c0', 'regras_c1', 'regras_c2', 'houve_feedback']
+
+
+def _figura_cenario(caminho, titulo, colunas):
+    """Figura de 3 subplots de um cenário. `colunas`: dict campo → ndarray."""
+    cores_classe = {0: '#2196F3', 1: '#FF9800', 2: '#F44336'}
+
+    dias     = colunas['dia']
+    tensoes  = colunas['tensao_6h_kpa']
+    classes  = colunas['classe_final']
+    irr      = colunas['irrigou_mm']
+
+    fig, axes = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
+    fig.suptitle(titulo, fontsize=13)
+
+    # Subplot 1: Tensão do solo
+    ax1 = axes[0]
+    ax1.plot(dias, tensoes, 'b-o', markersize=4, linewidth=1.5, label='Tensão 06h')
+    ax1.axhline(TENSAO_OPTIMA_MAX, color='green', linestyle='--',
+                alpha=0.7, label=f'Ótimo ({TENSAO_OPTIMA_MAX} kPa)')
+    ax1.axhline(TENSAO_STRESS_MOD, color='orange', linestyle='--',
+                alpha=0.7, label=f'Stress mod ({TENSAO_STRESS_MOD} kPa)')
+    ax1.axhline(TENSAO_STRESS_SEV, color='red', linestyle='--',
+                alpha=0.7, label=f'Stress sev ({TENSAO_STRESS_SEV} kPa)')
+    ax1.axhline(TENSAO_RANGE_MAX, color='darkred', linestyle=':',
+                alpha=0.5, label=f'Range max ({TENSAO_RANGE_MAX} kPa)')
+    ax1.set_ylabel('Tensão do solo (kPa)')
+    ax1.legend(fontsize=7, loc='upper right')
+    ax1.grid(True, alpha=0.3)
+
+    # Subplot 2: Classe predita + irrigação
+    ax2 = axes[1]
+    cores_barras = [cores_classe[c] for c in classes.tolist()]
+    ax2.bar(dias, classes, color=cores_barras, alpha=0.8, label='Classe final')
+    ax2_twin = ax2.twinx()
+    ax2_twin.plot(dias, irr, 'k--', alpha=0.5, linewidth=1, label='Irrigação (mm)')
+    ax2_twin.set_ylabel('Irrigação (mm)', fontsize=9)
+    ax2.set_ylabel('Classe (0=Nenhuma, 1=Mod, 2=Int)')
+    ax2.set_ylim(-0.2, 2.5)
+    ax2.set_yticks([0, 1, 2])
+    ax2.grid(True, alpha=0.3)
+
+    # Subplot 3: Distribuição de regras (mais relevante no C3)
+    ax3 = axes[2]
+    ax3.stackplot(dias, colunas['regras_c0'], colunas['regras_c1'], colunas['regras_c2'],
+                  labels=['Regras C0', 'Regras C1', 'Regras C2'],
+                  colors=['#2196F3', '#FF9800', '#F44336'], alpha=0.7)
+    ax3.set_ylabel('Nº de regras')
+    ax3.set_xlabel('Dia do cenário')
+    ax3.legend(fontsize=8, loc='upper right')
+    ax3.grid(True, alpha=0.3)
+
+    # Marcar eventos de feedback
+    fb_dias = dias[colunas['houve_feedback']]
+    for fd in fb_dias.tolist():
+        for ax in axes:
+            ax.axvline(fd, color='purple', alpha=0.3, linewidth=1)
+
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=120, bbox_inches='tight')
+    plt.close()
+
+
+def gerar_graficos(todos_resultados, output_dir, estado=None):
+    """
+    Gera gráficos PNG para cada cenário e o gráfico chave do Cenário 3.
+    Com `estado` (EstadoRelatorio), cenários cujos dados não mudaram
+    desde o último PNG são saltados. Os restantes são renderizados em
+    paralelo pelo servico_graficos (se disponível) ou em série.
+    """
     if not MATPLOTLIB_OK:
         return
 
     graficos_dir = os.path.join(output_dir, 'graficos_hil')
     os.makedirs(graficos_dir, exist_ok=True)
 
-    cores_classe = {0: '#2196F3', 1: '#FF9800', 2: '#F44336'}
-
+    pendentes = []   # (id_cenario, digest, caminho, titulo, colunas)
     for id_cenario, resultados in todos_resultados.items():
         if not resultados:
             continue
 
         cenario = CENARIOS[id_cenario]
-        dias     = [r['dia'] for r in resultados]
-        tensoes  = [r['tensao_6h_kpa'] for r in resultados]
-        classes  = [r['classe_final'] for r in resultados]
-        irr      = [r['irrigou_mm'] for r in resultados]
-
-        fig, axes = plt.subplots(3, 1, figsize=(12, 9), sharex=True)
-        fig.suptitle(f"Cenário {id_cenario} — {cenario['nome']}", fontsize=13)
-
-        # Subplot 1: Tensão do solo
-        ax1 = axes[0]
-        ax1.plot(dias, tensoes, 'b-o', markersize=4, linewidth=1.5, label='Tensão 06h')
-        ax1.axhline(TENSAO_OPTIMA_MAX, color='green', linestyle='--',
-                    alpha=0.7, label=f'Ótimo ({TENSAO_OPTIMA_MAX} kPa)')
-        ax1.axhline(TENSAO_STRESS_MOD, color='orange', linestyle='--',
-                    alpha=0.7, label=f'Stress mod ({TENSAO_STRESS_MOD} kPa)')
-        ax1.axhline(TENSAO_STRESS_SEV, color='red', linestyle='--',
-                    alpha=0.7, label=f'Stress sev ({TENSAO_STRESS_SEV} kPa)')
-        ax1.axhline(TENSAO_RANGE_MAX, color='darkred', linestyle=':',
-                    alpha=0.5, label=f'Range max ({TENSAO_RANGE_MAX} kPa)')
-        ax1.set_ylabel('Tensão do solo (kPa)')
-        ax1.legend(fontsize=7, loc='upper right')
-        ax1.grid(True, alpha=0.3)
-
-        # Subplot 2: Classe predita + irrigação
-        ax2 = axes[1]
-        cores_barras = [cores_classe[c] for c in classes]
-        ax2.bar(dias, classes, color=cores_barras, alpha=0.8, label='Classe final')
-        ax2_twin = ax2.twinx()
-        ax2_twin.plot(dias, irr, 'k--', alpha=0.5, linewidth=1, label='Irrigação (mm)')
-        ax2_twin.set_ylabel('Irrigação (mm)', fontsize=9)
-        ax2.set_ylabel('Classe (0=Nenhuma, 1=Mod, 2=Int)')
-        ax2.set_ylim(-0.2, 2.5)
-        ax2.set_yticks([0, 1, 2])
-        ax2.grid(True, alpha=0.3)
-
-        # Subplot 3: Distribuição de regras (mais relevante no C3)
-        ax3 = axes[2]
-        r0 = [r['regras_c0'] for r in resultados]
-        r1 = [r['regras_c1'] for r in resultados]
-        r2 = [r['regras_c2'] for r in resultados]
-        ax3.stackplot(dias, r0, r1, r2,
-                      labels=['Regras C0', 'Regras C1', 'Regras C2'],
-                      colors=['#2196F3', '#FF9800', '#F44336'], alpha=0.7)
-        ax3.set_ylabel('Nº de regras')
-        ax3.set_xlabel('Dia do cenário')
-        ax3.legend(fontsize=8, loc='upper right')
-        ax3.grid(True, alpha=0.3)
-
-        # Marcar eventos de feedback
-        fb_dias = [r['dia'] for r in resultados if r['houve_feedback']]
-        for fd in fb_dias:
-            for ax in axes:
-                ax.axvline(fd, color='purple', alpha=0.3, linewidth=1)
-
-        plt.tight_layout()
         nome_ficheiro = os.path.join(
             graficos_dir, f"cenario_{id_cenario}_{cenario['nome'].replace(' ', '_').lower()}.png"
         )
-        plt.savefig(nome_ficheiro, dpi=120, bbox_inches='tight')
-        plt.close()
+        digest = resultados.digest(CAMPOS_GRAFICO)
+        if estado is not None and estado.grafico_actual(id_cenario, digest, nome_ficheiro):
+            print(f"  → Gráfico inalterado: {nome_ficheiro}")
+            continue
+
+        colunas = {c: resultados[c].copy() for c in CAMPOS_GRAFICO}
+        titulo  = f"Cenário {id_cenario} — {cenario['nome']}"
+        pendentes.append((id_cenario, digest, nome_ficheiro, titulo, colunas))
+
+    if SERVICO_GRAFICOS_OK and len(pendentes) > 1:
+        # O cache é o EstadoRelatorio — o manifesto do serviço não é usado
+        res = renderizar_figuras(
+            [FiguraSpec(_figura_cenario, cam, {'titulo': tit, 'colunas': col})
+             for _, _, cam, tit, col in pendentes],
+            usar_manifesto=False, verbose=False
+        )
+        gerados = {cam for cam, st in res.items() if st == 'gerada'}
+    else:
+        gerados = set()
+        for _, _, cam, tit, col in pendentes:
+            _figura_cenario(cam, tit, col)
+            gerados.add(cam)
+
+    for id_cenario, digest, nome_ficheiro, _, _ in pendentes:
+        if nome_ficheiro not in gerados:
+            print(f"  ✗ Gráfico falhou: {nome_ficheiro}")
+            continue
+        if estado is not None:
+            estado.marcar_grafico(id_cenario, digest)
         print(f"  → Gráfico: {nome_ficheiro}")
 
 
@@ -590,9 +718,67 @@ def gerar_graficos(todos_resultados, output_dir):
 # RELATÓRIO HIL AUTOMÁTICO
 # ==============================================================================
 
+# Subir ao mudar o modelo de _seccao_cenario_md — invalida as secções em cache
+VERSAO_SECCAO_MD = 1
+
+
+def _chave_seccao_cenario(id_cenario, digest):
+    """Chave da secção em cache: resultados + definição do cenário + versão."""
+    cenario = CENARIOS.get(id_cenario, {})
+    return chave_seccao(digest, VERSAO_SECCAO_MD, cenario.get('nome'),
+                        cenario.get('descricao'), cenario.get('comportamento_esperado'))
+
+
+def _seccao_cenario_md(id_cenario, resultados):
+    """Linhas markdown da Secção 3 para um cenário (tabela dia a dia)."""
+    cenario = CENARIOS[id_cenario]
+    linhas  = []
+    W       = lambda s: linhas.append(s)
+
+    W(f"### Cenário {id_cenario} — {cenario['nome']}")
+    W(f"*{cenario['descricao']}*")
+    W("")
+    W(f"**Comportamento esperado:** {cenario['comportamento_esperado']}")
+    W("")
+
+    if resultados:
+        W("| Dia | kPa | θ | C manhã | C final | Irr mm | Motivo 18h | Regras | Flags |")
+        W("|-----|-----|---|---------|---------|--------|------------|--------|-------|")
+        for r in resultados.linhas():
+            flags = ""
+            if r['tensao_acima_range']:
+                flags += "⚠️range "
+            if r['houve_feedback']:
+                flags += "📚fb "
+            if r['choveu_sensor']:
+                flags += "🌧️"
+            W(f"| {r['dia']} | {r['tensao_6h_kpa']} | {r['theta_6h']} "
+              f"| C{r['classe_manha']} | C{r['classe_final']} "
+              f"| {r['irrigou_mm']} | {r['motivo_18h']} "
+              f"| {r['n_regras']} ({r['regras_c0']}/{r['regras_c1']}/{r['regras_c2']}) "
+              f"| {flags} |")
+    W("")
+    return linhas
+
+
 def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
-                    output_dir):
-    """Gera relatorio_hil.md com todas as secções especificadas no briefing."""
+                    output_dir, estado=None, perfil=None):
+    """
+    Gera relatorio_hil.md com todas as secções especificadas no briefing.
+
+    As estatísticas vêm dos agregados incrementais em `estado`
+    (EstadoRelatorio). A tabela de cada cenário só é renderizada de novo
+    se o digest dos seus resultados mudou; cenários de execuções anteriores
+    que não estão em `todos_resultados` são reaproveitados do estado.
+    Sem `estado`, os agregados são reconstruídos de `todos_resultados`.
+    `perfil` (PerfilEtapas) acrescenta a tabela de tempos por etapa desta
+    execução à Secção 1.
+    """
+    if estado is None:
+        estado = EstadoRelatorio(output_dir)
+        for id_c, resultados in todos_resultados.items():
+            estado.registar_cenario(id_c, AgregadosCenario.de_resultados(resultados),
+                                    tempos.get(id_c, (0.0, 0.0)), resultados.digest())
 
     caminho = os.path.join(output_dir, 'relatorio_hil.md')
     linhas  = []
@@ -606,7 +792,7 @@ def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
     # ------ Secção 1: Validação de Hardware ------
     W("## Secção 1 — Validação de Hardware")
     W("")
-    for id_c, (t_load, t_inf) in tempos.items():
+    for id_c, (t_load, t_inf) in estado.tempos().items():
         cenario = CENARIOS[id_c]
         W(f"**Cenário {id_c} ({cenario['nome']}):**")
         W(f"- Tempo carregamento pkl: `{t_load:.1f} ms`")
@@ -614,6 +800,17 @@ def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
     W(f"- Fonte do modelo: `{modelo_source}`")
     W("")
 
+    if perfil is not None and perfil.resumo():
+        W("### Tempos por etapa (esta execução)")
+        W("")
+        W("Spans monotónicos (`perf_counter_ns`) em histograma log2; p50/p99 "
+          "estimados pelo bucket. `feedback` inclui `learn`. "
+          "Detalhe em `perfil_etapas.json`.")
+        W("")
+        for linha in perfil.linhas_md():
+            W(linha)
+        W("")
+
     # ------ Secção 2: Validação de Integração ------
     W("## Secção 2 — Validação de Integração")
     W("")
@@ -622,6 +819,7 @@ def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
         W(f"- Latência: `{dados_meteo.get('latencia_ms', '?')} ms` ✅")
     W(f"- Chuva acum. 3d (Imperatriz-MA): `{dados_meteo.get('chuva_acum_3d_mm', '?')} mm`")
     W(f"- Tmax 3d: `{dados_meteo.get('tmax_max_3d_c', '?')} °C`")
+    W(f"- ETo acum. 3d (Hargreaves-Samani): `{dados_meteo.get('eto_acum_3d_mm', '?')} mm`")
     W(f"- Cache JSON: `cache_meteo.json` — {'✅' if os.path.exists('cache_meteo.json') else '❌'}")
     W("")
 
@@ -629,53 +827,33 @@ def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
     W("## Secção 3 — Resultados por Cenário")
     W("")
 
-    for id_cenario, resultados in todos_resultados.items():
-        cenario = CENARIOS[id_cenario]
-        W(f"### Cenário {id_cenario} — {cenario['nome']}")
-        W(f"*{cenario['descricao']}*")
-        W("")
-        W(f"**Comportamento esperado:** {cenario['comportamento_esperado']}")
-        W("")
-
-        if resultados:
-            W("| Dia | kPa | θ | C manhã | C final | Irr mm | Motivo 18h | Regras | Flags |")
-            W("|-----|-----|---|---------|---------|--------|------------|--------|-------|")
-            for r in resultados:
-                flags = ""
-                if r['tensao_acima_range']:
-                    flags += "⚠️range "
-                if r['houve_feedback']:
-                    flags += "📚fb "
-                if r['choveu_sensor']:
-                    flags += "🌧️"
-                W(f"| {r['dia']} | {r['tensao_6h_kpa']} | {r['theta_6h']} "
-                  f"| C{r['classe_manha']} | C{r['classe_final']} "
-                  f"| {r['irrigou_mm']} | {r['motivo_18h']} "
-                  f"| {r['n_regras']} ({r['regras_c0']}/{r['regras_c1']}/{r['regras_c2']}) "
-                  f"| {flags} |")
-        W("")
+    n_refeitas = 0
+    for id_cenario in estado.ids():
+        digest = _chave_seccao_cenario(id_cenario,
+                                       estado.cenarios[id_cenario].get('digest'))
+        bloco  = estado.seccao(id_cenario, digest)
+        if bloco is None:
+            if id_cenario not in todos_resultados:
+                continue
+            bloco = _seccao_cenario_md(id_cenario, todos_resultados[id_cenario])
+            estado.guardar_seccao(id_cenario, digest, bloco)
+            n_refeitas += 1
+        linhas.extend(bloco)
 
     # ------ Secção 4: Análise do Aprendizado Online (Cenário 3) ------
     W("## Secção 4 — Análise do Aprendizado Online (Cenário 3)")
     W("")
 
-    r3 = todos_resultados.get(3, [])
-    if r3:
-        semanas = [r3[0:7], r3[7:14], r3[14:21]]
+    agg3 = estado.agregados(3)
+    if agg3 and agg3.n_dias:
         W("### % de dias C1+C2 por semana")
         W("")
         W("| Semana | Dias | C0 | C1+C2 | % C1+C2 |")
         W("|--------|------|----|-------|---------|")
 
-        pcts = []
-        for i, semana in enumerate(semanas):
-            if not semana:
-                continue
-            c0    = sum(1 for r in semana if r['classe_final'] == 0)
-            c12   = sum(1 for r in semana if r['classe_final'] > 0)
-            pct   = c12 / len(semana) * 100
-            pcts.append(pct)
-            W(f"| Semana {i+1} | {len(semana)} | {c0} | {c12} | {pct:.0f}% |")
+        pcts = agg3.pct_c12_semanas()
+        for i, ((c0, c12), pct) in enumerate(zip(agg3.semanas, pcts)):
+            W(f"| Semana {i+1} | {c0 + c12} | {c0} | {c12} | {pct:.0f}% |")
 
         W("")
         if len(pcts) >= 2:
@@ -684,8 +862,7 @@ def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
               f"{'✅ PASS' if aprendeu else '❌ FAIL'} "
               f"({pcts[0]:.0f}% → {pcts[-1]:.0f}%)")
 
-        n_fb = sum(1 for r in r3 if r['houve_feedback'])
-        W(f"\n**Total de eventos de feedback:** {n_fb} em {len(r3)} dias")
+        W(f"\n**Total de eventos de feedback:** {agg3.n_feedback} em {agg3.n_dias} dias")
         W("")
 
     # ------ Secção 5: Dead Zone ------
@@ -697,10 +874,11 @@ def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
       "corrigidos por dados de campo reais com o sensor físico calibrado.")
     W("")
 
-    for id_cenario, resultados in todos_resultados.items():
-        dead = [r for r in resultados
-                if 40.0 < r['tensao_6h_kpa'] <= 90.0 and not r['houve_feedback']]
-        W(f"**Cenário {id_cenario}:** {len(dead)} dias na dead zone sem feedback")
+    for id_cenario in estado.ids():
+        agg = estado.agregados(id_cenario)
+        if agg is None:
+            continue
+        W(f"**Cenário {id_cenario}:** {agg.n_dead} dias na dead zone sem feedback")
 
     W("")
     W("---")
@@ -709,22 +887,20 @@ def gerar_relatorio(todos_resultados, dados_meteo, tempos, modelo_source,
 
     with open(caminho, 'w', encoding='utf-8') as f:
         f.write('\n'.join(linhas))
-    print(f"\n  → Relatório HIL: {caminho}")
+    print(f"\n  → Relatório HIL: {caminho} "
+          f"({n_refeitas} secção(ões) de cenário refeita(s))")
 
 
 # ==============================================================================
 # MAIN
 # ==============================================================================
 
-def main():
-    parser = argparse.ArgumentParser(description='Validação HIL — Sistema ALMMo-0')
-    parser.add_argument('--cenario', type=int, choices=[1, 2, 3, 4],
-                        help='Executar apenas este cenário (omitir = todos)')
-    parser.add_argument('--sem-api', action='store_true',
-                        help='Não chamar Open-Meteo (usar cache ou fallback)')
-    args = parser.parse_args()
-
-    usar_api = not args.sem_api
+def executar_validacao(apenas_cenario, usar_api, verbose, registo):
+    """
+    Protocolo HIL completo: modelo, meteorologia, cenários (todos ou só
+    `apenas_cenario`), gráficos, relatório e persistência. As decisões
+    vão para `registo` (RegistoDecisoes); quem chama fecha-o.
+    """
     os.makedirs(RESULTADOS_DIR, exist_ok=True)
 
     print("\n" + "="*60)
@@ -755,10 +931,16 @@ def main():
     sensor_chuva = SimuladorChuva(seed=42)
 
     # ------ Seleccionar cenários a executar ------
-    ids_cenarios = [args.cenario] if args.cenario else [1, 2, 3, 4]
+    ids_cenarios = [apenas_cenario] if apenas_cenario else [1, 2, 3, 4]
 
     todos_resultados = {}
     tempos           = {}
+    perfis           = {}
+    perfil_total     = PerfilEtapas()
+    estado           = EstadoRelatorio.carregar(RESULTADOS_DIR)
+
+    registo.registar('execucao_inicio', cenarios=ids_cenarios, modelo=modelo_source,
+                     fonte_meteo=dados_meteo.get('fonte'), t_load_ms=t_load_ms)
 
     for id_cenario in ids_cenarios:
         cenario        = CENARIOS[id_cenario].copy()
@@ -774,44 +956,95 @@ def main():
         )
 
         # Feedback reiniciado por cenário
-        feedback = FeedbackStressHidrico()
+        perfil   = PerfilEtapas()
+        feedback = FeedbackStressHidrico(perfil=perfil)
 
-        # Medir tempo de inferência
+        # Medir tempo de inferência (por etapa; t_inf_ms = média do ciclo)
+        agregados  = AgregadosCenario()
         t0_cenario = time.time()
         resultados = executar_cenario(
             cenario, modelo_cenario, feedback, normalizador_cenario,
-            dados_meteo, sensor_chuva, usar_api=usar_api
+            dados_meteo, sensor_chuva, usar_api=usar_api,
+            agregados=agregados, perfil=perfil, registo=registo,
+            verbose=verbose
         )
         t_total    = time.time() - t0_cenario
-        t_inf_ms   = (t_total / len(resultados)) * 1000 if resultados else 0
+        t_inf_ms   = perfil.media_ms('ciclo')
 
         todos_resultados[id_cenario] = resultados
         tempos[id_cenario]           = (t_load_ms, t_inf_ms)
+        estado.registar_cenario(id_cenario, agregados, tempos[id_cenario],
+                                resultados.digest())
 
         # Guardar CSV do cenário
         caminho_csv = os.path.join(RESULTADOS_DIR, cenario['ficheiro'])
-        salvar_csv(resultados, caminho_csv)
+        with perfil.span('persistencia'):
+            salvar_csv(resultados, caminho_csv)
 
+        perfis[id_cenario] = perfil
+        perfil_total.juntar(perfil)
+        registo.registar('cenario_fim', cenario=id_cenario, dias=len(resultados),
+                         t_inf_ms=t_inf_ms, telemetria=modelo_cenario.telemetria())
         print(f"\n  Tempo total: {t_total:.2f}s | "
-              f"Média/ciclo: {t_inf_ms:.1f}ms")
+              f"Média/ciclo: {t_inf_ms:.2f}ms (sem print)")
 
     # ------ Gráficos ------
     if MATPLOTLIB_OK:
         print("\n[Gráficos] Gerando...")
-        gerar_graficos(todos_resultados, RESULTADOS_DIR)
+        gerar_graficos(todos_resultados, RESULTADOS_DIR, estado=estado)
     else:
         print("\n[Gráficos] matplotlib não disponível — omitidos.")
 
-    # ------ Relatório HIL ------
-    print("\n[Relatório] Gerando relatorio_hil.md...")
-    gerar_relatorio(todos_resultados, dados_meteo, tempos,
-                    modelo_source, RESULTADOS_DIR)
-
     # ------ Salvar modelo actualizado ------
-    modelo.salvar(PKL_CAMPO)
+    with perfil_total.span('persistencia'):
+        modelo.salvar(PKL_CAMPO)
     print(f"\n[Modelo] Estado final guardado em: {PKL_CAMPO}")
     print(f"[Modelo] {modelo.info()}")
 
+    # ------ Relatório HIL + tempos por etapa ------
+    print("\n[Relatório] Gerando relatorio_hil.md...")
+    gerar_relatorio(todos_resultados, dados_meteo, tempos,
+                    modelo_source, RESULTADOS_DIR, estado=estado,
+                    perfil=perfil_total)
+    estado.guardar()
+
+    caminho_perfil = os.path.join(RESULTADOS_DIR, 'perfil_etapas.json')
+    perfil_total.guardar_json(caminho_perfil, extra={
+        'gerado_em': datetime.now().isoformat(timespec='seconds'),
+        'cenarios' : {str(k): p.para_dict() for k, p in perfis.items()},
+    })
+    print(f"  → Tempos por etapa: {caminho_perfil}")
+
+    registo.registar('execucao_fim', perfil=perfil_total.resumo())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Validação HIL — Sistema ALMMo-0')
+    parser.add_argument('--cenario', type=int, choices=[1, 2, 3, 4],
+                        help='Executar apenas este cenário (omitir = todos)')
+    parser.add_argument('--sem-api', action='store_true',
+                        help='Não chamar Open-Meteo (usar cache ou fallback)')
+    parser.add_argument('--silencioso', action='store_true',
+                        help='Sem a linha diária no console (decisões só no log)')
+    args = parser.parse_args()
+
+    usar_api = not args.sem_api
+    verbose  = CONSOLE_DIARIO and not args.silencioso
+
+    # O with garante o flush do buffer mesmo se um cenário falhar ou a
+    # execução for interrompida (Ctrl+C) — são esses os registos que
+    # explicam a falha
+    with RegistoDecisoes(LOG_SISTEMA, max_bytes=LOG_MAX_BYTES,
+                         n_rotacoes=LOG_N_ROTACOES,
+                         flush_registos=LOG_FLUSH_REGISTOS,
+                         flush_segundos=LOG_FLUSH_SEGUNDOS) as registo:
+        try:
+            executar_validacao(args.cenario, usar_api, verbose, registo)
+        except BaseException as e:
+            registo.registar('execucao_erro', erro=f"{type(e).__name__}: {e}")
+            raise
+    print(f"  → Registo de decisões: {LOG_SISTEMA}")
+
     print("\n" + "="*60)
     print("  VALIDAÇÃO HIL CONCLUÍDA")
     print(f"  Resultados em: {RESULTADOS_DIR}/")
@@ -0,0 +1,222 @@
+# perfil_hil.py — Tempos por etapa do ciclo de decisão HIL (spans nomeados)
+#
+# Cada etapa do ciclo diário é medida com time.perf_counter_ns (monotónico)
+# e acumulada num histograma em memória de tamanho fixo — O(1) por span,
+# sem guardar as amostras:
+#   - buckets log2 em ns (bucket k: [2^(k-1), 2^k) ns), 48 buckets
+#   - n, total, mínimo e máximo exactos
+#   - percentis estimados pelo bucket (centro geométrico)
+#
+# Etapas do ciclo (ETAPAS):
+#   sensor          leitura do sensor de solo (06h00)
+#   features        construção do vector de entrada
+#   normalizador    actualização Welford + cópia para o modelo
+#   predict         predict_com_confianca
+#   confirmacao_18h dupla confirmação (sensor chuva + tensão)
+#   feedback        avaliar_e_retreinar (inclui o learn)
+#   learn           ALMMo0.learn dentro do feedback
+#   registo         resultados colunares + agregados do relatório
+#   persistencia    CSV do cenário e pkl do modelo
+#   ciclo           dia completo, sem o print da linha de progresso
+#
+# Uso:
+#   perfil = PerfilEtapas()
+#   with perfil.span('predict'):
+#       classe, conf = modelo.predict_com_confianca(x)
+#   perfil.resumo()                 → {etapa: {n, media_us, p50_us, p99_us, ...}}
+#   perfil.guardar_json(caminho)
+#
+# PerfilEtapas(activo=False) devolve um span vazio partilhado — o custo
+# fica numa chamada de método.
+
+import os
+import json
+import time
+
+
+ETAPAS = ['sensor', 'features', 'normalizador', 'predict', 'confirmacao_18h',
+          'feedback', 'learn', 'registo', 'persistencia', 'ciclo']
+
+N_BUCKETS = 48   # 2^47 ns ≈ 39 h
+
+
+class _Histograma:
+    """Histograma log2 de durações em ns (memória constante)."""
+
+    __slots__ = ('n', 'total_ns', 'min_ns', 'max_ns', 'buckets')
+
+    def __init__(self):
+        self.n        = 0
+        self.total_ns = 0
+        self.min_ns   = None
+        self.max_ns   = 0
+        self.buckets  = [0] * N_BUCKETS
+
+    def registar(self, ns):
+        self.n        += 1
+        self.total_ns += ns
+        if self.min_ns is None or ns < self.min_ns:
+            self.min_ns = ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[min(ns.bit_length(), N_BUCKETS - 1)] += 1
+
+    def juntar(self, outro):
+        self.n        += outro.n
+        self.total_ns += outro.total_ns
+        if outro.min_ns is not None and (self.min_ns is None or outro.min_ns < self.min_ns):
+            self.min_ns = outro.min_ns
+        self.max_ns = max(self.max_ns, outro.max_ns)
+        self.buckets = [a + b for a, b in zip(self.buckets, outro.buckets)]
+
+    def percentil(self, p):
+        """Estimativa em ns pelo bucket que contém o percentil p (0–100)."""
+        if not self.n:
+            return 0.0
+        alvo = p / 100 * self.n
+        acum = 0
+        for k, c in enumerate(self.buckets):
+            acum += c
+            if c and acum >= alvo:
+                if k == 0:
+                    return 0.0
+                centro = 2 ** (k - 1) * 2 ** 0.5   # centro geométrico de [2^(k-1), 2^k)
+                return float(min(max(centro, self.min_ns), self.max_ns))
+        return float(self.max_ns)
+
+    def para_dict(self):
+        return {'n': self.n, 'total_ns': self.total_ns, 'min_ns': self.min_ns,
+                'max_ns': self.max_ns, 'buckets': self.buckets}
+
+    @classmethod
+    def de_dict(cls, d):
+        h = cls()
+        h.n, h.total_ns, h.min_ns, h.max_ns = d['n'], d['total_ns'], d['min_ns'], d['max_ns']
+        h.buckets = list(d['buckets']) + [0] * (N_BUCKETS - len(d['buckets']))
+        return h
+
+
+class _Span:
+    """Context manager reutilizável de uma etapa (sem alocar por uso)."""
+
+    __slots__ = ('_hist', '_t0')
+
+    def __init__(self, hist):
+        self._hist = hist
+        self._t0   = 0
+
+    def __enter__(self):
+        self._t0 = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self._hist.registar(time.perf_counter_ns() - self._t0)
+        return False
+
+
+class _SpanNulo:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_SPAN_NULO = _SpanNulo()
+
+
+class PerfilEtapas:
+    """Histogramas por etapa; um span por nome, criado no primeiro uso."""
+
+    def __init__(self, activo=True):
+        self.activo = activo
+        self._hist  = {}
+        self._spans = {}
+
+    def _histograma(self, nome):
+        h = self._hist.get(nome)
+        if h is None:
+            h = self._hist[nome] = _Histograma()
+        return h
+
+    def span(self, nome):
+        if not self.activo:
+            return _SPAN_NULO
+        s = self._spans.get(nome)
+        if s is None:
+            s = self._spans[nome] = _Span(self._histograma(nome))
+        return s
+
+    def registar(self, nome, ns):
+        """Regista uma duração medida fora de um span (em ns)."""
+        if self.activo:
+            self._histograma(nome).registar(ns)
+
+    def juntar(self, outro):
+        for nome, h in outro._hist.items():
+            self._histograma(nome).juntar(h)
+        return self
+
+    def media_ms(self, nome):
+        h = self._hist.get(nome)
+        return h.total_ns / h.n / 1e6 if h and h.n else 0.0
+
+    # ------ Saída ------
+
+    def _ordem(self):
+        return ([e for e in ETAPAS if e in self._hist]
+                + sorted(e for e in self._hist if e not in ETAPAS))
+
+    def resumo(self):
+        """{etapa: {n, total_ms, media_us, p50_us, p99_us, max_us}} pela ordem de ETAPAS."""
+        res = {}
+        for nome in self._ordem():
+            h = self._hist[nome]
+            if not h.n:
+                continue
+            res[nome] = {
+                'n'       : h.n,
+                'total_ms': round(h.total_ns / 1e6, 3),
+                'media_us': round(h.total_ns / h.n / 1e3, 2),
+                'p50_us'  : round(h.percentil(50) / 1e3, 2),
+                'p99_us'  : round(h.percentil(99) / 1e3, 2),
+                'max_us'  : round(h.max_ns / 1e3, 2),
+            }
+        return res
+
+    def linhas_md(self):
+        """Tabela Markdown do resumo (% relativa ao ciclo, se medido)."""
+        res = self.resumo()
+        if not res:
+            return []
+        total_ciclo = res.get('ciclo', {}).get('total_ms')
+        linhas = ["| Etapa | n | Média (µs) | p50 (µs) | p99 (µs) | Máx (µs) | % ciclo |",
+                  "|-------|---|------------|----------|----------|----------|---------|"]
+        for nome, r in res.items():
+            pct = (f"{100 * r['total_ms'] / total_ciclo:.1f}%"
+                   if total_ciclo and nome != 'ciclo' else '—')
+            linhas.append(f"| {nome} | {r['n']} | {r['media_us']:.1f} | {r['p50_us']:.1f} | "
+                          f"{r['p99_us']:.1f} | {r['max_us']:.1f} | {pct} |")
+        return linhas
+
+    def para_dict(self):
+        return {'resumo': self.resumo(),
+                'histogramas': {n: self._hist[n].para_dict() for n in self._ordem()}}
+
+    @classmethod
+    def de_dict(cls, d):
+        perfil = cls()
+        for nome, h in d.get('histogramas', {}).items():
+            perfil._hist[nome] = _Histograma.de_dict(h)
+        return perfil
+
+    def guardar_json(self, caminho, extra=None):
+        """Grava resumo + histogramas (buckets log2 em ns) em JSON."""
+        dados = self.para_dict()
+        if extra:
+            dados.update(extra)
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, indent=2, ensure_ascii=False)
@@ -0,0 +1,156 @@
+# resultados_colunares.py — Armazenamento colunar dos resultados diários do HIL
+#
+# Substitui a lista de dicts (24 chaves por dia) por um array NumPy
+# pré-alocado por campo. Cada dia acrescenta uma posição em cada coluna;
+# a capacidade duplica quando esgota (custo amortizado O(1)).
+#
+# Gráficos e relatório lêem as colunas directamente (sem list comprehensions
+# sobre dicts). A gravação é um CSV compacto com o mesmo cabeçalho dos
+# ficheiros cenario_N_*.csv anteriores — Parquet/Feather exigiriam pyarrow,
+# que não está instalado no Raspberry Pi (só numpy).
+#
+# Interface pública:
+#   res = ResultadosColunares()
+#   res.adicionar(dia=1, dap=60, ...)  → None
+#   res.coluna('tensao_6h_kpa')        → ndarray (vista, sem cópia)
+#   res['tensao_6h_kpa']               → idem
+#   len(res)                           → int
+#   res.linhas()                       → iterador de dicts (tabelas do relatório)
+#   res.salvar_csv(caminho)            → None
+#   res.digest()                       → str (sha1 do conteúdo)
+#   ResultadosColunares.carregar_csv(caminho) → ResultadosColunares
+
+import os
+import csv
+import hashlib
+import numpy as np
+
+
+# Esquema: (campo, dtype). A ordem define a ordem das colunas no CSV.
+ESQUEMA_HIL = [
+    ('dia'               , np.int32),
+    ('dap'               , np.int32),
+    ('theta_6h'          , np.float64),
+    ('tensao_6h_kpa'     , np.float64),
+    ('theta_18h'         , np.float64),
+    ('tensao_18h_kpa'    , np.float64),
+    ('chuva_3d_mm'       , np.float64),
+    ('tmax_3d_c'         , np.float64),
+    ('chuva_dia_mm'      , np.float64),
+    ('choveu_sensor'     , np.bool_),
+    ('mm_chuva_sensor'   , np.float64),
+    ('classe_manha'      , np.int8),
+    ('confianca_manha'   , np.float64),
+    ('classe_final'      , np.int8),
+    ('irrigou_mm'        , np.float64),
+    ('motivo_18h'        , object),
+    ('n_regras'          , np.int32),
+    ('regras_c0'         , np.int32),
+    ('regras_c1'         , np.int32),
+    ('regras_c2'         , np.int32),
+    ('houve_feedback'    , np.bool_),
+    ('n_ajustes'         , np.int32),
+    ('tensao_acima_range', np.bool_),
+    ('fonte_meteo'       , object),
+]
+
+
+class ResultadosColunares:
+    """
+    Colunas tipadas pré-alocadas, uma por campo do esquema.
+    Sem dict por linha — o custo por dia é uma escrita em cada array.
+    """
+
+    def __init__(self, esquema=ESQUEMA_HIL, capacidade=32):
+        self.esquema    = list(esquema)
+        self.campos     = [c for c, _ in self.esquema]
+        self.capacidade = max(1, int(capacidade))
+        self.n          = 0
+        self._dados     = {c: np.empty(self.capacidade, dtype=dt)
+                           for c, dt in self.esquema}
+
+    def __len__(self):
+        return self.n
+
+    def __bool__(self):
+        return self.n > 0
+
+    def __getitem__(self, campo):
+        return self.coluna(campo)
+
+    def _crescer(self):
+        """Duplica a capacidade de todas as colunas."""
+        nova = self.capacidade * 2
+        for campo, dt in self.esquema:
+            novo = np.empty(nova, dtype=dt)
+            novo[:self.n] = self._dados[campo][:self.n]
+            self._dados[campo] = novo
+        self.capacidade = nova
+
+    def adicionar(self, **valores):
+        """Acrescenta um dia. Todos os campos do esquema são obrigatórios."""
+        if self.n >= self.capacidade:
+            self._crescer()
+        i = self.n
+        for campo in self.campos:
+            self._dados[campo][i] = valores[campo]
+        self.n += 1
+
+    def coluna(self, campo):
+        """Vista (sem cópia) da coluna com os n dias registados."""
+        return self._dados[campo][:self.n]
+
+    def linhas(self):
+        """Itera dias como dicts de escalares Python (apenas para tabelas)."""
+        colunas = [self.coluna(c).tolist() for c in self.campos]
+        for valores in zip(*colunas):
+            yield dict(zip(self.campos, valores))
+
+    def digest(self, campos=None):
+        """
+        sha1 do conteúdo das colunas (todas, ou só as indicadas).
+        Usado para saber se uma secção do relatório ou um gráfico mudou.
+        """
+        h = hashlib.sha1()
+        tipos = dict(self.esquema)
+        for campo in (campos or self.campos):
+            col = self.coluna(campo)
+            h.update(campo.encode('utf-8'))
+            if tipos[campo] is object:
+                h.update('\x1f'.join(map(str, col.tolist())).encode('utf-8'))
+            else:
+                h.update(np.ascontiguousarray(col).tobytes())
+        return h.hexdigest()
+
+    def salvar_csv(self, caminho):
+        """CSV compacto com o mesmo cabeçalho dos ficheiros anteriores."""
+        if self.n == 0:
+            return
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        colunas = [self.coluna(c).tolist() for c in self.campos]
+        with open(caminho, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.campos)
+            writer.writerows(zip(*colunas))
+
+    @classmethod
+    def carregar_csv(cls, caminho, esquema=ESQUEMA_HIL):
+        """Reconstrói o armazenamento a partir de um CSV gravado por salvar_csv."""
+        with open(caminho, newline='', encoding='utf-8') as f:
+            reader    = csv.reader(f)
+            cabecalho = next(reader)
+            linhas    = list(reader)
+
+        res = cls(esquema, capacidade=max(1, len(linhas)))
+        idx = {c: cabecalho.index(c) for c in res.campos}
+        for campo, dt in res.esquema:
+            valores = [l[idx[campo]] for l in linhas]
+            if dt is np.bool_:
+                valores = [v == 'True' for v in valores]
+            elif dt is not object:
+                valores = np.asarray(valores, dtype=np.float64)
+            res._dados[campo][:len(linhas)] = valores
+        res.n = len(linhas)
+        return res
@@ -33,57 +33,72 @@ ARQUIVO_SAIDA   = "imperatriz_climate.txt"
 # CONVERSÃO
 # =============================================================================
 
-def converter_para_aquacrop(arquivo_entrada: str, arquivo_saida: str) -> None:
+COLUNAS_NECESSARIAS = ['tmin_c', 'tmax_c', 'chuva_mm', 'eto_mm']
 
-    # Carregar CSV tratado
-    caminho = Path(arquivo_entrada)
-    if not caminho.exists():
-        raise FileNotFoundError(
-            f"❌ Arquivo não encontrado: '{arquivo_entrada}'\n"
-            f"   Execute primeiro o pipeline Tratar_inmet_bdmep.py"
-        )
-
-    df = pd.read_csv(arquivo_entrada, sep=';', index_col='data', parse_dates=True)
-
-    print(f"✅ Carregado: {len(df)} dias | {df.index.min().date()} → {df.index.max().date()}")
-    print(f"   Anos presentes: {sorted(df.index.year.unique())}")
 
+def montar_aquacrop(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """Série diária tratada (índice data) → DataFrame no formato AquaCrop."""
     # Verificar colunas necessárias
-    colunas_necessarias = ['tmin_c', 'tmax_c', 'chuva_mm', 'eto_mm']
-    faltando = [c for c in colunas_necessarias if c not in df.columns]
+    faltando = [c for c in COLUNAS_NECESSARIAS if c not in df.columns]
     if faltando:
         raise ValueError(f"❌ Colunas ausentes no CSV: {faltando}")
 
     # Verificar NaN nas colunas críticas
-    for col in colunas_necessarias:
-        n_nan = df[col].isna().sum()
-        if n_nan > 0:
-            print(f"⚠️  {col}: {n_nan} NaN — serão preenchidos com 0 (precipitação) ou média (temperatura/ETo)")
-
-    # Preencher NaN residuais de forma conservadora
-    df['chuva_mm']  = df['chuva_mm'].fillna(0.0)
-    df['tmax_c']    = df['tmax_c'].fillna(df['tmax_c'].mean())
-    df['tmin_c']    = df['tmin_c'].fillna(df['tmin_c'].mean())
-    df['eto_mm']    = df['eto_mm'].fillna(df['eto_mm'].mean())
+    if verbose:
+        for col in COLUNAS_NECESSARIAS:
+            n_nan = df[col].isna().sum()
+            if n_nan > 0:
+                print(f"⚠️  {col}: {n_nan} NaN — serão preenchidos com 0 (precipitação) ou média (temperatura/ETo)")
+
+    # Preencher NaN residuais de forma conservadora (sem alterar o df de entrada)
+    chuva = df['chuva_mm'].fillna(0.0)
+    tmax  = df['tmax_c'].fillna(df['tmax_c'].mean())
+    tmin  = df['tmin_c'].fillna(df['tmin_c'].mean())
+    eto   = df['eto_mm'].fillna(df['eto_mm'].mean())
 
     # Montar DataFrame no formato AquaCrop
-    df_aquacrop = pd.DataFrame({
+    return pd.DataFrame({
         'Day':      df.index.day,
         'Month':    df.index.month,
         'Year':     df.index.year,
-        'Tmin(C)':  df['tmin_c'].round(2),
-        'Tmax(C)':  df['tmax_c'].round(2),
-        'Prcp(mm)': df['chuva_mm'].round(2),
-        'Et0(mm)':  df['eto_mm'].round(6),
+        'Tmin(C)':  tmin.round(2).values,
+        'Tmax(C)':  tmax.round(2).values,
+        'Prcp(mm)': chuva.round(2).values,
+        'Et0(mm)':  eto.round(6).values,
     })
 
+
+def exportar_aquacrop(df: pd.DataFrame, arquivo_saida: str, verbose: bool = True) -> pd.DataFrame:
+    """Escreve o TXT AquaCrop de uma série diária tratada. Devolve o DataFrame escrito."""
+    df_aquacrop = montar_aquacrop(df, verbose)
+
     # Salvar como TXT separado por TAB (idêntico ao formato de Córdoba)
+    Path(arquivo_saida).parent.mkdir(parents=True, exist_ok=True)
     df_aquacrop.to_csv(
         arquivo_saida,
         sep='\t',
         index=False,
         lineterminator='\r\n'  # CRLF — padrão do AquaCrop
     )
+    return df_aquacrop
+
+
+def converter_para_aquacrop(arquivo_entrada: str, arquivo_saida: str) -> None:
+
+    # Carregar CSV tratado
+    caminho = Path(arquivo_entrada)
+    if not caminho.exists():
+        raise FileNotFoundError(
+            f"❌ Arquivo não encontrado: '{arquivo_entrada}'\n"
+            f"   Execute primeiro o pipeline Tratar_inmet_bdmep.py"
+        )
+
+    df = pd.read_csv(arquivo_entrada, sep=';', index_col='data', parse_dates=True)
+
+    print(f"✅ Carregado: {len(df)} dias | {df.index.min().date()} → {df.index.max().date()}")
+    print(f"   Anos presentes: {sorted(df.index.year.unique())}")
+
+    df_aquacrop = exportar_aquacrop(df, arquivo_saida)
 
     print(f"\n✅ Arquivo gerado: {arquivo_saida}")
     print(f"   {len(df_aquacrop)} linhas | separador: TAB | terminador: CRLF")
@@ -0,0 +1,202 @@
+"""
+=============================================================================
+PROCESSAMENTO MULTI-ESTAÇÃO — INMET BDMEP → armazém particionado + AquaCrop
+Projeto: Sistema de Irrigação com ALMMo-0 | vários municípios
+=============================================================================
+
+Cada estação (uma pasta de CSV do BDMEP) passa pelo mesmo pipeline de
+tratar_inmet_bdmep.py (leitura → QA/QC → diário → lacunas → ETo), com as
+estações processadas em paralelo:
+
+  - N_ESTACOES_PARALELAS processos, um por estação; os núcleos restantes
+    vão para a leitura dos CSV dentro de cada estação
+  - o log de cada estação vai para <PASTA_ARMAZEM>/<id>.log
+  - Ra por (latitude, DOY) vem da tabela memoizada de eto_fao56 —
+    calculada uma vez por latitude em cada processo
+
+Saídas:
+  <PASTA_ARMAZEM>/estacoes.json     índice das estações (ArmazemEstacoes)
+  <PASTA_ARMAZEM>/clima_<id>.npy    série diária da estação (DTYPE_CLIMA)
+  <PASTA_TXT>/<id>_climate.txt      formato AquaCrop (converter_clima_aquacrop)
+
+A partição e o índice são escritos pelo processo principal, à medida que
+cada estação termina.
+=============================================================================
+"""
+
+import os
+import sys
+import time
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import tratar_inmet_bdmep as tratar
+from converter_clima_aquacrop import exportar_aquacrop
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import eto_fao56
+from armazem_clima import ArmazemEstacoes
+
+# =============================================================================
+# CONFIGURAÇÕES
+# =============================================================================
+
+# Uma entrada por estação: id INMET, pasta com os CSV, latitude e altitude
+ESTACOES = [
+    {'id': 'A225', 'nome': 'Imperatriz-MA', 'pasta': 'Dados__inmet',
+     'lat': -5.52, 'alt': 96.0},
+    # {'id': 'A221', 'nome': 'Balsas-MA', 'pasta': 'Dados__inmet_balsas',
+    #  'lat': -7.46, 'alt': 259.0},
+]
+
+ANO_INICIO = tratar.ANO_INICIO
+ANO_FIM    = tratar.ANO_FIM
+
+PASTA_ARMAZEM = "armazem_estacoes"
+PASTA_TXT     = "aquacrop_estacoes"
+
+# Estações em paralelo (None = min(nº de estações, nº de núcleos))
+N_ESTACOES_PARALELAS = None
+
+
+# =============================================================================
+# UMA ESTAÇÃO (executado no worker)
+# =============================================================================
+
+def registos_estacao(df_d: pd.DataFrame) -> pd.DataFrame:
+    """Série diária tratada → colunas do armazém (DTYPE_CLIMA)."""
+    def col(nome):
+        return df_d[nome].to_numpy(dtype=float) if nome in df_d.columns \
+            else np.full(len(df_d), np.nan)
+
+    return pd.DataFrame({
+        'data'  : df_d.index,
+        'tmin'  : col('tmin_c'),
+        'tmax'  : col('tmax_c'),
+        'prec'  : col('chuva_mm'),
+        'eto'   : col('eto_mm'),
+        'rs'    : col('radiacao_kj_m2_dia') / 1000.0,   # kJ → MJ/m²/dia
+        'rh'    : col('umidade_media'),
+        'u2_obs': eto_fao56.vento_2m(col('vento_medio_ms'), altura_m=10.0),
+    })
+
+
+def processar_estacao(estacao: dict, ano_inicio: int, ano_fim: int,
+                      n_leitura: int | None = None) -> pd.DataFrame:
+    """Pipeline completo de uma estação; o log vai para <PASTA_ARMAZEM>/<id>.log."""
+    os.makedirs(PASTA_ARMAZEM, exist_ok=True)
+    log = os.path.join(PASTA_ARMAZEM, f"{estacao['id']}.log")
+    with open(log, 'w', encoding='utf-8') as f, contextlib.redirect_stdout(f):
+        print(f"Estação {estacao['id']} — {estacao.get('nome', '')} ({estacao['pasta']})")
+        return tratar.processar_serie_diaria(
+            estacao['pasta'], ano_inicio, ano_fim,
+            lat_graus=estacao['lat'], altitude_m=estacao['alt'],
+            n_processos=n_leitura)
+
+
+# =============================================================================
+# TODAS AS ESTAÇÕES
+# =============================================================================
+
+def _guardar_estacao(armazem: ArmazemEstacoes, estacao: dict,
+                     df_d: pd.DataFrame) -> dict:
+    """Partição + índice + TXT AquaCrop de uma estação já processada."""
+    meta = {k: estacao[k] for k in ('nome', 'lat', 'alt') if k in estacao}
+    armazem.gravar(estacao['id'], registos_estacao(df_d), meta=meta)
+
+    exportar_aquacrop(df_d, os.path.join(PASTA_TXT, f"{estacao['id']}_climate.txt"),
+                      verbose=False)
+    return {'dias': len(df_d),
+            'inicio': df_d.index.min().date() if len(df_d) else None,
+            'fim': df_d.index.max().date() if len(df_d) else None,
+            'eto_media': float(df_d['eto_mm'].mean()) if 'eto_mm' in df_d else np.nan}
+
+
+def processar_estacoes(estacoes: list, ano_inicio: int = ANO_INICIO,
+                       ano_fim: int = ANO_FIM,
+                       n_paralelas: int | None = N_ESTACOES_PARALELAS) -> dict:
+    """
+    Processa as estações em paralelo e grava o armazém particionado.
+
+    Returns:
+        dict id → resumo ({dias, inicio, fim, eto_media} ou {'erro': ...})
+    """
+    print("\n" + "="*60)
+    print(f"🌐 PIPELINE MULTI-ESTAÇÃO — {len(estacoes)} estação(ões)")
+    print("="*60)
+
+    validas = []
+    resumo  = {}
+    for est in estacoes:
+        if Path(est['pasta']).exists():
+            validas.append(est)
+        else:
+            resumo[est['id']] = {'erro': f"pasta não encontrada: {est['pasta']}"}
+            print(f"  ⚠️  {est['id']}: pasta não encontrada ({est['pasta']}) — ignorada")
+    if not validas:
+        return resumo
+
+    # Orçamento de núcleos: estações em paralelo × processos de leitura por estação
+    nucleos   = os.cpu_count() or 1
+    n_est     = max(1, min(n_paralelas or nucleos, len(validas)))
+    n_leitura = max(1, nucleos // n_est)
+    print(f"  {n_est} estação(ões) em paralelo × {n_leitura} processo(s) de leitura")
+
+    armazem = ArmazemEstacoes(PASTA_ARMAZEM)
+    t0 = time.time()
+
+    def _concluir(est, df_d=None, erro=None):
+        if erro is None:
+            try:
+                resumo[est['id']] = _guardar_estacao(armazem, est, df_d)
+            except Exception as e:
+                erro = e
+        if erro is not None:
+            resumo[est['id']] = {'erro': str(erro)}
+            print(f"  ✗ {est['id']}: {erro}  (ver {PASTA_ARMAZEM}/{est['id']}.log)")
+        else:
+            r = resumo[est['id']]
+            print(f"  ✓ {est['id']}: {r['dias']} dias ({r['inicio']} → {r['fim']}) | "
+                  f"ETo média {r['eto_media']:.2f} mm/dia")
+
+    em_serie = list(validas)
+    if n_est > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=n_est) as pool:
+                futuros = {pool.submit(processar_estacao, est, ano_inicio, ano_fim, n_leitura): est
+                           for est in validas}
+                em_serie = []
+                for fut in as_completed(futuros):
+                    try:
+                        df_d = fut.result()
+                    except Exception as e:
+                        _concluir(futuros[fut], erro=e)
+                    else:
+                        _concluir(futuros[fut], df_d)
+        except Exception as e:
+            # Pool indisponível — seguir em série com as estações por fazer
+            print(f"  ⚠️  pool indisponível ({e}) — estações em série")
+            em_serie = [est for est in validas if est['id'] not in resumo]
+
+    for est in em_serie:
+        try:
+            df_d = processar_estacao(est, ano_inicio, ano_fim, n_leitura)
+        except Exception as e:
+            _concluir(est, erro=e)
+        else:
+            _concluir(est, df_d)
+
+    print(f"\n  Concluído em {time.time() - t0:.1f}s → {PASTA_ARMAZEM}/, {PASTA_TXT}/")
+    return resumo
+
+
+# =============================================================================
+# PONTO DE ENTRADA
+# =============================================================================
+
+if __name__ == "__main__":
+    processar_estacoes(ESTACOES, ANO_INICIO, ANO_FIM)
@@ -14,10 +14,22 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
+import io
+import os
+import sys
+import hashlib
+import re
+from collections import deque
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+# Núcleo ETo FAO-56 partilhado com script_simulacao_v11.py (raiz do repositório)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import eto_fao56
+
 # =============================================================================
 # CONFIGURAÇÕES
 # =============================================================================
@@ -37,6 +49,20 @@ ANOS_EXCLUIR = [2024]
 
 GERAR_GRAFICOS = True
 
+# Processos na leitura dos CSV (None = nº de núcleos)
+N_PROCESSOS_LEITURA = None
+
+# Cache por ficheiro da série horária já limpa (cabeçalho, colunas, datetime,
+# conversão numérica). Chave = sha1 do CSV + versão do pipeline: só ficheiros
+# novos ou alterados são reprocessados. Subir VERSAO_PIPELINE ao mudar o parse.
+PASTA_CACHE     = "cache_inmet"
+USAR_CACHE      = True
+VERSAO_PIPELINE = 2
+
+# Processa um ficheiro de cada vez (QA/QC → diário → lacunas) em vez de
+# concatenar toda a série horária: memória de pico independente do arquivo
+MODO_STREAMING = True
+
 # =============================================================================
 # MAPEAMENTO DE COLUNAS
 # IMPORTANTE: as chaves devem estar com a capitalização ORIGINAL do BDMEP,
@@ -93,44 +119,168 @@ MAPA_COLUNAS = {
 # ETAPA 1 — LEITURA DA PASTA
 # =============================================================================
 
-def detectar_linhas_cabecalho(caminho: str) -> int:
+NA_VALUES = ['-9999', '-9999.0', '', ' ', '//', 'null', 'NULL']
+
+# Colunas meteorológicas lidas directamente como float (nomes já padronizados)
+COLUNAS_NUMERICAS = [
+    'temp_bulbo_seco', 'temp_max_hora', 'temp_min_hora',
+    'precipitacao', 'umidade_relativa', 'umidade_max_hora',
+    'umidade_min_hora', 'vento_velocidade', 'radiacao_kj_m2',
+    'pressao_atm', 'temp_orvalho'
+]
+
+
+def detectar_linhas_cabecalho(linhas) -> int:
     """
     Encontra a linha do cabeçalho real do BDMEP.
     Pula as linhas de metadados iniciais (normalmente 8).
     """
-    with open(caminho, 'r', encoding='latin-1') as f:
-        for i, linha in enumerate(f):
-            lower = linha.strip().lower()
-            if 'data' in lower and any(
-                p in lower for p in ['hora', 'precipita', 'temperatura', 'temp.']
-            ):
-                return i
+    for i, linha in enumerate(linhas):
+        lower = linha.strip().lower()
+        if 'data' in lower and any(
+            p in lower for p in ['hora', 'precipita', 'temperatura', 'temp.']
+        ):
+            return i
     return 8
 
 
-def carregar_arquivo_unico(caminho: Path) -> pd.DataFrame | None:
-    """Carrega um CSV do BDMEP. Retorna None se falhar."""
-    n_skip = detectar_linhas_cabecalho(str(caminho))
-    for sep in [';', ',', '\t']:
+def sniff_arquivo(caminho: Path, bruto: bytes | None = None) -> tuple[str, int, str, str]:
+    """
+    Uma única leitura do ficheiro: devolve (texto, linha do cabeçalho,
+    separador, encoding). O BDMEP antigo vem em latin-1; os mais recentes
+    às vezes em UTF-8 (com ou sem BOM).
+    """
+    if bruto is None:
+        bruto = Path(caminho).read_bytes()
+    for encoding in ('utf-8-sig', 'latin-1'):
         try:
-            df = pd.read_csv(
-                caminho,
-                skiprows=n_skip,
-                sep=sep,
-                encoding='latin-1',
-                decimal=',',
-                na_values=['-9999', '-9999.0', '', ' ', '//', 'null', 'NULL'],
-                low_memory=False
-            )
-            if len(df.columns) >= 4 and len(df) > 0:
-                return df
-        except Exception:
+            texto = bruto.decode(encoding)
+            break
+        except UnicodeDecodeError:
             continue
-    return None
+    linhas = texto.splitlines()
+    n_skip = detectar_linhas_cabecalho(linhas)
+    cabecalho = linhas[n_skip] if n_skip < len(linhas) else ''
+    sep = max([';', ',', '\t'], key=cabecalho.count)
+    return texto, n_skip, sep, encoding
+
+
+def carregar_arquivo_unico(caminho: Path, bruto: bytes | None = None) -> pd.DataFrame | None:
+    """
+    Carrega um CSV do BDMEP já com as colunas padronizadas e as meteorológicas
+    em float. Retorna None se falhar.
+    """
+    try:
+        texto, n_skip, sep, _ = sniff_arquivo(caminho, bruto)
+    except OSError:
+        return None
+
+    opcoes = dict(skiprows=n_skip, sep=sep, decimal=',', na_values=NA_VALUES)
+    try:
+        cols = pd.read_csv(io.StringIO(texto), nrows=0, **opcoes).columns
+    except Exception:
+        return None
+    nomes = mapear_nomes(cols)
+    dtypes = {orig: 'float64' for orig, novo in zip(cols, nomes) if novo in COLUNAS_NUMERICAS}
+    dtypes.update({orig: str for orig, novo in zip(cols, nomes) if novo in ('data', 'hora')})
+
+    try:
+        df = pd.read_csv(io.StringIO(texto), dtype=dtypes, **opcoes)
+    except (ValueError, TypeError):
+        # Valor não numérico numa coluna float — converter_numericas trata depois
+        try:
+            df = pd.read_csv(io.StringIO(texto), low_memory=False, **opcoes)
+        except Exception:
+            return None
+    if len(df.columns) < 4 or len(df) == 0:
+        return None
 
+    df.columns = nomes
+    return df.loc[:, ~df.columns.duplicated(keep='first')]
 
-def carregar_pasta_bdmep(pasta: str) -> pd.DataFrame:
-    """Lê todos os CSVs da pasta e concatena."""
+
+def concatenar_colunar(partes: list[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Junta os DataFrames num buffer pré-alocado por coluna (uma cópia por
+    valor, sem os realinhamentos sucessivos do pd.concat).
+    """
+    colunas = list(dict.fromkeys(c for p in partes for c in p.columns))
+    n = sum(len(p) for p in partes)
+    buffers = {}
+    for c in colunas:
+        numerica = all(pd.api.types.is_numeric_dtype(p[c]) for p in partes if c in p.columns)
+        buffers[c] = np.full(n, np.nan) if numerica else np.full(n, np.nan, dtype=object)
+
+    inicio = 0
+    for p in partes:
+        fim = inicio + len(p)
+        for c in p.columns:
+            buffers[c][inicio:fim] = p[c].to_numpy()
+        inicio = fim
+    return pd.DataFrame(buffers, copy=False)
+
+
+def versao_cache() -> str:
+    """Versão do pipeline por ficheiro: muda se o mapeamento de colunas mudar."""
+    h = hashlib.sha1(f"v{VERSAO_PIPELINE}".encode())
+    for obj in (MAPA_COLUNAS, MAPA_COLUNAS_LOWERCASE, COLUNAS_NUMERICAS):
+        h.update(repr(sorted(obj.items()) if isinstance(obj, dict) else obj).encode('utf-8'))
+    return h.hexdigest()[:12]
+
+
+def _carregar_cache(caminho_cache: Path) -> pd.DataFrame | None:
+    try:
+        with np.load(caminho_cache, allow_pickle=False) as z:
+            colunas = {k: z[k] for k in z.files if k != '_datetime'}
+            idx = pd.DatetimeIndex(z['_datetime'], name='datetime')
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(colunas, index=idx)
+
+
+def _guardar_cache(caminho_cache: Path, df: pd.DataFrame) -> None:
+    caminho_cache.parent.mkdir(parents=True, exist_ok=True)
+    tmp = caminho_cache.with_name(f"{caminho_cache.stem}.tmp{os.getpid()}.npz")
+    np.savez(tmp, _datetime=df.index.values.astype('datetime64[ns]'),
+             **{c: df[c].to_numpy() for c in df.columns})
+    os.replace(tmp, caminho_cache)
+
+
+def processar_arquivo(caminho: Path, pasta_cache: str | None = PASTA_CACHE
+                      ) -> tuple[pd.DataFrame | None, bool]:
+    """
+    Série horária limpa de um CSV (índice datetime, só colunas numéricas).
+    Returns: (df ou None se falhar, True se veio do cache).
+    """
+    bruto = Path(caminho).read_bytes()
+    caminho_cache = None
+    if pasta_cache:
+        chave = f"{hashlib.sha1(bruto).hexdigest()[:20]}_{versao_cache()}"
+        caminho_cache = Path(pasta_cache) / f"{chave}.npz"
+        if caminho_cache.exists():
+            df = _carregar_cache(caminho_cache)
+            if df is not None:
+                return df, True
+
+    df = carregar_arquivo_unico(caminho, bruto)
+    if df is None or 'data' not in df.columns or 'hora' not in df.columns:
+        return None, False
+    df = parsear_datetime(df, verbose=False)
+    df = converter_numericas(df, verbose=False)
+    df = df.select_dtypes('number')
+    if caminho_cache is not None and len(df):
+        _guardar_cache(caminho_cache, df)
+    return df, False
+
+
+def _data_no_nome(caminho: Path) -> tuple:
+    """Data inicial no nome BDMEP (..._01-01-2019_A_31-12-2019.CSV) para ordenar."""
+    m = re.search(r'(\d{2})-(\d{2})-(\d{4})_A_', caminho.name)
+    return (m.group(3), m.group(2), m.group(1), caminho.name) if m else ('', '', '', caminho.name)
+
+
+def listar_arquivos_bdmep(pasta: str) -> list[Path]:
+    """CSVs da pasta, em ordem cronológica quando o nome traz o período."""
     print(f"\n{'='*60}")
     print(f"📂 Lendo pasta: {pasta}")
 
@@ -143,16 +293,39 @@ def carregar_pasta_bdmep(pasta: str) -> pd.DataFrame:
 
     arquivos = sorted(set(
         list(pasta_path.glob("*.csv")) + list(pasta_path.glob("*.CSV"))
-    ))
+    ), key=_data_no_nome)
     if not arquivos:
         raise FileNotFoundError(f"❌ Nenhum .csv encontrado em '{pasta}'")
+    return arquivos
+
 
-    print(f"   {len(arquivos)} arquivo(s) encontrado(s):\n")
-    dfs = []
-    for arq in arquivos:
-        df_arq = carregar_arquivo_unico(arq)
+def carregar_pasta_bdmep(pasta: str, n_processos: int | None = N_PROCESSOS_LEITURA,
+                         pasta_cache: str | None = PASTA_CACHE if USAR_CACHE else None
+                         ) -> pd.DataFrame:
+    """
+    Lê todos os CSVs da pasta em paralelo (cada um: leitura, colunas,
+    datetime e conversão numérica, ou o resultado em cache) e concatena
+    numa série horária única.
+    """
+    arquivos = listar_arquivos_bdmep(pasta)
+    n = min(len(arquivos), n_processos or os.cpu_count() or 1)
+    print(f"   {len(arquivos)} arquivo(s) encontrado(s) — {n} processo(s)"
+          f"{'' if pasta_cache else ' — sem cache'}:\n")
+    resultados = None
+    if n > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=n) as pool:
+                resultados = list(pool.map(processar_arquivo, arquivos, repeat(pasta_cache)))
+        except Exception as e:
+            print(f"   ⚠️  Leitura paralela indisponível ({e}) — lendo em série")
+    if resultados is None:
+        resultados = [processar_arquivo(arq, pasta_cache) for arq in arquivos]
+
+    dfs, n_cache = [], 0
+    for arq, (df_arq, do_cache) in zip(arquivos, resultados):
         if df_arq is not None:
-            print(f"   ✅  {arq.name:<55s} {len(df_arq):>8,} linhas")
+            n_cache += do_cache
+            print(f"   ✅  {arq.name:<55s} {len(df_arq):>8,} linhas{' (cache)' if do_cache else ''}")
             dfs.append(df_arq)
         else:
             print(f"   ❌  {arq.name:<55s} FALHA")
@@ -160,44 +333,53 @@ def carregar_pasta_bdmep(pasta: str) -> pd.DataFrame:
     if not dfs:
         raise ValueError("❌ Nenhum arquivo carregado.")
 
-    df = pd.concat(dfs, ignore_index=True)
-    print(f"\n   ✅  Total: {len(df):,} linhas de {len(dfs)} arquivo(s)")
-    return df
+    idx = np.concatenate([d.index.values for d in dfs])
+    df = concatenar_colunar(dfs)
+    df.index = pd.DatetimeIndex(idx, name='datetime')
+    print(f"\n   ✅  Total: {len(df):,} linhas de {len(dfs)} arquivo(s) "
+          f"({n_cache} do cache, {len(dfs) - n_cache} processados)")
+    return ordenar_serie(df)
 
 
 # =============================================================================
 # ETAPA 2 — PADRONIZAÇÃO: rename ANTES de lowercase
 # =============================================================================
 
-def padronizar_colunas(df: pd.DataFrame) -> pd.DataFrame:
+# Variações que só aparecem depois de converter para minúsculas
+MAPA_COLUNAS_LOWERCASE = {
+    'radiacao global (kj/m²)':                               'radiacao_kj_m2',
+    'pressao atmosferica ao nivel da estacao, horaria (mb)': 'pressao_atm',
+    'pressão atmosferica max.na hora ant. (aut) (mb)':       'pressao_max',
+    'pressão atmosferica min. na hora ant. (aut) (mb)':      'pressao_min',
+    'temperatura do ponto de orvalho (°c)':                  'temp_orvalho',
+    'temperatura orvalho max. na hora ant. (aut) (°c)':      'temp_orvalho_max',
+    'temperatura orvalho min. na hora ant. (aut) (°c)':      'temp_orvalho_min',
+    'vento, rajada maxima (m/s)':                             'rajada_vento',
+    'unnamed: 19':                                            '_col_vazia',
+}
+
+
+def mapear_nomes(colunas) -> list[str]:
     """
     1. Strip de espaços
     2. Rename com MAPA_COLUNAS (capitalização original)
     3. Só depois converte tudo para minúsculas
     4. Segunda passagem: mapeia variações que só aparecem em lowercase
     """
-    # Passo 1: limpar espaços
-    df.columns = df.columns.str.strip()
-
-    # Passo 2: rename com chaves no formato original do BDMEP
-    df = df.rename(columns=MAPA_COLUNAS)
-
-    # Passo 3: converter para minúsculas (agora que as colunas importantes já foram renomeadas)
-    df.columns = [c.lower().strip() for c in df.columns]
-
-    # Passo 4: segunda passagem para variações que aparecem já em lowercase
-    mapa_lowercase = {
-        'radiacao global (kj/m²)':                               'radiacao_kj_m2',
-        'pressao atmosferica ao nivel da estacao, horaria (mb)': 'pressao_atm',
-        'pressão atmosferica max.na hora ant. (aut) (mb)':       'pressao_max',
-        'pressão atmosferica min. na hora ant. (aut) (mb)':      'pressao_min',
-        'temperatura do ponto de orvalho (°c)':                  'temp_orvalho',
-        'temperatura orvalho max. na hora ant. (aut) (°c)':      'temp_orvalho_max',
-        'temperatura orvalho min. na hora ant. (aut) (°c)':      'temp_orvalho_min',
-        'vento, rajada maxima (m/s)':                             'rajada_vento',
-        'unnamed: 19':                                            '_col_vazia',
-    }
-    df = df.rename(columns=mapa_lowercase)
+    nomes = []
+    for c in colunas:
+        c = str(c).strip()
+        c = MAPA_COLUNAS.get(c, c).lower().strip()
+        nomes.append(MAPA_COLUNAS_LOWERCASE.get(c, c))
+    return nomes
+
+
+def padronizar_colunas(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Aplica mapear_nomes (idempotente — os ficheiros já chegam padronizados
+    de carregar_arquivo_unico) e reporta as colunas reconhecidas.
+    """
+    df.columns = mapear_nomes(df.columns)
 
     # Reportar resultado
     esperadas = {'data', 'hora', 'temp_bulbo_seco', 'temp_max_hora',
@@ -232,7 +414,7 @@ def normalizar_hora(serie: pd.Series) -> pd.Series:
       - '00:00 UTC', '01:00 UTC'      (com sufixo UTC)
       - '0', '100', '1200'            (sem zero à esquerda)
       - '00', '01', ..., '23'         (só hora, 2 dígitos)
-    Normaliza tudo para 'HH:MM'.
+    Normaliza tudo para 'HH:MM'. Usado só no fallback por strings.
     """
     s = serie.astype(str).str.strip()
 
@@ -253,22 +435,106 @@ def normalizar_hora(serie: pd.Series) -> pd.Series:
     return s
 
 
-def parsear_datetime(df: pd.DataFrame) -> pd.DataFrame:
+# Layouts de data: (posições do ano, mês, dia, separadores) numa string de 10 chars
+LAYOUTS_DATA = {
+    'AAAA/MM/DD': ((0, 4), (5, 7), (8, 10), (4, 7), '/'),
+    'AAAA-MM-DD': ((0, 4), (5, 7), (8, 10), (4, 7), '-'),
+    'DD/MM/AAAA': ((6, 10), (3, 5), (0, 2), (2, 5), '/'),
+    'DD-MM-AAAA': ((6, 10), (3, 5), (0, 2), (2, 5), '-'),
+}
+LARGURA_HORA = 12   # '0000 UTC', '00:00 UTC', '00:00:00'...
+
+
+def _matriz_chars(serie: pd.Series, largura: int) -> np.ndarray:
+    """Matriz (n, largura) de códigos Unicode (0 depois do fim da string)."""
+    arr = np.asarray(serie.astype(str).str.strip().to_numpy(), dtype=f'U{largura}')
+    return arr.view(np.uint32).reshape(len(arr), largura)
+
+
+def _inteiro(m: np.ndarray, a: int, b: int) -> tuple[np.ndarray, np.ndarray]:
+    """Inteiro formado pelos dígitos m[:, a:b]; e máscara de linhas válidas."""
+    d  = m[:, a:b].astype(np.int64) - ord('0')
+    ok = ((d >= 0) & (d <= 9)).all(axis=1)
+    return d @ (10 ** np.arange(b - a - 1, -1, -1)), ok
+
+
+def detectar_layout(data: pd.Series, hora: pd.Series, n_amostra: int = 48) -> tuple[str | None, str | None]:
     """
-    Converte colunas 'data' e 'hora' para índice datetime.
-    Cobre todos os formatos conhecidos do BDMEP (2019-2025):
-      - Data: AAAA/MM/DD  ou  DD/MM/AAAA
-      - Hora: '0000 UTC', '0100 UTC', ..., '2300 UTC'
+    Detecta uma vez por ficheiro o layout da data e da hora (são uniformes
+    dentro de cada CSV do BDMEP) a partir das primeiras linhas válidas.
     """
-    # Normalizar hora e montar string datetime completa
-    hora_norm = normalizar_hora(df['hora'])
+    amostra_d = data.dropna().astype(str).str.strip().head(n_amostra)
+    layout_d = None
+    for nome, (_, _, _, seps, sep) in LAYOUTS_DATA.items():
+        if len(amostra_d) and amostra_d.map(
+                lambda v: len(v) >= 10 and v[seps[0]] == sep and v[seps[1]] == sep
+                and v[:10].replace(sep, '').isdigit()).all():
+            layout_d = nome
+            break
 
-    print(f"\n🔎 Diagnóstico de formato:")
-    print(f"   hora bruta  : {df['hora'].dropna().unique()[:3].tolist()}")
-    print(f"   hora norm.  : {hora_norm.dropna().unique()[:3].tolist()}")
-    print(f"   data bruta  : {df['data'].dropna().unique()[:3].tolist()}")
+    amostra_h = hora.dropna().astype(str).str.strip().head(n_amostra)
+    amostra_h = amostra_h.str.split().str[0]     # tira ' UTC'
+    layout_h = None
+    if len(amostra_h):
+        if amostra_h.map(lambda v: len(v) >= 5 and v[2] == ':').all():
+            layout_h = 'HH:MM'
+        elif amostra_h.str.isdigit().all():
+            layout_h = 'HH' if amostra_h.str.len().max() <= 2 else 'HHMM'
+    return layout_d, layout_h
 
-    dt_str = df['data'].astype(str).str.strip() + ' ' + hora_norm
+
+def timestamps_vectorizados(data: pd.Series, hora: pd.Series,
+                            layout_d: str | None, layout_h: str | None
+                            ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Monta datetime64[ns] a partir de componentes inteiros numa passagem.
+    Returns: (timestamps, máscara das linhas resolvidas). Linhas inválidas
+    ficam NaT e vão para o fallback por strings.
+    """
+    n = len(data)
+    if layout_d is None or layout_h is None:
+        return np.full(n, np.datetime64('NaT'), dtype='datetime64[ns]'), np.zeros(n, dtype=bool)
+
+    (ay, by), (am, bm), (ad, bd), _, _ = LAYOUTS_DATA[layout_d]
+    md = _matriz_chars(data, 10)
+    ano, ok_a = _inteiro(md, ay, by)
+    mes, ok_m = _inteiro(md, am, bm)
+    dia, ok_d = _inteiro(md, ad, bd)
+
+    mh = _matriz_chars(hora, LARGURA_HORA)
+    if layout_h == 'HH:MM':
+        h, ok_h = _inteiro(mh, 0, 2)
+        mi, ok_mi = _inteiro(mh, 3, 5)
+        ok_hora = ok_h & ok_mi & (mh[:, 2] == ord(':'))
+    else:
+        # Prefixo numérico de largura variável ('0', '100', '1200 UTC')
+        dig = mh.astype(np.int64) - ord('0')
+        prefixo = np.cumprod((dig >= 0) & (dig <= 9), axis=1).astype(bool)
+        v = np.zeros(n, dtype=np.int64)
+        for k in range(LARGURA_HORA):
+            v = np.where(prefixo[:, k], v * 10 + dig[:, k], v)
+        ok_hora = prefixo[:, 0]
+        h, mi = (v, np.zeros(n, dtype=np.int64)) if layout_h == 'HH' else (v // 100, v % 100)
+
+    ok = (ok_a & ok_m & ok_d & ok_hora & (mes >= 1) & (mes <= 12) & (dia >= 1)
+          & (dia <= 31) & (h >= 0) & (h <= 23) & (mi >= 0) & (mi <= 59))
+    ano, mes, dia = np.where(ok, ano, 1970), np.where(ok, mes, 1), np.where(ok, dia, 1)
+
+    inicio_mes = (ano - 1970) * 12 + (mes - 1)
+    dias = (inicio_mes.astype('datetime64[M]').astype('datetime64[D]')
+            + (dia - 1).astype('timedelta64[D]'))
+    # Dia inexistente no mês (ex.: 31/04) rola para o mês seguinte — rejeitar
+    ok &= dias.astype('datetime64[M]') == inicio_mes.astype('datetime64[M]')
+
+    ts = (dias.astype('datetime64[ns]') + h.astype('timedelta64[h]')
+          + mi.astype('timedelta64[m]'))
+    ts[~ok] = np.datetime64('NaT')
+    return ts, ok
+
+
+def _parsear_por_formatos(data: pd.Series, hora: pd.Series, verbose: bool) -> pd.Series:
+    """Fallback por strings: tenta os formatos conhecidos nas linhas restantes."""
+    dt_str = data.astype(str).str.strip() + ' ' + normalizar_hora(hora)
 
     # Tentar formatos na ordem de probabilidade para os dados de Imperatriz
     formatos = [
@@ -278,39 +544,76 @@ def parsear_datetime(df: pd.DataFrame) -> pd.DataFrame:
         '%d-%m-%Y %H:%M',
     ]
 
-    df['datetime'] = pd.NaT
+    resultado = pd.Series(pd.NaT, index=data.index, dtype='datetime64[ns]')
     for fmt in formatos:
-        ainda_nulos = df['datetime'].isna()
+        ainda_nulos = resultado.isna()
         if not ainda_nulos.any():
             break
         parsed = pd.to_datetime(dt_str[ainda_nulos], format=fmt, errors='coerce')
         resolvidos = parsed.notna()
         if resolvidos.any():
-            df.loc[ainda_nulos[ainda_nulos].index[resolvidos], 'datetime'] = \
-                parsed[resolvidos].values
-            print(f"   → Formato '{fmt}': {resolvidos.sum():,} linhas resolvidas")
+            resultado.loc[parsed.index[resolvidos]] = parsed[resolvidos]
+            if verbose:
+                print(f"   → Formato '{fmt}': {resolvidos.sum():,} linhas resolvidas")
+    return resultado
+
+
+def parsear_datetime(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """
+    Converte colunas 'data' e 'hora' para índice datetime.
+    Cobre todos os formatos conhecidos do BDMEP (2019-2025):
+      - Data: AAAA/MM/DD  ou  DD/MM/AAAA
+      - Hora: '0000 UTC', '0100 UTC', ..., '2300 UTC'
+
+    O layout é detectado uma vez (detectar_layout) e os timestamps saem de
+    componentes inteiros numa só passagem; só as linhas que falham passam
+    pelo parse por strings.
+    """
+    layout_d, layout_h = detectar_layout(df['data'], df['hora'])
+    ts, ok = timestamps_vectorizados(df['data'], df['hora'], layout_d, layout_h)
+
+    if verbose:
+        print(f"\n🔎 Diagnóstico de formato:")
+        print(f"   hora bruta  : {df['hora'].dropna().unique()[:3].tolist()}")
+        print(f"   data bruta  : {df['data'].dropna().unique()[:3].tolist()}")
+        print(f"   layout      : data {layout_d} | hora {layout_h} → "
+              f"{ok.sum():,} linhas resolvidas")
+
+    df['datetime'] = ts
+    if not ok.all():
+        resto = ~ok
+        df.loc[resto, 'datetime'] = _parsear_por_formatos(
+            df.loc[resto, 'data'], df.loc[resto, 'hora'], verbose).values
 
     df['datetime'] = pd.to_datetime(df['datetime'])
     n_inv = df['datetime'].isna().sum()
     if n_inv > 0:
-        falhas = df[df['datetime'].isna()][['data', 'hora']].head(3)
-        print(f"\n⚠️  {n_inv:,} linhas com datetime inválido removidas")
-        print(f"   Exemplos:\n{falhas.to_string()}")
+        if verbose:
+            falhas = df[df['datetime'].isna()][['data', 'hora']].head(3)
+            print(f"\n⚠️  {n_inv:,} linhas com datetime inválido removidas")
+            print(f"   Exemplos:\n{falhas.to_string()}")
         df = df.dropna(subset=['datetime'])
 
-    df = df.set_index('datetime').sort_index()
+    return ordenar_serie(df.set_index('datetime'), verbose)
+
+
+def ordenar_serie(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """Ordena pelo índice datetime e remove timestamps duplicados."""
+    df = df.sort_index()
 
     n_dup = df.index.duplicated().sum()
     if n_dup > 0:
-        print(f"   ⚠️  {n_dup:,} timestamps duplicados removidos")
+        if verbose:
+            print(f"   ⚠️  {n_dup:,} timestamps duplicados removidos")
         df = df[~df.index.duplicated(keep='first')]
 
-    print(f"\n📅 Série: {df.index.min().date()} → {df.index.max().date()}")
-    print(f"   Anos : {sorted(df.index.year.unique())}")
+    if verbose:
+        print(f"\n📅 Série: {df.index.min().date()} → {df.index.max().date()}")
+        print(f"   Anos : {sorted(df.index.year.unique())}")
     return df
 
 
-def converter_numericas(df: pd.DataFrame) -> pd.DataFrame:
+def converter_numericas(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
     """
     Converte colunas meteorológicas para float.
     Remove colunas duplicadas antes de converter (podem surgir da concatenação).
@@ -318,22 +621,18 @@ def converter_numericas(df: pd.DataFrame) -> pd.DataFrame:
     # Remover colunas duplicadas mantendo a primeira ocorrência
     colunas_dup = df.columns[df.columns.duplicated()].tolist()
     if colunas_dup:
-        print(f"\n⚠️  Colunas duplicadas removidas: {colunas_dup}")
+        if verbose:
+            print(f"\n⚠️  Colunas duplicadas removidas: {colunas_dup}")
         df = df.loc[:, ~df.columns.duplicated(keep='first')]
 
-    colunas = [
-        'temp_bulbo_seco', 'temp_max_hora', 'temp_min_hora',
-        'precipitacao', 'umidade_relativa', 'umidade_max_hora',
-        'umidade_min_hora', 'vento_velocidade', 'radiacao_kj_m2',
-        'pressao_atm', 'temp_orvalho'
-    ]
-    for col in colunas:
+    for col in COLUNAS_NUMERICAS:
         if col not in df.columns:
             continue
         # Garantir que é Series (não DataFrame com colunas duplicadas)
         serie = df[col]
         if isinstance(serie, pd.DataFrame):
-            print(f"   ⚠️  Coluna '{col}' ainda duplicada — mantendo primeira")
+            if verbose:
+                print(f"   ⚠️  Coluna '{col}' ainda duplicada — mantendo primeira")
             serie = serie.iloc[:, 0]
             df = df.drop(columns=col)
             df[col] = serie
@@ -348,10 +647,12 @@ def converter_numericas(df: pd.DataFrame) -> pd.DataFrame:
 # ETAPA 4 — QA/QC HORÁRIO
 # =============================================================================
 
-def qa_qc_outliers(df: pd.DataFrame) -> pd.DataFrame:
-    """Remove outliers fisicamente impossíveis para Imperatriz-MA."""
-    print("\n🔍 QA/QC — Outliers físicos (série horária):")
-
+def qa_qc_outliers(df: pd.DataFrame, verbose: bool = True,
+                   contagens: dict | None = None) -> pd.DataFrame:
+    """
+    Remove outliers fisicamente impossíveis para Imperatriz-MA.
+    contagens: dict acumulado entre blocos no modo streaming.
+    """
     limites = {
         'temp_bulbo_seco': (-5.0, 50.0),
         'temp_max_hora':   (-5.0, 50.0),
@@ -362,35 +663,42 @@ def qa_qc_outliers(df: pd.DataFrame) -> pd.DataFrame:
         'radiacao_kj_m2':  ( 0.0, 5000.0),
     }
 
-    total = 0
+    contagens = {} if contagens is None else contagens
     for col, (vmin, vmax) in limites.items():
         if col in df.columns:
             mask = (df[col] < vmin) | (df[col] > vmax)
             n = mask.sum()
             if n:
                 df.loc[mask, col] = np.nan
-                print(f"   {col:35s}: {n:6,} → NaN")
-                total += n
+                contagens[col] = contagens.get(col, 0) + n
 
     if 'temp_max_hora' in df.columns and 'temp_min_hora' in df.columns:
         inv = df['temp_max_hora'] < df['temp_min_hora']
         n = inv.sum()
         if n:
             df.loc[inv, ['temp_max_hora', 'temp_min_hora']] = np.nan
-            print(f"   {'Tmax < Tmin':35s}: {n:6,} → NaN")
-            total += n
+            contagens['Tmax < Tmin'] = contagens.get('Tmax < Tmin', 0) + n
 
-    print(f"   Total: {total:,} valores removidos")
+    if verbose:
+        relatorio_outliers(contagens)
     return df
 
 
+def relatorio_outliers(contagens: dict) -> None:
+    print("\n🔍 QA/QC — Outliers físicos (série horária):")
+    for col, n in contagens.items():
+        print(f"   {col:35s}: {n:6,} → NaN")
+    print(f"   Total: {sum(contagens.values()):,} valores removidos")
+
+
 # =============================================================================
 # ETAPA 5 — AGREGAÇÃO HORÁRIA → DIÁRIA
 # =============================================================================
 
-def agregar_para_diario(df: pd.DataFrame) -> pd.DataFrame:
+def agregar_para_diario(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
     """Agrega com função correta por variável."""
-    print("\n📊 Agregando horário → diário...")
+    if verbose:
+        print("\n📊 Agregando horário → diário...")
 
     cols = set(df.columns)
     agg = {}
@@ -445,7 +753,8 @@ def agregar_para_diario(df: pd.DataFrame) -> pd.DataFrame:
     }
     df_d = df_d.rename(columns={k: v for k, v in renomear.items() if k in df_d.columns})
 
-    print(f"   → {len(df_d):,} dias | {df_d.index.min().date()} a {df_d.index.max().date()}")
+    if verbose:
+        print(f"   → {len(df_d):,} dias | {df_d.index.min().date()} a {df_d.index.max().date()}")
     return df_d
 
 
@@ -453,44 +762,52 @@ def agregar_para_diario(df: pd.DataFrame) -> pd.DataFrame:
 # ETAPA 6 — QA/QC DIÁRIO
 # =============================================================================
 
-def qa_qc_lacunas(df: pd.DataFrame) -> pd.DataFrame:
-    """Trata lacunas na série diária."""
+COLUNAS_LACUNAS = ['tmax_c', 'tmin_c', 'tmean_c', 'chuva_mm',
+                   'umidade_media', 'vento_medio_ms']
+LIMITE_INTERPOLACAO = 3   # dias
+
+
+def blocos_nan(mascara: np.ndarray) -> list[tuple[int, int, int]]:
+    """Sequências de True: [(início, fim, tamanho), ...] (posições inclusivas)."""
+    m = np.concatenate([[False], np.asarray(mascara, dtype=bool), [False]]).astype(np.int8)
+    d = np.diff(m)
+    ini, fim = np.flatnonzero(d == 1), np.flatnonzero(d == -1) - 1
+    return [(int(a), int(b), int(b - a + 1)) for a, b in zip(ini, fim)]
+
+
+def qa_qc_lacunas(df: pd.DataFrame, mascara_nan: pd.DataFrame | None = None,
+                  interpolado: bool = False) -> pd.DataFrame:
+    """
+    Trata lacunas na série diária.
+    No modo streaming a série já chega completa e interpolada (limit=3);
+    mascara_nan traz os NaN originais para a contagem dos blocos.
+    """
     print("\n🔍 QA/QC — Lacunas na série diária:")
 
-    # Reindexar apenas dentro dos anos que têm dados reais
-    # Evita criar 366 linhas fantasma para anos descartados (ex: 2024)
-    anos_com_dados = set(df.index.year.unique())
-    idx_completo = pd.DatetimeIndex([
-        d for d in pd.date_range(df.index.min(), df.index.max(), freq='D')
-        if d.year in anos_com_dados
-    ])
-    df = df.reindex(idx_completo)
+    if mascara_nan is None:
+        # Reindexar apenas dentro dos anos que têm dados reais
+        # Evita criar 366 linhas fantasma para anos descartados (ex: 2024)
+        anos_com_dados = set(df.index.year.unique())
+        idx_completo = pd.date_range(df.index.min(), df.index.max(), freq='D')
+        idx_completo = idx_completo[idx_completo.year.isin(anos_com_dados)]
+        df = df.reindex(idx_completo)
 
-    colunas = [c for c in ['tmax_c', 'tmin_c', 'tmean_c', 'chuva_mm',
-                            'umidade_media', 'vento_medio_ms'] if c in df.columns]
+    colunas = [c for c in COLUNAS_LACUNAS if c in df.columns]
 
     for col in colunas:
-        n_nan = df[col].isna().sum()
+        nan_orig = mascara_nan[col].values if mascara_nan is not None else df[col].isna().values
+        n_nan = int(nan_orig.sum())
         if n_nan == 0:
             print(f"   {col:25s}: sem lacunas ✅")
             continue
 
-        blocos = []
-        em_bloco, inicio = False, 0
-        for i, v in enumerate(df[col].isna()):
-            if v and not em_bloco:
-                em_bloco, inicio = True, i
-            elif not v and em_bloco:
-                blocos.append((inicio, i - 1, i - inicio))
-                em_bloco = False
-        if em_bloco:
-            blocos.append((inicio, len(df) - 1, len(df) - inicio))
-
+        blocos = blocos_nan(nan_orig)
         curtas = [b for b in blocos if b[2] <= 3]
         medias = [b for b in blocos if 3 < b[2] <= 15]
         longas = [b for b in blocos if b[2] > 15]
 
-        df[col] = df[col].interpolate(method='linear', limit=3)
+        if not interpolado:
+            df[col] = df[col].interpolate(method='linear', limit=LIMITE_INTERPOLACAO)
 
         for ini, fim, _ in medias:
             for data in df.index[ini:fim+1]:
@@ -515,76 +832,235 @@ def qa_qc_lacunas(df: pd.DataFrame) -> pd.DataFrame:
 
 
 # =============================================================================
-# ETAPA 7 — CÁLCULO DE ETo
+# MODO STREAMING — um ficheiro de cada vez (ETAPAS 4–6 em blocos)
 # =============================================================================
 
-def radiacao_extraterrestre(doy: np.ndarray, lat_rad: float) -> np.ndarray:
-    dr      = 1 + 0.033 * np.cos(2 * np.pi / 365 * doy)
-    delta   = 0.409 * np.sin(2 * np.pi / 365 * doy - 1.39)
-    omega_s = np.arccos(np.clip(-np.tan(lat_rad) * np.tan(delta), -1, 1))
-    return (24 * 60 / np.pi) * 0.0820 * dr * (
-        omega_s * np.sin(lat_rad) * np.sin(delta) +
-        np.cos(lat_rad) * np.cos(delta) * np.sin(omega_s)
-    )
+class AgregadorDiarioStreaming:
+    """
+    Horário → diário por blocos cronológicos, com estado entre blocos:
+      - as horas do último dia de cada bloco ficam retidas (o dia pode
+        continuar no ficheiro seguinte) e só são agregadas no bloco seguinte
+      - dias sem nenhuma hora entre dois blocos são inseridos como o
+        resample faria sobre a série inteira (chuva 0, restante NaN)
+    """
 
+    def __init__(self, anos_excluir=()):
+        self.anos_excluir = set(anos_excluir)
+        self.retidas      = None   # horas do último dia ainda aberto
+        self.ultimo_dia   = None   # último dia já emitido
+        self.outliers     = {}
+        self.n_horas      = 0
+        self.n_atrasadas  = 0      # horas de dias já emitidos (descartadas)
+
+    def processar(self, df_h: pd.DataFrame) -> pd.DataFrame:
+        if self.retidas is not None:
+            df_h = pd.concat([self.retidas, df_h])
+        df_h = ordenar_serie(df_h, verbose=False)
+        if self.ultimo_dia is not None:
+            atrasadas = df_h.index < self.ultimo_dia + pd.Timedelta(days=1)
+            self.n_atrasadas += int(atrasadas.sum())
+            df_h = df_h[~atrasadas]
+        if len(df_h) == 0:
+            self.retidas = None
+            return pd.DataFrame()
+
+        dia_aberto   = df_h.index[-1].normalize()
+        self.retidas = df_h[df_h.index >= dia_aberto]
+        return self._emitir(df_h[df_h.index < dia_aberto])
+
+    def finalizar(self) -> pd.DataFrame:
+        retidas, self.retidas = self.retidas, None
+        return self._emitir(retidas) if retidas is not None else pd.DataFrame()
+
+    def _emitir(self, df_h: pd.DataFrame) -> pd.DataFrame:
+        if len(df_h) == 0:
+            return pd.DataFrame()
+        self.n_horas += len(df_h)
+        df_h = qa_qc_outliers(df_h, verbose=False, contagens=self.outliers)
+        df_d = agregar_para_diario(df_h, verbose=False)
+
+        if self.ultimo_dia is not None:
+            faltam = pd.date_range(self.ultimo_dia + pd.Timedelta(days=1),
+                                   df_d.index[0] - pd.Timedelta(days=1), freq='D')
+            if len(faltam):
+                lacuna = pd.DataFrame(index=faltam, columns=df_d.columns, dtype=float)
+                if 'chuva_mm' in lacuna.columns:
+                    lacuna['chuva_mm'] = 0.0
+                df_d = pd.concat([lacuna, df_d])
+        self.ultimo_dia = df_d.index[-1]
+
+        if self.anos_excluir:
+            df_d = df_d[~df_d.index.year.isin(self.anos_excluir)]
+        return df_d
+
+
+class InterpoladorStreaming:
+    """
+    Equivalente em blocos a df[col].interpolate(method='linear', limit=3).
 
-def eto_hargreaves_samani(tmax, tmin, tmean, Ra) -> np.ndarray:
-    return np.maximum(
-        0.0023 * Ra * (tmean + 17.8) * np.sqrt(np.maximum(tmax - tmin, 0.0)), 0.0
-    )
+    Só é emitido o que está antes do último valor válido mais antigo entre
+    as colunas (corte): aí todas as lacunas já têm as duas extremidades.
+    A cauda retida começa no último valor válido de cada coluna antes do
+    corte, para que as lacunas que o atravessam mantenham a extremidade
+    esquerda; essas linhas de contexto já emitidas não voltam a sair.
+    """
 
+    def __init__(self, colunas=COLUNAS_LACUNAS, limite=LIMITE_INTERPOLACAO):
+        self.colunas     = list(colunas)
+        self.limite      = limite
+        self.cauda       = None
+        self.ja_emitidas = 0   # linhas no início da cauda já emitidas
+
+    def processar(self, df_d: pd.DataFrame) -> tuple[pd.DataFrame, pd.DataFrame]:
+        """Returns: (dias emitidos interpolados, máscara dos NaN originais)."""
+        if len(df_d) == 0:
+            return pd.DataFrame(), pd.DataFrame()
+        bruto = df_d if self.cauda is None else pd.concat([self.cauda, df_d])
+        colunas = [c for c in self.colunas if c in bruto.columns]
+        validos = [np.flatnonzero(bruto[c].notna().values) for c in colunas]
+
+        corte = len(bruto)
+        for v in validos:
+            if len(v):
+                corte = min(corte, v[-1])
+        inicio = corte
+        for v in validos:
+            antes = v[v <= corte]
+            if len(antes):
+                inicio = min(inicio, antes[-1])
+
+        saida = self._interpolar(bruto, colunas, self.ja_emitidas, corte)
+        self.cauda, self.ja_emitidas = bruto.iloc[inicio:], corte - inicio
+        return saida
+
+    def finalizar(self) -> tuple[pd.DataFrame, pd.DataFrame]:
+        cauda, self.cauda = self.cauda, None
+        if cauda is None or len(cauda) == 0:
+            return pd.DataFrame(), pd.DataFrame()
+        colunas = [c for c in self.colunas if c in cauda.columns]
+        return self._interpolar(cauda, colunas, self.ja_emitidas, len(cauda))
+
+    def _interpolar(self, bruto, colunas, de, ate):
+        mascara = bruto[colunas].isna().iloc[de:ate]
+        saida = bruto.copy()
+        for c in colunas:
+            saida[c] = saida[c].interpolate(method='linear', limit=self.limite)
+        return saida.iloc[de:ate], mascara
+
+
+def _iterar_processados(arquivos, n_processos, pasta_cache):
+    """processar_arquivo em paralelo, em ordem, com no máximo n ficheiros em voo."""
+    if n_processos <= 1:
+        for arq in arquivos:
+            yield arq, processar_arquivo(arq, pasta_cache)
+        return
+    with ProcessPoolExecutor(max_workers=n_processos) as pool:
+        em_voo = deque()
+        for arq in arquivos:
+            em_voo.append((arq, pool.submit(processar_arquivo, arq, pasta_cache)))
+            if len(em_voo) >= n_processos:
+                a, fut = em_voo.popleft()
+                yield a, fut.result()
+        while em_voo:
+            a, fut = em_voo.popleft()
+            yield a, fut.result()
+
+
+def agregar_pasta_streaming(pasta: str, ano_inicio: int, ano_fim: int,
+                            n_processos: int | None = N_PROCESSOS_LEITURA,
+                            pasta_cache: str | None = PASTA_CACHE if USAR_CACHE else None
+                            ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Lê → QA/QC horário → diário → interpolação curta, um ficheiro de cada vez.
+    Só a série diária (pequena) é acumulada.
 
-def eto_penman_monteith(df: pd.DataFrame, lat_rad: float, altitude_m: float) -> np.ndarray:
-    T, Tmax, Tmin = df['tmean_c'].values, df['tmax_c'].values, df['tmin_c'].values
-    doy = df.index.dayofyear.values
+    Returns: (série diária interpolada, máscara dos NaN antes da interpolação)
+    """
+    arquivos = listar_arquivos_bdmep(pasta)
+    n = min(len(arquivos), n_processos or os.cpu_count() or 1)
+    print(f"   {len(arquivos)} arquivo(s) — streaming, {n} em leitura simultânea:\n")
+
+    agregador   = AgregadorDiarioStreaming(ANOS_EXCLUIR)
+    interpolador = InterpoladorStreaming()
+    dias, mascaras = [], []
+    n_ok = n_cache = 0
+
+    def _emitir(df_d):
+        d, m = interpolador.processar(df_d)
+        if len(d):
+            dias.append(d); mascaras.append(m)
+
+    for arq, (df_h, do_cache) in _iterar_processados(arquivos, n, pasta_cache):
+        if df_h is None:
+            print(f"   ❌  {arq.name:<55s} FALHA")
+            continue
+        if n_ok == 0:
+            padronizar_colunas(df_h)
+        n_ok += 1; n_cache += do_cache
+        print(f"   ✅  {arq.name:<55s} {len(df_h):>8,} linhas{' (cache)' if do_cache else ''}")
+        df_h = df_h[(df_h.index.year >= ano_inicio) & (df_h.index.year <= ano_fim)]
+        if ANOS_EXCLUIR:
+            df_h = df_h[~df_h.index.year.isin(ANOS_EXCLUIR)]
+        _emitir(agregador.processar(df_h))
+
+    _emitir(agregador.finalizar())
+    d, m = interpolador.finalizar()
+    if len(d):
+        dias.append(d); mascaras.append(m)
+
+    if not dias:
+        raise ValueError(
+            "❌ Nenhuma hora restante após o filtro de período.\n"
+            "   Verifique se o parsing de datetime funcionou (ver diagnóstico acima)."
+        )
 
-    es = (0.6108 * np.exp(17.27 * Tmax / (Tmax + 237.3)) +
-          0.6108 * np.exp(17.27 * Tmin / (Tmin + 237.3))) / 2
+    df_d    = pd.concat(dias)
+    mascara = pd.concat(mascaras).reindex(columns=[c for c in COLUNAS_LACUNAS if c in df_d.columns],
+                                          fill_value=True)
+    mascara = mascara.fillna(True).astype(bool)
+    print(f"\n   ✅  {n_ok} arquivo(s) ({n_cache} do cache) | {agregador.n_horas:,} horas "
+          f"→ {len(df_d):,} dias | {df_d.index.min().date()} a {df_d.index.max().date()}")
+    if agregador.n_atrasadas:
+        print(f"   ⚠️  {agregador.n_atrasadas:,} horas de dias já fechados descartadas "
+              f"(ficheiros sobrepostos)")
+    relatorio_outliers(agregador.outliers)
+    return df_d, mascara
+
+
+# =============================================================================
+# ETAPA 7 — CÁLCULO DE ETo
+# =============================================================================
+
+def eto_penman_monteith(df: pd.DataFrame, lat_graus: float, altitude_m: float) -> np.ndarray:
+    """Prepara as colunas diárias do INMET e chama o núcleo vectorizado eto_fao56."""
+    rh = rs = u2 = None
 
     if 'umidade_media' in df.columns and df['umidade_media'].notna().mean() > 0.5:
-        ea = df['umidade_media'].values / 100 * es
+        rh = df['umidade_media'].values
     else:
-        ea = 0.6108 * np.exp(17.27 * Tmin / (Tmin + 237.3))
         print("   ⚠️  Umidade indisponível → ea estimada pela Tmin")
 
-    vpd   = np.maximum(es - ea, 0.0)
-    P     = 101.3 * ((293 - 0.0065 * altitude_m) / 293) ** 5.26
-    gamma = 0.000665 * P
-    Delta = 4098 * es / (T + 237.3) ** 2
-    Ra    = radiacao_extraterrestre(doy, lat_rad)
-    Rso   = (0.75 + 2e-5 * altitude_m) * Ra
-
     if 'radiacao_kj_m2_dia' in df.columns and df['radiacao_kj_m2_dia'].notna().mean() > 0.3:
-        Rs = np.clip(df['radiacao_kj_m2_dia'].values / 1000.0, 0.0, Ra)
+        rs = df['radiacao_kj_m2_dia'].values / 1000.0
         print("   ✅  Usando radiação medida para PM")
     else:
-        Rs = (0.25 + 0.50 * 0.5) * Ra
         print("   ⚠️  Radiação indisponível → estimada por Ångström-Prescott (n/N=0.5)")
 
-    Rns   = (1 - 0.23) * Rs
-    sigma = 4.903e-9
-    Rnl = sigma * ((Tmax + 273.16)**4 + (Tmin + 273.16)**4) / 2 * \
-          (0.34 - 0.14 * np.sqrt(np.maximum(ea, 0.001))) * \
-          (1.35 * np.clip(Rs / np.maximum(Rso, 0.01), 0, 1) - 0.35)
-    Rn = np.maximum(Rns - Rnl, 0.0)
-
     if 'vento_medio_ms' in df.columns and df['vento_medio_ms'].notna().mean() > 0.5:
-        u2 = np.maximum(df['vento_medio_ms'].values * (4.87 / np.log(67.8 * 10 - 5.42)), 0.5)
-    else:
-        u2 = np.full(len(df), 2.0)
+        u2 = eto_fao56.vento_2m(df['vento_medio_ms'].values, altura_m=10.0)
 
-    num = 0.408 * Delta * Rn + gamma * (900 / (T + 273)) * u2 * vpd
-    den = Delta + gamma * (1 + 0.34 * u2)
-    return np.maximum(num / den, 0.0)
+    return eto_fao56.eto_penman_monteith(
+        df['tmax_c'].values, df['tmin_c'].values, df.index.dayofyear.values,
+        lat_graus, altitude_m, rs=rs, rh=rh, u2=u2, tmean=df['tmean_c'].values,
+        ea_minimo=0.001, rn_minimo=0.0   # como o cálculo INMET anterior
+    )
 
 
 def calcular_eto(df: pd.DataFrame, lat_graus: float, altitude_m: float) -> pd.DataFrame:
     print("\n💧 Calculando ETo diária...")
-    lat_rad = np.radians(lat_graus)
-    Ra      = radiacao_extraterrestre(df.index.dayofyear.values, lat_rad)
-
-    df['eto_hs_mm'] = eto_hargreaves_samani(
-        df['tmax_c'].values, df['tmin_c'].values, df['tmean_c'].values, Ra
+    df['eto_hs_mm'] = eto_fao56.eto_hargreaves_samani(
+        df['tmax_c'].values, df['tmin_c'].values, df.index.dayofyear.values,
+        lat_graus, tmean=df['tmean_c'].values
     )
 
     # Verificar se o vento medido é plausível para PM
@@ -600,7 +1076,7 @@ def calcular_eto(df: pd.DataFrame, lat_graus: float, altitude_m: float) -> pd.Da
     if vento_ok and umidade_ok:
         print("   → Método: Penman-Monteith FAO-56")
         print(f"     (vento mediano: {df['vento_medio_ms'].median():.2f} m/s — adequado para PM)")
-        df['eto_mm']     = eto_penman_monteith(df, lat_rad, altitude_m)
+        df['eto_mm']     = eto_penman_monteith(df, lat_graus, altitude_m)
         df['eto_metodo'] = 'Penman-Monteith FAO-56'
     else:
         mediana_vento = df['vento_medio_ms'].median() if 'vento_medio_ms' in df.columns else 0
@@ -707,46 +1183,62 @@ def gerar_graficos(df: pd.DataFrame) -> None:
 # PIPELINE PRINCIPAL
 # =============================================================================
 
-def processar_inmet(pasta: str, ano_inicio: int, ano_fim: int) -> pd.DataFrame:
-    print("\n" + "="*60)
-    print("🌿 PIPELINE INMET BDMEP — Múltiplos Anos")
-    print("   Projeto: Sistema de Irrigação com ALMMo-0")
-    print("="*60)
+def processar_serie_diaria(pasta: str, ano_inicio: int, ano_fim: int,
+                           lat_graus: float = LATITUDE_GRAUS,
+                           altitude_m: float = ALTITUDE_METROS,
+                           n_processos: int | None = N_PROCESSOS_LEITURA) -> pd.DataFrame:
+    """
+    ETAPAS 1–7 para uma estação: leitura → QA/QC → diário → lacunas → ETo.
+    Devolve a série diária completa (inclui radiação, se medida).
+    """
+    if MODO_STREAMING:
+        df_d, mascara = agregar_pasta_streaming(pasta, ano_inicio, ano_fim, n_processos)
+        df_d = qa_qc_lacunas(df_d, mascara_nan=mascara, interpolado=True)
+    else:
+        # Leitura, colunas, datetime e conversão numérica por ficheiro (com cache)
+        df = carregar_pasta_bdmep(pasta, n_processos)
+        df = padronizar_colunas(df)
+
+        df = df[(df.index.year >= ano_inicio) & (df.index.year <= ano_fim)]
+        if ANOS_EXCLUIR:
+            df = df[~df.index.year.isin(ANOS_EXCLUIR)]
+        anos_finais = sorted(df.index.year.unique())
+        print(f"\n📅 Após filtro {ano_inicio}–{ano_fim} (excluindo {ANOS_EXCLUIR}): "
+              f"{len(df):,} horas | anos: {anos_finais}")
+
+        if len(df) == 0:
+            raise ValueError(
+                "❌ Nenhuma hora restante após o filtro de período.\n"
+                "   Verifique se o parsing de datetime funcionou (ver diagnóstico acima)."
+            )
 
-    df = carregar_pasta_bdmep(pasta)
-    df = padronizar_colunas(df)
-    df = parsear_datetime(df)
-    df = converter_numericas(df)
+        df = qa_qc_outliers(df)
+        df_d = agregar_para_diario(df)
 
-    df = df[(df.index.year >= ano_inicio) & (df.index.year <= ano_fim)]
-    if ANOS_EXCLUIR:
-        df = df[~df.index.year.isin(ANOS_EXCLUIR)]
-    anos_finais = sorted(df.index.year.unique())
-    print(f"\n📅 Após filtro {ano_inicio}–{ano_fim} (excluindo {ANOS_EXCLUIR}): "
-          f"{len(df):,} horas | anos: {anos_finais}")
+        # Remover dias de anos excluídos que o resample criou como NaN
+        # (o resample preenche todos os dias entre min e max, incluindo anos sem dados)
+        if ANOS_EXCLUIR:
+            df_d = df_d[~df_d.index.year.isin(ANOS_EXCLUIR)]
+            print(f"   → Dias de {ANOS_EXCLUIR} removidos do agregado diário")
 
-    if len(df) == 0:
-        raise ValueError(
-            "❌ Nenhuma hora restante após o filtro de período.\n"
-            "   Verifique se o parsing de datetime funcionou (ver diagnóstico acima)."
-        )
+        df_d = qa_qc_lacunas(df_d)
+    return calcular_eto(df_d, lat_graus, altitude_m)
 
-    df = qa_qc_outliers(df)
-    df_d = agregar_para_diario(df)
 
-    # Remover dias de anos excluídos que o resample criou como NaN
-    # (o resample preenche todos os dias entre min e max, incluindo anos sem dados)
-    if ANOS_EXCLUIR:
-        df_d = df_d[~df_d.index.year.isin(ANOS_EXCLUIR)]
-        print(f"   → Dias de {ANOS_EXCLUIR} removidos do agregado diário")
+COLUNAS_FINAIS = ['tmax_c', 'tmin_c', 'tmean_c', 'chuva_mm',
+                  'eto_mm', 'eto_hs_mm', 'eto_metodo',
+                  'umidade_media', 'vento_medio_ms']
+
+
+def processar_inmet(pasta: str, ano_inicio: int, ano_fim: int) -> pd.DataFrame:
+    print("\n" + "="*60)
+    print("🌿 PIPELINE INMET BDMEP — Múltiplos Anos")
+    print("   Projeto: Sistema de Irrigação com ALMMo-0")
+    print("="*60)
 
-    df_d = qa_qc_lacunas(df_d)
-    df_d = calcular_eto(df_d, LATITUDE_GRAUS, ALTITUDE_METROS)
+    df_d = processar_serie_diaria(pasta, ano_inicio, ano_fim)
 
-    colunas_finais = ['tmax_c', 'tmin_c', 'tmean_c', 'chuva_mm',
-                      'eto_mm', 'eto_hs_mm', 'eto_metodo',
-                      'umidade_media', 'vento_medio_ms']
-    df_saida = df_d[[c for c in colunas_finais if c in df_d.columns]].copy()
+    df_saida = df_d[[c for c in COLUNAS_FINAIS if c in df_d.columns]].copy()
 
     gerar_relatorio(df_saida)
     if GERAR_GRAFICOS:
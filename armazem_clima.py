@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+============================================================================
+Armazém de Clima — série diária única, colunar e mapeada em memória
+============================================================================
+
+Substitui os 46 ficheiros de weather_files/ (um TXT AquaCrop + um _meta.csv
+por ano) por um único ficheiro .npy com todos os anos, ordenado por data:
+
+    weather_files/clima_imperatriz.npy   (array estruturado, DTYPE_CLIMA)
+
+  - carregar()      : np.load(mmap_mode='r') — uma leitura, sem parse
+  - ano(year)       : vista (searchsorted na coluna data, sem cópia)
+  - weather_df(...) : DataFrame no formato de aquacrop.utils.prepare_weather,
+                      para passar directamente ao AquaCropModel
+  - veranico        : mesma vista do ano; só a coluna Precipitation é nova
+  - exportar_txt()  : TXT AquaCrop sob pedido, refeito só se o ano mudou
+                      (manifesto .manifesto_txt.json na pasta de saída)
+  - sem_dados       : datas que a fonte devolveu sem valor (ex.: NASA POWER
+                      com fill em Tmax/Tmin/Rs) — não entram na série, mas
+                      contam como conhecidas (datas_conhecidas()) para não
+                      serem pedidas de novo em cada execução. Ficam em
+                      <armazém>_sem_dados.json, ao lado do .npy.
+
+ArmazemEstacoes guarda um ArmazemClima por estação (partição) com um
+índice JSON — usado por C_Tratamento_dados/processar_estacoes.py.
+
+Uso:
+    from armazem_clima import ArmazemClima
+    clima = ArmazemClima.carregar('weather_files/clima_imperatriz.npy')
+    wdf   = clima.weather_df(2010)
+    wver  = clima.weather_df(2010, veranico=(0.20, [2, 3]))
+============================================================================
+"""
+
+import os
+import json
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+DTYPE_CLIMA = np.dtype([
+    ('data'  , 'datetime64[D]'),
+    ('tmin'  , 'f8'),   # °C
+    ('tmax'  , 'f8'),   # °C
+    ('prec'  , 'f8'),   # mm
+    ('eto'   , 'f8'),   # mm/dia (FAO-56)
+    ('rs'    , 'f8'),   # MJ/m²/dia
+    ('rh'    , 'f8'),   # %
+    ('u2_obs', 'f8'),   # m/s (NaN se em falta)
+])
+
+# aquacrop.utils.prepare_weather limita a ETo inferiormente (evita divisões por zero)
+ETO_MINIMO = 0.1
+
+TXT_HEADER = "Day\tMonth\tYear\tMinTemp\tMaxTemp\tPrecipitation\tReferenceET"
+TXT_FMT    = ['%d', '%d', '%d', '%.2f', '%.2f', '%.2f', '%.4f']
+MANIFESTO_TXT = '.manifesto_txt.json'
+
+
+def _guardar_npy(caminho, dados):
+    """Escrita atómica: ficheiro temporário + os.replace."""
+    pasta = os.path.dirname(os.path.abspath(caminho))
+    os.makedirs(pasta, exist_ok=True)
+    tmp = f"{caminho}.tmp{os.getpid()}.npy"
+    np.save(tmp, dados)
+    os.replace(tmp, caminho)
+
+
+class ArmazemClima:
+    """Série diária de todos os anos num array estruturado ordenado por data."""
+
+    def __init__(self, dados=None, caminho=None, sem_dados=None):
+        self.dados     = np.empty(0, dtype=DTYPE_CLIMA) if dados is None else dados
+        self.caminho   = caminho
+        self.sem_dados = np.empty(0, dtype='datetime64[D]') if sem_dados is None else sem_dados
+        self._dfs      = {}   # (ano, veranico) -> DataFrame já montado
+
+    def __len__(self):
+        return len(self.dados)
+
+    # ------ Persistência ------
+
+    @staticmethod
+    def _caminho_sem_dados(caminho):
+        return f"{os.path.splitext(str(caminho))[0]}_sem_dados.json"
+
+    @classmethod
+    def carregar(cls, caminho):
+        """Mapeia o ficheiro em memória; armazém vazio se não existir."""
+        try:
+            with open(cls._caminho_sem_dados(caminho), encoding='utf-8') as f:
+                sem_dados = np.array(json.load(f), dtype='datetime64[D]')
+        except (OSError, ValueError):
+            sem_dados = None
+        if not os.path.exists(caminho):
+            return cls(caminho=str(caminho), sem_dados=sem_dados)
+        return cls(np.load(caminho, mmap_mode='r'), caminho=str(caminho), sem_dados=sem_dados)
+
+    def guardar(self, caminho=None):
+        self.caminho = str(caminho or self.caminho)
+        _guardar_npy(self.caminho, np.ascontiguousarray(self.dados))
+        self.dados = np.load(self.caminho, mmap_mode='r')
+        self._dfs.clear()
+        if len(self.sem_dados) or os.path.exists(self._caminho_sem_dados(self.caminho)):
+            caminho_sd = self._caminho_sem_dados(self.caminho)
+            tmp = f"{caminho_sd}.tmp{os.getpid()}"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump([str(d) for d in self.sem_dados], f, indent=0)
+            os.replace(tmp, caminho_sd)
+
+    # ------ Escrita ------
+
+    def acrescentar(self, novos):
+        """
+        Junta registos (array DTYPE_CLIMA ou DataFrame com as mesmas colunas).
+        Datas repetidas ficam com o valor novo; o resultado fica em memória
+        até guardar().
+        """
+        if isinstance(novos, pd.DataFrame):
+            arr = np.empty(len(novos), dtype=DTYPE_CLIMA)
+            for campo in DTYPE_CLIMA.names:
+                if campo == 'data':
+                    arr[campo] = pd.to_datetime(novos[campo]).values.astype('datetime64[D]')
+                else:
+                    arr[campo] = novos[campo].to_numpy(dtype=float) if campo in novos else np.nan
+            novos = arr
+        todos = np.concatenate([novos, np.asarray(self.dados)])
+        # np.unique devolve a 1.ª ocorrência de cada data — a dos registos novos
+        _, idx = np.unique(todos['data'], return_index=True)
+        self.dados = todos[idx]
+        self.sem_dados = np.setdiff1d(self.sem_dados, novos['data'])
+        self._dfs.clear()
+
+    def marcar_sem_dados(self, datas):
+        """Regista datas sem valor na fonte (não voltam a ser pedidas)."""
+        datas = np.asarray(pd.DatetimeIndex(datas).values.astype('datetime64[D]'))
+        datas = np.setdiff1d(datas, self.dados['data'])
+        self.sem_dados = np.union1d(self.sem_dados, datas)
+
+    def datas_conhecidas(self):
+        """Datas com dados mais as marcadas sem dados (para a busca incremental)."""
+        return np.concatenate([np.asarray(self.dados['data']), self.sem_dados])
+
+    # ------ Leitura ------
+
+    def anos(self):
+        return sorted(set(self.dados['data'].astype('datetime64[Y]').astype(int) + 1970))
+
+    def intervalo(self, inicio, fim):
+        """Vista dos dias em [inicio, fim] (datas ISO ou datetime64)."""
+        d = self.dados['data']
+        i = np.searchsorted(d, np.datetime64(inicio, 'D'), side='left')
+        j = np.searchsorted(d, np.datetime64(fim, 'D'), side='right')
+        return self.dados[i:j]
+
+    def ano(self, year):
+        return self.intervalo(f'{year}-01-01', f'{year}-12-31')
+
+    def digest_ano(self, year):
+        return hashlib.sha1(np.ascontiguousarray(self.ano(year)).tobytes()).hexdigest()
+
+    def meta(self, year):
+        """DataFrame com todas as variáveis do ano (antigo _meta.csv)."""
+        v = self.ano(year)
+        return pd.DataFrame({'date': v['data'].astype('datetime64[ns]'),
+                             'tmax': v['tmax'], 'tmin': v['tmin'], 'prec': v['prec'],
+                             'rs': v['rs'], 'rh': v['rh'], 'u2_obs': v['u2_obs'],
+                             'eto': v['eto']})
+
+    def weather_df(self, year, veranico=None):
+        """
+        DataFrame do ano no formato de prepare_weather
+        (MinTemp, MaxTemp, Precipitation, ReferenceET, Date).
+
+        veranico: (fator, meses) — multiplica a chuva desses meses; as
+        restantes colunas vêm da mesma vista do ano. Memoizado por
+        (ano, veranico); o DataFrame devolvido não deve ser alterado.
+        """
+        chave = (year, None if veranico is None else (veranico[0], tuple(veranico[1])))
+        if chave in self._dfs:
+            return self._dfs[chave]
+
+        v     = self.ano(year)
+        datas = v['data'].astype('datetime64[ns]')
+        prec  = v['prec']
+        if veranico is not None:
+            fator, meses = veranico
+            mes  = datas.astype('datetime64[M]').astype(int) % 12 + 1
+            prec = np.where(np.isin(mes, meses), prec * fator, prec)
+
+        df = pd.DataFrame({
+            'MinTemp'      : v['tmin'],
+            'MaxTemp'      : v['tmax'],
+            'Precipitation': prec,
+            'ReferenceET'  : np.maximum(v['eto'], ETO_MINIMO),
+            'Date'         : datas,
+        })
+        self._dfs[chave] = df
+        return df
+
+    # ------ Exportação TXT AquaCrop ------
+
+    def exportar_txt(self, year, caminho):
+        """
+        Escreve o TXT AquaCrop do ano se não existir ou se os dados mudaram.
+        Returns: True se escreveu, False se o ficheiro já estava actual.
+        """
+        pasta  = os.path.dirname(os.path.abspath(caminho))
+        nome   = os.path.basename(caminho)
+        digest = self.digest_ano(year)
+        try:
+            with open(os.path.join(pasta, MANIFESTO_TXT), encoding='utf-8') as f:
+                manifesto = json.load(f)
+        except (OSError, ValueError):
+            manifesto = {}
+        if os.path.exists(caminho) and manifesto.get(nome) == digest:
+            return False
+
+        v = self.ano(year)
+        d = pd.DatetimeIndex(v['data'].astype('datetime64[ns]'))
+        os.makedirs(pasta, exist_ok=True)
+        np.savetxt(caminho, np.column_stack([d.day, d.month, d.year,
+                                             v['tmin'], v['tmax'], v['prec'], v['eto']]),
+                   fmt=TXT_FMT, delimiter='\t', header=TXT_HEADER, comments='')
+        manifesto[nome] = digest
+        with open(os.path.join(pasta, MANIFESTO_TXT), 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, indent=1, sort_keys=True)
+        return True
+
+
+# ============================================================================
+# VÁRIAS ESTAÇÕES — uma partição (ArmazemClima) por estação
+# ============================================================================
+
+class ArmazemEstacoes:
+    """
+    Armazém particionado por estação e data:
+
+        <pasta>/estacoes.json        índice {id: {nome, lat, alt, dias, inicio, fim}}
+        <pasta>/clima_<id>.npy       ArmazemClima da estação (mmap)
+
+    Cada partição é gravada de forma atómica e independente — estações
+    processadas em paralelo não se bloqueiam entre si.
+    """
+
+    INDICE = 'estacoes.json'
+
+    def __init__(self, pasta):
+        self.pasta = str(pasta)
+
+    def caminho(self, id_estacao):
+        return os.path.join(self.pasta, f"clima_{id_estacao}.npy")
+
+    def estacoes(self):
+        try:
+            with open(os.path.join(self.pasta, self.INDICE), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def estacao(self, id_estacao):
+        return ArmazemClima.carregar(self.caminho(id_estacao))
+
+    def gravar(self, id_estacao, registos, meta=None):
+        """Substitui a partição da estação e actualiza o índice."""
+        clima = ArmazemClima()
+        clima.acrescentar(registos)
+        clima.guardar(self.caminho(id_estacao))
+
+        indice = self.estacoes()
+        d = clima.dados['data']
+        indice[str(id_estacao)] = dict(meta or {}, dias=len(clima),
+                                       inicio=str(d[0]) if len(d) else None,
+                                       fim=str(d[-1]) if len(d) else None)
+        tmp = os.path.join(self.pasta, f"{self.INDICE}.tmp{os.getpid()}")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(indice, f, indent=1, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, os.path.join(self.pasta, self.INDICE))
+        return clima
+
+
+# ============================================================================
+# MIGRAÇÃO DOS FICHEIROS ANUAIS
+# ============================================================================
+
+def ler_ficheiros_anuais(txt_path, meta_path=None):
+    """
+    Lê um par TXT AquaCrop + _meta.csv antigo como DataFrame de registos.
+    Os valores AquaCrop vêm do TXT (os mesmos que prepare_weather lia);
+    rs, rh e u2_obs vêm do meta, se existir.
+    """
+    txt = pd.read_csv(txt_path, sep=r'\s+')
+    df  = pd.DataFrame({
+        'data': pd.to_datetime(dict(year=txt['Year'], month=txt['Month'], day=txt['Day'])),
+        'tmin': txt['MinTemp'], 'tmax': txt['MaxTemp'],
+        'prec': txt['Precipitation'], 'eto': txt['ReferenceET'],
+    })
+    if meta_path is not None and os.path.exists(meta_path):
+        meta = pd.read_csv(meta_path, parse_dates=['date'])
+        df = df.merge(meta[['date', 'rs', 'rh', 'u2_obs']].rename(columns={'date': 'data'}),
+                      on='data', how='left')
+    return df
@@ -11,7 +11,7 @@ Uso:
     pip install -r requirements.txt
     python benchmark_script.py
 
-Tempo estimado: < 5 minutos (dependendo do hardware)
+Tempo estimado: perto do fit mais lento (fits em paralelo, ver N_NUCLEOS)
 ==========================================================================
 """
 
@@ -19,7 +19,14 @@ import warnings
 warnings.filterwarnings('ignore')
 
 import os
+import sys
+import csv
+import json
 import time
+import pickle
+import tempfile
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import numpy as np
 import pandas as pd
 from collections import Counter
@@ -48,6 +55,17 @@ matplotlib.use('Agg')  # Backend não-interativo (funciona sem display)
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+# Renderização paralela e com cache das figuras
+from servico_graficos import FiguraSpec, renderizar_figuras
+from cache_reamostragem import reamostrar
+from divisao_grupos import detectar_grupos, dividir
+
+# ALMMo-0: v9 (cold start) e runtime do Raspberry Pi (C_Rasp/almmo0.py)
+from cold_start_v9 import ALMMo0 as ALMMo0V9
+PASTA_HIL = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'C_Rasp')
+sys.path.append(PASTA_HIL)
+from almmo0 import ALMMo0 as ALMMo0HIL
+
 # ========================================================================
 # CONFIGURAÇÃO
 # ========================================================================
@@ -64,12 +82,8 @@ TARGET = 'classe_irrigacao'
 # Grupos de teste (idênticos ao cold start do ALMMo-0)
 GRUPOS_TESTE = [6, 10, 14, 18, 22, 28]
 
-# Tamanhos dos 30 grupos (5 anos × 2 janelas × 3 cenários)
-TAMANHOS_GRUPOS = [
-    92, 90, 90, 92, 92, 89, 92, 94, 92, 88,
-    92, 90, 90, 92, 92, 89, 92, 94, 92, 88,
-    92, 90, 90, 92, 92, 89, 92, 94, 92, 88
-]
+# Os grupos (5 anos × 2 janelas × 3 cenários) são detectados pelos
+# reinícios da DAP, tal como no cold start — não por tamanhos fixos
 
 # Resultados de referência do ALMMo-0
 ALMMO_REF = {
@@ -84,6 +98,31 @@ ALMMO_REF = {
     },
 }
 
+# Orçamento de núcleos do benchmark (None = todos). Cada fit
+# (dataset, método, algoritmo) é um job do pool; os núcleos que sobram
+# vão para as threads internas de Random Forest e XGBoost
+N_NUCLEOS = None
+
+# SVC.predict usa a função de decisão; probability=True só acrescentava
+# uma CV interna de 5 folds (Platt) ao fit, sem mudar as predições
+SVC_PROBABILIDADE = False
+
+CSV_RESULTADOS = 'benchmark_resultados.csv'
+
+# ALMMo-0 na matriz (método B, cost-sensitive): variante do cold start v9
+# e a mesma base de regras servida pelo runtime do Pi (C_Rasp/almmo0.py)
+INCLUIR_ALMMO   = True
+ALMMO_R         = 0.5
+ALMMO_MAX_RULES = 50
+
+# Inferência na borda: cada modelo treinado é medido num processo novo,
+# em série depois da matriz, com EDGE_THREADS threads de BLAS/OpenMP
+MEDIR_EDGE   = True
+EDGE_THREADS = 1
+N_LATENCIA   = 500      # predições de uma amostra para p50/p99
+# Orçamento do Raspberry Pi — candidatos fora dele ficam marcados no relatório
+ORCAMENTO_EDGE = {'lat_p99_ms': 50.0, 'pico_rss_mb': 200.0, 'tamanho_kb': 2048.0}
+
 # Seed global
 RANDOM_STATE = 42
 np.random.seed(RANDOM_STATE)
@@ -94,18 +133,8 @@ np.random.seed(RANDOM_STATE)
 # ========================================================================
 
 def criar_grupos(df):
-    """Recria coluna de grupo baseada nas linhas do dataset."""
-    grupos = []
-    for i, t in enumerate(TAMANHOS_GRUPOS, 1):
-        grupos.extend([i] * t)
-    # Truncar ou estender para o tamanho real do dataframe
-    if len(grupos) >= len(df):
-        return grupos[:len(df)]
-    else:
-        # Se o dataset for maior (v8 com oversampling no dataset),
-        # os grupos extras não existem — usar -1 como marcador
-        grupos.extend([-1] * (len(df) - len(grupos)))
-        return grupos
+    """Coluna de grupo (1-indexada) pelos reinícios da DAP ou pela grupo_id."""
+    return detectar_grupos(df) + 1
 
 
 def split_leave_groups_out(df, features, target, grupos_teste):
@@ -113,20 +142,9 @@ def split_leave_groups_out(df, features, target, grupos_teste):
     Split Leave-Groups-Out idêntico ao cold start do ALMMo-0.
     Retorna X_train, X_test, y_train, y_test.
     """
-    df = df.copy()
-
-    # Verificar se coluna de grupo já existe
-    if 'grupo' not in df.columns:
-        df['grupo'] = criar_grupos(df)
-
-    mask_teste = df['grupo'].isin(grupos_teste)
-
-    X_train = df[~mask_teste][features].values
-    y_train = df[~mask_teste][target].values
-    X_test  = df[mask_teste][features].values
-    y_test  = df[mask_teste][target].values
-
-    return X_train, X_test, y_train, y_test
+    # Coluna de grupo já existente (1-indexada) tem prioridade
+    grupos = df['grupo'].to_numpy() if 'grupo' in df.columns else criar_grupos(df)
+    return dividir(df[features].values, df[target].values, grupos, grupos_teste)
 
 
 def normalizar(X_train, X_test):
@@ -205,16 +223,23 @@ def adasyn_resample(X_train, y_train):
         return smote_integral(X_train, y_train), True  # True = fallback acionado
 
 
+def _adasyn_com_info(X_train, y_train):
+    """adasyn_resample no formato da cache (X, y, info com o fallback)."""
+    (X_res, y_res), fallback = adasyn_resample(X_train, y_train)
+    return X_res, y_res, {'fallback': fallback}
+
+
 # ========================================================================
 # DEFINIÇÃO DOS ALGORITMOS
 # ========================================================================
 
-def get_algoritmos(metodo, n_classes):
+def get_algoritmos(metodo, n_classes, n_threads=1):
     """
     Retorna dicionário de algoritmos configurados para o método de tratamento.
 
     metodo: 'A' (baseline), 'B' (cost-sensitive), 'C'/'D'/'E' (resampling)
     n_classes: 2 ou 3
+    n_threads: threads internas de Random Forest e XGBoost
     """
     algos = {}
 
@@ -224,40 +249,194 @@ def get_algoritmos(metodo, n_classes):
             max_iter=1000, random_state=RANDOM_STATE, class_weight='balanced'
         )
         algos['SVC'] = SVC(
-            kernel='rbf', probability=True, random_state=RANDOM_STATE,
+            kernel='rbf', probability=SVC_PROBABILIDADE, random_state=RANDOM_STATE,
             class_weight='balanced'
         )
         algos['Random Forest'] = RandomForestClassifier(
-            n_estimators=100, random_state=RANDOM_STATE, class_weight='balanced'
+            n_estimators=100, random_state=RANDOM_STATE, class_weight='balanced',
+            n_jobs=n_threads
         )
         # KNN não tem class_weight — não incluir no método B
         # XGBoost: para multiclasse, usar sample_weight no fit()
         algos['XGBoost'] = XGBClassifier(
             n_estimators=100, random_state=RANDOM_STATE,
             eval_metric='mlogloss' if n_classes > 2 else 'logloss',
-            use_label_encoder=False
+            use_label_encoder=False, n_jobs=n_threads
         )
+        if INCLUIR_ALMMO:
+            algos['ALMMo-0 v9']  = ALMMoBenchmark('v9', n_classes, cost_sensitive=True)
+            algos['ALMMo-0 HIL'] = ALMMoBenchmark('hil', n_classes, cost_sensitive=True)
     else:
         # Métodos A, C, D, E — algoritmos com configuração padrão
         algos['LogReg'] = LogisticRegression(
             max_iter=1000, random_state=RANDOM_STATE
         )
         algos['SVC'] = SVC(
-            kernel='rbf', probability=True, random_state=RANDOM_STATE
+            kernel='rbf', probability=SVC_PROBABILIDADE, random_state=RANDOM_STATE
         )
         algos['Random Forest'] = RandomForestClassifier(
-            n_estimators=100, random_state=RANDOM_STATE
+            n_estimators=100, random_state=RANDOM_STATE, n_jobs=n_threads
         )
         algos['KNN'] = KNeighborsClassifier(n_neighbors=5)
         algos['XGBoost'] = XGBClassifier(
             n_estimators=100, random_state=RANDOM_STATE,
             eval_metric='mlogloss' if n_classes > 2 else 'logloss',
-            use_label_encoder=False
+            use_label_encoder=False, n_jobs=n_threads
         )
 
     return algos
 
 
+class ALMMoBenchmark:
+    """
+    ALMMo-0 com a interface fit/predict dos outros algoritmos.
+
+    variante 'v9' : prediz com cold_start_v9.ALMMo0 (pesos 1/d²)
+    variante 'hil': mesma base de regras servida por C_Rasp/almmo0.py
+                    (activação de Cauchy) — o que corre no Pi
+    estado        : dict de regras/normalização, o formato do pkl do Pi
+    """
+
+    def __init__(self, variante, n_classes, cost_sensitive=False,
+                 r_threshold=ALMMO_R, max_rules=ALMMO_MAX_RULES):
+        self.variante       = variante
+        self.n_classes      = n_classes
+        self.cost_sensitive = cost_sensitive
+        self.r_threshold    = r_threshold
+        self.max_rules      = max_rules
+        self.estado         = None
+
+    def fit(self, X, y, sample_weight=None):
+        y = np.asarray(y).astype(int)
+        cw = None
+        if self.cost_sensitive:
+            # Mesmos pesos do cold start v9: total / (k · n_c), C0 = 1
+            counts = np.maximum(np.bincount(y, minlength=self.n_classes), 1)
+            cw = len(y) / (self.n_classes * counts)
+            cw = cw / cw[0]
+        m = ALMMo0V9(n_inputs=X.shape[1], r_threshold=self.r_threshold,
+                     max_rules=self.max_rules, n_classes=self.n_classes,
+                     class_weights=cw)
+        m.cold_start(np.asarray(X), y)
+        self.estado = dict(vars(m))
+        self._m = m if self.variante == 'v9' else ALMMo0HIL(pickle.loads(pickle.dumps(self.estado)))
+        return self
+
+    def predict(self, X):
+        return np.array([self._m.predict(x) for x in X], dtype=int)
+
+
+# ========================================================================
+# INFERÊNCIA NA BORDA (latência, throughput, memória, carga a frio)
+# ========================================================================
+
+# Executado num processo Python novo: mede a carga a frio (imports +
+# unpickle + 1ª predição), p50/p99 de uma amostra, throughput em lote e
+# o pico de RSS do processo. O pico vem de VmHWM em /proc/self/status,
+# que recomeça no exec: ru_maxrss (getrusage) herda o máximo do processo
+# pai através do fork e mediria o benchmark, não o modelo. Sem /proc
+# (fora de Linux) o pico fica em falta.
+_SCRIPT_EDGE = r"""
+import sys, time, json
+t0 = time.perf_counter()
+import pickle
+import numpy as np
+caminho, caminho_X, tipo, pasta_hil, n_lat = sys.argv[1:6]
+with open(caminho, 'rb') as f:
+    obj = pickle.load(f)
+X = np.load(caminho_X)
+if tipo == 'almmo':
+    sys.path.insert(0, pasta_hil)
+    from almmo0 import ALMMo0
+    m = ALMMo0(obj)
+    um = m.predict
+    lote = lambda X: [m.predict(x) for x in X]
+else:
+    um = lambda x: obj.predict(x.reshape(1, -1))
+    lote = obj.predict
+um(X[0])
+t_carga = time.perf_counter() - t0
+
+lat = np.empty(int(n_lat))
+for i in range(len(lat)):
+    x = X[i % len(X)]
+    t = time.perf_counter_ns()
+    um(x)
+    lat[i] = (time.perf_counter_ns() - t) / 1e6
+t = time.perf_counter()
+lote(X)
+t_lote = time.perf_counter() - t
+
+rss = None
+try:
+    with open('/proc/self/status') as f:
+        for linha in f:
+            if linha.startswith('VmHWM:'):
+                rss = int(linha.split()[1]) / 1024   # kB -> MiB
+                break
+except OSError:
+    pass
+print(json.dumps({'lat_p50_ms': float(np.percentile(lat, 50)),
+                  'lat_p99_ms': float(np.percentile(lat, 99)),
+                  'throughput_amostras_s': len(X) / t_lote if t_lote > 0 else None,
+                  'tempo_carga_s': t_carga, 'pico_rss_mb': rss}))
+"""
+
+
+def artefacto_edge(modelo):
+    """
+    (bytes serializados, tipo) do modelo tal como seria levado para o Pi,
+    ou None se não for medido.
+
+    ALMMo-0 v9 não é medido: o seu runtime é o cold_start_v9.py de treino
+    (importa pandas, sklearn e matplotlib), que não vai para o Pi; servir
+    as mesmas regras no Pi é a linha 'ALMMo-0 HIL'.
+    """
+    if isinstance(modelo, ALMMoBenchmark):
+        if modelo.variante != 'hil':
+            return None
+        return pickle.dumps(modelo.estado), 'almmo'
+    if 'n_jobs' in modelo.get_params():
+        modelo.set_params(n_jobs=1)   # o Pi serve uma predição de cada vez
+    return pickle.dumps(modelo), 'sklearn'
+
+
+def medir_edge(artefacto, tipo, X_test, n_latencia=N_LATENCIA):
+    """
+    Mede um modelo serializado num processo novo.
+    Retorna dict com tamanho_kb, tempo_carga_s, lat_p50_ms, lat_p99_ms,
+    throughput_amostras_s e pico_rss_mb (ou 'erro_edge').
+    """
+    medidas = {'tamanho_kb': round(len(artefacto) / 1024, 1)}
+    env = dict(os.environ, OMP_NUM_THREADS=str(EDGE_THREADS),
+               OPENBLAS_NUM_THREADS=str(EDGE_THREADS), MKL_NUM_THREADS=str(EDGE_THREADS))
+    with tempfile.TemporaryDirectory() as tmp:
+        caminho, caminho_X = os.path.join(tmp, 'modelo.pkl'), os.path.join(tmp, 'X.npy')
+        with open(caminho, 'wb') as f:
+            f.write(artefacto)
+        np.save(caminho_X, np.ascontiguousarray(X_test))
+        try:
+            proc = subprocess.run(
+                [sys.executable, '-c', _SCRIPT_EDGE, caminho, caminho_X, tipo,
+                 PASTA_HIL, str(n_latencia)],
+                capture_output=True, text=True, timeout=600, env=env)
+            saida = json.loads(proc.stdout.strip().splitlines()[-1])
+        except (subprocess.SubprocessError, ValueError, IndexError) as e:
+            medidas['erro_edge'] = str(e) or 'sem saída'
+            return medidas
+
+    medidas.update({k: round(v, 4) if v is not None else None for k, v in saida.items()})
+    return medidas
+
+
+def dentro_orcamento(linha, orcamento=ORCAMENTO_EDGE):
+    """True se todas as medidas disponíveis cabem no orçamento do Pi."""
+    valores = [linha.get(k) for k in orcamento]
+    if any(v is None or (isinstance(v, float) and np.isnan(v)) for v in valores):
+        return None
+    return all(v <= limite for v, limite in zip(valores, orcamento.values()))
+
+
 # ========================================================================
 # FUNÇÃO DE AVALIAÇÃO
 # ========================================================================
@@ -313,10 +492,34 @@ def avaliar(y_test, y_pred, nome, n_classes):
 # PIPELINE PRINCIPAL
 # ========================================================================
 
-def executar_benchmark_dataset(df, dataset_nome, n_classes):
+METODO_NOMES = {
+    'A': 'Baseline',
+    'B': 'Cost-Sensitive',
+    'C': 'SMOTE Parcial 15%',
+    'D': 'SMOTE Integral',
+    'E': 'ADASYN'
+}
+
+# Custo relativo aproximado do fit — os jobs mais lentos são submetidos
+# primeiro, para o tempo total ficar perto do fit mais lento
+CUSTO_ALGO = {'SVC': 4, 'Random Forest': 3, 'XGBoost': 3, 'ALMMo-0 v9': 2,
+              'ALMMo-0 HIL': 2, 'LogReg': 1, 'KNN': 0}
+
+COLUNAS_CSV = [
+    'nome', 'dataset', 'n_classes', 'metodo', 'metodo_nome', 'algoritmo',
+    'f1_macro', 'f1_weighted', 'recall_c0', 'recall_c1', 'recall_c2',
+    'precision_c1', 'mae_ordinal', 'erros_adj_pct', 'confusion_matrix',
+    'dist_pos_resample', 'adasyn_fallback', 'delta_almmo_baseline',
+    'tempo_fit_s', 'tempo_predict_s', 'tempo_s', 'n_threads',
+    'lat_p50_ms', 'lat_p99_ms', 'throughput_amostras_s', 'tamanho_kb',
+    'tempo_carga_s', 'pico_rss_mb', 'dentro_orcamento_edge', 'erro',
+]
+
+
+def preparar_dataset(df, dataset_nome, n_classes):
     """
-    Executa todos os algoritmos × todos os métodos para um dataset.
-    Retorna lista de dicionários com resultados.
+    Split, normalização e reamostragem (cache) de um dataset.
+    Retorna dict metodo → {X_tr, y_tr, X_test, y_test, n_classes, dist, fallback}.
     """
     print(f"\n{'='*70}")
     print(f"DATASET: {dataset_nome} ({n_classes} classes)")
@@ -334,248 +537,352 @@ def executar_benchmark_dataset(df, dataset_nome, n_classes):
     # Normalizar
     X_train_norm, X_test_norm = normalizar(X_train, X_test)
 
-    resultados = []
-    metodos = ['A', 'B', 'C', 'D', 'E']
-    metodo_nomes = {
-        'A': 'Baseline',
-        'B': 'Cost-Sensitive',
-        'C': 'SMOTE Parcial 15%',
-        'D': 'SMOTE Integral',
-        'E': 'ADASYN'
-    }
-
-    adasyn_fallbacks = {}
-
-    for metodo in metodos:
-        print(f"\n  --- Método {metodo}: {metodo_nomes[metodo]} ---")
-
+    dados = {}
+    for metodo, metodo_nome in METODO_NOMES.items():
+        fallback = False
         # Preparar dados de treino conforme o método
         if metodo in ['A', 'B']:
-            X_tr, y_tr = X_train_norm.copy(), y_train.copy()
-            dist_pos_resample = None
+            X_tr, y_tr = X_train_norm, y_train
         elif metodo == 'C':
-            X_tr, y_tr = smote_parcial(X_train_norm, y_train)
-            dist_pos_resample = dict(Counter(y_tr))
-            print(f"    Distribuição pós-SMOTE parcial: {dist_pos_resample}")
+            X_tr, y_tr = reamostrar(smote_parcial, X_train_norm, y_train)
         elif metodo == 'D':
-            X_tr, y_tr = smote_integral(X_train_norm, y_train)
-            dist_pos_resample = dict(Counter(y_tr))
-            print(f"    Distribuição pós-SMOTE integral: {dist_pos_resample}")
+            X_tr, y_tr = reamostrar(smote_integral, X_train_norm, y_train)
         elif metodo == 'E':
-            (X_tr, y_tr), fallback = adasyn_resample(X_train_norm, y_train)
-            dist_pos_resample = dict(Counter(y_tr))
-            adasyn_fallbacks[dataset_nome] = fallback
-            print(f"    Distribuição pós-ADASYN: {dist_pos_resample}")
-            if fallback:
-                print(f"    ⚠ ADASYN usou fallback para SMOTE integral")
+            X_tr, y_tr, info = reamostrar(_adasyn_com_info, X_train_norm, y_train,
+                                          com_info=True)
+            fallback = info.get('fallback', False)
 
-        # Obter algoritmos para este método
-        algos = get_algoritmos(metodo, n_classes)
+        dist = dict(Counter(y_tr)) if metodo not in ['A', 'B'] else None
+        if dist:
+            print(f"  Método {metodo} ({metodo_nome}): distribuição pós-reamostragem {dist}")
+        if fallback:
+            print(f"    ⚠ ADASYN usou fallback para SMOTE integral")
 
-        for algo_nome, modelo in algos.items():
-            t0 = time.time()
-            nome_completo = f"{algo_nome}_{metodo}_{dataset_nome}"
+        dados[metodo] = {'X_tr': X_tr, 'y_tr': y_tr, 'X_test': X_test_norm,
+                         'y_test': y_test, 'n_classes': n_classes,
+                         'dist': dist, 'fallback': fallback}
+    return dados
 
-            try:
-                # Fit com sample_weight para XGBoost Cost-Sensitive
-                if metodo == 'B' and algo_nome == 'XGBoost':
-                    sw = compute_sample_weight('balanced', y_tr)
-                    modelo.fit(X_tr, y_tr, sample_weight=sw)
-                else:
-                    modelo.fit(X_tr, y_tr)
-
-                y_pred = modelo.predict(X_test_norm)
-                resultado = avaliar(y_test, y_pred, nome_completo, n_classes)
-                resultado['algoritmo'] = algo_nome
-                resultado['metodo'] = metodo
-                resultado['metodo_nome'] = metodo_nomes[metodo]
-                resultado['dataset'] = dataset_nome
-                resultado['n_classes'] = n_classes
-                resultado['dist_pos_resample'] = str(dist_pos_resample) if dist_pos_resample else 'N/A'
-                resultado['adasyn_fallback'] = adasyn_fallbacks.get(dataset_nome, False) if metodo == 'E' else False
-                resultado['tempo_s'] = round(time.time() - t0, 2)
-
-                delta_ref = 0.543 if dataset_nome == 'v7' else 0.644  # ref por cenário
-                delta_almmo = resultado['f1_macro'] - delta_ref
-                resultado['delta_almmo_baseline'] = round(delta_almmo, 4)
-
-                print(f"    {algo_nome:15s} | F1-macro={resultado['f1_macro']:.4f} "
-                      f"| Δ ALMMo-0={delta_almmo:+.4f} | {resultado['tempo_s']:.1f}s")
-
-                resultados.append(resultado)
 
+_DADOS = {}   # (dataset, metodo) → dados de treino/teste, um por worker
+
+
+def _iniciar_worker(dados):
+    _DADOS.clear()
+    _DADOS.update(dados)
+
+
+def executar_fit(dataset_nome, metodo, algo_nome, n_threads=1, edge=False):
+    """
+    Um job do benchmark: fit + predict + métricas de um algoritmo.
+    edge=True devolve também o modelo serializado: (resultado, (bytes, tipo)).
+    """
+    d = _DADOS[(dataset_nome, metodo)]
+    nome_completo = f"{algo_nome}_{metodo}_{dataset_nome}"
+    linha = {
+        'nome': nome_completo,
+        'algoritmo': algo_nome,
+        'metodo': metodo,
+        'metodo_nome': METODO_NOMES[metodo],
+        'dataset': dataset_nome,
+        'n_classes': d['n_classes'],
+        'n_threads': n_threads,
+    }
+    try:
+        modelo = get_algoritmos(metodo, d['n_classes'], n_threads)[algo_nome]
+
+        # Fit com sample_weight para XGBoost Cost-Sensitive
+        t0 = time.perf_counter()
+        if metodo == 'B' and algo_nome == 'XGBoost':
+            sw = compute_sample_weight('balanced', d['y_tr'])
+            modelo.fit(d['X_tr'], d['y_tr'], sample_weight=sw)
+        else:
+            modelo.fit(d['X_tr'], d['y_tr'])
+        t_fit = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        y_pred = modelo.predict(d['X_test'])
+        t_pred = time.perf_counter() - t0
+
+        resultado = avaliar(d['y_test'], y_pred, nome_completo, d['n_classes'])
+        resultado.update(linha)
+        resultado['dist_pos_resample'] = str(d['dist']) if d['dist'] else 'N/A'
+        resultado['adasyn_fallback'] = d['fallback'] if metodo == 'E' else False
+        resultado['tempo_fit_s'] = round(t_fit, 3)
+        resultado['tempo_predict_s'] = round(t_pred, 4)
+        resultado['tempo_s'] = round(t_fit + t_pred, 2)
+
+        delta_ref = 0.543 if dataset_nome == 'v7' else 0.644  # ref por cenário
+        resultado['delta_almmo_baseline'] = round(resultado['f1_macro'] - delta_ref, 4)
+        return (resultado, artefacto_edge(modelo)) if edge else resultado
+
+    except Exception as e:
+        resultado = dict(linha, f1_macro=None, erro=str(e))
+        return (resultado, None) if edge else resultado
+
+
+class _CSVIncremental:
+    """Escreve cada resultado em CSV_RESULTADOS assim que o job termina."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self._f = open(caminho, 'w', newline='', encoding='utf-8')
+        self._w = csv.DictWriter(self._f, fieldnames=COLUNAS_CSV, extrasaction='ignore')
+        self._w.writeheader()
+        self._f.flush()
+
+    def escrever(self, linha):
+        self._w.writerow(linha)
+        self._f.flush()
+
+    def fechar(self):
+        self._f.close()
+
+
+def executar_benchmark(datasets, csv_path=CSV_RESULTADOS, n_nucleos=N_NUCLEOS,
+                       edge=MEDIR_EDGE):
+    """
+    Executa a matriz dataset × método × algoritmo num pool de processos.
+
+    datasets : dict nome → {'df': DataFrame, 'n_classes': 2 ou 3}
+    csv_path : CSV incremental (reescrito a cada execução); None = sem ficheiro
+
+    Os dados (split normalizado + reamostragens) são preparados uma vez no
+    processo principal e enviados aos workers no arranque. Cada fit é um
+    job; o orçamento de núcleos é dividido entre jobs em paralelo e threads
+    internas dos modelos. As linhas vão para o CSV à medida que terminam.
+
+    Com edge, cada modelo treinado é depois medido em série, num
+    processo novo (medir_edge) — fora do pool, para a latência não ser
+    medida com os núcleos ocupados por outros fits.
+
+    Retorna lista de dicionários com resultados (ordem da matriz).
+    """
+    dados = {}
+    jobs = []
+    for ds_nome, config in datasets.items():
+        por_metodo = preparar_dataset(config['df'], ds_nome, config['n_classes'])
+        for metodo, d in por_metodo.items():
+            dados[(ds_nome, metodo)] = d
+            for algo_nome in get_algoritmos(metodo, config['n_classes']):
+                jobs.append((ds_nome, metodo, algo_nome))
+
+    # Orçamento de núcleos: jobs em paralelo × threads por modelo
+    nucleos   = n_nucleos or os.cpu_count() or 1
+    n_workers = max(1, min(nucleos, len(jobs)))
+    n_threads = max(1, nucleos // n_workers)
+    print(f"\n  {len(jobs)} fits | {n_workers} em paralelo × {n_threads} thread(s) por modelo")
+
+    ordem = {job: i for i, job in enumerate(jobs)}
+    por_custo = sorted(jobs, key=lambda j: -CUSTO_ALGO.get(j[2], 1))
+    resultados = {}
+    artefactos = {}
+    saida = _CSVIncremental(csv_path) if csv_path else None
+
+    def _concluir(job, resultado):
+        if edge:
+            resultado, artefactos[job] = resultado
+        resultados[job] = resultado
+        if saida is not None:
+            saida.escrever(resultado)
+        if resultado.get('f1_macro') is None:
+            print(f"    {resultado['nome']:32s} | ERRO: {resultado.get('erro')}")
+        else:
+            print(f"    {resultado['nome']:32s} | F1-macro={resultado['f1_macro']:.4f} "
+                  f"| Δ ALMMo-0={resultado['delta_almmo_baseline']:+.4f} "
+                  f"| fit {resultado['tempo_fit_s']:.2f}s | predict {resultado['tempo_predict_s']:.3f}s")
+
+    t0 = time.time()
+    em_serie = por_custo
+    try:
+        if n_workers > 1:
+            try:
+                with ProcessPoolExecutor(max_workers=n_workers, initializer=_iniciar_worker,
+                                         initargs=(dados,)) as pool:
+                    futuros = {pool.submit(executar_fit, *job, n_threads, edge): job for job in por_custo}
+                    for fut in as_completed(futuros):
+                        _concluir(futuros[fut], fut.result())
+                    em_serie = []
             except Exception as e:
-                print(f"    {algo_nome:15s} | ERRO: {e}")
-                resultados.append({
-                    'nome': nome_completo,
-                    'algoritmo': algo_nome,
-                    'metodo': metodo,
-                    'metodo_nome': metodo_nomes[metodo],
-                    'dataset': dataset_nome,
-                    'n_classes': n_classes,
-                    'f1_macro': None,
-                    'erro': str(e),
-                })
+                # Pool indisponível — seguir em série com os jobs por fazer
+                print(f"  ⚠ pool indisponível ({e}) — fits em série")
+                em_serie = [job for job in por_custo if job not in resultados]
+
+        if em_serie:
+            _iniciar_worker(dados)
+            for job in em_serie:
+                _concluir(job, executar_fit(*job, n_threads=nucleos, edge=edge))
+    finally:
+        if saida is not None:
+            saida.fechar()
+
+    print(f"  Matriz concluída em {time.time() - t0:.1f}s")
+
+    medidos = [job for job in jobs if artefactos.get(job)]
+    if medidos:
+        print(f"\n  Inferência na borda: {len(medidos)} modelos "
+              f"({EDGE_THREADS} thread(s), {N_LATENCIA} predições de 1 amostra)")
+        t0 = time.time()
+        for job in medidos:
+            r = resultados[job]
+            r.update(medir_edge(*artefactos[job], dados[job[:2]]['X_test']))
+            r['dentro_orcamento_edge'] = dentro_orcamento(r)
+            if 'erro_edge' in r:
+                print(f"    {r['nome']:32s} | ERRO edge: {r['erro_edge']}")
+            else:
+                print(f"    {r['nome']:32s} | p50 {r['lat_p50_ms']:.3f}ms | p99 {r['lat_p99_ms']:.3f}ms "
+                      f"| {r['tamanho_kb']:.0f} KiB | RSS {r['pico_rss_mb'] or float('nan'):.0f} MiB "
+                      f"| carga {r['tempo_carga_s']:.2f}s")
+        print(f"  Medição concluída em {time.time() - t0:.1f}s")
+    return [resultados[job] for job in sorted(resultados, key=ordem.get)]
+
+
+def executar_benchmark_dataset(df, dataset_nome, n_classes, csv_path=None):
+    """
+    Executa todos os algoritmos × todos os métodos para um dataset.
+    Retorna lista de dicionários com resultados.
+
+    Sem CSV incremental por omissão — não reescreve o CSV_RESULTADOS da
+    matriz completa; passar csv_path para gravar.
+    """
+    return executar_benchmark({dataset_nome: {'df': df, 'n_classes': n_classes}},
+                              csv_path=csv_path)
 
-    return resultados
 
 
 # ========================================================================
 # GERAÇÃO DE GRÁFICOS
 # ========================================================================
 
-def gerar_graficos(df_resultados, output_dir='.'):
-    """Gera os 4 gráficos obrigatórios."""
-    print(f"\n{'='*70}")
-    print("GERANDO GRÁFICOS")
-    print(f"{'='*70}")
+# Cores por algoritmo
+CORES_ALGO = {
+    'LogReg': '#2196F3',
+    'SVC': '#4CAF50',
+    'Random Forest': '#FF9800',
+    'KNN': '#9C27B0',
+    'XGBoost': '#F44336',
+    'ALMMo-0': '#000000',
+}
 
-    # Filtrar resultados válidos
-    df_valid = df_resultados.dropna(subset=['f1_macro']).copy()
 
-    # Cores por algoritmo
-    cores_algo = {
-        'LogReg': '#2196F3',
-        'SVC': '#4CAF50',
-        'Random Forest': '#FF9800',
-        'KNN': '#9C27B0',
-        'XGBoost': '#F44336',
-        'ALMMo-0': '#000000',
-    }
+def _grafico1_ranking(caminho, df_ds, ds):
+    """Gráfico 1: ranking F1-macro de um dataset."""
+    df_ds = df_ds.sort_values('f1_macro', ascending=True).copy()
+    df_ds['label'] = df_ds['algoritmo'] + ' (' + df_ds['metodo'] + ')'
+
+    # Referências ALMMo-0 para este dataset
+    if ds == 'v7':
+        ref_baseline = 0.543
+        ref_melhor = 0.598
+        ref_aleatorio = 0.333
+    else:  # v7_bin
+        ref_baseline = 0.644  # ALMMo-0 binário Cost-Sensitive
+        ref_melhor = 0.644
+        ref_aleatorio = 0.500
+
+    fig, ax = plt.subplots(figsize=(12, max(6, len(df_ds) * 0.35)))
+    bars = ax.barh(
+        range(len(df_ds)),
+        df_ds['f1_macro'].values,
+        color=[CORES_ALGO.get(a, '#888') for a in df_ds['algoritmo']],
+        alpha=0.8,
+        height=0.7
+    )
+    ax.set_yticks(range(len(df_ds)))
+    ax.set_yticklabels(df_ds['label'].values, fontsize=9)
+
+    # Linhas de referência
+    ax.axvline(ref_baseline, color='red', linestyle='--', linewidth=1.5,
+                label=f'ALMMo-0 baseline ({ref_baseline})')
+    ax.axvline(ref_melhor, color='orange', linestyle='--', linewidth=1.5,
+                label=f'ALMMo-0 melhor ({ref_melhor})')
+    ax.axvline(ref_aleatorio, color='gray', linestyle=':', linewidth=1,
+                label=f'Aleatório ({ref_aleatorio})')
+
+    # Valores nas barras
+    for i, v in enumerate(df_ds['f1_macro'].values):
+        ax.text(v + 0.005, i, f'{v:.3f}', va='center', fontsize=8)
+
+    ax.set_xlabel('F1-macro', fontsize=11)
+    ax.set_title(f'Ranking F1-macro — Dataset {ds.upper()}', fontsize=13, fontweight='bold')
+    ax.legend(loc='lower right', fontsize=9)
+    ax.set_xlim(0, min(1.0, df_ds['f1_macro'].max() + 0.08))
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150, bbox_inches='tight')
+    plt.close()
 
-    # ------------------------------------------------------------------
-    # GRÁFICO 1: Ranking geral por dataset
-    # ------------------------------------------------------------------
-    for ds in df_valid['dataset'].unique():
-        df_ds = df_valid[df_valid['dataset'] == ds].copy()
-        df_ds = df_ds.sort_values('f1_macro', ascending=True)
-        df_ds['label'] = df_ds['algoritmo'] + ' (' + df_ds['metodo'] + ')'
 
-        # Referências ALMMo-0 para este dataset
-        if ds == 'v7':
-            ref_baseline = 0.543
-            ref_melhor = 0.598
-            ref_aleatorio = 0.333
-        else:  # v7_bin
-            ref_baseline = 0.644  # ALMMo-0 binário Cost-Sensitive
-            ref_melhor = 0.644
-            ref_aleatorio = 0.500
-
-        fig, ax = plt.subplots(figsize=(12, max(6, len(df_ds) * 0.35)))
-        bars = ax.barh(
-            range(len(df_ds)),
-            df_ds['f1_macro'].values,
-            color=[cores_algo.get(a, '#888') for a in df_ds['algoritmo']],
-            alpha=0.8,
-            height=0.7
-        )
-        ax.set_yticks(range(len(df_ds)))
-        ax.set_yticklabels(df_ds['label'].values, fontsize=9)
-
-        # Linhas de referência
-        ax.axvline(ref_baseline, color='red', linestyle='--', linewidth=1.5,
-                    label=f'ALMMo-0 baseline ({ref_baseline})')
-        ax.axvline(ref_melhor, color='orange', linestyle='--', linewidth=1.5,
-                    label=f'ALMMo-0 melhor ({ref_melhor})')
-        ax.axvline(ref_aleatorio, color='gray', linestyle=':', linewidth=1,
-                    label=f'Aleatório ({ref_aleatorio})')
-
-        # Valores nas barras
-        for i, v in enumerate(df_ds['f1_macro'].values):
-            ax.text(v + 0.005, i, f'{v:.3f}', va='center', fontsize=8)
-
-        ax.set_xlabel('F1-macro', fontsize=11)
-        ax.set_title(f'Ranking F1-macro — Dataset {ds.upper()}', fontsize=13, fontweight='bold')
-        ax.legend(loc='lower right', fontsize=9)
-        ax.set_xlim(0, min(1.0, df_ds['f1_macro'].max() + 0.08))
-        plt.tight_layout()
-        path = os.path.join(output_dir, f'grafico1_ranking_{ds}.png')
-        plt.savefig(path, dpi=150, bbox_inches='tight')
-        plt.close()
-        print(f"  ✓ {path}")
-
-    # ------------------------------------------------------------------
-    # GRÁFICO 2: Heatmap F1-macro (algoritmo × tratamento) por dataset
-    # ------------------------------------------------------------------
-    for ds in df_valid['dataset'].unique():
-        df_ds = df_valid[df_valid['dataset'] == ds]
-        pivot = df_ds.pivot_table(
-            index='algoritmo', columns='metodo', values='f1_macro', aggfunc='first'
+def _grafico2_heatmap(caminho, df_ds, ds):
+    """Gráfico 2: heatmap F1-macro (algoritmo × tratamento) de um dataset."""
+    pivot = df_ds.pivot_table(
+        index='algoritmo', columns='metodo', values='f1_macro', aggfunc='first'
+    )
+    # Ordenar colunas
+    cols_order = [c for c in ['A', 'B', 'C', 'D', 'E'] if c in pivot.columns]
+    pivot = pivot[cols_order]
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    sns.heatmap(
+        pivot, annot=True, fmt='.3f', cmap='YlOrRd',
+        linewidths=0.5, ax=ax, vmin=0.3, vmax=0.8,
+        cbar_kws={'label': 'F1-macro'}
+    )
+    ax.set_title(f'Heatmap F1-macro — Dataset {ds.upper()}', fontsize=13, fontweight='bold')
+    ax.set_xlabel('Método de Tratamento')
+    ax.set_ylabel('Algoritmo')
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150, bbox_inches='tight')
+    plt.close()
+
+
+def _grafico3_tradeoff(caminho, df_ds, ds):
+    """Gráfico 3: trade-off Recall C0 vs Recall C1+C2 (só 3 classes)."""
+    df_ds = df_ds.copy()
+    df_ds['recall_c1_c2_mean'] = df_ds.apply(
+        lambda r: np.nanmean([
+            r['recall_c1'] if r['recall_c1'] is not None else np.nan,
+            r['recall_c2'] if r['recall_c2'] is not None else np.nan
+        ]), axis=1
+    )
+
+    fig, ax = plt.subplots(figsize=(10, 8))
+
+    for _, row in df_ds.iterrows():
+        ax.scatter(
+            row['recall_c0'], row['recall_c1_c2_mean'],
+            color=CORES_ALGO.get(row['algoritmo'], '#888'),
+            s=80, alpha=0.7, edgecolors='black', linewidth=0.5
         )
-        # Ordenar colunas
-        cols_order = [c for c in ['A', 'B', 'C', 'D', 'E'] if c in pivot.columns]
-        pivot = pivot[cols_order]
-
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.heatmap(
-            pivot, annot=True, fmt='.3f', cmap='YlOrRd',
-            linewidths=0.5, ax=ax, vmin=0.3, vmax=0.8,
-            cbar_kws={'label': 'F1-macro'}
+        ax.annotate(
+            f"{row['algoritmo']}({row['metodo']})",
+            (row['recall_c0'], row['recall_c1_c2_mean']),
+            fontsize=7, alpha=0.8,
+            xytext=(5, 5), textcoords='offset points'
         )
-        ax.set_title(f'Heatmap F1-macro — Dataset {ds.upper()}', fontsize=13, fontweight='bold')
-        ax.set_xlabel('Método de Tratamento')
-        ax.set_ylabel('Algoritmo')
-        plt.tight_layout()
-        path = os.path.join(output_dir, f'grafico2_heatmap_{ds}.png')
-        plt.savefig(path, dpi=150, bbox_inches='tight')
-        plt.close()
-        print(f"  ✓ {path}")
-
-    # ------------------------------------------------------------------
-    # GRÁFICO 3: Trade-off Recall C0 vs Recall C1+C2 (só 3 classes)
-    # ------------------------------------------------------------------
-    for ds in ['v7']:  # Trade-off C0 vs C1+C2 só faz sentido com 3 classes
-        df_ds = df_valid[(df_valid['dataset'] == ds) & (df_valid['n_classes'] == 3)].copy()
-        if df_ds.empty:
-            continue
 
-        df_ds['recall_c1_c2_mean'] = df_ds.apply(
-            lambda r: np.nanmean([
-                r['recall_c1'] if r['recall_c1'] is not None else np.nan,
-                r['recall_c2'] if r['recall_c2'] is not None else np.nan
-            ]), axis=1
-        )
+    # ALMMo-0 referência
+    if ds == 'v7':
+        almmo_c0 = 0.771
+        almmo_c1c2 = np.mean([0.341, 0.762])
+        ax.scatter(almmo_c0, almmo_c1c2, color='black', s=150,
+                   marker='*', zorder=5, label='ALMMo-0 v7 baseline')
 
-        fig, ax = plt.subplots(figsize=(10, 8))
+    ax.set_xlabel('Recall C0 (Sem Irrigação)', fontsize=11)
+    ax.set_ylabel('Recall Médio C1+C2 (Irrigação)', fontsize=11)
+    ax.set_title(f'Trade-off Recall C0 vs C1+C2 — Dataset {ds.upper()}',
+                  fontsize=13, fontweight='bold')
+    ax.set_xlim(0, 1.05)
+    ax.set_ylim(0, 1.05)
+    ax.plot([0, 1], [0, 1], 'k--', alpha=0.2, label='Equilíbrio perfeito')
+    ax.legend(fontsize=9)
+    ax.grid(True, alpha=0.3)
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150, bbox_inches='tight')
+    plt.close()
 
-        for _, row in df_ds.iterrows():
-            ax.scatter(
-                row['recall_c0'], row['recall_c1_c2_mean'],
-                color=cores_algo.get(row['algoritmo'], '#888'),
-                s=80, alpha=0.7, edgecolors='black', linewidth=0.5
-            )
-            ax.annotate(
-                f"{row['algoritmo']}({row['metodo']})",
-                (row['recall_c0'], row['recall_c1_c2_mean']),
-                fontsize=7, alpha=0.8,
-                xytext=(5, 5), textcoords='offset points'
-            )
 
-        # ALMMo-0 referência
-        if ds == 'v7':
-            almmo_c0 = 0.771
-            almmo_c1c2 = np.mean([0.341, 0.762])
-            ax.scatter(almmo_c0, almmo_c1c2, color='black', s=150,
-                       marker='*', zorder=5, label='ALMMo-0 v7 baseline')
-
-        ax.set_xlabel('Recall C0 (Sem Irrigação)', fontsize=11)
-        ax.set_ylabel('Recall Médio C1+C2 (Irrigação)', fontsize=11)
-        ax.set_title(f'Trade-off Recall C0 vs C1+C2 — Dataset {ds.upper()}',
-                      fontsize=13, fontweight='bold')
-        ax.set_xlim(0, 1.05)
-        ax.set_ylim(0, 1.05)
-        ax.plot([0, 1], [0, 1], 'k--', alpha=0.2, label='Equilíbrio perfeito')
-        ax.legend(fontsize=9)
-        ax.grid(True, alpha=0.3)
-        plt.tight_layout()
-        path = os.path.join(output_dir, f'grafico3_tradeoff_{ds}.png')
-        plt.savefig(path, dpi=150, bbox_inches='tight')
-        plt.close()
-        print(f"  ✓ {path}")
-
-    # ------------------------------------------------------------------
-    # GRÁFICO 4: Comparação por dataset (melhor tratamento por algo)
-    # ------------------------------------------------------------------
+def _grafico4_comparacao(caminho, df_valid):
+    """Gráfico 4: comparação por dataset (melhor tratamento por algoritmo)."""
     melhor_por_algo_ds = df_valid.loc[
         df_valid.groupby(['algoritmo', 'dataset'])['f1_macro'].idxmax()
     ]
@@ -621,10 +928,49 @@ def gerar_graficos(df_resultados, output_dir='.'):
     ax.legend(fontsize=9, loc='upper left')
     ax.grid(axis='y', alpha=0.3)
     plt.tight_layout()
-    path = os.path.join(output_dir, 'grafico4_comparacao_datasets.png')
-    plt.savefig(path, dpi=150, bbox_inches='tight')
+    plt.savefig(caminho, dpi=150, bbox_inches='tight')
     plt.close()
-    print(f"  ✓ {path}")
+
+
+def gerar_graficos(df_resultados, output_dir='.'):
+    """
+    Gera os 4 gráficos obrigatórios.
+    Renderização em paralelo via servico_graficos — figuras cujos dados
+    não mudaram desde a última execução são reaproveitadas.
+    """
+    print(f"\n{'='*70}")
+    print("GERANDO GRÁFICOS")
+    print(f"{'='*70}")
+
+    # Filtrar resultados válidos
+    df_valid = df_resultados.dropna(subset=['f1_macro']).copy()
+    cols = ['dataset', 'algoritmo', 'metodo', 'n_classes', 'f1_macro',
+            'recall_c0', 'recall_c1', 'recall_c2']
+    df_valid = df_valid[[c for c in cols if c in df_valid.columns]]
+
+    specs = []
+    for ds in df_valid['dataset'].unique():
+        df_ds = df_valid[df_valid['dataset'] == ds]
+        specs.append(FiguraSpec(
+            _grafico1_ranking, os.path.join(output_dir, f'grafico1_ranking_{ds}.png'),
+            {'df_ds': df_ds[['algoritmo', 'metodo', 'f1_macro']], 'ds': ds}))
+        specs.append(FiguraSpec(
+            _grafico2_heatmap, os.path.join(output_dir, f'grafico2_heatmap_{ds}.png'),
+            {'df_ds': df_ds[['algoritmo', 'metodo', 'f1_macro']], 'ds': ds}))
+
+    for ds in ['v7']:  # Trade-off C0 vs C1+C2 só faz sentido com 3 classes
+        df_ds = df_valid[(df_valid['dataset'] == ds) & (df_valid['n_classes'] == 3)]
+        if df_ds.empty:
+            continue
+        specs.append(FiguraSpec(
+            _grafico3_tradeoff, os.path.join(output_dir, f'grafico3_tradeoff_{ds}.png'),
+            {'df_ds': df_ds, 'ds': ds}))
+
+    specs.append(FiguraSpec(
+        _grafico4_comparacao, os.path.join(output_dir, 'grafico4_comparacao_datasets.png'),
+        {'df_valid': df_valid[['algoritmo', 'dataset', 'f1_macro']]}))
+
+    renderizar_figuras(specs)
 
 
 # ========================================================================
@@ -705,6 +1051,10 @@ def gerar_relatorio(df_resultados, output_dir='.'):
     add("## 3. Diagnóstico")
     add()
 
+    # Diagnóstico e comparações só com os algoritmos clássicos
+    df_almmo = df[df['algoritmo'].str.startswith('ALMMo')]
+    df = df.drop(df_almmo.index)
+
     # Diagnóstico separado por cenário
     for ds_diag, ds_label, ref_almmo in [('v7', '3 classes', 0.598), ('v7_bin', 'binário', 0.644)]:
         df_diag = df[df['dataset'] == ds_diag]
@@ -827,8 +1177,44 @@ def gerar_relatorio(df_resultados, output_dir='.'):
     add("- `grafico4_comparacao_datasets.png` — Comparação v7 (3 classes) vs v7_bin (binário)")
     add()
 
+    # ---- Inferência na borda ----
+    df_edge = pd.concat([df, df_almmo])
+    if 'lat_p99_ms' in df_edge.columns and df_edge['lat_p99_ms'].notna().any():
+        orc = ORCAMENTO_EDGE
+        add("## 5. Inferência na Borda (Raspberry Pi)")
+        add()
+        add(f"Cada modelo foi serializado e medido num processo Python novo com "
+            f"{EDGE_THREADS} thread(s): latência de uma amostra ({N_LATENCIA} predições), ")
+        add("throughput em lote sobre o conjunto de teste, pico de RSS do processo (VmHWM), ")
+        add("tamanho do pkl e carga a frio (imports + unpickle + 1ª predição).")
+        add()
+        add(f"**Orçamento:** p99 ≤ {orc['lat_p99_ms']:.0f} ms | RSS ≤ {orc['pico_rss_mb']:.0f} MiB "
+            f"| pkl ≤ {orc['tamanho_kb']:.0f} KiB")
+        add()
+        for ds in sorted(df_edge['dataset'].unique()):
+            df_ds = df_edge[(df_edge['dataset'] == ds) & df_edge['lat_p99_ms'].notna()]
+            if df_ds.empty:
+                continue
+            add(f"### Dataset {ds}")
+            add()
+            add("| Algoritmo | Método | F1-macro | p50 (ms) | p99 (ms) | Amostras/s | pkl (KiB) | Carga (s) | RSS (MiB) | Orçamento |")
+            add("|---|:---:|:---:|:---:|:---:|:---:|:---:|:---:|:---:|:---:|")
+            for _, r in df_ds.sort_values(['lat_p99_ms']).iterrows():
+                ok = {True: '✓', False: '✗'}.get(r.get('dentro_orcamento_edge'), '—')
+                rss = f"{r['pico_rss_mb']:.0f}" if pd.notna(r.get('pico_rss_mb')) else '—'
+                add(f"| {r['algoritmo']} | {r['metodo']} | {r['f1_macro']:.4f} | "
+                    f"{r['lat_p50_ms']:.3f} | {r['lat_p99_ms']:.3f} | "
+                    f"{r['throughput_amostras_s']:.0f} | {r['tamanho_kb']:.1f} | "
+                    f"{r['tempo_carga_s']:.2f} | {rss} | {ok} |")
+            add()
+        add("ALMMo-0 HIL é medido com o runtime do Pi (C_Rasp/almmo0.py) sobre o dict de ")
+        add("regras do cold start v9. A linha v9 não entra nesta tabela: o seu runtime é o ")
+        add("script de treino (cold_start_v9.py), que não é levado para o Pi, e as suas ")
+        add("predições diferem das do runtime HIL.")
+        add()
+
     # ---- Notas técnicas ----
-    add("## 5. Notas Técnicas")
+    add("## 6. Notas Técnicas")
     add()
     add("- Split: Leave-Groups-Out com 6 grupos de teste (6, 10, 14, 18, 22, 28)")
     add("- Normalização: StandardScaler fitado no treino")
@@ -891,21 +1277,14 @@ def main():
         'v7_bin': {'df': df_v7_bin, 'n_classes': 2},
     }
 
-    # Executar benchmark para cada cenário
-    todos_resultados = []
-    for nome, config in datasets_disponiveis.items():
-        resultados = executar_benchmark_dataset(
-            config['df'], nome, config['n_classes']
-        )
-        todos_resultados.extend(resultados)
+    # Executar a matriz completa (todos os cenários num único pool);
+    # o CSV é escrito linha a linha à medida que cada fit termina
+    todos_resultados = executar_benchmark(datasets_disponiveis, CSV_RESULTADOS)
 
-    # Consolidar resultados
+    # Consolidar resultados (CSV final na ordem da matriz)
     df_resultados = pd.DataFrame(todos_resultados)
-
-    # Salvar CSV
-    csv_path = 'benchmark_resultados.csv'
-    df_resultados.to_csv(csv_path, index=False, encoding='utf-8')
-    print(f"\n✓ Resultados salvos em: {csv_path}")
+    df_resultados.to_csv(CSV_RESULTADOS, index=False, encoding='utf-8')
+    print(f"\n✓ Resultados salvos em: {CSV_RESULTADOS}")
 
     # Gerar gráficos
     gerar_graficos(df_resultados)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+============================================================================
+Cache de Reamostragem — datasets SMOTE/ADASYN/... calculados uma só vez
+============================================================================
+
+Partilhado por cold_start_v8.py (orquestrador), cold_start_v9.py e
+benchmark_script.py. Os métodos do imblearn (k-NN + interpolação) davam
+sempre o mesmo resultado para o mesmo split e a mesma semente, mas eram
+recalculados em cada execução.
+
+Chave = (hash do split X/y, método, parâmetros — posicionais e nomeados
+de um functools.partial —, versão do imblearn, VERSAO_CACHE). A semente
+não é parâmetro: cada método fixa o seu random_state (42) no código, que
+tal como o resto do corpo só entra na chave pela VERSAO_CACHE. Cada
+entrada fica em
+
+    cache_reamostragem/<chave>_X.npy   (mmap)
+    cache_reamostragem/<chave>_y.npy   (mmap)
+    cache_reamostragem/<chave>.json    metadados; escrito por último, marca
+                                       a entrada como completa
+
+Os arrays devolvidos são só de leitura (mapeados com mmap_mode='r'): indexação
+(X[idx]) cria cópias normais; quem precise de alterar in-place faz .copy().
+
+Uso:
+    from cache_reamostragem import reamostrar
+    X_res, y_res = reamostrar(strategy_smote, X_train, y_train)
+    X_res, y_res = reamostrar(partial(smote_parcial, target_ratio=0.15), X, y)
+============================================================================
+"""
+
+import os
+import json
+import hashlib
+from functools import partial
+
+import numpy as np
+
+PASTA_CACHE = 'cache_reamostragem'
+USAR_CACHE  = True
+# Subir ao mudar o código de algum método de reamostragem (incl. random_state)
+VERSAO_CACHE = 2
+
+
+def _versao_imblearn():
+    try:
+        import imblearn
+        return imblearn.__version__
+    except ImportError:
+        return None
+
+
+def _descrever(funcao):
+    """
+    (nome, parâmetros) de uma função ou functools.partial. Os argumentos
+    posicionais do partial ficam em params['args'].
+    """
+    params, args = {}, []
+    while isinstance(funcao, partial):
+        params = dict(funcao.keywords, **params)
+        args   = list(funcao.args) + args   # os do partial interior vêm primeiro
+        funcao = funcao.func
+    if args:
+        params['args'] = args
+    return f"{funcao.__module__}.{funcao.__qualname__}", params
+
+
+def hash_split(X, y):
+    """Hash dos arrays de treino (conteúdo, dtype e forma)."""
+    h = hashlib.sha1()
+    for v in (X, y):
+        v = np.ascontiguousarray(v)
+        h.update(f"{v.dtype}{v.shape}".encode())
+        h.update(v.tobytes())
+    return h.hexdigest()
+
+
+def chave_reamostragem(X, y, metodo, params=None):
+    txt = json.dumps([hash_split(X, y), metodo, params or {},
+                      _versao_imblearn(), VERSAO_CACHE], sort_keys=True, default=str)
+    return hashlib.sha1(txt.encode()).hexdigest()
+
+
+def _abrir(caminho):
+    """ndarray só de leitura mapeado no ficheiro (sem a subclasse np.memmap)."""
+    return np.asarray(np.load(caminho, mmap_mode='r'))
+
+
+def _guardar(caminho, arr):
+    tmp = f"{caminho}.tmp{os.getpid()}.npy"
+    np.save(tmp, np.ascontiguousarray(arr))
+    os.replace(tmp, caminho)
+
+
+def reamostrar(funcao, X, y, metodo=None, pasta=None, com_info=False):
+    """
+    Devolve funcao(X, y) da cache ou calcula e guarda.
+
+    Args:
+        funcao   : funcao(X, y) → (X_res, y_res) ou (X_res, y_res, info)
+                   (info: dict JSON-serializável, ex. {'fallback': True})
+        metodo   : nome na chave (None = módulo.nome da função)
+        com_info : também devolve info
+
+    Returns:
+        (X_res, y_res) ou (X_res, y_res, info)
+    """
+    nome, params = _descrever(funcao)
+    metodo = metodo or nome
+    pasta = pasta or PASTA_CACHE
+    chave = chave_reamostragem(X, y, metodo, params)
+    base  = os.path.join(pasta, chave)
+
+    if USAR_CACHE and os.path.exists(f"{base}.json"):
+        try:
+            with open(f"{base}.json", encoding='utf-8') as f:
+                meta = json.load(f)
+            X_res, y_res = _abrir(f"{base}_X.npy"), _abrir(f"{base}_y.npy")
+            return (X_res, y_res, meta['info']) if com_info else (X_res, y_res)
+        except (OSError, ValueError, KeyError):
+            pass   # entrada incompleta ou corrompida — recalcular
+
+    res = funcao(X, y)
+    X_res, y_res = res[0], res[1]
+    info = res[2] if len(res) > 2 else {}
+
+    if USAR_CACHE:
+        os.makedirs(pasta, exist_ok=True)
+        _guardar(f"{base}_X.npy", X_res)
+        _guardar(f"{base}_y.npy", y_res)
+        meta = {'metodo': metodo, 'params': params,
+                'n_entrada': int(len(y)), 'n_saida': int(len(y_res)), 'info': info}
+        tmp = f"{base}.json.tmp{os.getpid()}"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, indent=1, default=str)
+        os.replace(tmp, f"{base}.json")
+        X_res, y_res = _abrir(f"{base}_X.npy"), _abrir(f"{base}_y.npy")
+
+    return (X_res, y_res, info) if com_info else (X_res, y_res)
@@ -19,17 +19,24 @@
   
   Execução:
     python cold_start_v8.py
+
+  Cada célula (estratégia, r, mrpc) corre como tarefa independente num
+  pool de processos (orquestrador_experimentos.py) e fica guardada em
+  resultados_v8/ — re-execuções só calculam células novas.
 ============================================================================
 """
 
 import numpy as np
 import pandas as pd
 import os
+import io
 import time
+import contextlib
 import pickle
 import warnings
 from datetime import datetime
 from collections import Counter
+from functools import partial
 from sklearn.metrics import (
     classification_report, confusion_matrix,
     f1_score, accuracy_score, mean_absolute_error,
@@ -40,6 +47,13 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from servico_graficos import FiguraSpec, renderizar_figuras
+from cache_reamostragem import reamostrar
+from divisao_grupos import detectar_grupos, dividir, validacao_cruzada
+from orquestrador_experimentos import (
+    Experimento, ArmazemResultados, executar_experimentos, hash_base, chave_celula
+)
+
 warnings.filterwarnings('ignore')
 
 
@@ -71,9 +85,10 @@ class ALMMo0:
         self.n_rules_pruned  = 0
         self.created_at      = datetime.now().isoformat()
 
-    def fit_normalizer(self, X):
-        self.input_mean = np.mean(X, axis=0)
-        self.input_std  = np.std(X, axis=0)
+    def fit_normalizer(self, X, pesos=None):
+        # pesos: nº de apresentações de cada linha (ordem com repetições)
+        self.input_mean = np.average(X, axis=0, weights=pesos)
+        self.input_std  = np.sqrt(np.average((X - self.input_mean) ** 2, axis=0, weights=pesos))
         self.input_std[self.input_std < self.epsilon] = 1.0
 
     def normalize(self, x):
@@ -175,14 +190,20 @@ class ALMMo0:
         self.rules = surviving
         self.n_rules_pruned += n_before - len(self.rules)
 
-    def cold_start(self, X, y, verbose=False):
-        self.fit_normalizer(X)
+    def cold_start(self, X, y, verbose=False, ordem=None):
+        """
+        ordem: índices de apresentação (ex.: ordem_repeated_minority) — as
+        amostras são lidas de X por índice, sem materializar o dataset aumentado.
+        """
+        n = len(X) if ordem is None else len(ordem)
+        pesos = None if ordem is None else np.bincount(ordem, minlength=len(X))
+        self.fit_normalizer(X, pesos)
         history = []
-        for i in range(len(X)):
-            self.learn(X[i], int(y[i]))
+        for i, (x, yi) in enumerate(apresentar(X, y, ordem)):
+            self.learn(x, yi)
             history.append(len(self.rules))
-            if verbose and (i + 1) % max(1, len(X) // 10) == 0:
-                pct = 100 * (i + 1) / len(X)
+            if verbose and (i + 1) % max(1, n // 10) == 0:
+                pct = 100 * (i + 1) / n
                 dist = self.rules_by_class()
                 print(f"    {pct:3.0f}% | {len(self.rules)} regras | {dist}")
         return history
@@ -211,6 +232,12 @@ class ALMMo0:
 # HELPERS
 # ─────────────────────────────────────────────────────────────────────────────
 
+def apresentar(X, y, ordem=None):
+    """Gerador (x, y) pela ordem de apresentação, lido de X por índice."""
+    for j in (range(len(X)) if ordem is None else ordem):
+        yield X[j], int(y[j])
+
+
 def erros_adjacentes(y_true, y_pred):
     erros = y_true != y_pred
     if erros.sum() == 0:
@@ -231,6 +258,13 @@ def sep(title):
 def evaluate(model, X_test, y_test, label="", verbose=True):
     """Avalia modelo e retorna dicionário de métricas."""
     y_pred = np.array([model.predict(x) for x in X_test])
+    return avaliar_predicoes(y_test, y_pred, label, len(model.rules),
+                             model.rules_by_class(), verbose)
+
+
+def avaliar_predicoes(y_test, y_pred, label="", n_rules=0, rbc=None, verbose=True):
+    """Métricas a partir das predições (guardadas no armazém de resultados)."""
+    y_pred = np.asarray(y_pred)
     acc = accuracy_score(y_test, y_pred)
     f1m = f1_score(y_test, y_pred, average='macro', zero_division=0)
     f1w = f1_score(y_test, y_pred, average='weighted', zero_division=0)
@@ -241,7 +275,7 @@ def evaluate(model, X_test, y_test, label="", verbose=True):
     cm = confusion_matrix(y_test, y_pred, labels=[0, 1, 2])
     adj_pct, adj_n, nadj_n = erros_adjacentes(y_test, y_pred)
     n_err = int((y_test != y_pred).sum())
-    rbc = model.rules_by_class()
+    rbc = rbc or {}
 
     if verbose:
         print(f"\n  ┌─ {label}")
@@ -250,7 +284,7 @@ def evaluate(model, X_test, y_test, label="", verbose=True):
         print(f"  │  Recall:      C0={rec[0]:.3f}  C1={rec[1]:.3f}  C2={rec[2]:.3f}")
         print(f"  │  Precision:   C0={prec[0]:.3f}  C1={prec[1]:.3f}  C2={prec[2]:.3f}")
         print(f"  │  Erros adj:   {adj_n}/{n_err} ({adj_pct:.1f}%), não-adj: {nadj_n}")
-        print(f"  │  Regras:      {len(model.rules)} total | {rbc}")
+        print(f"  │  Regras:      {n_rules} total | {rbc}")
         print(f"  │  CM: {cm[0].tolist()} / {cm[1].tolist()} / {cm[2].tolist()}")
         print(f"  └─")
 
@@ -258,37 +292,10 @@ def evaluate(model, X_test, y_test, label="", verbose=True):
         'label': label, 'acc': acc, 'f1_macro': f1m, 'f1_weighted': f1w,
         'f1_per': f1p, 'recall': rec, 'precision': prec, 'mae': mae,
         'cm': cm, 'adj_pct': adj_pct, 'adj_n': adj_n, 'nadj_n': nadj_n,
-        'n_rules': len(model.rules), 'rbc': rbc, 'y_pred': y_pred,
+        'n_rules': n_rules, 'rbc': rbc, 'y_pred': y_pred,
     }
 
 
-def sweep_for_strategy(X_train, y_train, X_test, y_test, label,
-                       r_values, mrpc_values, max_rules_base=40,
-                       class_weights=None):
-    """Executa sweep e retorna melhor modelo + métricas."""
-    best_f1 = -1
-    best_cfg = None
-    best_model = None
-
-    for mrpc in mrpc_values:
-        for r in r_values:
-            r = round(r, 2)
-            eff_max = max(max_rules_base, mrpc * 3 + 5)
-            m = ALMMo0(n_inputs=4, r_threshold=r, max_rules=eff_max,
-                       age_limit=80, n_classes=3, min_rules_per_class=mrpc,
-                       class_weights=class_weights)
-            m.cold_start(X_train, y_train, verbose=False)
-            yp = np.array([m.predict(x) for x in X_test])
-            f1 = f1_score(y_test, yp, average='macro', zero_division=0)
-            if f1 > best_f1:
-                best_f1 = f1
-                best_cfg = {'r': r, 'mrpc': mrpc}
-                best_model = m
-
-    print(f"  {label}: melhor r={best_cfg['r']}, mrpc={best_cfg['mrpc']}, F1={best_f1:.4f}")
-    return best_model, best_cfg, best_f1
-
-
 def sanity_check(model, verbose=True):
     """Testa 4 cenários agronómicos. Retorna n_pass."""
     casos = [
@@ -387,73 +394,55 @@ def strategy_smote_tomek(X_train, y_train):
     return X_res, y_res
 
 
-def strategy_repeated_minority(X_train, y_train, repeat_factor=None):
+def ordem_repeated_minority(y_train, repeat_factor=None):
     """
-    Apresentação repetida de amostras minoritárias intercaladas no fluxo.
-    Mais natural para aprendizado online que SMOTE: não cria amostras
-    sintéticas, apenas re-apresenta amostras reais em posições estratégicas.
+    Ordem de apresentação da Repeated Minority: índices de y_train com as
+    amostras minoritárias extra intercaladas no fluxo. Mais natural para
+    aprendizado online que SMOTE: não cria amostras sintéticas, apenas
+    re-apresenta amostras reais em posições estratégicas.
+
+    Calculada de uma vez (sem inserções em listas): cada amostra original i
+    vai para a posição i + min(m, i // intervalo) e a extra k para
+    (k+1)·intervalo + k (as que não cabem ficam no fim).
     """
+    y_train = np.asarray(y_train)
     counts = Counter(y_train)
     max_count = max(counts.values())
-    
-    # Separar por classe
-    indices_by_class = {c: np.where(y_train == c)[0] for c in counts}
-    
-    # Calcular factor de repetição por classe
+
+    # Factor de repetição por classe
     if repeat_factor is None:
         # Auto: igualar contagens (mas cap em 20x para evitar overfitting)
-        repeat_factors = {}
-        for c in counts:
-            factor = min(int(np.ceil(max_count / counts[c])), 20)
-            repeat_factors[c] = factor
+        repeat_factors = {c: min(int(np.ceil(max_count / counts[c])), 20) for c in counts}
     else:
         repeat_factors = {c: repeat_factor for c in counts}
-    
-    # Construir dataset expandido mantendo ordem temporal base
-    # Estratégia: para cada passagem pelo dataset, inserir amostras
-    # minoritárias extras de forma periódica
-    X_list, y_list = [], []
-    
-    # Pool de amostras minoritárias para inserção
-    minority_pools = {}
+
+    # Pool de amostras minoritárias para inserção (repetido e embaralhado)
+    pools = []
     for c in counts:
         if repeat_factors[c] > 1:
-            idxs = indices_by_class[c]
-            # Repetir e embaralhar o pool
             rng = np.random.RandomState(42)
-            pool = np.tile(idxs, repeat_factors[c] - 1)
+            pool = np.tile(np.flatnonzero(y_train == c), repeat_factors[c] - 1)
             rng.shuffle(pool)
-            minority_pools[c] = list(pool)
-    
-    # Percorrer dataset original e intercalar
-    total_extra = sum(len(p) for p in minority_pools.values())
-    insert_interval = max(1, len(X_train) // (total_extra + 1))
-    
-    extra_queue = []
-    for c, pool in minority_pools.items():
-        extra_queue.extend(pool)
-    rng = np.random.RandomState(42)
-    rng.shuffle(extra_queue)
-    extra_idx = 0
-    
-    for i in range(len(X_train)):
-        X_list.append(X_train[i])
-        y_list.append(y_train[i])
-        # Inserir amostra extra periodicamente
-        if extra_idx < len(extra_queue) and (i + 1) % insert_interval == 0:
-            j = extra_queue[extra_idx]
-            X_list.append(X_train[j])
-            y_list.append(y_train[j])
-            extra_idx += 1
-    
-    # Inserir restantes no final
-    while extra_idx < len(extra_queue):
-        j = extra_queue[extra_idx]
-        X_list.append(X_train[j])
-        y_list.append(y_train[j])
-        extra_idx += 1
-    
-    return np.array(X_list), np.array(y_list)
+            pools.append(pool)
+    extra = np.concatenate(pools) if pools else np.empty(0, dtype=np.int64)
+    np.random.RandomState(42).shuffle(extra)
+
+    n, e = len(y_train), len(extra)
+    intervalo = max(1, n // (e + 1))
+    m = min(e, n // intervalo)          # extras intercaladas; o resto vai no fim
+
+    ordem = np.empty(n + e, dtype=np.int64)
+    i = np.arange(n)
+    ordem[i + np.minimum(m, i // intervalo)] = i
+    k = np.arange(e)
+    ordem[np.where(k < m, (k + 1) * intervalo + k, n + k)] = extra
+    return ordem
+
+
+def strategy_repeated_minority(X_train, y_train, repeat_factor=None):
+    """Dataset materializado da Repeated Minority (preferir ordem_repeated_minority)."""
+    ordem = ordem_repeated_minority(y_train, repeat_factor)
+    return X_train[ordem], y_train[ordem]
 
 
 def strategy_partial_oversample(X_train, y_train, target_ratio=0.15):
@@ -492,13 +481,8 @@ def prepare_binary_then_split(X_train, y_train, X_test, y_test):
     y_train_bin = (y_train > 0).astype(int)  # 0 = sem irrigação, 1 = irrigação
     y_test_bin = (y_test > 0).astype(int)
     
-    # Oversample para stage 1
-    from imblearn.over_sampling import SMOTE
-    counts_bin = Counter(y_train_bin)
-    k = min(5, min(counts_bin.values()) - 1)
-    k = max(1, k)
-    sm = SMOTE(random_state=42, k_neighbors=k)
-    X_train_bin, y_train_bin_res = sm.fit_resample(X_train, y_train_bin)
+    # Oversample para stage 1 (cache de reamostragem: mesmo SMOTE nos 2 estágios)
+    X_train_bin, y_train_bin_res = reamostrar(strategy_smote, X_train, y_train_bin)
     
     # Stage 2: Apenas amostras de irrigação (C1 vs C2)
     irr_mask_train = y_train > 0
@@ -507,18 +491,10 @@ def prepare_binary_then_split(X_train, y_train, X_test, y_test):
     # Remap para 0 e 1 para o sub-classificador
     y_train_irr_sub = y_train_irr - 1  # C1→0, C2→1
     
-    # Oversample stage 2
+    # Oversample stage 2 (fallback: random oversample)
     counts_sub = Counter(y_train_irr_sub)
-    if min(counts_sub.values()) > 1:
-        k2 = min(5, min(counts_sub.values()) - 1)
-        k2 = max(1, k2)
-        sm2 = SMOTE(random_state=42, k_neighbors=k2)
-        X_train_irr_res, y_train_irr_res = sm2.fit_resample(X_train_irr, y_train_irr_sub)
-    else:
-        # Fallback: random oversample
-        from imblearn.over_sampling import RandomOverSampler
-        ros = RandomOverSampler(random_state=42)
-        X_train_irr_res, y_train_irr_res = ros.fit_resample(X_train_irr, y_train_irr_sub)
+    metodo_sub = strategy_smote if min(counts_sub.values()) > 1 else strategy_random_oversample
+    X_train_irr_res, y_train_irr_res = reamostrar(metodo_sub, X_train_irr, y_train_irr_sub)
     
     return {
         'X_train_bin': X_train_bin, 'y_train_bin': y_train_bin_res,
@@ -527,6 +503,210 @@ def prepare_binary_then_split(X_train, y_train, X_test, y_test):
     }
 
 
+# ─────────────────────────────────────────────────────────────────────────────
+# ORQUESTRAÇÃO — estratégia × grelha (orquestrador_experimentos.py)
+# ─────────────────────────────────────────────────────────────────────────────
+
+PASTA_RESULTADOS = 'resultados_v8'
+# Validação cruzada leave-k-groups-out da melhor célula de cada estratégia
+# (0 = desligada). SELECIONAR_POR_CV ordena pela média da CV em vez do split fixo
+CV_K_GRUPOS       = 6
+CV_REPETICOES     = 1
+SELECIONAR_POR_CV = False
+# Subir ao mudar o ALMMo0, as estratégias ou a avaliação: invalida o armazém
+VERSAO_EXPERIMENTOS = 1
+SEMENTE = 42
+
+
+def treinar_almmo(dados, r, mrpc, n_classes=3, max_rules_base=40, fator_mrpc=3,
+                  class_weights=None):
+    """Cold start de uma célula (r, mrpc) sobre dados['X'], dados['y']."""
+    eff_max = max(max_rules_base, mrpc * fator_mrpc + 5)
+    m = ALMMo0(n_inputs=4, r_threshold=r, max_rules=eff_max,
+               age_limit=80, n_classes=n_classes, min_rules_per_class=mrpc,
+               class_weights=class_weights)
+    m.cold_start(dados['X'], dados['y'], verbose=False, ordem=dados.get('ordem'))
+    return m
+
+
+def celula_almmo(dados, r, mrpc, **fixos):
+    """Tarefa do orquestrador: treina e avalia em dados['X_teste']."""
+    t0 = time.time()
+    m = treinar_almmo(dados, r, mrpc, **fixos)
+    yp = np.array([m.predict(x) for x in dados['X_teste']], dtype=int)
+    f1 = f1_score(dados['y_teste'], yp, average='macro', zero_division=0) \
+        if len(yp) else 0.0
+    return {'f1_macro': float(f1), 'n_rules': len(m.rules),
+            'rbc': m.rules_by_class(), 'y_pred': yp.tolist(),
+            'train_size': len(dados.get('ordem', dados['X'])), 'tempo_s': round(time.time() - t0, 3)}
+
+
+def _embaralhar(X, y, semente=SEMENTE):
+    """Permutação própria de cada estratégia — independente da ordem de execução."""
+    idx = np.random.RandomState(semente).permutation(len(X))
+    return X[idx], y[idx]
+
+
+def preparar_reamostragem(X_train, y_train, X_test, y_test, estrategia,
+                          embaralhar=True):
+    """Dataset de uma estratégia de resampling (uma vez para toda a grelha)."""
+    X_s, y_s = reamostrar(estrategia, X_train, y_train)
+    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
+    if embaralhar:
+        # Embaralhar para evitar blocos homogéneos no final
+        X_s, y_s = _embaralhar(X_s, y_s)
+    return {'X': X_s, 'y': y_s, 'X_teste': X_test, 'y_teste': y_test}
+
+
+def preparar_repeated_minority(X_train, y_train, X_test, y_test):
+    """Só a ordem de apresentação — o dataset aumentado nunca é materializado."""
+    ordem = ordem_repeated_minority(y_train)
+    print(f"    Dataset: {len(ordem)} apresentações | {dict(Counter(y_train[ordem]))}")
+    return {'X': X_train, 'y': y_train, 'ordem': ordem, 'X_teste': X_test, 'y_teste': y_test}
+
+
+def preparar_binario_estagio1(X_train, y_train, X_test, y_test):
+    """Estágio 1: C0 vs irrigação, avaliado em todo o teste."""
+    bin_data = prepare_binary_then_split(X_train, y_train, X_test, y_test)
+    print(f"    Stage 1 (binário): {len(bin_data['X_train_bin'])} amostras")
+    X_b, y_b = _embaralhar(bin_data['X_train_bin'], bin_data['y_train_bin'])
+    return {'X': X_b, 'y': y_b, 'X_teste': X_test, 'y_teste': bin_data['y_test_bin']}
+
+
+def preparar_binario_estagio2(X_train, y_train, X_test, y_test):
+    """Estágio 2: C1 vs C2 (remapeado 0/1), avaliado no teste com irrigação."""
+    bin_data = prepare_binary_then_split(X_train, y_train, X_test, y_test)
+    print(f"    Stage 2 (C1vsC2):  {len(bin_data['X_train_sub'])} amostras")
+    X_b, y_b = _embaralhar(bin_data['X_train_sub'], bin_data['y_train_sub'])
+    irr = y_test > 0
+    return {'X': X_b, 'y': y_b, 'X_teste': X_test[irr], 'y_teste': y_test[irr] - 1}
+
+
+def f1_fold(X_tr, y_tr, X_te, y_te, preparar, r, mrpc, fixos):
+    """Um fold da CV por grupos: prepara o treino do fold e avalia a célula."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        dados = preparar(X_train=X_tr, y_train=y_tr, X_test=X_te, y_test=y_te)
+    return {'f1_macro': celula_almmo(dados, r, mrpc, **fixos)['f1_macro']}
+
+
+def melhor_celula(celulas):
+    """1.ª célula com o F1-macro máximo (mesmo desempate do sweep em série)."""
+    return max(celulas, key=lambda c: c['f1_macro'])
+
+
+def modelo_da_celula(armazem, base, experimento, celula):
+    """
+    Modelo treinado de uma célula: artefacto do armazém se existir,
+    senão re-treina (determinístico) e guarda.
+    """
+    nome = f"modelo_{chave_celula(hash_base(base), experimento, celula)}"
+    if os.path.exists(armazem.caminho_artefacto(nome)):
+        return armazem.carregar_artefacto(nome)
+    dados = experimento.preparar(**base)
+    m = treinar_almmo(dados, celula['r'], celula['mrpc'], **experimento.fixos)
+    armazem.guardar_artefacto(nome, m)
+    return m
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# GRÁFICOS (funções de módulo — renderizadas em paralelo por servico_graficos)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def fig_comparacao_estrategias(caminho, experimentos):
+    """Comparação de todas as estratégias (F1-macro bar chart)."""
+    fig, ax = plt.subplots(figsize=(14, 6))
+    strategies = [m['strategy'] for m in experimentos]
+    f1s = [m['f1_macro'] for m in experimentos]
+    colors = ['#4CAF50' if f >= 0.40 else '#F44336' for f in f1s]
+    bars = ax.barh(range(len(strategies)), f1s, color=colors, alpha=0.85, edgecolor='white')
+    ax.axvline(x=0.40, color='red', linestyle='--', linewidth=1.5, label='Limiar (0.40)')
+    ax.axvline(x=0.333, color='gray', linestyle=':', linewidth=1, alpha=0.5, label='Baseline (0.33)')
+    for i, (s, f1) in enumerate(zip(strategies, f1s)):
+        ax.text(f1 + 0.005, i, f'{f1:.3f}', va='center', fontsize=10, fontweight='bold')
+    ax.set_yticks(range(len(strategies)))
+    ax.set_yticklabels(strategies, fontsize=10)
+    ax.set_xlabel('F1-Score Macro', fontsize=12)
+    ax.set_title('Comparação de Estratégias de Resampling — F1-macro', fontsize=14, fontweight='bold')
+    ax.legend(fontsize=10)
+    ax.set_xlim(0, max(f1s) * 1.15)
+    ax.invert_yaxis()
+    ax.grid(True, axis='x', alpha=0.2)
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150)
+    plt.close()
+
+
+def fig_recall_por_estrategia(caminho, experimentos):
+    """Recall por classe para cada estratégia."""
+    strategies = [m['strategy'] for m in experimentos]
+    fig, axes = plt.subplots(1, 3, figsize=(16, 6), sharey=True)
+    for c, (ax, title, color) in enumerate(zip(
+        axes, ['Recall C0 (Sem irrig.)', 'Recall C1 (Moderada)', 'Recall C2 (Intensa)'],
+        ['#2196F3', '#FF9800', '#4CAF50']
+    )):
+        recs = [m['recall'][c] for m in experimentos]
+        ax.barh(range(len(strategies)), recs, color=color, alpha=0.8, edgecolor='white')
+        if c > 0:
+            ax.axvline(x=0.20, color='red', linestyle='--', linewidth=1, alpha=0.7)
+        for i, r in enumerate(recs):
+            ax.text(r + 0.01, i, f'{r:.2f}', va='center', fontsize=9)
+        ax.set_yticks(range(len(strategies)))
+        if c == 0:
+            ax.set_yticklabels(strategies, fontsize=9)
+        ax.set_title(title, fontsize=12, fontweight='bold')
+        ax.set_xlim(0, 1.15)
+        ax.invert_yaxis()
+        ax.grid(True, axis='x', alpha=0.2)
+    plt.suptitle('Recall por Classe — Todas as Estratégias', fontsize=14, fontweight='bold', y=1.02)
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150, bbox_inches='tight')
+    plt.close()
+
+
+def fig_matriz_confusao(caminho, cm, strategy):
+    """Confusion matrix do melhor modelo."""
+    fig, ax = plt.subplots(figsize=(7, 6))
+    cm_labels_short = ['C0\nSem irrig.', 'C1\nModerada', 'C2\nIntensa']
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues', xticklabels=cm_labels_short,
+                yticklabels=cm_labels_short, ax=ax, cbar_kws={'label': 'Amostras'},
+                annot_kws={'fontsize': 14, 'fontweight': 'bold'})
+    ax.set_xlabel('Predito', fontsize=12)
+    ax.set_ylabel('Real', fontsize=12)
+    ax.set_title(f'Matriz de Confusão — {strategy}', fontsize=13, fontweight='bold')
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150)
+    plt.close()
+
+
+def fig_precision_recall(caminho, experimentos):
+    """Precision vs Recall scatter per strategy."""
+    fig, ax = plt.subplots(figsize=(10, 8))
+    markers = ['o', 's', '^', 'D', 'v', 'P', 'X', '*', 'h', 'p']
+    for i, m in enumerate(experimentos):
+        for c, (color, offset) in enumerate(zip(['#2196F3', '#FF9800', '#4CAF50'], [-0.005, 0, 0.005])):
+            ax.scatter(m['recall'][c], m['precision'][c] + offset,
+                      marker=markers[i % len(markers)], s=80, color=color,
+                      alpha=0.7, edgecolors='black', linewidth=0.5)
+    # Legend for strategies
+    for i, m in enumerate(experimentos):
+        ax.scatter([], [], marker=markers[i % len(markers)], s=60, color='gray',
+                  label=m['strategy'], alpha=0.7, edgecolors='black')
+    # Legend for classes
+    for c, (color, name) in enumerate(zip(['#2196F3', '#FF9800', '#4CAF50'],
+                                           ['C0', 'C1', 'C2'])):
+        ax.scatter([], [], marker='o', s=60, color=color, label=f'Classe {name}')
+    ax.set_xlabel('Recall', fontsize=12)
+    ax.set_ylabel('Precision', fontsize=12)
+    ax.set_title('Precision vs Recall por Classe e Estratégia', fontsize=13, fontweight='bold')
+    ax.legend(fontsize=8, bbox_to_anchor=(1.02, 1), loc='upper left')
+    ax.grid(True, alpha=0.2)
+    ax.set_xlim(-0.05, 1.05)
+    ax.set_ylim(-0.05, 1.05)
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150, bbox_inches='tight')
+    plt.close()
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # MAIN
 # ─────────────────────────────────────────────────────────────────────────────
@@ -551,283 +731,136 @@ if __name__ == '__main__':
     # ── 2. SPLIT (mesmo do v7) ───────────────────────────────────────────
     sep("2. SPLIT (Leave-Groups-Out)")
 
-    dap_vals = df['dap'].values
-    resets = [0] + [i for i in range(1, len(dap_vals)) if dap_vals[i] < dap_vals[i-1]] + [len(dap_vals)]
-    n_groups = len(resets) - 1
+    grupos = detectar_grupos(df)
+    n_groups = int(grupos.max()) + 1 if len(grupos) else 0
     print(f"  {n_groups} grupos detectados")
 
-# Ajuste dinâmico: seleciona apenas grupos que existem no dataset atual
-    potential_test_groups = [5, 9, 13, 17, 21, 23] 
+    # Ajuste dinâmico: seleciona apenas grupos que existem no dataset atual
+    potential_test_groups = [5, 9, 13, 17, 21, 23]
     test_group_ids = [g for g in potential_test_groups if g < n_groups]
 
-    test_idx = []
-    for g in test_group_ids:
-        test_idx.extend(range(resets[g], resets[g+1]))
-
-    train_idx = [i for i in range(len(df)) if i not in test_idx]
-
-    X_train, y_train = X[train_idx], y[train_idx]
-    X_test, y_test = X[test_idx], y[test_idx]
+    X_train, X_test, y_train, y_test = dividir(X, y, grupos, test_group_ids)
 
     print(f"  Grupos de teste (0-indexed): {test_group_ids}")
     print(f"  Treino: {len(X_train)}  |  Teste: {len(X_test)}")
 
-# Mantendo a contagem de classes por split para conferência
+    # Mantendo a contagem de classes por split para conferência
     for c in range(3):
         print(f"  C{c}: treino={int((y_train==c).sum()):5d}  teste={int((y_test==c).sum()):4d}")
 
-    # ── 3. SWEEP CONFIG ──────────────────────────────────────────────────
-    # Sweep focado: testar combinações mais promissoras
-    r_values = np.arange(0.10, 2.05, 0.05)
-    mrpc_values = [3, 5, 7, 10]
+    # ── 3. ESTRATÉGIAS × GRELHA (declaradas como dados) ──────────────────
+    # Cada célula (estratégia, r, mrpc) é uma tarefa independente no pool;
+    # o armazém em resultados_v8/ guarda cada uma — só corre o que é novo
+    grelha = {'mrpc': [3, 5, 7, 10],
+              'r'   : [round(r, 2) for r in np.arange(0.10, 2.05, 0.05)]}
+    grelha_binaria = {'mrpc': [3, 5, 7],
+                      'r'   : [round(r, 2) for r in np.arange(0.10, 1.55, 0.10)]}
 
-    # ── 4. ESTRATÉGIAS ───────────────────────────────────────────────────
-    sep("3. EXECUÇÃO DAS ESTRATÉGIAS (pode demorar 2-5 minutos)")
-
-    all_experiments = []
-
-    # ─── STRATEGY 0: Baseline ────────────────────────────────────────────
-    print("\n  [0/8] Baseline (sem resampling)...")
-    X_s, y_s = strategy_baseline(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    model_0, cfg_0, f1_0 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "Baseline", r_values, mrpc_values)
-    metrics_0 = evaluate(model_0, X_test, y_test, "Baseline")
-    metrics_0['strategy'] = 'Baseline'
-    metrics_0['cfg'] = cfg_0
-    metrics_0['train_size'] = len(X_s)
-    all_experiments.append(metrics_0)
-
-    # ─── STRATEGY 1: Random Oversampling ─────────────────────────────────
-    print("\n  [1/8] Random Oversampling...")
-    X_s, y_s = strategy_random_oversample(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    # Embaralhar para evitar blocos homogéneos no final
-    rng = np.random.RandomState(42)
-    shuffle_idx = rng.permutation(len(X_s))
-    X_s, y_s = X_s[shuffle_idx], y_s[shuffle_idx]
-    model_1, cfg_1, f1_1 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "RandomOS", r_values, mrpc_values)
-    metrics_1 = evaluate(model_1, X_test, y_test, "Random Oversampling")
-    metrics_1['strategy'] = 'Random Oversampling'
-    metrics_1['cfg'] = cfg_1
-    metrics_1['train_size'] = len(X_s)
-    all_experiments.append(metrics_1)
-
-    # ─── STRATEGY 2: SMOTE ──────────────────────────────────────────────
-    print("\n  [2/8] SMOTE...")
-    X_s, y_s = strategy_smote(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    shuffle_idx = rng.permutation(len(X_s))
-    X_s, y_s = X_s[shuffle_idx], y_s[shuffle_idx]
-    model_2, cfg_2, f1_2 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "SMOTE", r_values, mrpc_values)
-    metrics_2 = evaluate(model_2, X_test, y_test, "SMOTE")
-    metrics_2['strategy'] = 'SMOTE'
-    metrics_2['cfg'] = cfg_2
-    metrics_2['train_size'] = len(X_s)
-    all_experiments.append(metrics_2)
-
-    # ─── STRATEGY 3: ADASYN ─────────────────────────────────────────────
-    print("\n  [3/8] ADASYN...")
-    X_s, y_s = strategy_adasyn(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    shuffle_idx = rng.permutation(len(X_s))
-    X_s, y_s = X_s[shuffle_idx], y_s[shuffle_idx]
-    model_3, cfg_3, f1_3 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "ADASYN", r_values, mrpc_values)
-    metrics_3 = evaluate(model_3, X_test, y_test, "ADASYN")
-    metrics_3['strategy'] = 'ADASYN'
-    metrics_3['cfg'] = cfg_3
-    metrics_3['train_size'] = len(X_s)
-    all_experiments.append(metrics_3)
-
-    # ─── STRATEGY 4: BorderlineSMOTE ─────────────────────────────────────
-    print("\n  [4/8] BorderlineSMOTE...")
-    X_s, y_s = strategy_borderline_smote(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    shuffle_idx = rng.permutation(len(X_s))
-    X_s, y_s = X_s[shuffle_idx], y_s[shuffle_idx]
-    model_4, cfg_4, f1_4 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "BorderlineSMOTE", r_values, mrpc_values)
-    metrics_4 = evaluate(model_4, X_test, y_test, "BorderlineSMOTE")
-    metrics_4['strategy'] = 'BorderlineSMOTE'
-    metrics_4['cfg'] = cfg_4
-    metrics_4['train_size'] = len(X_s)
-    all_experiments.append(metrics_4)
-
-    # ─── STRATEGY 5: SMOTE + Tomek ──────────────────────────────────────
-    print("\n  [5/8] SMOTE + Tomek Links...")
-    X_s, y_s = strategy_smote_tomek(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    shuffle_idx = rng.permutation(len(X_s))
-    X_s, y_s = X_s[shuffle_idx], y_s[shuffle_idx]
-    model_5, cfg_5, f1_5 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "SMOTE+Tomek", r_values, mrpc_values)
-    metrics_5 = evaluate(model_5, X_test, y_test, "SMOTE + Tomek Links")
-    metrics_5['strategy'] = 'SMOTE + Tomek'
-    metrics_5['cfg'] = cfg_5
-    metrics_5['train_size'] = len(X_s)
-    all_experiments.append(metrics_5)
-
-    # ─── STRATEGY 6: Binary + Sub-classification ─────────────────────────
-    print("\n  [6/8] Binarização + Sub-classificação...")
-    bin_data = prepare_binary_then_split(X_train, y_train, X_test, y_test)
-    print(f"    Stage 1 (binário): {len(bin_data['X_train_bin'])} amostras")
-    print(f"    Stage 2 (C1vsC2):  {len(bin_data['X_train_sub'])} amostras")
-
-    # Stage 1: treinar classificador binário
-    r_vals_short = np.arange(0.10, 1.55, 0.10)
-    mrpc_short = [3, 5, 7]
-    best_f1_bin = -1
-    best_model_bin = None
-    for mrpc in mrpc_short:
-        for r in r_vals_short:
-            r = round(r, 2)
-            eff_max = max(30, mrpc * 2 + 5)
-            m = ALMMo0(n_inputs=4, r_threshold=r, max_rules=eff_max,
-                       age_limit=80, n_classes=2, min_rules_per_class=mrpc)
-            # Embaralhar dados binários
-            shuf = rng.permutation(len(bin_data['X_train_bin']))
-            m.cold_start(bin_data['X_train_bin'][shuf],
-                        bin_data['y_train_bin'][shuf], verbose=False)
-            yp = np.array([m.predict(x) for x in X_test])
-            f1 = f1_score(bin_data['y_test_bin'], yp, average='macro', zero_division=0)
-            if f1 > best_f1_bin:
-                best_f1_bin = f1
-                best_model_bin = m
-
-    # Stage 2: treinar sub-classificador (C1=0, C2=1)
-    best_f1_sub = -1
-    best_model_sub = None
-    for mrpc in mrpc_short:
-        for r in r_vals_short:
-            r = round(r, 2)
-            eff_max = max(20, mrpc * 2 + 5)
-            m = ALMMo0(n_inputs=4, r_threshold=r, max_rules=eff_max,
-                       age_limit=80, n_classes=2, min_rules_per_class=mrpc)
-            shuf = rng.permutation(len(bin_data['X_train_sub']))
-            m.cold_start(bin_data['X_train_sub'][shuf],
-                        bin_data['y_train_sub'][shuf], verbose=False)
-            # Avaliar no subset de irrigação do teste
-            irr_test_mask = y_test > 0
-            if irr_test_mask.sum() > 0:
-                yp = np.array([m.predict(x) for x in X_test[irr_test_mask]])
-                y_true_sub = y_test[irr_test_mask] - 1
-                f1 = f1_score(y_true_sub, yp, average='macro', zero_division=0)
-                if f1 > best_f1_sub:
-                    best_f1_sub = f1
-                    best_model_sub = m
-
-    # Combinar: Stage 1 decide C0 vs irrigação, Stage 2 decide C1 vs C2
-    y_pred_bin_combined = []
-    for x in X_test:
-        stage1_pred = best_model_bin.predict(x)
-        if stage1_pred == 0:  # sem irrigação
-            y_pred_bin_combined.append(0)
-        else:
-            stage2_pred = best_model_sub.predict(x)  # 0=C1, 1=C2
-            y_pred_bin_combined.append(stage2_pred + 1)  # remap para 1 ou 2
-
-    y_pred_6 = np.array(y_pred_bin_combined)
-    f1_6 = f1_score(y_test, y_pred_6, average='macro', zero_division=0)
-    rec_6 = recall_score(y_test, y_pred_6, average=None, zero_division=0)
-    prec_6 = precision_score(y_test, y_pred_6, average=None, zero_division=0)
-    f1p_6 = f1_score(y_test, y_pred_6, average=None, zero_division=0)
-    acc_6 = accuracy_score(y_test, y_pred_6)
-    mae_6 = mean_absolute_error(y_test, y_pred_6)
-    cm_6 = confusion_matrix(y_test, y_pred_6, labels=[0, 1, 2])
-    adj_6, adj_n_6, nadj_6 = erros_adjacentes(y_test, y_pred_6)
-    n_rules_6 = len(best_model_bin.rules) + len(best_model_sub.rules)
-
-    print(f"    Stage 1 F1-macro (binário): {best_f1_bin:.4f}")
-    print(f"    Stage 2 F1-macro (C1vsC2):  {best_f1_sub:.4f}")
-    print(f"    Combinado F1-macro:         {f1_6:.4f}")
-    print(f"    Recall: C0={rec_6[0]:.3f} C1={rec_6[1]:.3f} C2={rec_6[2]:.3f}")
-    print(f"    CM: {cm_6[0].tolist()} / {cm_6[1].tolist()} / {cm_6[2].tolist()}")
-
-    metrics_6 = {
-        'label': 'Binary+Sub', 'strategy': 'Binary + Sub-classificação',
-        'acc': acc_6, 'f1_macro': f1_6, 'f1_weighted': f1_score(y_test, y_pred_6, average='weighted', zero_division=0),
-        'f1_per': f1p_6, 'recall': rec_6, 'precision': prec_6, 'mae': mae_6,
-        'cm': cm_6, 'adj_pct': adj_6, 'adj_n': adj_n_6, 'nadj_n': nadj_6,
-        'n_rules': n_rules_6, 'rbc': {}, 'y_pred': y_pred_6,
-        'cfg': {'stage1_rules': len(best_model_bin.rules), 'stage2_rules': len(best_model_sub.rules)},
-        'train_size': len(bin_data['X_train_bin']) + len(bin_data['X_train_sub']),
-    }
-    all_experiments.append(metrics_6)
-
-    # ─── STRATEGY 7: Repeated Minority Presentation ──────────────────────
-    print("\n  [7/8] Repeated Minority Presentation...")
-    X_s, y_s = strategy_repeated_minority(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    model_7, cfg_7, f1_7 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "RepMinority", r_values, mrpc_values)
-    metrics_7 = evaluate(model_7, X_test, y_test, "Repeated Minority Presentation")
-    metrics_7['strategy'] = 'Repeated Minority'
-    metrics_7['cfg'] = cfg_7
-    metrics_7['train_size'] = len(X_s)
-    all_experiments.append(metrics_7)
-
-    # ─── STRATEGY 8: Cost-Sensitive Learning ─────────────────────────────
-    print("\n  [8/8] Cost-Sensitive Learning...")
-    # Pesos inversamente proporcionais à frequência
+    # Cost-sensitive: pesos inversamente proporcionais à frequência, C0 = 1
     counts = Counter(y_train)
     total = len(y_train)
     cw = [total / (3 * counts[c]) for c in range(3)]
-    # Normalizar para que C0 tenha peso 1
     cw = [w / cw[0] for w in cw]
-    print(f"    Pesos: C0={cw[0]:.2f}  C1={cw[1]:.2f}  C2={cw[2]:.2f}")
-
-    best_f1_cs = -1
-    best_model_cs = None
-    best_cfg_cs = None
-    for mrpc in mrpc_values:
-        for r in r_values:
-            r = round(r, 2)
-            eff_max = max(max_rules_base, mrpc * 3 + 5) if 'max_rules_base' in dir() else max(40, mrpc * 3 + 5)
-            m = ALMMo0(n_inputs=4, r_threshold=r, max_rules=eff_max,
-                       age_limit=80, n_classes=3, min_rules_per_class=mrpc,
-                       class_weights=cw)
-            m.cold_start(X_train, y_train, verbose=False)
-            yp = np.array([m.predict(x) for x in X_test])
-            f1 = f1_score(y_test, yp, average='macro', zero_division=0)
-            if f1 > best_f1_cs:
-                best_f1_cs = f1
-                best_cfg_cs = {'r': r, 'mrpc': mrpc}
-                best_model_cs = m
-    print(f"  Cost-Sensitive: melhor r={best_cfg_cs['r']}, mrpc={best_cfg_cs['mrpc']}, F1={best_f1_cs:.4f}")
-    metrics_8 = evaluate(best_model_cs, X_test, y_test, "Cost-Sensitive Learning")
-    metrics_8['strategy'] = 'Cost-Sensitive'
-    metrics_8['cfg'] = best_cfg_cs
-    metrics_8['train_size'] = len(X_train)
-    all_experiments.append(metrics_8)
-
-    # ─── STRATEGY 9 (BONUS): Partial Oversampling (15%) ──────────────────
-    print("\n  [BONUS] SMOTE Parcial (target 15% por classe minoritária)...")
-    X_s, y_s = strategy_partial_oversample(X_train, y_train, target_ratio=0.15)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    shuffle_idx = rng.permutation(len(X_s))
-    X_s, y_s = X_s[shuffle_idx], y_s[shuffle_idx]
-    model_9, cfg_9, f1_9 = sweep_for_strategy(
-        X_s, y_s, X_test, y_test, "PartialSMOTE", r_values, mrpc_values)
-    metrics_9 = evaluate(model_9, X_test, y_test, "SMOTE Parcial (15%)")
-    metrics_9['strategy'] = 'SMOTE Parcial 15%'
-    metrics_9['cfg'] = cfg_9
-    metrics_9['train_size'] = len(X_s)
-    all_experiments.append(metrics_9)
+
+    def reamostragem(funcao, embaralhar=True):
+        return partial(preparar_reamostragem, estrategia=funcao, embaralhar=embaralhar)
+
+    binario = {'n_classes': 2, 'fator_mrpc': 2}
+    experimentos = [
+        Experimento('Baseline', reamostragem(strategy_baseline, False), celula_almmo, grelha),
+        Experimento('Random Oversampling', reamostragem(strategy_random_oversample),
+                    celula_almmo, grelha),
+        Experimento('SMOTE', reamostragem(strategy_smote), celula_almmo, grelha),
+        Experimento('ADASYN', reamostragem(strategy_adasyn), celula_almmo, grelha),
+        Experimento('BorderlineSMOTE', reamostragem(strategy_borderline_smote),
+                    celula_almmo, grelha),
+        Experimento('SMOTE + Tomek', reamostragem(strategy_smote_tomek), celula_almmo, grelha),
+        Experimento('Binary estágio 1', preparar_binario_estagio1, celula_almmo,
+                    grelha_binaria, dict(binario, max_rules_base=30)),
+        Experimento('Binary estágio 2', preparar_binario_estagio2, celula_almmo,
+                    grelha_binaria, dict(binario, max_rules_base=20)),
+        Experimento('Repeated Minority', preparar_repeated_minority, celula_almmo, grelha),
+        Experimento('Cost-Sensitive', reamostragem(strategy_baseline, False), celula_almmo,
+                    grelha, {'class_weights': cw}),
+        Experimento('SMOTE Parcial 15%',
+                    reamostragem(partial(strategy_partial_oversample, target_ratio=0.15)),
+                    celula_almmo, grelha),
+    ]
+    for e in experimentos:
+        e.versao = VERSAO_EXPERIMENTOS
+    por_nome = {e.nome: e for e in experimentos}
+
+    sep(f"3. EXECUÇÃO DAS ESTRATÉGIAS ({sum(len(e.celulas()) for e in experimentos)} células)")
+    print(f"    Pesos cost-sensitive: C0={cw[0]:.2f}  C1={cw[1]:.2f}  C2={cw[2]:.2f}")
+    base = {'X_train': X_train, 'y_train': y_train, 'X_test': X_test, 'y_test': y_test}
+    armazem = ArmazemResultados(PASTA_RESULTADOS)
+    resultados = executar_experimentos(experimentos, base, armazem)
+
+    # ── 4. MELHOR CÉLULA DE CADA ESTRATÉGIA ─────────────────────────────
+    all_experiments = []
+    melhores = {}
+    for e in experimentos:
+        if e.nome.startswith('Binary'):
+            continue
+        cel = melhores[e.nome] = melhor_celula(resultados[e.nome])
+        print(f"  {e.nome}: melhor r={cel['r']}, mrpc={cel['mrpc']}, F1={cel['f1_macro']:.4f}")
+        rbc = {int(k): v for k, v in cel['rbc'].items()}
+        metrics = avaliar_predicoes(y_test, cel['y_pred'], e.nome, cel['n_rules'], rbc)
+        metrics['strategy'] = e.nome
+        metrics['cfg'] = {'r': cel['r'], 'mrpc': cel['mrpc']}
+        metrics['train_size'] = cel['train_size']
+        all_experiments.append(metrics)
+
+    # Binary + Sub: estágio 1 decide C0 vs irrigação, estágio 2 decide C1 vs C2
+    cel_bin = melhor_celula(resultados['Binary estágio 1'])
+    cel_sub = melhor_celula(resultados['Binary estágio 2'])
+    best_model_bin = modelo_da_celula(armazem, base, por_nome['Binary estágio 1'], cel_bin)
+    best_model_sub = modelo_da_celula(armazem, base, por_nome['Binary estágio 2'], cel_sub)
+    stage1 = np.asarray(cel_bin['y_pred'])
+    stage2 = np.array([best_model_sub.predict(x) for x in X_test])   # 0=C1, 1=C2
+    y_pred_6 = np.where(stage1 == 0, 0, stage2 + 1)
+
+    print(f"\n  Binary + Sub-classificação:")
+    print(f"    Stage 1 F1-macro (binário): {cel_bin['f1_macro']:.4f}")
+    print(f"    Stage 2 F1-macro (C1vsC2):  {cel_sub['f1_macro']:.4f}")
+    metrics_6 = avaliar_predicoes(y_test, y_pred_6, 'Binary+Sub',
+                                  cel_bin['n_rules'] + cel_sub['n_rules'])
+    metrics_6['strategy'] = 'Binary + Sub-classificação'
+    metrics_6['cfg'] = {'stage1_rules': cel_bin['n_rules'], 'stage2_rules': cel_sub['n_rules']}
+    metrics_6['train_size'] = cel_bin['train_size'] + cel_sub['train_size']
+    all_experiments.insert(6, metrics_6)
+
+    # ── 4b. VALIDAÇÃO CRUZADA POR GRUPOS (melhor célula de cada estratégia)
+    for m in all_experiments:
+        m['cv_f1'], m['cv_std'] = np.nan, np.nan
+    if CV_K_GRUPOS:
+        sep(f"3b. VALIDAÇÃO CRUZADA (leave-{CV_K_GRUPOS}-groups-out, {n_groups} grupos)")
+        for m in all_experiments:
+            if m['strategy'] not in melhores:
+                continue   # Binary + Sub: cascata de 2 modelos, só split fixo
+            e, cel = por_nome[m['strategy']], melhores[m['strategy']]
+            folds = validacao_cruzada(f1_fold, X, y, grupos, CV_K_GRUPOS,
+                                      repeticoes=CV_REPETICOES, preparar=e.preparar,
+                                      r=cel['r'], mrpc=cel['mrpc'], fixos=e.fixos)
+            f1s = [f['f1_macro'] for f in folds]
+            m['cv_f1'], m['cv_std'] = float(np.mean(f1s)), float(np.std(f1s))
+            print(f"  {m['strategy']:24s} F1 split={m['f1_macro']:.4f} | "
+                  f"CV={m['cv_f1']:.4f} ± {m['cv_std']:.4f} ({len(f1s)} folds)")
 
     # ── 5. COMPARAÇÃO ────────────────────────────────────────────────────
     sep("4. TABELA COMPARATIVA")
 
-    # Sort by F1-macro
-    all_experiments.sort(key=lambda x: -x['f1_macro'])
+    # Sort by F1-macro (split fixo) ou pela média da CV por grupos
+    if SELECIONAR_POR_CV and CV_K_GRUPOS:
+        all_experiments.sort(key=lambda x: -(x['cv_f1'] if np.isfinite(x['cv_f1']) else -1))
+    else:
+        all_experiments.sort(key=lambda x: -x['f1_macro'])
 
     header = (f"  {'#':>2s} {'Estratégia':24s} {'F1-mac':>7s} {'RecC0':>6s} "
               f"{'RecC1':>6s} {'RecC2':>6s} {'PrcC1':>6s} {'PrcC2':>6s} "
-              f"{'MAE':>6s} {'Adj%':>5s} {'Rules':>5s} {'Train':>6s}")
+              f"{'MAE':>6s} {'Adj%':>5s} {'Rules':>5s} {'Train':>6s} {'CV-F1':>6s}")
     print(header)
-    print(f"  {'─'*2} {'─'*24} {'─'*7} {'─'*6} {'─'*6} {'─'*6} {'─'*6} {'─'*6} {'─'*6} {'─'*5} {'─'*5} {'─'*6}")
+    print(f"  {'─'*2} {'─'*24} {'─'*7} {'─'*6} {'─'*6} {'─'*6} {'─'*6} {'─'*6} {'─'*6} {'─'*5} {'─'*5} {'─'*6} {'─'*6}")
 
     for i, m in enumerate(all_experiments):
         star = " ★" if i == 0 else ""
@@ -835,7 +868,7 @@ if __name__ == '__main__':
               f"{m['recall'][0]:6.3f} {m['recall'][1]:6.3f} {m['recall'][2]:6.3f} "
               f"{m['precision'][1]:6.3f} {m['precision'][2]:6.3f} "
               f"{m['mae']:6.3f} {m['adj_pct']:5.1f} {m['n_rules']:5d} "
-              f"{m['train_size']:6d}{star}")
+              f"{m['train_size']:6d} {m['cv_f1']:6.3f}{star}")
 
     best_exp = all_experiments[0]
     print(f"\n  ★ Melhor estratégia: {best_exp['strategy']}")
@@ -869,22 +902,15 @@ if __name__ == '__main__':
     # ── 7. SANIDADE DO MELHOR ────────────────────────────────────────────
     sep("6. SANIDADE AGRONÓMICA — MELHOR ESTRATÉGIA")
 
-    # Encontrar o modelo correspondente à melhor estratégia
-    # Precisamos mapear — vamos re-treinar o melhor
     best_strat = bm['strategy']
     print(f"  Estratégia: {best_strat}")
 
-    # Reconstruir modelo do melhor (já temos os modelos locais)
-    # Usar o modelo que está no escopo — se for baseline é model_0, etc.
-    model_map = {
-        'Baseline': model_0, 'Random Oversampling': model_1,
-        'SMOTE': model_2, 'ADASYN': model_3,
-        'BorderlineSMOTE': model_4, 'SMOTE + Tomek': model_5,
-        'Repeated Minority': model_7, 'Cost-Sensitive': best_model_cs,
-        'SMOTE Parcial 15%': model_9,
-    }
-    if best_strat in model_map:
-        best_model_final = model_map[best_strat]
+    # Modelo da melhor célula: artefacto do armazém ou re-treino determinístico
+    best_model_final = None
+    if best_strat in melhores:
+        best_model_final = modelo_da_celula(armazem, base, por_nome[best_strat],
+                                            melhores[best_strat])
+    if best_model_final is not None:
         n_pass = sanity_check(best_model_final)
     elif best_strat == 'Binary + Sub-classificação':
         # Sanidade especial para 2 estágios
@@ -942,9 +968,9 @@ if __name__ == '__main__':
 
     # ── 9. SALVAR MELHOR MODELO ──────────────────────────────────────────
     sep("8. ARTEFACTOS")
-    if best_strat in model_map:
-        model_map[best_strat].save('memoria_cold_start_v8.pkl')
-        print(f"  ✓ memoria_cold_start_v8.pkl ({model_map[best_strat].rules_by_class()})")
+    if best_model_final is not None:
+        best_model_final.save('memoria_cold_start_v8.pkl')
+        print(f"  ✓ memoria_cold_start_v8.pkl ({best_model_final.rules_by_class()})")
     elif best_strat == 'Binary + Sub-classificação':
         # Salvar ambos os modelos
         best_model_bin.save('memoria_cold_start_v8_stage1.pkl')
@@ -956,95 +982,20 @@ if __name__ == '__main__':
     # ── 10. GRÁFICOS ────────────────────────────────────────────────────
     sep("9. GRÁFICOS")
 
-    # 10a: Comparação de todas as estratégias (F1-macro bar chart)
-    fig, ax = plt.subplots(figsize=(14, 6))
-    strategies = [m['strategy'] for m in all_experiments]
-    f1s = [m['f1_macro'] for m in all_experiments]
-    colors = ['#4CAF50' if f >= 0.40 else '#F44336' for f in f1s]
-    bars = ax.barh(range(len(strategies)), f1s, color=colors, alpha=0.85, edgecolor='white')
-    ax.axvline(x=0.40, color='red', linestyle='--', linewidth=1.5, label='Limiar (0.40)')
-    ax.axvline(x=0.333, color='gray', linestyle=':', linewidth=1, alpha=0.5, label='Baseline (0.33)')
-    for i, (s, f1) in enumerate(zip(strategies, f1s)):
-        ax.text(f1 + 0.005, i, f'{f1:.3f}', va='center', fontsize=10, fontweight='bold')
-    ax.set_yticks(range(len(strategies)))
-    ax.set_yticklabels(strategies, fontsize=10)
-    ax.set_xlabel('F1-Score Macro', fontsize=12)
-    ax.set_title('Comparação de Estratégias de Resampling — F1-macro', fontsize=14, fontweight='bold')
-    ax.legend(fontsize=10)
-    ax.set_xlim(0, max(f1s) * 1.15)
-    ax.invert_yaxis()
-    ax.grid(True, axis='x', alpha=0.2)
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/comparacao_estrategias.png', dpi=150)
-    plt.close()
-    print(f"  ✓ {OUT}/comparacao_estrategias.png")
-
-    # 10b: Recall por classe para cada estratégia
-    fig, axes = plt.subplots(1, 3, figsize=(16, 6), sharey=True)
-    for c, (ax, title, color) in enumerate(zip(
-        axes, ['Recall C0 (Sem irrig.)', 'Recall C1 (Moderada)', 'Recall C2 (Intensa)'],
-        ['#2196F3', '#FF9800', '#4CAF50']
-    )):
-        recs = [m['recall'][c] for m in all_experiments]
-        ax.barh(range(len(strategies)), recs, color=color, alpha=0.8, edgecolor='white')
-        if c > 0:
-            ax.axvline(x=0.20, color='red', linestyle='--', linewidth=1, alpha=0.7)
-        for i, r in enumerate(recs):
-            ax.text(r + 0.01, i, f'{r:.2f}', va='center', fontsize=9)
-        ax.set_yticks(range(len(strategies)))
-        if c == 0:
-            ax.set_yticklabels(strategies, fontsize=9)
-        ax.set_title(title, fontsize=12, fontweight='bold')
-        ax.set_xlim(0, 1.15)
-        ax.invert_yaxis()
-        ax.grid(True, axis='x', alpha=0.2)
-    plt.suptitle('Recall por Classe — Todas as Estratégias', fontsize=14, fontweight='bold', y=1.02)
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/recall_por_estrategia.png', dpi=150, bbox_inches='tight')
-    plt.close()
-    print(f"  ✓ {OUT}/recall_por_estrategia.png")
-
-    # 10c: Confusion matrix do melhor modelo
-    fig, ax = plt.subplots(figsize=(7, 6))
-    cm_labels_short = ['C0\nSem irrig.', 'C1\nModerada', 'C2\nIntensa']
-    sns.heatmap(bm['cm'], annot=True, fmt='d', cmap='Blues', xticklabels=cm_labels_short,
-                yticklabels=cm_labels_short, ax=ax, cbar_kws={'label': 'Amostras'},
-                annot_kws={'fontsize': 14, 'fontweight': 'bold'})
-    ax.set_xlabel('Predito', fontsize=12)
-    ax.set_ylabel('Real', fontsize=12)
-    ax.set_title(f'Matriz de Confusão — {bm["strategy"]}', fontsize=13, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/matriz_confusao_melhor.png', dpi=150)
-    plt.close()
-    print(f"  ✓ {OUT}/matriz_confusao_melhor.png")
-
-    # 10d: Precision vs Recall scatter per strategy
-    fig, ax = plt.subplots(figsize=(10, 8))
-    markers = ['o', 's', '^', 'D', 'v', 'P', 'X', '*', 'h', 'p']
-    for i, m in enumerate(all_experiments):
-        for c, (color, offset) in enumerate(zip(['#2196F3', '#FF9800', '#4CAF50'], [-0.005, 0, 0.005])):
-            ax.scatter(m['recall'][c], m['precision'][c] + offset,
-                      marker=markers[i % len(markers)], s=80, color=color,
-                      alpha=0.7, edgecolors='black', linewidth=0.5)
-    # Legend for strategies
-    for i, m in enumerate(all_experiments):
-        ax.scatter([], [], marker=markers[i % len(markers)], s=60, color='gray',
-                  label=m['strategy'], alpha=0.7, edgecolors='black')
-    # Legend for classes
-    for c, (color, name) in enumerate(zip(['#2196F3', '#FF9800', '#4CAF50'],
-                                           ['C0', 'C1', 'C2'])):
-        ax.scatter([], [], marker='o', s=60, color=color, label=f'Classe {name}')
-    ax.set_xlabel('Recall', fontsize=12)
-    ax.set_ylabel('Precision', fontsize=12)
-    ax.set_title('Precision vs Recall por Classe e Estratégia', fontsize=13, fontweight='bold')
-    ax.legend(fontsize=8, bbox_to_anchor=(1.02, 1), loc='upper left')
-    ax.grid(True, alpha=0.2)
-    ax.set_xlim(-0.05, 1.05)
-    ax.set_ylim(-0.05, 1.05)
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/precision_recall_scatter.png', dpi=150, bbox_inches='tight')
-    plt.close()
-    print(f"  ✓ {OUT}/precision_recall_scatter.png")
+    # Só as métricas usadas nos gráficos (hash pequeno, pickling barato)
+    exp_graf = [{'strategy': m['strategy'], 'f1_macro': float(m['f1_macro']),
+                 'recall': np.asarray(m['recall']), 'precision': np.asarray(m['precision'])}
+                for m in all_experiments]
+    renderizar_figuras([
+        FiguraSpec(fig_comparacao_estrategias, f'{OUT}/comparacao_estrategias.png',
+                   {'experimentos': exp_graf}),
+        FiguraSpec(fig_recall_por_estrategia, f'{OUT}/recall_por_estrategia.png',
+                   {'experimentos': exp_graf}),
+        FiguraSpec(fig_matriz_confusao, f'{OUT}/matriz_confusao_melhor.png',
+                   {'cm': bm['cm'], 'strategy': bm['strategy']}),
+        FiguraSpec(fig_precision_recall, f'{OUT}/precision_recall_scatter.png',
+                   {'experimentos': exp_graf}),
+    ])
 
     # ── FIM ──────────────────────────────────────────────────────────────
     elapsed = time.time() - t0
@@ -1052,6 +1003,7 @@ if __name__ == '__main__':
     print(f"  Tempo total: {elapsed:.1f}s")
     print(f"  Melhor: {bm['strategy']} (F1-macro={bm['f1_macro']:.4f})")
     print(f"  Estratégias testadas: {len(all_experiments)}")
+    print(f"  Armazém de resultados: {PASTA_RESULTADOS}/ ({len(armazem)} células)")
     print()
     print(f"  Resumo rápido:")
     for i, m in enumerate(all_experiments):
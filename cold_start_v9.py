@@ -36,6 +36,7 @@ import pickle
 import warnings
 from datetime import datetime
 from collections import Counter
+from functools import partial
 from sklearn.metrics import (
     classification_report, confusion_matrix,
     f1_score, accuracy_score, mean_absolute_error,
@@ -46,6 +47,9 @@ matplotlib.use('Agg')
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from servico_graficos import FiguraSpec, renderizar_figuras
+from cache_reamostragem import reamostrar
+
 warnings.filterwarnings('ignore')
 
 
@@ -76,9 +80,10 @@ class ALMMo0:
         self.n_rules_pruned  = 0
         self.created_at      = datetime.now().isoformat()
 
-    def fit_normalizer(self, X):
-        self.input_mean = np.mean(X, axis=0)
-        self.input_std  = np.std(X, axis=0)
+    def fit_normalizer(self, X, pesos=None):
+        # pesos: nº de apresentações de cada linha (ordem com repetições)
+        self.input_mean = np.average(X, axis=0, weights=pesos)
+        self.input_std  = np.sqrt(np.average((X - self.input_mean) ** 2, axis=0, weights=pesos))
         self.input_std[self.input_std < self.epsilon] = 1.0
 
     def normalize(self, x):
@@ -176,14 +181,20 @@ class ALMMo0:
         self.rules = surviving
         self.n_rules_pruned += n_before - len(self.rules)
 
-    def cold_start(self, X, y, verbose=False):
-        self.fit_normalizer(X)
+    def cold_start(self, X, y, verbose=False, ordem=None):
+        """
+        ordem: índices de apresentação (ex.: ordem_repeated_minority) — as
+        amostras são lidas de X por índice, sem materializar o dataset aumentado.
+        """
+        n = len(X) if ordem is None else len(ordem)
+        pesos = None if ordem is None else np.bincount(ordem, minlength=len(X))
+        self.fit_normalizer(X, pesos)
         history = []
-        for i in range(len(X)):
-            self.learn(X[i], int(y[i]))
+        for i, (x, yi) in enumerate(apresentar(X, y, ordem)):
+            self.learn(x, yi)
             history.append(len(self.rules))
-            if verbose and (i + 1) % max(1, len(X) // 10) == 0:
-                pct = 100 * (i + 1) / len(X)
+            if verbose and (i + 1) % max(1, n // 10) == 0:
+                pct = 100 * (i + 1) / n
                 dist = self.rules_by_class()
                 print(f"    {pct:3.0f}% | {len(self.rules)} regras | {dist}")
         return history
@@ -212,6 +223,12 @@ class ALMMo0:
 # HELPERS
 # ─────────────────────────────────────────────────────────────────────────────
 
+def apresentar(X, y, ordem=None):
+    """Gerador (x, y) pela ordem de apresentação, lido de X por índice."""
+    for j in (range(len(X)) if ordem is None else ordem):
+        yield X[j], int(y[j])
+
+
 def sep(title):
     w = 75
     print(f"\n{'═'*w}")
@@ -250,7 +267,7 @@ def evaluate(model, X_test, y_test, label="", n_classes=2, verbose=True):
 
 def sweep(X_train, y_train, X_test, y_test, label,
           r_values, mrpc_values, max_rules_base=40,
-          class_weights=None, n_classes=2, shuffle=False):
+          class_weights=None, n_classes=2, shuffle=False, ordem=None):
     best_f1 = -1
     best_cfg = None
     best_model = None
@@ -263,11 +280,14 @@ def sweep(X_train, y_train, X_test, y_test, label,
             m = ALMMo0(n_inputs=4, r_threshold=r, max_rules=eff_max,
                        age_limit=80, n_classes=n_classes,
                        min_rules_per_class=mrpc, class_weights=class_weights)
-            Xs, ys = X_train, y_train
+            Xs, ys, ordem_c = X_train, y_train, ordem
             if shuffle:
-                idx = rng.permutation(len(Xs))
-                Xs, ys = Xs[idx], ys[idx]
-            m.cold_start(Xs, ys, verbose=False)
+                if ordem is None:
+                    idx = rng.permutation(len(Xs))
+                    Xs, ys = Xs[idx], ys[idx]
+                else:
+                    ordem_c = ordem[rng.permutation(len(ordem))]
+            m.cold_start(Xs, ys, verbose=False, ordem=ordem_c)
             yp = np.array([m.predict(x) for x in X_test])
             f1 = f1_score(y_test, yp, average='macro', zero_division=0)
             if f1 > best_f1:
@@ -340,24 +360,129 @@ def resample_partial_smote(X, y, target_ratio=0.15):
     return sm.fit_resample(X, y)
 
 
-def resample_repeated_minority(X, y):
+def ordem_repeated_minority(y):
+    """
+    Ordem de apresentação da Repeated Minority (índices de y), sem inserções
+    em listas. Para cada classe minoritária, a k-ésima extra vai para a
+    posição min(L + k, (k+1)·intervalo) da ordem corrente (L = tamanho antes
+    da classe) — as mesmas posições de list.insert, preenchidas por máscara.
+    """
+    y = np.asarray(y)
     counts = Counter(y)
     max_count = max(counts.values())
-    indices_by_class = {c: np.where(y == c)[0] for c in counts}
     rng = np.random.RandomState(42)
-    X_list, y_list = list(X), list(y)
+    n = len(y)
+    ordem = np.arange(n)
     for c in counts:
         if counts[c] < max_count:
             factor = min(int(np.ceil(max_count / counts[c])), 20) - 1
             if factor > 0:
-                pool = np.tile(indices_by_class[c], factor)
+                pool = np.tile(np.flatnonzero(y == c), factor)
                 rng.shuffle(pool)
-                insert_interval = max(1, len(X) // (len(pool) + 1))
-                for idx_i, j in enumerate(pool):
-                    pos = min(len(X_list), (idx_i + 1) * insert_interval)
-                    X_list.insert(pos, X[j])
-                    y_list.insert(pos, y[j])
-    return np.array(X_list), np.array(y_list)
+                insert_interval = max(1, n // (len(pool) + 1))
+                k = np.arange(len(pool))
+                pos = np.minimum(len(ordem) + k, (k + 1) * insert_interval)
+                nova = np.empty(len(ordem) + len(pool), dtype=np.int64)
+                extra = np.zeros(len(nova), dtype=bool)
+                extra[pos] = True
+                nova[pos] = pool
+                nova[~extra] = ordem
+                ordem = nova
+    return ordem
+
+
+def resample_repeated_minority(X, y):
+    """Dataset materializado da Repeated Minority (preferir ordem_repeated_minority)."""
+    ordem = ordem_repeated_minority(y)
+    return X[ordem], y[ordem]
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# GRÁFICOS (funções de módulo — renderizadas em paralelo por servico_graficos)
+# ─────────────────────────────────────────────────────────────────────────────
+
+def fig_comparacao_binario(caminho, experimentos):
+    """Comparação estratégias (F1-macro)."""
+    fig, ax = plt.subplots(figsize=(12, 5))
+    strategies = [m['strategy'] for m in experimentos]
+    f1s = [m['f1_macro'] for m in experimentos]
+    colors = ['#4CAF50' if f >= 0.50 else '#FF9800' if f >= 0.40 else '#F44336' for f in f1s]
+    bars = ax.barh(range(len(strategies)), f1s, color=colors, alpha=0.85, edgecolor='white')
+    ax.axvline(x=0.50, color='red', linestyle='--', linewidth=1.5, label='Limiar (0.50)')
+    for i, (s, f1) in enumerate(zip(strategies, f1s)):
+        ax.text(f1 + 0.005, i, f'{f1:.3f}', va='center', fontsize=10, fontweight='bold')
+    ax.set_yticks(range(len(strategies)))
+    ax.set_yticklabels(strategies, fontsize=10)
+    ax.set_xlabel('F1-Score Macro', fontsize=12)
+    ax.set_title('v9 Binário — Comparação de Estratégias', fontsize=14, fontweight='bold')
+    ax.legend(fontsize=10)
+    ax.set_xlim(0, max(f1s) * 1.15)
+    ax.invert_yaxis()
+    ax.grid(True, axis='x', alpha=0.2)
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150)
+    plt.close()
+
+
+def fig_matriz_confusao_binario(caminho, cm, strategy):
+    """Confusion matrix do melhor modelo."""
+    fig, ax = plt.subplots(figsize=(6, 5))
+    cm_labels = ['C0\nSem irrigação', 'C1\nIrrigação']
+    sns.heatmap(cm, annot=True, fmt='d', cmap='Blues',
+                xticklabels=cm_labels, yticklabels=cm_labels, ax=ax,
+                annot_kws={'fontsize': 16, 'fontweight': 'bold'})
+    ax.set_xlabel('Predito', fontsize=12)
+    ax.set_ylabel('Real', fontsize=12)
+    ax.set_title(f'Matriz de Confusão — {strategy}', fontsize=13, fontweight='bold')
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150)
+    plt.close()
+
+
+def fig_metricas_irrigacao(caminho, experimentos):
+    """Recall/Precision/F1 de C1 por estratégia (grouped bar)."""
+    strategies = [m['strategy'] for m in experimentos]
+    fig, ax = plt.subplots(figsize=(14, 6))
+    x_pos = np.arange(len(strategies))
+    w = 0.2
+    rec_c1 = [m['recall'][1] for m in experimentos]
+    prc_c1 = [m['precision'][1] for m in experimentos]
+    f1_c1 = [m['f1_per'][1] for m in experimentos]
+    ax.bar(x_pos - w, rec_c1, w, label='Recall C1', color='#FF9800', alpha=0.85)
+    ax.bar(x_pos, prc_c1, w, label='Precision C1', color='#2196F3', alpha=0.85)
+    ax.bar(x_pos + w, f1_c1, w, label='F1 C1', color='#4CAF50', alpha=0.85)
+    ax.axhline(y=0.30, color='red', linestyle='--', linewidth=1, alpha=0.7, label='Limiar Recall (0.30)')
+    ax.set_xticks(x_pos)
+    ax.set_xticklabels(strategies, fontsize=9, rotation=30, ha='right')
+    ax.set_ylabel('Score', fontsize=12)
+    ax.set_title('Métricas de Irrigação (C1) por Estratégia', fontsize=13, fontweight='bold')
+    ax.legend(fontsize=9)
+    ax.set_ylim(0, 1.05)
+    ax.grid(True, axis='y', alpha=0.2)
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150)
+    plt.close()
+
+
+def fig_deteccao_subclasses(caminho, sub_data):
+    """Como o binário vê C1_orig vs C2_orig. sub_data: [(estratégia, r_c1o, r_c2o)]."""
+    fig, ax = plt.subplots(figsize=(8, 5))
+    strats = [s[0] for s in sub_data]
+    rc1o = [s[1] for s in sub_data]
+    rc2o = [s[2] for s in sub_data]
+    x_pos = np.arange(len(strats))
+    ax.bar(x_pos - 0.15, rc1o, 0.3, label='Detecção C1_orig (moderada)', color='#FF9800', alpha=0.85)
+    ax.bar(x_pos + 0.15, rc2o, 0.3, label='Detecção C2_orig (intensa)', color='#F44336', alpha=0.85)
+    ax.set_xticks(x_pos)
+    ax.set_xticklabels(strats, fontsize=9, rotation=30, ha='right')
+    ax.set_ylabel('Taxa de detecção', fontsize=12)
+    ax.set_title('Detecção de Sub-classes Originais (C1 e C2) por Estratégia', fontsize=12, fontweight='bold')
+    ax.legend(fontsize=10)
+    ax.set_ylim(0, 1.05)
+    ax.grid(True, axis='y', alpha=0.2)
+    plt.tight_layout()
+    plt.savefig(caminho, dpi=150)
+    plt.close()
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -461,7 +586,7 @@ if __name__ == '__main__':
 
     # ─── 2: SMOTE ───────────────────────────────────────────────────────
     print("\n  [2/6] SMOTE (equalizado)...")
-    X_s, y_s = resample_smote(X_train, y_train)
+    X_s, y_s = reamostrar(resample_smote, X_train, y_train)
     print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
     idx = rng.permutation(len(X_s))
     X_s, y_s = X_s[idx], y_s[idx]
@@ -476,7 +601,7 @@ if __name__ == '__main__':
 
     # ─── 3: ADASYN ──────────────────────────────────────────────────────
     print("\n  [3/6] ADASYN...")
-    X_s, y_s = resample_adasyn(X_train, y_train)
+    X_s, y_s = reamostrar(resample_adasyn, X_train, y_train)
     print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
     idx = rng.permutation(len(X_s))
     X_s, y_s = X_s[idx], y_s[idx]
@@ -491,7 +616,7 @@ if __name__ == '__main__':
 
     # ─── 4: SMOTE Parcial (15%) ─────────────────────────────────────────
     print("\n  [4/6] SMOTE Parcial (target 15%)...")
-    X_s, y_s = resample_partial_smote(X_train, y_train, target_ratio=0.15)
+    X_s, y_s = reamostrar(partial(resample_partial_smote, target_ratio=0.15), X_train, y_train)
     print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
     idx = rng.permutation(len(X_s))
     X_s, y_s = X_s[idx], y_s[idx]
@@ -506,20 +631,21 @@ if __name__ == '__main__':
 
     # ─── 5: Repeated Minority ────────────────────────────────────────────
     print("\n  [5/6] Repeated Minority Presentation...")
-    X_s, y_s = resample_repeated_minority(X_train, y_train)
-    print(f"    Dataset: {len(X_s)} amostras | {dict(Counter(y_s))}")
-    m5, cfg5, f1_5 = sweep(X_s, y_s, X_test, y_test, "RepMinority",
-                            r_values, mrpc_values, n_classes=2)
+    # Só a ordem de apresentação — o dataset aumentado nunca é materializado
+    ordem_rm = ordem_repeated_minority(y_train)
+    print(f"    Dataset: {len(ordem_rm)} apresentações | {dict(Counter(y_train[ordem_rm]))}")
+    m5, cfg5, f1_5 = sweep(X_train, y_train, X_test, y_test, "RepMinority",
+                            r_values, mrpc_values, n_classes=2, ordem=ordem_rm)
     met5 = evaluate(m5, X_test, y_test, "Repeated Minority", n_classes=2)
     met5['strategy'] = 'Repeated Minority'
     met5['cfg'] = cfg5
-    met5['train_size'] = len(X_s)
+    met5['train_size'] = len(ordem_rm)
     all_experiments.append(met5)
     best_models['Repeated Minority'] = m5
 
     # ─── 6: Cost-Sensitive + SMOTE Parcial ───────────────────────────────
     print("\n  [6/6] Cost-Sensitive + SMOTE Parcial (combo)...")
-    X_s, y_s = resample_partial_smote(X_train, y_train, target_ratio=0.15)
+    X_s, y_s = reamostrar(partial(resample_partial_smote, target_ratio=0.15), X_train, y_train)
     idx = rng.permutation(len(X_s))
     X_s, y_s = X_s[idx], y_s[idx]
     counts_s = Counter(y_s)
@@ -646,90 +772,28 @@ if __name__ == '__main__':
     # ── 11. GRÁFICOS ─────────────────────────────────────────────────────
     sep("10. GRÁFICOS")
 
-    # 11a: Comparação estratégias
-    fig, ax = plt.subplots(figsize=(12, 5))
-    strategies = [m['strategy'] for m in all_experiments]
-    f1s = [m['f1_macro'] for m in all_experiments]
-    colors = ['#4CAF50' if f >= 0.50 else '#FF9800' if f >= 0.40 else '#F44336' for f in f1s]
-    bars = ax.barh(range(len(strategies)), f1s, color=colors, alpha=0.85, edgecolor='white')
-    ax.axvline(x=0.50, color='red', linestyle='--', linewidth=1.5, label='Limiar (0.50)')
-    for i, (s, f1) in enumerate(zip(strategies, f1s)):
-        ax.text(f1 + 0.005, i, f'{f1:.3f}', va='center', fontsize=10, fontweight='bold')
-    ax.set_yticks(range(len(strategies)))
-    ax.set_yticklabels(strategies, fontsize=10)
-    ax.set_xlabel('F1-Score Macro', fontsize=12)
-    ax.set_title('v9 Binário — Comparação de Estratégias', fontsize=14, fontweight='bold')
-    ax.legend(fontsize=10)
-    ax.set_xlim(0, max(f1s) * 1.15)
-    ax.invert_yaxis()
-    ax.grid(True, axis='x', alpha=0.2)
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/comparacao_estrategias_binario.png', dpi=150)
-    plt.close()
-    print(f"  ✓ {OUT}/comparacao_estrategias_binario.png")
-
-    # 11b: Confusion matrix
-    fig, ax = plt.subplots(figsize=(6, 5))
-    cm_labels = ['C0\nSem irrigação', 'C1\nIrrigação']
-    sns.heatmap(bm['cm'], annot=True, fmt='d', cmap='Blues',
-                xticklabels=cm_labels, yticklabels=cm_labels, ax=ax,
-                annot_kws={'fontsize': 16, 'fontweight': 'bold'})
-    ax.set_xlabel('Predito', fontsize=12)
-    ax.set_ylabel('Real', fontsize=12)
-    ax.set_title(f'Matriz de Confusão — {bm["strategy"]}', fontsize=13, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/matriz_confusao_binario.png', dpi=150)
-    plt.close()
-    print(f"  ✓ {OUT}/matriz_confusao_binario.png")
-
-    # 11c: Recall/Precision por estratégia (grouped bar)
-    fig, ax = plt.subplots(figsize=(14, 6))
-    x_pos = np.arange(len(strategies))
-    w = 0.2
-    rec_c1 = [m['recall'][1] for m in all_experiments]
-    prc_c1 = [m['precision'][1] for m in all_experiments]
-    f1_c1 = [m['f1_per'][1] for m in all_experiments]
-    ax.bar(x_pos - w, rec_c1, w, label='Recall C1', color='#FF9800', alpha=0.85)
-    ax.bar(x_pos, prc_c1, w, label='Precision C1', color='#2196F3', alpha=0.85)
-    ax.bar(x_pos + w, f1_c1, w, label='F1 C1', color='#4CAF50', alpha=0.85)
-    ax.axhline(y=0.30, color='red', linestyle='--', linewidth=1, alpha=0.7, label='Limiar Recall (0.30)')
-    ax.set_xticks(x_pos)
-    ax.set_xticklabels(strategies, fontsize=9, rotation=30, ha='right')
-    ax.set_ylabel('Score', fontsize=12)
-    ax.set_title('Métricas de Irrigação (C1) por Estratégia', fontsize=13, fontweight='bold')
-    ax.legend(fontsize=9)
-    ax.set_ylim(0, 1.05)
-    ax.grid(True, axis='y', alpha=0.2)
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/metricas_irrigacao_por_estrategia.png', dpi=150)
-    plt.close()
-    print(f"  ✓ {OUT}/metricas_irrigacao_por_estrategia.png")
-
-    # 11d: Sub-class analysis (como o binário vê C1_orig vs C2_orig)
-    fig, ax = plt.subplots(figsize=(8, 5))
+    # Só as métricas usadas nos gráficos (hash pequeno, pickling barato)
+    exp_graf = [{'strategy': m['strategy'], 'f1_macro': float(m['f1_macro']),
+                 'recall': np.asarray(m['recall']), 'precision': np.asarray(m['precision']),
+                 'f1_per': np.asarray(m['f1_per'])}
+                for m in all_experiments]
     sub_data = []
     for m_exp in all_experiments:
         yp = m_exp['y_pred']
-        r_c1o = (yp[c1_orig_mask] == 1).mean() if c1_orig_mask.sum() > 0 else 0
-        r_c2o = (yp[c2_orig_mask] == 1).mean() if c2_orig_mask.sum() > 0 else 0
+        r_c1o = float((yp[c1_orig_mask] == 1).mean()) if c1_orig_mask.sum() > 0 else 0
+        r_c2o = float((yp[c2_orig_mask] == 1).mean()) if c2_orig_mask.sum() > 0 else 0
         sub_data.append((m_exp['strategy'], r_c1o, r_c2o))
-    strats = [s[0] for s in sub_data]
-    rc1o = [s[1] for s in sub_data]
-    rc2o = [s[2] for s in sub_data]
-    x_pos = np.arange(len(strats))
-    ax.bar(x_pos - 0.15, rc1o, 0.3, label='Detecção C1_orig (moderada)', color='#FF9800', alpha=0.85)
-    ax.bar(x_pos + 0.15, rc2o, 0.3, label='Detecção C2_orig (intensa)', color='#F44336', alpha=0.85)
-    ax.set_xticks(x_pos)
-    ax.set_xticklabels(strats, fontsize=9, rotation=30, ha='right')
-    ax.set_ylabel('Taxa de detecção', fontsize=12)
-    ax.set_title('Detecção de Sub-classes Originais (C1 e C2) por Estratégia', fontsize=12, fontweight='bold')
-    ax.legend(fontsize=10)
-    ax.set_ylim(0, 1.05)
-    ax.grid(True, axis='y', alpha=0.2)
-    plt.tight_layout()
-    plt.savefig(f'{OUT}/deteccao_subclasses.png', dpi=150)
-    plt.close()
-    print(f"  ✓ {OUT}/deteccao_subclasses.png")
+
+    renderizar_figuras([
+        FiguraSpec(fig_comparacao_binario, f'{OUT}/comparacao_estrategias_binario.png',
+                   {'experimentos': exp_graf}),
+        FiguraSpec(fig_matriz_confusao_binario, f'{OUT}/matriz_confusao_binario.png',
+                   {'cm': bm['cm'], 'strategy': bm['strategy']}),
+        FiguraSpec(fig_metricas_irrigacao, f'{OUT}/metricas_irrigacao_por_estrategia.png',
+                   {'experimentos': exp_graf}),
+        FiguraSpec(fig_deteccao_subclasses, f'{OUT}/deteccao_subclasses.png',
+                   {'sub_data': sub_data}),
+    ])
 
     # ── FIM ──────────────────────────────────────────────────────────────
     elapsed = time.time() - t0
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+============================================================================
+Divisão por Grupos — leave-groups-out e validação cruzada por grupos
+============================================================================
+
+Partilhado por cold_start_v8.py, benchmark_script.py e teste.py.
+
+Um grupo é uma série contínua de uma simulação (ano × janela × cenário).
+Amostras do mesmo grupo são fortemente correlacionadas, por isso treino e
+teste nunca partilham grupos.
+
+  detectar_grupos(df)        → id de grupo por linha (0..G-1), O(N):
+                               coluna grupo_id se existir (dataset v11 full),
+                               senão reinícios da DAP (dap[i] < dap[i-1])
+  mascara_teste(grupos, ids) → máscara booleana das linhas de teste
+  dividir(X, y, grupos, ids) → X_train, X_test, y_train, y_test
+  folds_por_grupos(grupos, k_grupos, repeticoes, semente)
+                             → [(máscara treino, máscara teste), ...]
+                               cada grupo fica no teste uma vez por repetição
+  validacao_cruzada(funcao, X, y, grupos, k_grupos, ...)
+                             → métricas por fold, folds em paralelo
+
+Uso:
+    from divisao_grupos import detectar_grupos, dividir
+    grupos = detectar_grupos(df)
+    X_train, X_test, y_train, y_test = dividir(X, y, grupos, [5, 9, 13])
+============================================================================
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+COLUNA_GRUPO = 'grupo_id'
+
+
+# ============================================================================
+# GRUPOS
+# ============================================================================
+
+def grupos_por_reinicio(dap):
+    """Novo grupo sempre que a DAP desce (início de outra simulação)."""
+    dap = np.asarray(dap)
+    if len(dap) == 0:
+        return np.empty(0, dtype=np.int64)
+    return np.concatenate([[0], np.cumsum(dap[1:] < dap[:-1])]).astype(np.int64)
+
+
+def detectar_grupos(df, coluna_grupo=COLUNA_GRUPO, coluna_dap='dap'):
+    """
+    Id de grupo (0-indexado, pela ordem de aparição) de cada linha.
+    Usa df[coluna_grupo] se existir; senão os reinícios de df[coluna_dap].
+    """
+    if coluna_grupo in df.columns:
+        ids = df[coluna_grupo].to_numpy()
+        # Renumerar 0..G-1 pela ordem da primeira ocorrência
+        _, primeira, inverso = np.unique(ids, return_index=True, return_inverse=True)
+        ordem = np.argsort(np.argsort(primeira))
+        return ordem[inverso].astype(np.int64)
+    return grupos_por_reinicio(df[coluna_dap].to_numpy())
+
+
+def mascara_teste(grupos, grupos_teste):
+    return np.isin(grupos, np.asarray(list(grupos_teste)))
+
+
+def dividir(X, y, grupos, grupos_teste):
+    """Leave-groups-out: linhas dos grupos_teste para teste, o resto para treino."""
+    teste = mascara_teste(grupos, grupos_teste)
+    return X[~teste], X[teste], y[~teste], y[teste]
+
+
+# ============================================================================
+# VALIDAÇÃO CRUZADA
+# ============================================================================
+
+def folds_por_grupos(grupos, k_grupos, repeticoes=1, semente=42):
+    """
+    Leave-k-groups-out: em cada repetição os grupos são baralhados e
+    partidos em blocos de k_grupos; cada bloco é o teste de um fold.
+
+    Returns:
+        lista de (mascara_treino, mascara_teste)
+    """
+    grupos = np.asarray(grupos)
+    ids = np.unique(grupos)
+    rng = np.random.RandomState(semente)
+    folds = []
+    for _ in range(repeticoes):
+        baralhados = rng.permutation(ids)
+        for i in range(0, len(baralhados), k_grupos):
+            teste = np.isin(grupos, baralhados[i:i + k_grupos])
+            if teste.all():
+                continue   # um só bloco com todos os grupos — sem treino
+            folds.append((~teste, teste))
+    return folds
+
+
+_XY = {}   # X, y no worker (enviados uma vez no arranque)
+
+
+def _iniciar_worker(X, y):
+    _XY['X'], _XY['y'] = X, y
+
+
+def _avaliar_fold(funcao, treino, teste, kwargs):
+    X, y = _XY['X'], _XY['y']
+    return funcao(X[treino], y[treino], X[teste], y[teste], **kwargs)
+
+
+def validacao_cruzada(funcao, X, y, grupos, k_grupos, repeticoes=1, semente=42,
+                      n_workers=None, verbose=True, **kwargs):
+    """
+    Avalia funcao(X_tr, y_tr, X_te, y_te, **kwargs) → dict de métricas em
+    cada fold leave-k-groups-out. Folds em paralelo (em série se o pool
+    falhar ou houver um só fold); funcao deve ser de módulo (picklável).
+
+    Returns:
+        lista de dicts (um por fold, pela ordem dos folds)
+    """
+    folds = folds_por_grupos(grupos, k_grupos, repeticoes, semente)
+    resultados = None
+    n = n_workers or min(len(folds), os.cpu_count() or 1)
+    if n > 1 and len(folds) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=n, initializer=_iniciar_worker,
+                                     initargs=(X, y)) as pool:
+                futuros = [pool.submit(_avaliar_fold, funcao, tr, te, kwargs)
+                           for tr, te in folds]
+                resultados = [f.result() for f in futuros]
+        except Exception as e:
+            if verbose:
+                print(f"  [cv] pool indisponível ({e}) — folds em série")
+    if resultados is None:
+        _iniciar_worker(X, y)
+        resultados = [_avaliar_fold(funcao, tr, te, kwargs) for tr, te in folds]
+    return resultados
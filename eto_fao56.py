@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+============================================================================
+ETo FAO-56 — núcleo vectorizado (NumPy) partilhado pelos geradores de clima
+============================================================================
+
+Usado por script_simulacao_v11.py (NASA POWER → weather_files/), por
+C_Tratamento_dados/tratar_inmet_bdmep.py (INMET BDMEP → CSV diário) e pelo
+caminho meteorológico do HIL (C_Rasp/main_hil.py). Só depende de NumPy.
+
+Todas as funções recebem arrays (ou escalares) com um valor por dia e
+devolvem um array do mesmo tamanho — um ano, 23 anos ou uma estação
+inteira são calculados numa única passagem, sem loop Python por dia.
+
+  geometria_solar(lat_graus)                         → tabela 366 dias
+                      (dr, δ, ωs, Ra, N), memoizada por latitude
+  radiacao_extraterrestre(doy, lat_graus)            → Ra  [MJ/m²/dia]
+  radiacao_ceu_limpo(doy, lat_graus, alt)            → Rso [MJ/m²/dia]
+  eto_penman_monteith(tmax, tmin, doy, lat_graus, alt,
+                      rs=None, rh=None, u2=None, tmean=None) → ETo [mm/dia]
+  eto_hargreaves_samani(tmax, tmin, doy, lat_graus, tmean=None) → ETo [mm/dia]
+  vento_2m(u_z, altura_m=10.0)                       → u2  [m/s]
+
+Valores em falta (NaN) em rs, rh ou u2 são substituídos dia a dia:
+  rs  → Ångström-Prescott com n/N = 0.5
+  rh  → ea estimada pela Tmin
+  u2  → 2.0 m/s (valor por omissão da FAO-56)
+
+Controlo de qualidade em eto_penman_monteith (intencional, para ambos os
+geradores — o caminho INMET já o fazia, o NASA POWER escalar não):
+  rs medido     → limitado a [0, Ra]  (Rs > Ra é fisicamente impossível)
+  Rs/Rso        → limitado a [0, 1]   (o escalar só limitava o máximo)
+  es - ea (VPD) → ≥ 0                 (humidade > 100% ou ea > es)
+Só mudam a ETo em dias com leituras fisicamente inválidas.
+
+Diferenças entre os dois geradores mantidas por parâmetro (cada um
+continua a dar a ETo que dava antes do núcleo partilhado):
+                        NASA POWER (omissão)   INMET
+  ea_minimo (Rnl)       0.01 kPa               0.001 kPa
+  rn_minimo             None (Rn pode ser < 0) 0.0 (Rn ≥ 0)
+============================================================================
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+SIGMA       = 4.903e-9   # Stefan-Boltzmann [MJ/K⁴/m²/dia]
+U2_PADRAO   = 2.0        # vento a 2 m por omissão (FAO-56, eq. 47 sem dados)
+U2_MINIMO   = 0.5        # limite inferior para vento medido
+EA_MINIMO_RNL = 0.01     # piso de ea no termo √ea da Rnl (NASA POWER, V7–V11)
+ALBEDO      = 0.23
+
+
+# ============================================================================
+# GEOMETRIA SOLAR — tabela (latitude × DOY) memoizada
+# ============================================================================
+# dr, δ, ωs, Ra e N dependem só da latitude e do dia do ano: são calculados
+# uma vez por latitude (366 dias) e depois lidos por índice, em vez de
+# avaliar as funções trigonométricas para cada dia de cada ano.
+
+DTYPE_GEOMETRIA = np.dtype([
+    ('dr'     , 'f8'),   # distância relativa Terra-Sol (eq. 23)
+    ('delta'  , 'f8'),   # declinação solar [rad] (eq. 24)
+    ('omega_s', 'f8'),   # ângulo horário do pôr do sol [rad] (eq. 25)
+    ('ra'     , 'f8'),   # radiação extraterrestre [MJ/m²/dia] (eq. 21)
+    ('n_horas', 'f8'),   # duração máxima do dia N [h] (eq. 34)
+])
+CASAS_LATITUDE = 4       # latitudes iguais até 1e-4° partilham a tabela
+
+
+def _geometria(doy, lat_graus):
+    """Geometria solar FAO-56 (cálculo directo) para um array de DOY."""
+    doy     = np.asarray(doy, dtype=float)
+    lat_rad = np.radians(lat_graus)
+    geo = np.empty(doy.shape, dtype=DTYPE_GEOMETRIA)
+    geo['dr']      = 1 + 0.033 * np.cos(2 * np.pi / 365 * doy)
+    geo['delta']   = 0.409 * np.sin(2 * np.pi / 365 * doy - 1.39)
+    geo['omega_s'] = np.arccos(np.clip(-np.tan(lat_rad) * np.tan(geo['delta']), -1, 1))
+    geo['ra']      = (24 * 60 / np.pi) * 0.0820 * geo['dr'] * (
+        geo['omega_s'] * np.sin(lat_rad) * np.sin(geo['delta']) +
+        np.cos(lat_rad) * np.cos(geo['delta']) * np.sin(geo['omega_s'])
+    )
+    geo['n_horas'] = 24 / np.pi * geo['omega_s']
+    return geo
+
+
+@lru_cache(maxsize=64)
+def _tabela_geometria(lat_graus):
+    tabela = _geometria(np.arange(1, 367), lat_graus)
+    tabela.setflags(write=False)
+    return tabela
+
+
+def geometria_solar(lat_graus):
+    """
+    Tabela só de leitura com 366 linhas (índice = DOY − 1) e os campos de
+    DTYPE_GEOMETRIA. Memoizada por latitude (arredondada a CASAS_LATITUDE).
+    """
+    return _tabela_geometria(round(float(lat_graus), CASAS_LATITUDE))
+
+
+def geometria_dias(doy, lat_graus):
+    """Geometria solar de cada dia: leitura na tabela se DOY inteiro em 1..366."""
+    doy = np.asarray(doy)
+    if np.issubdtype(doy.dtype, np.integer) or np.array_equal(doy, np.round(doy)):
+        i = doy.astype(np.int64)
+        if i.size == 0 or (i.min() >= 1 and i.max() <= 366):
+            return geometria_solar(lat_graus)[i - 1]
+    return _geometria(doy, lat_graus)
+
+
+def radiacao_extraterrestre(doy, lat_graus):
+    """Ra [MJ/m²/dia] para cada dia do ano — FAO-56 eq. 21."""
+    return geometria_dias(doy, lat_graus)['ra']
+
+
+def radiacao_ceu_limpo(doy, lat_graus, alt):
+    """Rso [MJ/m²/dia] — FAO-56 eq. 37."""
+    return (0.75 + 2e-5 * alt) * radiacao_extraterrestre(doy, lat_graus)
+
+
+# ============================================================================
+# TERMOS AUXILIARES
+# ============================================================================
+
+def _pressao_saturacao(t):
+    """e°(T) [kPa] — FAO-56 eq. 11."""
+    return 0.6108 * np.exp(17.27 * t / (t + 237.3))
+
+
+def vento_2m(u_z, altura_m=10.0):
+    """Converte vento medido a altura_m para 2 m — FAO-56 eq. 47."""
+    return np.asarray(u_z, dtype=float) * (4.87 / np.log(67.8 * altura_m - 5.42))
+
+
+def _preencher(valores, n, padrao):
+    """(array float de tamanho n, máscara de válidos); None/NaN → padrao."""
+    if valores is None:
+        return np.full(n, padrao, dtype=float), np.zeros(n, dtype=bool)
+    arr = np.broadcast_to(np.asarray(valores, dtype=float), (n,)).copy()
+    valido = np.isfinite(arr)
+    arr[~valido] = padrao
+    return arr, valido
+
+
+# ============================================================================
+# PENMAN-MONTEITH FAO-56
+# ============================================================================
+
+def eto_penman_monteith(tmax, tmin, doy, lat_graus, alt,
+                        rs=None, rh=None, u2=None, tmean=None,
+                        ea_minimo=EA_MINIMO_RNL, rn_minimo=None):
+    """
+    ETo diária Penman-Monteith FAO-56 (eq. 6), vectorizada.
+
+    Args:
+        tmax, tmin : °C, um valor por dia
+        doy        : dia do ano
+        lat_graus  : latitude em graus (negativa a sul)
+        alt        : altitude [m]
+        rs         : radiação solar global [MJ/m²/dia] (None/NaN → Ångström)
+        rh         : humidade relativa média [%] (None/NaN/≤0 → ea pela Tmin)
+        u2         : vento a 2 m [m/s] (None/NaN → 2.0; medido ≥ 0.5)
+        tmean      : °C (None → (tmax+tmin)/2)
+        ea_minimo  : piso de ea [kPa] no termo √ea da Rnl (eq. 39)
+        rn_minimo  : piso da radiação líquida Rn (None = sem piso)
+
+    Returns:
+        ndarray ETo [mm/dia], ≥ 0. NaN onde tmax/tmin forem NaN.
+
+    Controlo de qualidade: rs medido limitado a [0, Ra], Rs/Rso a [0, 1]
+    e es - ea a ≥ 0; ea_minimo e rn_minimo reproduzem cada gerador (ver
+    cabeçalho do módulo).
+    """
+    tmax = np.asarray(tmax, dtype=float)
+    tmin = np.asarray(tmin, dtype=float)
+    tmax, tmin = np.broadcast_arrays(tmax, tmin)
+    n = tmax.size
+    tmax, tmin = tmax.ravel(), tmin.ravel()
+    doy = np.broadcast_to(np.asarray(doy), (n,))
+    t = (tmax + tmin) / 2.0 if tmean is None else \
+        np.broadcast_to(np.asarray(tmean, dtype=float), (n,))
+
+    P     = 101.3 * ((293.0 - 0.0065 * alt) / 293.0) ** 5.26
+    gamma = 0.000665 * P
+
+    e_tmax = _pressao_saturacao(tmax)
+    e_tmin = _pressao_saturacao(tmin)
+    es     = (e_tmax + e_tmin) / 2.0
+
+    rh, _ = _preencher(rh, n, np.nan)
+    ea = np.where(rh > 0, es * rh / 100.0, e_tmin)
+
+    delta = 4098.0 * _pressao_saturacao(t) / (t + 237.3) ** 2
+
+    Ra  = radiacao_extraterrestre(doy, lat_graus)
+    Rso = radiacao_ceu_limpo(doy, lat_graus, alt)
+    rs, rs_ok = _preencher(rs, n, np.nan)
+    # QA: rs medido em [0, Ra]
+    rs = np.where(rs_ok, np.clip(rs, 0.0, Ra), (0.25 + 0.50 * 0.5) * Ra)
+
+    Rns  = (1 - ALBEDO) * rs
+    rs_r = np.where(Rso > 0, np.clip(rs / np.where(Rso > 0, Rso, 1.0), 0.0, 1.0), 0.5)
+    Rnl  = SIGMA * ((tmax + 273.16) ** 4 + (tmin + 273.16) ** 4) / 2 * \
+           (0.34 - 0.14 * np.sqrt(np.maximum(ea, ea_minimo))) * (1.35 * rs_r - 0.35)
+    Rn   = Rns - Rnl
+    if rn_minimo is not None:
+        Rn = np.maximum(Rn, rn_minimo)
+
+    u2, u2_ok = _preencher(u2, n, U2_PADRAO)
+    u2 = np.where(u2_ok, np.maximum(u2, U2_MINIMO), u2)
+
+    # QA: VPD ≥ 0
+    num = 0.408 * delta * Rn + gamma * (900.0 / (t + 273.0)) * u2 * np.maximum(es - ea, 0.0)
+    den = delta + gamma * (1 + 0.34 * u2)
+    return np.maximum(num / den, 0.0)
+
+
+# ============================================================================
+# HARGREAVES-SAMANI
+# ============================================================================
+
+def eto_hargreaves_samani(tmax, tmin, doy, lat_graus, tmean=None):
+    """ETo Hargreaves-Samani (FAO-56 eq. 52), vectorizada [mm/dia]."""
+    tmax = np.asarray(tmax, dtype=float)
+    tmin = np.asarray(tmin, dtype=float)
+    t    = (tmax + tmin) / 2.0 if tmean is None else np.asarray(tmean, dtype=float)
+    Ra   = radiacao_extraterrestre(doy, lat_graus)
+    return np.maximum(
+        0.0023 * Ra * (t + 17.8) * np.sqrt(np.maximum(tmax - tmin, 0.0)), 0.0
+    )
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+============================================================================
+NASA POWER — busca incremental de séries diárias (API temporal/daily/point)
+============================================================================
+
+Em vez de um pedido bloqueante por ano, a busca:
+  1. compara as datas já guardadas com o período pedido e obtém só os
+     intervalos em falta (anos parciais incluídos)
+  2. junta intervalos próximos em pedidos de vários anos (até
+     MAX_DIAS_PEDIDO dias cada)
+  3. executa os pedidos em paralelo, no máximo MAX_PEDIDOS_SIMULTANEOS
+     de cada vez, com novas tentativas em erros de rede / 5xx
+
+Um ponto novo ou um novo período de anos custa um só pedido por bloco de
+MAX_DIAS_PEDIDO dias, em vez de 23 pedidos em série.
+
+Para testes sem rede há um servidor falso local com a mesma estrutura JSON:
+
+    srv, url = iniciar_servidor_falso()
+    df = buscar_em_falta([], 2001, 2023, lat, lon, url=url)
+    srv.shutdown()
+
+Auto-verificação:  python nasa_power.py
+============================================================================
+"""
+
+import json
+import time
+import threading
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+import pandas as pd
+import requests
+
+API_URL = "https://power.larc.nasa.gov/api/temporal/daily/point"
+PARAMETROS = ['T2M_MAX', 'T2M_MIN', 'PRECTOTCORR', 'ALLSKY_SFC_SW_DWN', 'RH2M', 'WS2M']
+VALOR_EM_FALTA = -999.0
+
+MAX_DIAS_PEDIDO         = 366 * 12   # um pedido cobre até ~12 anos
+MAX_PEDIDOS_SIMULTANEOS = 3          # a API limita pedidos concorrentes por IP
+INTERVALO_JUNTAR_DIAS   = 31         # lacunas menores que isto entram no mesmo pedido
+LATENCIA_DIAS           = 7          # a POWER publica com alguns dias de atraso
+TIMEOUT_S               = 180
+TENTATIVAS              = 3
+
+
+# ============================================================================
+# PLANEAMENTO DOS PEDIDOS
+# ============================================================================
+
+def intervalos_em_falta(datas_existentes, inicio, fim):
+    """
+    Intervalos contíguos [(d0, d1), ...] de [inicio, fim] sem dados.
+    datas_existentes: qualquer iterável de datas (array datetime64, Index...).
+    """
+    fim = min(pd.Timestamp(fim), pd.Timestamp(date.today() - timedelta(days=LATENCIA_DIAS)))
+    todas = pd.date_range(inicio, fim, freq='D')
+    if len(todas) == 0:
+        return []
+    falta = ~todas.isin(pd.DatetimeIndex(datas_existentes))
+    if not falta.any():
+        return []
+    # Inícios e fins de cada sequência de True
+    m = np.concatenate([[False], falta, [False]]).astype(np.int8)
+    d = np.diff(m)
+    ini, fin = np.flatnonzero(d == 1), np.flatnonzero(d == -1) - 1
+    return [(todas[a].date(), todas[b].date()) for a, b in zip(ini, fin)]
+
+
+def agrupar_intervalos(intervalos, max_dias=MAX_DIAS_PEDIDO, juntar_dias=INTERVALO_JUNTAR_DIAS):
+    """
+    Junta intervalos separados por menos de juntar_dias e parte os que
+    excedem max_dias. Devolve a lista de pedidos (d0, d1).
+    """
+    pedidos = []
+    for d0, d1 in sorted(intervalos):
+        if pedidos and (d0 - pedidos[-1][1]).days <= juntar_dias \
+                and (d1 - pedidos[-1][0]).days < max_dias:
+            pedidos[-1] = (pedidos[-1][0], max(d1, pedidos[-1][1]))
+        else:
+            pedidos.append((d0, d1))
+
+    partidos = []
+    for d0, d1 in pedidos:
+        while (d1 - d0).days >= max_dias:
+            corte = d0 + timedelta(days=max_dias - 1)
+            partidos.append((d0, corte))
+            d0 = corte + timedelta(days=1)
+        partidos.append((d0, d1))
+    return partidos
+
+
+# ============================================================================
+# PEDIDOS
+# ============================================================================
+
+def buscar_intervalo(d0, d1, lat, lon, url=API_URL, parametros=PARAMETROS,
+                     timeout=TIMEOUT_S, tentativas=TENTATIVAS, sessao=None):
+    """
+    Um pedido à API para [d0, d1]. Devolve DataFrame indexado por data com
+    uma coluna por parâmetro (VALOR_EM_FALTA → NaN).
+    """
+    params = {'parameters': ','.join(parametros), 'community': 'AG',
+              'longitude': lon, 'latitude': lat,
+              'start': d0.strftime('%Y%m%d'), 'end': d1.strftime('%Y%m%d'),
+              'format': 'JSON'}
+    http = sessao or requests
+    for t in range(1, tentativas + 1):
+        try:
+            resp = http.get(url, params=params, timeout=timeout)
+            if resp.status_code >= 500 and t < tentativas:
+                raise requests.HTTPError(f"HTTP {resp.status_code}")
+            resp.raise_for_status()
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as e:
+            if t == tentativas or (isinstance(e, requests.HTTPError) and resp.status_code < 500):
+                raise
+            time.sleep(2 ** t)
+
+    props = resp.json()['properties']['parameter']
+    df = pd.DataFrame({p: pd.Series(props.get(p, {}), dtype=float) for p in parametros})
+    df.index = pd.to_datetime(df.index, format='%Y%m%d')
+    df = df.sort_index().replace(VALOR_EM_FALTA, np.nan)
+    df.index.name = 'data'
+    return df
+
+
+def buscar_em_falta(datas_existentes, ano_inicio, ano_fim, lat, lon, url=API_URL,
+                    max_simultaneos=MAX_PEDIDOS_SIMULTANEOS, verbose=True):
+    """
+    Busca só o que falta em [ano_inicio-01-01, ano_fim-12-31].
+
+    Returns:
+        DataFrame (índice data, colunas PARAMETROS), vazio se nada faltar.
+    """
+    pedidos = agrupar_intervalos(
+        intervalos_em_falta(datas_existentes, f'{ano_inicio}-01-01', f'{ano_fim}-12-31'))
+    if not pedidos:
+        return pd.DataFrame(columns=PARAMETROS, index=pd.DatetimeIndex([], name='data'))
+
+    if verbose:
+        dias = sum((d1 - d0).days + 1 for d0, d1 in pedidos)
+        print(f"    NASA POWER: {dias} dias em {len(pedidos)} pedido(s) "
+              f"({min(max_simultaneos, len(pedidos))} em paralelo)")
+    t0 = time.time()
+    with requests.Session() as sessao, \
+            ThreadPoolExecutor(max_workers=max(1, min(max_simultaneos, len(pedidos)))) as pool:
+        futuros = [pool.submit(buscar_intervalo, d0, d1, lat, lon, url, sessao=sessao)
+                   for d0, d1 in pedidos]
+        partes = [f.result() for f in futuros]
+    if verbose:
+        print(f"    NASA POWER: concluido em {time.time() - t0:.1f}s")
+    df = pd.concat(partes)
+    return df[~df.index.duplicated(keep='last')].sort_index()
+
+
+# ============================================================================
+# SERVIDOR FALSO (testes sem rede)
+# ============================================================================
+
+def _serie_falsa(d0, d1, parametros):
+    """Valores sintéticos determinísticos por data (sazonalidade simples)."""
+    datas = pd.date_range(d0, d1, freq='D')
+    doy = datas.dayofyear.values
+    onda = np.sin(2 * np.pi * (doy - 30) / 365)
+    valores = {
+        'T2M_MAX'          : 32.0 + 3.0 * onda,
+        'T2M_MIN'          : 22.0 + 1.5 * onda,
+        'PRECTOTCORR'      : np.maximum(6.0 * -onda + 2.0 * np.cos(doy), 0.0),
+        'ALLSKY_SFC_SW_DWN': 18.0 + 4.0 * onda,
+        'RH2M'             : 75.0 - 10.0 * onda,
+        'WS2M'             : 1.5 + 0.5 * onda,
+    }
+    chaves = datas.strftime('%Y%m%d')
+    return {p: dict(zip(chaves, np.round(valores.get(p, np.zeros(len(datas))), 2).tolist()))
+            for p in parametros}
+
+
+class _ManipuladorFalso(BaseHTTPRequestHandler):
+    def do_GET(self):
+        q = parse_qs(urlparse(self.path).query)
+        try:
+            d0 = pd.Timestamp(q['start'][0]); d1 = pd.Timestamp(q['end'][0])
+            parametros = q['parameters'][0].split(',')
+        except (KeyError, ValueError):
+            self.send_response(422); self.end_headers(); return
+        self.server.pedidos.append((d0.date(), d1.date()))
+        corpo = json.dumps({'properties': {'parameter': _serie_falsa(d0, d1, parametros)}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_servidor_falso(porta=0):
+    """
+    Servidor HTTP local com o formato JSON da POWER.
+    Returns: (servidor, url). servidor.pedidos regista os (d0, d1) pedidos.
+    """
+    srv = ThreadingHTTPServer(('127.0.0.1', porta), _ManipuladorFalso)
+    srv.pedidos = []
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_address[1]}/api/temporal/daily/point"
+
+
+if __name__ == '__main__':
+    srv, url = iniciar_servidor_falso()
+    try:
+        df = buscar_em_falta([], 2001, 2023, -5.5253, -47.4825, url=url)
+        print(f"  1.ª busca: {len(df)} dias, {len(srv.pedidos)} pedido(s): {srv.pedidos}")
+        assert len(df) == len(pd.date_range('2001-01-01', '2023-12-31'))
+
+        # Ano parcial: só os dias em falta voltam a ser pedidos
+        srv.pedidos.clear()
+        existentes = df.index[~((df.index >= '2010-03-01') & (df.index <= '2010-03-10'))]
+        df2 = buscar_em_falta(existentes, 2001, 2023, -5.5253, -47.4825, url=url)
+        print(f"  2.ª busca: {len(df2)} dias, pedidos: {srv.pedidos}")
+        assert len(df2) == 10 and srv.pedidos == [(date(2010, 3, 1), date(2010, 3, 10))]
+
+        srv.pedidos.clear()
+        assert buscar_em_falta(df.index, 2001, 2023, -5.5253, -47.4825, url=url).empty
+        assert not srv.pedidos
+        print("  OK")
+    finally:
+        srv.shutdown()
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+============================================================================
+Orquestrador de Experimentos — estratégia × grelha num pool de processos
+============================================================================
+
+Usado por cold_start_v8.py. Cada estratégia é descrita por um Experimento:
+
+    nome     : identificador (chave no armazém de resultados)
+    preparar : preparar(**base) → dict de arrays (dataset reamostrado,
+               conjunto de avaliação...); chamado uma vez por estratégia
+    funcao   : funcao(dados, **celula, **fixos) → dict de métricas
+               (JSON-serializável); função de módulo, picklável
+    grelha   : dict ordenado {parâmetro: valores}; o produto cartesiano
+               define as células, pela ordem das chaves
+    fixos    : parâmetros iguais em todas as células
+    versao   : subir para invalidar resultados já guardados da estratégia
+
+executar_experimentos(experimentos, base, armazem):
+  1. calcula a chave de cada célula (hash da base + estratégia + parâmetros)
+  2. salta as células já presentes no ArmazemResultados
+  3. prepara só os datasets das estratégias com células em falta (uma vez
+     cada; os workers recebem-nos no arranque, não em cada tarefa)
+  4. executa todas as células em falta num único ProcessPoolExecutor
+     (em série se o pool falhar) e grava cada uma assim que termina
+
+Uma execução interrompida, uma estratégia nova ou uma grelha alargada só
+calculam as células que ainda não existem.
+
+Uso:
+    from orquestrador_experimentos import Experimento, ArmazemResultados, executar_experimentos
+    exps = [Experimento('SMOTE', preparar_smote, celula, {'r': rs, 'mrpc': [3, 5]})]
+    res  = executar_experimentos(exps, {'X': X, 'y': y}, ArmazemResultados('resultados_v8'))
+    res['SMOTE']   # lista de dicts {r, mrpc, **métricas}, pela ordem da grelha
+============================================================================
+"""
+
+import os
+import json
+import time
+import pickle
+import hashlib
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+
+class Experimento:
+    """Uma estratégia: preparação dos dados + função por célula + grelha."""
+
+    def __init__(self, nome, preparar, funcao, grelha, fixos=None, versao=1):
+        self.nome     = nome
+        self.preparar = preparar
+        self.funcao   = funcao
+        self.grelha   = dict(grelha)
+        self.fixos    = fixos or {}
+        self.versao   = versao
+
+    def celulas(self):
+        """Lista de dicts de parâmetros, pela ordem da grelha."""
+        nomes = list(self.grelha)
+        return [dict(zip(nomes, valores))
+                for valores in itertools.product(*self.grelha.values())]
+
+    def __repr__(self):
+        return f"Experimento({self.nome!r}, {len(self.celulas())} células)"
+
+
+# ============================================================================
+# CHAVES
+# ============================================================================
+
+def _para_json(obj):
+    """Converte escalares/arrays NumPy em tipos nativos (para json.dumps)."""
+    if isinstance(obj, dict):
+        return {str(k): _para_json(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_para_json(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return obj
+
+
+def hash_base(base):
+    """Hash dos arrays de entrada (split treino/teste)."""
+    h = hashlib.sha1()
+    for k in sorted(base):
+        v = np.ascontiguousarray(base[k])
+        h.update(f"{k}{v.dtype}{v.shape}".encode())
+        h.update(v.tobytes())
+    return h.hexdigest()
+
+
+def chave_celula(digest_base, experimento, celula):
+    txt = json.dumps([digest_base, experimento.nome, experimento.versao,
+                      _para_json(experimento.fixos), _para_json(celula)], sort_keys=True)
+    return hashlib.sha1(txt.encode()).hexdigest()
+
+
+# ============================================================================
+# ARMAZÉM DE RESULTADOS
+# ============================================================================
+
+class ArmazemResultados:
+    """
+    Resultados por célula num JSON-lines só de acréscimo + artefactos:
+
+        <pasta>/celulas.jsonl            {chave, experimento, celula, metricas}
+        <pasta>/artefactos/<nome>.pkl    modelos e outros objectos
+
+    Só o processo principal escreve; uma linha por célula concluída.
+    """
+
+    FICHEIRO = 'celulas.jsonl'
+
+    def __init__(self, pasta):
+        self.pasta = str(pasta)
+        self._celulas = {}
+        try:
+            with open(os.path.join(self.pasta, self.FICHEIRO), encoding='utf-8') as f:
+                for linha in f:
+                    try:
+                        reg = json.loads(linha)
+                    except ValueError:
+                        continue   # linha truncada por uma execução interrompida
+                    self._celulas[reg['chave']] = reg
+        except OSError:
+            pass
+
+    def __contains__(self, chave):
+        return chave in self._celulas
+
+    def __len__(self):
+        return len(self._celulas)
+
+    def metricas(self, chave):
+        return self._celulas[chave]['metricas']
+
+    def gravar(self, chave, experimento, celula, metricas):
+        reg = {'chave': chave, 'experimento': experimento,
+               'celula': _para_json(celula), 'metricas': _para_json(metricas)}
+        os.makedirs(self.pasta, exist_ok=True)
+        with open(os.path.join(self.pasta, self.FICHEIRO), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(reg, ensure_ascii=False) + '\n')
+        self._celulas[chave] = reg
+
+    # ------ Artefactos ------
+
+    def caminho_artefacto(self, nome):
+        return os.path.join(self.pasta, 'artefactos', f"{nome}.pkl")
+
+    def guardar_artefacto(self, nome, obj):
+        caminho = self.caminho_artefacto(nome)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        tmp = f"{caminho}.tmp{os.getpid()}"
+        with open(tmp, 'wb') as f:
+            pickle.dump(obj, f)
+        os.replace(tmp, caminho)
+        return caminho
+
+    def carregar_artefacto(self, nome):
+        with open(self.caminho_artefacto(nome), 'rb') as f:
+            return pickle.load(f)
+
+
+# ============================================================================
+# EXECUÇÃO
+# ============================================================================
+
+_DADOS = {}   # nome da estratégia → dados preparados (um por worker)
+
+
+def _iniciar_worker(dados):
+    _DADOS.clear()
+    _DADOS.update(dados)
+
+
+def _executar_celula(funcao, nome, celula, fixos):
+    return funcao(_DADOS[nome], **celula, **fixos)
+
+
+def executar_experimentos(experimentos, base, armazem, n_workers=None,
+                          verbose=True):
+    """
+    Executa as células em falta de todos os experimentos.
+
+    Args:
+        experimentos : list[Experimento]
+        base         : dict de arrays passado a cada preparar(**base)
+        armazem      : ArmazemResultados
+        n_workers    : processos do pool (None = nº de núcleos)
+
+    Returns:
+        dict nome → lista de dicts {**celula, **metricas}, pela ordem da grelha
+    """
+    digest = hash_base(base)
+    chaves = {e.nome: [(c, chave_celula(digest, e, c)) for c in e.celulas()]
+              for e in experimentos}
+    por_nome = {e.nome: e for e in experimentos}
+    pendentes = [(e.nome, c, k) for e in experimentos
+                 for c, k in chaves[e.nome] if k not in armazem]
+
+    if verbose:
+        total = sum(len(v) for v in chaves.values())
+        print(f"  [orquestrador] {total} células | {total - len(pendentes)} já no "
+              f"armazém | {len(pendentes)} a calcular")
+
+    # Datasets só das estratégias com trabalho por fazer — uma vez cada
+    dados = {}
+    for nome in dict.fromkeys(n for n, _, _ in pendentes):
+        t0 = time.time()
+        dados[nome] = por_nome[nome].preparar(**base)
+        if verbose:
+            print(f"  [orquestrador] {nome}: dados preparados em {time.time() - t0:.1f}s")
+
+    def _concluir(nome, celula, chave, metricas):
+        armazem.gravar(chave, nome, celula, metricas)
+
+    t0 = time.time()
+    em_serie = list(pendentes)
+    n = n_workers or os.cpu_count() or 1
+    if n > 1 and len(pendentes) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(n, len(pendentes)),
+                                     initializer=_iniciar_worker,
+                                     initargs=(dados,)) as pool:
+                futuros = {pool.submit(_executar_celula, por_nome[nome].funcao, nome,
+                                       celula, por_nome[nome].fixos): (nome, celula, chave)
+                           for nome, celula, chave in pendentes}
+                for i, fut in enumerate(as_completed(futuros), 1):
+                    _concluir(*futuros[fut], fut.result())
+                    if verbose and i % max(1, len(futuros) // 10) == 0:
+                        print(f"    {100 * i / len(futuros):3.0f}% | {i}/{len(futuros)} células "
+                              f"| {time.time() - t0:.1f}s")
+                em_serie = []
+        except Exception as e:
+            # Pool indisponível (ex.: função não picklável) — seguir em série
+            if verbose:
+                print(f"  [orquestrador] pool indisponível ({e}) — células em série")
+            em_serie = [p for p in pendentes if p[2] not in armazem]
+
+    if em_serie:
+        _iniciar_worker(dados)
+        for nome, celula, chave in em_serie:
+            _concluir(nome, celula, chave,
+                      _executar_celula(por_nome[nome].funcao, nome, celula, por_nome[nome].fixos))
+
+    if verbose and pendentes:
+        print(f"  [orquestrador] concluído em {time.time() - t0:.1f}s")
+
+    return {nome: [dict(c, **armazem.metricas(k)) for c, k in lista]
+            for nome, lista in chaves.items()}
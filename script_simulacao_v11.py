@@ -18,12 +18,14 @@ Simulacoes: 23x3 (chuva) + 23x2 (seca) = 115
 Requisitos: pip install aquacrop pandas numpy requests matplotlib
 """
 
-import os, sys, math, time, warnings, threading
+import os, sys, time, warnings, threading, json, hashlib
+import multiprocessing as mp
+from multiprocessing.connection import wait as mp_wait
+from collections import deque
 from datetime import datetime
 from pathlib import Path
 import numpy as np
 import pandas as pd
-import requests
 
 try:
     import matplotlib
@@ -34,11 +36,15 @@ except ImportError:
     HAS_MPL = False
     print("AVISO: matplotlib nao encontrado. Graficos pulados.")
 
+from servico_graficos import FiguraSpec, renderizar_figuras
+from eto_fao56 import eto_penman_monteith
+from armazem_clima import ArmazemClima, ler_ficheiros_anuais
+from nasa_power import buscar_em_falta
+
 os.environ['DEVELOPMENT'] = 'True'
 try:
     from aquacrop import (AquaCropModel, Soil, Crop, InitialWaterContent,
                           IrrigationManagement, FieldMngt)
-    from aquacrop.utils import prepare_weather
 except ImportError:
     print("ERRO: pip install aquacrop"); sys.exit(1)
 
@@ -72,6 +78,17 @@ CENARIOS_SECA  = ['smt_otimo','manutencao']
 VERANICO_FATOR, VERANICO_MESES = 0.20, [2, 3]
 DAP_MIN, DAP_MAX, TR_MIN = 14, 107, 0.1
 MAX_SIM_SECONDS = 120
+# Fazenda de simulacoes: processos em paralelo, timeout real (terminate) e retry
+N_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MAX_TENTATIVAS = 2
+
+# Parametros fixos do modelo (entram na chave do cache de simulacoes)
+SIM_CONFIG = {'soil':'SandyLoam','crop':'TomatoGDD','initial_wc':'FC',
+              'mulches':True,'mulch_pct':80,'f_mulch':0.3}
+# Cache de simulacoes: colunas brutas do AquaCrop em .npz, chave = hash do conteudo
+SIM_CACHE_DIR = Path('sim_cache')
+SIM_CACHE_VERSAO = 1   # incrementar se mudar o formato das colunas guardadas
+SIM_CACHE_COLS = ['IrrDay','Wr','Tr','dap','z_root']
 
 # Limiar minimo de irrigacao real (mm)
 IRR_MIN_MM = 2.0
@@ -82,76 +99,67 @@ NOMES_CLASSES = {0:'Sem irrigacao',1:'Manutencao',2:'Intensiva'}
 OUTPUT_DIR = Path('.')
 WEATHER_DIR = Path('weather_files')
 WEATHER_DIR.mkdir(exist_ok=True)
-TXT_HEADER = "Day\tMonth\tYear\tMinTemp\tMaxTemp\tPrecipitation\tReferenceET"
+CLIMA_PATH = WEATHER_DIR/'clima_imperatriz.npy'
+EXPORTAR_TXT = False  # True: (re)escreve os TXT AquaCrop anuais a partir do armazem
 
 # ============================================================================
 # MODULO 1: METEOROLOGIA
 # ============================================================================
-def calc_eto_fao56(tmax, tmin, rs, rh, doy, lat_deg=LAT, alt=ALTITUDE):
-    tmean = (tmax+tmin)/2.0
-    lat_rad = lat_deg*math.pi/180.0
-    P = 101.3*((293.0-0.0065*alt)/293.0)**5.26
-    gamma = 0.000665*P
-    e_tmax = 0.6108*math.exp(17.27*tmax/(tmax+237.3))
-    e_tmin = 0.6108*math.exp(17.27*tmin/(tmin+237.3))
-    es = (e_tmax+e_tmin)/2.0
-    ea = es*(rh/100.0) if rh > 0 else e_tmin
-    delta = 4098.0*(0.6108*math.exp(17.27*tmean/(tmean+237.3)))/(tmean+237.3)**2
-    dr = 1.0+0.033*math.cos(2*math.pi*doy/365)
-    d_sol = 0.409*math.sin(2*math.pi*doy/365-1.39)
-    ws = math.acos(-math.tan(lat_rad)*math.tan(d_sol))
-    Ra = (24*60/math.pi)*0.0820*dr*(ws*math.sin(lat_rad)*math.sin(d_sol)+
-         math.cos(lat_rad)*math.cos(d_sol)*math.sin(ws))
-    Rso = (0.75+2e-5*alt)*Ra
-    Rns = 0.77*rs
-    sigma = 4.903e-9
-    rs_r = min(rs/Rso,1.0) if Rso > 0 else 0.5
-    Rnl = sigma*((tmax+273.16)**4+(tmin+273.16)**4)/2*(0.34-0.14*math.sqrt(max(ea,0.01)))*(1.35*rs_r-0.35)
-    Rn = Rns-Rnl
-    u2 = 2.0
-    num = 0.408*delta*Rn+gamma*(900/(tmean+273))*u2*(es-ea)
-    den = delta+gamma*(1+0.34*u2)
-    return max(num/den, 0.0)
-
-def fetch_and_save_weather(year):
-    txt_path = WEATHER_DIR/f'weather_imperatriz_{year}_full.txt'
-    meta_path = WEATHER_DIR/f'weather_imperatriz_{year}_full_meta.csv'
-    if txt_path.exists():
-        meta = pd.read_csv(meta_path) if meta_path.exists() else None
-        return str(txt_path), meta
-    print(f"    Buscando NASA POWER {year}...")
-    params = {'parameters':'T2M_MAX,T2M_MIN,PRECTOTCORR,ALLSKY_SFC_SW_DWN,RH2M,WS2M',
-              'community':'AG','longitude':LON,'latitude':LAT,
-              'start':f'{year}0101','end':f'{year}1231','format':'JSON'}
-    resp = requests.get(API_URL, params=params, timeout=180); resp.raise_for_status()
-    props = resp.json()['properties']['parameter']
-    dates = pd.date_range(f'{year}-01-01',f'{year}-12-31')
-    lines, meta_records = [], []
-    for d in dates:
-        key = d.strftime('%Y%m%d')
-        tmax=props['T2M_MAX'].get(key,-999); tmin=props['T2M_MIN'].get(key,-999)
-        prec=props['PRECTOTCORR'].get(key,-999); rs=props['ALLSKY_SFC_SW_DWN'].get(key,-999)
-        rh=props['RH2M'].get(key,-999); u2_obs=props['WS2M'].get(key,-999)
-        if tmax<-900 or tmin<-900 or rs<-900: continue
-        if rh<-900: rh=75.0
-        prec=max(prec,0.0)
-        doy=d.timetuple().tm_yday; eto=calc_eto_fao56(tmax,tmin,rs,rh,doy)
-        lines.append(f"{d.day}\t{d.month}\t{d.year}\t{tmin:.2f}\t{tmax:.2f}\t{prec:.2f}\t{eto:.4f}")
-        meta_records.append({'date':d,'tmax':tmax,'tmin':tmin,'prec':prec,'rs':rs,'rh':rh,
-                             'u2_obs':u2_obs if u2_obs>-900 else np.nan,'eto':eto})
-    with open(txt_path,'w') as f:
-        f.write(TXT_HEADER+'\n')
-        for l in lines: f.write(l+'\n')
-    meta = pd.DataFrame(meta_records); meta.to_csv(meta_path, index=False)
-    print(f"    Salvo: {txt_path} ({len(lines)} dias)")
-    return str(txt_path), meta
-
-def aplicar_veranico(wdf, year):
-    wdf_ver = wdf.copy()
-    mask = (wdf_ver['Date'].dt.month.isin(VERANICO_MESES))&(wdf_ver['Date'].dt.year==year)
-    pa = wdf_ver.loc[mask,'Precipitation'].sum()
-    wdf_ver.loc[mask,'Precipitation'] *= VERANICO_FATOR
-    pd2 = wdf_ver.loc[mask,'Precipitation'].sum()
+NASA_OBRIGATORIOS = ['T2M_MAX','T2M_MIN','ALLSKY_SFC_SW_DWN']
+
+def registos_nasa(raw):
+    """
+    Parametros brutos da NASA POWER -> registos do armazem (precisao do TXT AquaCrop).
+    Dias com NaN/fill num parametro obrigatorio ficam de fora (ver carregar_clima).
+    """
+    raw = raw.dropna(subset=NASA_OBRIGATORIOS)
+    tmax, tmin, rs = raw['T2M_MAX'].to_numpy(), raw['T2M_MIN'].to_numpy(), raw['ALLSKY_SFC_SW_DWN'].to_numpy()
+    rh = raw['RH2M'].fillna(75.0).to_numpy(); prec = raw['PRECTOTCORR'].fillna(0.0).clip(lower=0.0).to_numpy()
+    # u2 fixo em 2.0 (como nas versoes anteriores); WS2M fica so como u2_obs
+    eto = eto_penman_monteith(tmax, tmin, raw.index.dayofyear.values, LAT, ALTITUDE, rs=rs, rh=rh)
+    return pd.DataFrame({'data':raw.index,'tmin':tmin.round(2),'tmax':tmax.round(2),'prec':prec.round(2),
+                         'eto':eto.round(4),'rs':rs,'rh':rh,'u2_obs':raw['WS2M'].to_numpy()})
+
+def carregar_clima(anos=ANOS):
+    """
+    Armazem unico (weather_files/clima_imperatriz.npy, mmap). Anos em falta vem
+    dos pares TXT/_meta.csv antigos (migracao); o resto das datas em falta
+    (anos inteiros ou parciais) vem da NASA POWER em pedidos multi-ano.
+    Dias que a POWER devolve sem Tmax/Tmin/Rs ficam marcados como sem dados
+    no armazem e nao sao pedidos de novo nas execucoes seguintes.
+    """
+    clima = ArmazemClima.carregar(CLIMA_PATH); existentes = set(clima.anos())
+    n0, n0_sd = len(clima), len(clima.sem_dados)
+    novos = [ler_ficheiros_anuais(WEATHER_DIR/f'weather_imperatriz_{y}_full.txt',
+                                  WEATHER_DIR/f'weather_imperatriz_{y}_full_meta.csv')
+             for y in anos if y not in existentes and (WEATHER_DIR/f'weather_imperatriz_{y}_full.txt').exists()]
+    if novos: clima.acrescentar(pd.concat(novos, ignore_index=True))
+    conhecidas = clima.datas_conhecidas()
+    raw = buscar_em_falta(conhecidas, min(anos), max(anos), LAT, LON, url=API_URL)
+    # Os pedidos juntam intervalos proximos e trazem datas ja guardadas — so
+    # as que faltavam entram no armazem (dados migrados/guardados nao mudam,
+    # nem as chaves do cache de simulacoes)
+    raw = raw[~raw.index.isin(pd.DatetimeIndex(conhecidas))]
+    if len(raw):
+        clima.acrescentar(registos_nasa(raw))
+        clima.marcar_sem_dados(raw.index[raw[NASA_OBRIGATORIOS].isna().any(axis=1)])
+    if len(clima) != n0 or len(clima.sem_dados) != n0_sd:
+        clima.guardar()
+        print(f"  Clima: +{len(clima)-n0} dias ({len(novos)} ano(s) migrados) -> {CLIMA_PATH} ({len(clima)} dias)")
+        if len(clima.sem_dados):
+            print(f"  Clima: {len(clima.sem_dados)} dia(s) sem dados na NASA POWER (nao serao pedidos de novo)")
+    else:
+        print(f"  Clima: {CLIMA_PATH} ({len(clima)} dias, {len(existentes)} anos, mmap)")
+    if EXPORTAR_TXT:
+        n = sum(clima.exportar_txt(y, WEATHER_DIR/f'weather_imperatriz_{y}_full.txt') for y in anos)
+        print(f"  TXT AquaCrop: {n} ano(s) reescritos em {WEATHER_DIR}/")
+    return clima
+
+def aplicar_veranico(clima, year):
+    wdf_ver = clima.weather_df(year, veranico=(VERANICO_FATOR, VERANICO_MESES))
+    mask = wdf_ver['Date'].dt.month.isin(VERANICO_MESES).to_numpy()
+    pa = clima.weather_df(year)['Precipitation'].to_numpy()[mask].sum()
+    pd2 = wdf_ver['Precipitation'].to_numpy()[mask].sum()
     print(f"      Veranico {year}: fev-mar {pa:.0f}mm -> {pd2:.0f}mm ({pd2/pa:.2f}x)" if pa>0 else f"      Veranico {year}: sem chuva fev-mar")
     return wdf_ver
 
@@ -165,21 +173,34 @@ def umidade_para_tensao_kpa(theta_vol):
 def wr_para_tensao_kpa_dinamica(wr_mm, z_root_m):
     return umidade_para_tensao_kpa(wr_mm/(1000.0*max(z_root_m, 0.10)))
 
+def wr_para_tensao_kpa_array(wr_mm, z_root_m):
+    """Versao vetorizada de wr_para_tensao_kpa_dinamica (arrays de qualquer tamanho)."""
+    theta=np.asarray(wr_mm,dtype=float)/(1000.0*np.maximum(np.asarray(z_root_m,dtype=float),0.10))
+    ts=np.clip(theta,THETA_PM,THETA_SAT)
+    return np.clip(A_SAXTON*(ts**(-B_SAXTON)),1.0,1500.0)
+
 # ============================================================================
 # MODULO 3: SIMULACAO AQUACROP
 # ============================================================================
 COL_IRR=COL_WR=COL_TR=COL_DAP=COL_ZROOT=None
 
-def detect_columns(wf, cg):
+def colunas_detectadas():
+    return (COL_IRR,COL_WR,COL_TR,COL_DAP,COL_ZROOT)
+
+def definir_colunas(colunas, verbose=True):
+    """Fixa as colunas de saida do AquaCrop (ex.: detectadas num processo da fazenda)."""
     global COL_IRR,COL_WR,COL_TR,COL_DAP,COL_ZROOT
+    COL_IRR,COL_WR,COL_TR,COL_DAP,COL_ZROOT = colunas
+    if verbose: print(f"    Colunas: IRR={COL_IRR}, WR={COL_WR}, TR={COL_TR}, DAP={COL_DAP}, ZROOT={COL_ZROOT}")
+
+def detect_columns(wf, cg, verbose=True):
     def find(c,cols): return next((x for x in c if x in cols),None)
     wc,gc = set(wf.columns),set(cg.columns)
-    COL_IRR=find(['IrrDay','Irr','irr_day','IrrNet'],wc)
-    COL_WR=find(['Wr','Wr(1)','wr','th1','WrAct'],wc)
-    COL_TR=find(['Tr','TrAct','tr','Tact'],wc)
-    COL_DAP=find(['DAP','dap','GrowingSeasonDay'],gc)
-    COL_ZROOT=find(['z_root','Zroot','zRoot','RootDepth','ZrAct','Zr'],gc)
-    print(f"    Colunas: IRR={COL_IRR}, WR={COL_WR}, TR={COL_TR}, DAP={COL_DAP}, ZROOT={COL_ZROOT}")
+    definir_colunas((find(['IrrDay','Irr','irr_day','IrrNet'],wc),
+                     find(['Wr','Wr(1)','wr','th1','WrAct'],wc),
+                     find(['Tr','TrAct','tr','Tact'],wc),
+                     find(['DAP','dap','GrowingSeasonDay'],gc),
+                     find(['z_root','Zroot','zRoot','RootDepth','ZrAct','Zr'],gc)),verbose)
     miss=[n for n,v in [('IRR',COL_IRR),('WR',COL_WR),('TR',COL_TR),('DAP',COL_DAP)] if not v]
     if miss: print(f"    ERRO: {miss}"); return False
     return True
@@ -190,28 +211,36 @@ def build_irr_management(cn):
     if m==4: return IrrigationManagement(irrigation_method=4,NetIrrSMT=c['NetIrrSMT'])
     raise ValueError(f"Method {m}")
 
-def run_single_simulation(year, cenario_nome, janela, wdf_to_use):
-    global COL_IRR
+def run_single_simulation(year, cenario_nome, janela, wdf_to_use, timeout=MAX_SIM_SECONDS,
+                          verbose=True):
+    """
+    timeout=None: corre direto (o processo da fazenda ja impoe o limite).
+    verbose=False: deteccao de colunas sem o banner (processos da fazenda).
+    """
     jcfg=JANELAS[janela]
     ss=jcfg['sim_start_fmt'].format(year=year); se=jcfg['sim_end_fmt'].format(year=year)
+    sc=SIM_CONFIG
     model = AquaCropModel(sim_start_time=ss, sim_end_time=se, weather_df=wdf_to_use,
-        soil=Soil('SandyLoam'), crop=Crop('TomatoGDD',planting_date=jcfg['planting_date']),
-        initial_water_content=InitialWaterContent(value=['FC']),
+        soil=Soil(sc['soil']), crop=Crop(sc['crop'],planting_date=jcfg['planting_date']),
+        initial_water_content=InitialWaterContent(value=[sc['initial_wc']]),
         irrigation_management=build_irr_management(cenario_nome),
-        field_management=FieldMngt(mulches=True, mulch_pct=80, f_mulch=0.3))
+        field_management=FieldMngt(mulches=sc['mulches'], mulch_pct=sc['mulch_pct'], f_mulch=sc['f_mulch']))
 
-    sim_error=[None]
-    def _run():
-        try: model.run_model(till_termination=True)
-        except Exception as e: sim_error[0]=e
-    t=threading.Thread(target=_run,daemon=True); t.start(); t.join(timeout=MAX_SIM_SECONDS)
-    if t.is_alive(): raise TimeoutError(f"Timeout method {CENARIOS[cenario_nome]['method']}")
-    if sim_error[0]: raise sim_error[0]
+    if timeout is None:
+        model.run_model(till_termination=True)
+    else:
+        sim_error=[None]
+        def _run():
+            try: model.run_model(till_termination=True)
+            except Exception as e: sim_error[0]=e
+        t=threading.Thread(target=_run,daemon=True); t.start(); t.join(timeout=timeout)
+        if t.is_alive(): raise TimeoutError(f"Timeout method {CENARIOS[cenario_nome]['method']}")
+        if sim_error[0]: raise sim_error[0]
 
     wf,cg = model._outputs.water_flux, model._outputs.crop_growth
     if wf is None or cg is None or len(wf)==0: raise RuntimeError("Sem resultados")
     if COL_IRR is None:
-        if not detect_columns(wf,cg): raise RuntimeError("Colunas!")
+        if not detect_columns(wf,cg,verbose): raise RuntimeError("Colunas!")
 
     nr=min(len(wf),len(cg))
     result = pd.DataFrame({'IrrDay':wf[COL_IRR].values[:nr],'Wr':wf[COL_WR].values[:nr],
@@ -219,34 +248,168 @@ def run_single_simulation(year, cenario_nome, janela, wdf_to_use):
     if COL_ZROOT: result['z_root']=cg[COL_ZROOT].values[:nr]
     else:
         dv=result['dap'].values; result['z_root']=np.clip(0.3+(0.7*dv/max(dv.max(),1)),0.3,1.0)
-
-    sd=pd.date_range(ss,periods=nr,freq='D'); wi=wdf_to_use.set_index('Date')
-    result['precipitation']=[float(wi.loc[pd.Timestamp(d),'Precipitation']) if pd.Timestamp(d) in wi.index else 0.0 for d in sd]
-    result['tmax']=[float(wi.loc[pd.Timestamp(d),'MaxTemp']) if pd.Timestamp(d) in wi.index else np.nan for d in sd]
+    return juntar_meteo(result, year, cenario_nome, janela, wdf_to_use)
+
+def juntar_meteo(result, year, cenario_nome, janela, wdf_to_use):
+    """Acrescenta precipitacao/tmax do dia e identificadores a saida bruta do AquaCrop."""
+    ss=JANELAS[janela]['sim_start_fmt'].format(year=year); nr=len(result)
+    sd=pd.date_range(ss,periods=nr,freq='D')
+    wi=wdf_to_use.set_index('Date')[['Precipitation','MaxTemp']].reindex(sd)
+    result['precipitation']=wi['Precipitation'].fillna(0.0).to_numpy(dtype=float)
+    result['tmax']=wi['MaxTemp'].to_numpy(dtype=float)
     result['date']=sd; result['year']=year; result['cenario']=cenario_nome; result['janela']=janela
     return result
 
-def run_all_simulations():
+# ============================================================================
+# MODULO 3a: CACHE DE SIMULACOES (enderecado por conteudo)
+# ============================================================================
+def _versao_aquacrop():
+    try:
+        from importlib.metadata import version
+        return version('aquacrop')
+    except Exception:
+        return 'desconhecida'
+
+AQUACROP_VERSAO = _versao_aquacrop()
+
+def chave_simulacao(year, cenario_nome, janela, wdf):
+    """
+    sha1 de tudo o que determina a saida do AquaCrop: meteorologia efetivamente
+    usada (conteudo do txt ja com veranico aplicado), ano, janela, config do
+    cenario, fator veranico, parametros fixos do modelo e versao do aquacrop.
+    Limiares de rotulagem (IRR_MIN_MM, CLASSE_C1_MAX) nao entram — muda-los
+    reaproveita todas as simulacoes.
+    """
+    h=hashlib.sha1()
+    cols=['Date','MinTemp','MaxTemp','Precipitation','ReferenceET']
+    h.update(pd.util.hash_pandas_object(wdf[cols],index=False).values.tobytes())
+    meta={'v':SIM_CACHE_VERSAO,'year':year,'janela':JANELAS[janela],'cenario':cenario_nome,
+          'cfg':{k:v for k,v in CENARIOS[cenario_nome].items() if k!='descricao'},
+          'veranico':[VERANICO_FATOR,VERANICO_MESES] if cenario_nome=='veranico' else None,
+          'sim':SIM_CONFIG,'aquacrop':AQUACROP_VERSAO}
+    h.update(json.dumps(meta,sort_keys=True).encode())
+    return h.hexdigest()
+
+def carregar_cache_sim(chave):
+    """DataFrame com SIM_CACHE_COLS, ou None se nao houver entrada."""
+    path=SIM_CACHE_DIR/f'{chave}.npz'
+    if not path.exists(): return None
+    try:
+        with np.load(path) as z: return pd.DataFrame({c:z[c] for c in SIM_CACHE_COLS})
+    except Exception:
+        return None
+
+def guardar_cache_sim(chave, result):
+    SIM_CACHE_DIR.mkdir(exist_ok=True)
+    path=SIM_CACHE_DIR/f'{chave}.npz'; tmp=SIM_CACHE_DIR/f'{chave}.tmp.npz'
+    np.savez_compressed(tmp,**{c:result[c].to_numpy() for c in SIM_CACHE_COLS})
+    os.replace(tmp,path)
+
+# ============================================================================
+# MODULO 3b: FAZENDA DE SIMULACOES (multiprocessing)
+# ============================================================================
+def _worker_simulacao(conn, year, cenario_nome, janela, wdf, colunas):
+    """
+    Processo filho: uma simulacao, resultado devolvido pelo Pipe junto com
+    as colunas usadas. Recebe as colunas ja conhecidas do pai; so detecta
+    (em silencio) se ainda nao houver — o banner e impresso uma vez no pai.
+    """
+    try:
+        if colunas[0] is not None: definir_colunas(colunas,verbose=False)
+        r=run_single_simulation(year,cenario_nome,janela,wdf,timeout=None,verbose=False)
+        conn.send(('ok',(r,colunas_detectadas())))
+    except Exception as e:
+        conn.send(('erro',f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+def run_farm(tarefas, n_workers=N_WORKERS, timeout=MAX_SIM_SECONDS,
+             max_tentativas=MAX_TENTATIVAS, ao_concluir=None, ao_falhar=None):
+    """
+    Executa tarefas (dicts com year, cenario, janela, wdf) em processos separados.
+    Cada tarefa corre no seu proprio processo: o timeout e real (terminate),
+    e falhas/timeouts sao repetidos ate max_tentativas. Os resultados sao
+    entregues a ao_concluir(tarefa, df) por ordem de conclusao; falhas
+    definitivas a ao_falhar(tarefa, msg).
+    """
+    ctx=mp.get_context()
+    fila=deque(dict(t,tentativa=1) for t in tarefas)
+    ativos={}  # conn -> (processo, tarefa, t_inicio)
+
+    def _falha(tarefa, msg):
+        if tarefa['tentativa']<max_tentativas:
+            print(f"    [retry {tarefa['tentativa']+1}/{max_tentativas}] {tarefa['year']}/{tarefa['janela']}/{tarefa['cenario']}: {msg}")
+            fila.append(dict(tarefa,tentativa=tarefa['tentativa']+1))
+        elif ao_falhar: ao_falhar(tarefa,msg)
+
+    while fila or ativos:
+        while fila and len(ativos)<n_workers:
+            t=fila.popleft()
+            rx,tx=ctx.Pipe(duplex=False)
+            p=ctx.Process(target=_worker_simulacao,daemon=True,
+                          args=(tx,t['year'],t['cenario'],t['janela'],t['wdf'],colunas_detectadas()))
+            p.start(); tx.close()
+            ativos[rx]=(p,t,time.time())
+
+        for conn in mp_wait(list(ativos),timeout=0.5):
+            p,t,_=ativos.pop(conn)
+            try: status,payload=conn.recv()
+            except EOFError: status,payload='erro',f"processo terminou sem resultado (exitcode={p.exitcode})"
+            conn.close(); p.join()
+            if status=='ok':
+                r,colunas=payload
+                if COL_IRR is None: definir_colunas(colunas)   # banner uma so vez
+                if ao_concluir: ao_concluir(t,r)
+            else: _falha(t,payload)
+
+        agora=time.time()
+        for conn,(p,t,t0) in list(ativos.items()):
+            if agora-t0>timeout:
+                p.terminate(); p.join(); conn.close(); del ativos[conn]
+                _falha(t,f"TimeoutError: Timeout method {CENARIOS[t['cenario']]['method']} (>{timeout}s)")
+
+def run_all_simulations(n_workers=N_WORKERS, usar_cache=True):
     all_results,weather_metas,failed=[],{},[]
-    gc,sc=0,0; t0=time.time()
+    gc=0; t0=time.time(); n_cache=0
     total=len(ANOS)*(len(CENARIOS_CHUVA)+len(CENARIOS_SECA))
+    tarefas=[]; clima=carregar_clima(ANOS)
     for year in ANOS:
         print(f"\n{'='*60}\nANO: {year} ({ANOS.index(year)+1}/{len(ANOS)})\n{'='*60}")
-        tp,meta=fetch_and_save_weather(year); weather_metas[year]=meta
-        wb=prepare_weather(tp); wv=aplicar_veranico(wb,year)
+        weather_metas[year]=clima.meta(year)
+        wb=clima.weather_df(year); wv=aplicar_veranico(clima,year)
         for janela,clist in [('chuva',CENARIOS_CHUVA),('seca',CENARIOS_SECA)]:
             for cen in clist:
                 wdf=wv if (cen=='veranico' and janela=='chuva') else wb
-                gc+=1; sc+=1; m=CENARIOS[cen]['method']; lb=f"{janela}/{cen}(m{m})"
-                try:
-                    r=run_single_simulation(year,cen,janela,wdf); r['grupo_id']=gc
-                    ir=(r['IrrDay']>=IRR_MIN_MM).sum(); it=r['IrrDay'].sum()
-                    im=r.loc[r['IrrDay']>=IRR_MIN_MM,'IrrDay'].mean() if ir>0 else 0
-                    print(f"    [{sc:3d}/{total}] {lb}: {ir} dias, {it:.0f}mm, {im:.1f}mm/ev")
-                    all_results.append(r)
-                except Exception as e:
-                    failed.append(f"{year}/{janela}/{cen}: {e}")
-                    print(f"    [{sc:3d}/{total}] {lb}: ERRO - {e}")
+                gc+=1
+                t={'grupo_id':gc,'year':year,'cenario':cen,'janela':janela,'wdf':wdf,
+                   'chave':chave_simulacao(year,cen,janela,wdf)}
+                bruto=carregar_cache_sim(t['chave']) if usar_cache else None
+                if bruto is not None:
+                    r=juntar_meteo(bruto,year,cen,janela,wdf); r['grupo_id']=gc
+                    all_results.append(r); n_cache+=1
+                else:
+                    tarefas.append(t)
+
+    print(f"\n  Cache: {n_cache}/{total} simulacoes reaproveitadas ({SIM_CACHE_DIR}/)")
+    print(f"  Fazenda: {len(tarefas)} simulacoes em {n_workers} processos "
+          f"(timeout {MAX_SIM_SECONDS}s, {MAX_TENTATIVAS} tentativas)")
+    sc=[n_cache]
+    def _lb(t): return f"{t['year']} {t['janela']}/{t['cenario']}(m{CENARIOS[t['cenario']]['method']})"
+    def ao_concluir(t, r):
+        sc[0]+=1; r['grupo_id']=t['grupo_id']
+        if usar_cache: guardar_cache_sim(t['chave'],r)
+        ir=(r['IrrDay']>=IRR_MIN_MM).sum(); it=r['IrrDay'].sum()
+        im=r.loc[r['IrrDay']>=IRR_MIN_MM,'IrrDay'].mean() if ir>0 else 0
+        print(f"    [{sc[0]:3d}/{total}] {_lb(t)}: {ir} dias, {it:.0f}mm, {im:.1f}mm/ev")
+        all_results.append(r)
+    def ao_falhar(t, msg):
+        sc[0]+=1
+        failed.append(f"{t['year']}/{t['janela']}/{t['cenario']}: {msg}")
+        print(f"    [{sc[0]:3d}/{total}] {_lb(t)}: ERRO - {msg}")
+
+    run_farm(tarefas,n_workers=n_workers,ao_concluir=ao_concluir,ao_falhar=ao_falhar)
+    # Ordem de conclusao e arbitraria — repor a ordem dos grupos
+    all_results.sort(key=lambda r: int(r['grupo_id'].iloc[0]))
     el=time.time()-t0
     print(f"\nTempo: {el/60:.1f}min | OK: {len(all_results)}/{total} | Falhas: {len(failed)}")
     for f in failed: print(f"  - {f}")
@@ -256,20 +419,27 @@ def run_all_simulations():
 # MODULO 4: PROCESSAMENTO
 # ============================================================================
 def process_dataset(all_results):
-    frames=[]
-    for sim_df in all_results:
-        df=sim_df.copy()
-        df=df[(df['Tr']>TR_MIN)&(df['dap']>=DAP_MIN)&(df['dap']<=DAP_MAX)].copy()
-        if len(df)==0: continue
-        df['tensao_raw']=df.apply(lambda r: wr_para_tensao_kpa_dinamica(r['Wr'],r['z_root']),axis=1)
-        vals=df['tensao_raw'].values
-        df['tensao_solo_kpa']=np.concatenate([[vals[0]],vals[:-1]])
-        df['chuva_acum_3d_mm']=df['precipitation'].rolling(3,min_periods=1).sum().values
-        df['tmax_max_3d_c']=df['tmax'].rolling(3,min_periods=1).max().values
-        df['delta_tensao_kpa']=df['tensao_solo_kpa'].diff().fillna(0).values
-        frames.append(df)
-    if not frames: raise ValueError("Nenhuma simulacao!")
-    out=pd.concat(frames,ignore_index=True)
+    """
+    Features de todas as simulacoes numa so passagem: um concat, filtro,
+    Saxton-Rawls em array e janelas de 3 dias por simulacao via groupby.shift.
+    """
+    if not all_results: raise ValueError("Nenhuma simulacao!")
+    sim_id=np.repeat(np.arange(len(all_results)),[len(r) for r in all_results])
+    df=pd.concat(all_results,ignore_index=True); df['_sim']=sim_id
+    df=df[(df['Tr']>TR_MIN)&(df['dap']>=DAP_MIN)&(df['dap']<=DAP_MAX)].reset_index(drop=True)
+    if len(df)==0: raise ValueError("Nenhuma simulacao!")
+
+    g=df.groupby('_sim',sort=False)
+    df['tensao_raw']=wr_para_tensao_kpa_array(df['Wr'].to_numpy(),df['z_root'].to_numpy())
+    # Sensor le o estado do dia anterior; 1o dia de cada simulacao repete o proprio valor
+    df['tensao_solo_kpa']=g['tensao_raw'].shift(1).fillna(df['tensao_raw']).to_numpy()
+    p1,p2=g['precipitation'].shift(1),g['precipitation'].shift(2)
+    df['chuva_acum_3d_mm']=(df['precipitation']+p1.fillna(0.0)+p2.fillna(0.0)).to_numpy()
+    t1,t2=g['tmax'].shift(1),g['tmax'].shift(2)
+    df['tmax_max_3d_c']=np.fmax(np.fmax(df['tmax'].to_numpy(),t1.to_numpy()),t2.to_numpy())
+    df['delta_tensao_kpa']=df.groupby('_sim',sort=False)['tensao_solo_kpa'].diff().fillna(0).to_numpy()
+    out=df.drop(columns='_sim')
+
     print("\n  Resumo por cenario:")
     for cen in CENARIOS:
         s=out[out['cenario']==cen]
@@ -279,11 +449,8 @@ def process_dataset(all_results):
     return out
 
 def rotular_classes(df):
-    def cls(v):
-        if v<IRR_MIN_MM: return 0
-        elif v<CLASSE_C1_MAX: return 1
-        else: return 2
-    df['classe_irrigacao']=df['IrrDay'].apply(cls)
+    v=df['IrrDay'].to_numpy()
+    df['classe_irrigacao']=np.select([v<IRR_MIN_MM,v<CLASSE_C1_MAX],[0,1],default=2)
     ruido=((df['IrrDay']>0)&(df['IrrDay']<IRR_MIN_MM)).sum()
     print(f"\n  Limiar: {IRR_MIN_MM}mm | Ruido->C0: {ruido} amostras")
     print(f"  C0: <{IRR_MIN_MM}mm | C1: [{IRR_MIN_MM},{CLASSE_C1_MAX}) | C2: >={CLASSE_C1_MAX}mm")
@@ -309,17 +476,14 @@ def build_final_dataset(df):
 CC={0:'#2196F3',1:'#4CAF50',2:'#F44336'}
 LC={0:'C0: Sem irrigacao',1:'C1: Manutencao\n(2-10mm)',2:'C2: Intensiva\n(>=10mm)'}
 
-def gerar_graficos(df_treino, df_full):
-    if not HAS_MPL: print("  matplotlib indisponivel."); return
-    print("  Gerando graficos...")
-    plt.rcParams.update({'figure.facecolor':'white','axes.facecolor':'#FAFAFA',
-                         'axes.grid':True,'grid.alpha':0.3,'font.size':10})
+ESTILO_GRAFICOS={'figure.facecolor':'white','axes.facecolor':'#FAFAFA',
+                 'axes.grid':True,'grid.alpha':0.3,'font.size':10}
+
+def _fig1_distribuicao(caminho, classes):
     cls=[0,1,2]
-    vc=df_treino['classe_irrigacao'].value_counts().sort_index()
-    vcp=df_treino['classe_irrigacao'].value_counts(normalize=True).sort_index()*100
+    vc=classes.value_counts().sort_index()
+    vcp=classes.value_counts(normalize=True).sort_index()*100
     vals=[vc.get(c,0) for c in cls]; pcts=[vcp.get(c,0) for c in cls]
-
-    # FIG 1: Distribuicao + evolucao
     fig,axes=plt.subplots(1,2,figsize=(14,5))
     ax=axes[0]
     bars=ax.bar([f'C{c}' for c in cls],vals,color=[CC[c] for c in cls],edgecolor='white',linewidth=1.5)
@@ -333,10 +497,10 @@ def gerar_graficos(df_treino, df_full):
     ax2.bar(x,pcts,w,label='v11',color='#FFCC80',edgecolor='white')
     ax2.set_xticks(x); ax2.set_xticklabels(['C0','C1','C2'])
     ax2.set_ylabel('%'); ax2.set_title('Evolucao v7 vs v11',fontsize=13,fontweight='bold'); ax2.legend()
-    plt.tight_layout(); fig.savefig(OUTPUT_DIR/'fig1_distribuicao_classes.png',dpi=150,bbox_inches='tight'); plt.close()
-    print("    fig1_distribuicao_classes.png")
+    plt.tight_layout(); fig.savefig(caminho,dpi=150,bbox_inches='tight'); plt.close()
 
-    # FIG 2: Contribuicao por metodo
+def _fig2_metodos(caminho, df_full):
+    cls=[0,1,2]
     fig,ax=plt.subplots(figsize=(10,6))
     co=['smt_otimo','manutencao','veranico']
     bottom=np.zeros(len(co))
@@ -350,10 +514,10 @@ def gerar_graficos(df_treino, df_full):
         bottom+=vc2
     ax.set_xticks(range(len(co))); ax.set_xticklabels([f"{c}\n(method {CENARIOS[c]['method']})" for c in co],fontsize=9)
     ax.set_ylabel('Amostras'); ax.set_title('Contribuicao por Metodo',fontsize=13,fontweight='bold'); ax.legend(loc='upper right',fontsize=9)
-    plt.tight_layout(); fig.savefig(OUTPUT_DIR/'fig2_metodos_por_classe.png',dpi=150,bbox_inches='tight'); plt.close()
-    print("    fig2_metodos_por_classe.png")
+    plt.tight_layout(); fig.savefig(caminho,dpi=150,bbox_inches='tight'); plt.close()
 
-    # FIG 3: Boxplots
+def _fig3_boxplots(caminho, df_treino):
+    cls=[0,1,2]
     fig,axes=plt.subplots(1,2,figsize=(14,5))
     for idx,(col,tit) in enumerate([('tensao_solo_kpa','Tensao do Solo por Classe'),
                                      ('delta_tensao_kpa','Delta Tensao por Classe')]):
@@ -364,10 +528,10 @@ def gerar_graficos(df_treino, df_full):
         for p,c in zip(bp['boxes'],cls): p.set_facecolor(CC[c]); p.set_alpha(0.7)
         ax.set_ylabel(col); ax.set_title(tit,fontsize=13,fontweight='bold')
         if 'delta' in col: ax.axhline(y=0,color='gray',linestyle='--',alpha=0.5)
-    plt.tight_layout(); fig.savefig(OUTPUT_DIR/'fig3_tensao_por_classe.png',dpi=150,bbox_inches='tight'); plt.close()
-    print("    fig3_tensao_por_classe.png")
+    plt.tight_layout(); fig.savefig(caminho,dpi=150,bbox_inches='tight'); plt.close()
 
-    # FIG 4: Histograma doses
+def _fig4_doses(caminho, df_full):
+    co=['smt_otimo','manutencao','veranico']
     fig,axes=plt.subplots(1,2,figsize=(14,5))
     ax=axes[0]
     ip=df_full[df_full['IrrDay']>=IRR_MIN_MM]['IrrDay']
@@ -381,21 +545,19 @@ def gerar_graficos(df_treino, df_full):
         s=df_full[(df_full['cenario']==cn)&(df_full['IrrDay']>=IRR_MIN_MM)]
         if len(s)>0: ax2.hist(s['IrrDay'],bins=30,alpha=0.5,label=cn,color=cm[cn],edgecolor='none')
     ax2.set_xlabel('Dose (mm)'); ax2.set_ylabel('Freq'); ax2.set_title('Doses por Metodo',fontsize=13,fontweight='bold'); ax2.legend(fontsize=9)
-    plt.tight_layout(); fig.savefig(OUTPUT_DIR/'fig4_histograma_doses.png',dpi=150,bbox_inches='tight'); plt.close()
-    print("    fig4_histograma_doses.png")
+    plt.tight_layout(); fig.savefig(caminho,dpi=150,bbox_inches='tight'); plt.close()
 
-    # FIG 5: Scatter tensao vs chuva
+def _fig5_scatter(caminho, df_treino):
     fig,ax=plt.subplots(figsize=(10,7))
-    for c in cls:
+    for c in [0,1,2]:
         s=df_treino[df_treino['classe_irrigacao']==c]
         a,sz=(0.1,5) if c==0 else (0.6,20)
         ax.scatter(s['tensao_solo_kpa'],s['chuva_acum_3d_mm'],c=CC[c],s=sz,alpha=a,label=LC[c],edgecolors='none')
     ax.set_xlabel('Tensao (kPa)',fontsize=12); ax.set_ylabel('Chuva 3d (mm)',fontsize=12)
     ax.set_title('Tensao vs Chuva por Classe',fontsize=13,fontweight='bold'); ax.legend(fontsize=9,markerscale=3)
-    plt.tight_layout(); fig.savefig(OUTPUT_DIR/'fig5_scatter_tensao_chuva.png',dpi=150,bbox_inches='tight'); plt.close()
-    print("    fig5_scatter_tensao_chuva.png")
+    plt.tight_layout(); fig.savefig(caminho,dpi=150,bbox_inches='tight'); plt.close()
 
-    # FIG 6: Perfil temporal (2 metodos)
+def _fig6_perfil(caminho, df_full):
     fig,axes=plt.subplots(2,1,figsize=(14,8),sharex=True)
     ano_ex=2005
     for idx,cen in enumerate(['smt_otimo','manutencao']):
@@ -413,9 +575,25 @@ def gerar_graficos(df_treino, df_full):
         ax2.bar(daps,irr,color=cb,alpha=0.7,width=0.8); ax2.set_ylabel('Irrigacao (mm)',color='#F44336')
         ax.set_title(f'{cen} (method {CENARIOS[cen]["method"]}) — seca {ano_ex}',fontsize=11,fontweight='bold')
     axes[-1].set_xlabel('DAP')
-    plt.tight_layout(); fig.savefig(OUTPUT_DIR/'fig6_perfil_temporal.png',dpi=150,bbox_inches='tight'); plt.close()
-    print("    fig6_perfil_temporal.png")
-    print("  6 graficos gerados.")
+    plt.tight_layout(); fig.savefig(caminho,dpi=150,bbox_inches='tight'); plt.close()
+
+def gerar_graficos(df_treino, df_full):
+    """6 figuras via servico_graficos: em paralelo, so as que mudaram."""
+    if not HAS_MPL: print("  matplotlib indisponivel."); return
+    print("  Gerando graficos...")
+    cols_full=['cenario','janela','year','dap','tensao_solo_kpa','IrrDay','classe_irrigacao']
+    df_f=df_full[cols_full]
+    specs=[
+        FiguraSpec(_fig1_distribuicao,OUTPUT_DIR/'fig1_distribuicao_classes.png',{'classes':df_treino['classe_irrigacao']},ESTILO_GRAFICOS),
+        FiguraSpec(_fig2_metodos,OUTPUT_DIR/'fig2_metodos_por_classe.png',{'df_full':df_f[['cenario','classe_irrigacao']]},ESTILO_GRAFICOS),
+        FiguraSpec(_fig3_boxplots,OUTPUT_DIR/'fig3_tensao_por_classe.png',{'df_treino':df_treino[['classe_irrigacao','tensao_solo_kpa','delta_tensao_kpa']]},ESTILO_GRAFICOS),
+        FiguraSpec(_fig4_doses,OUTPUT_DIR/'fig4_histograma_doses.png',{'df_full':df_f[['cenario','IrrDay']]},ESTILO_GRAFICOS),
+        FiguraSpec(_fig5_scatter,OUTPUT_DIR/'fig5_scatter_tensao_chuva.png',{'df_treino':df_treino[['classe_irrigacao','tensao_solo_kpa','chuva_acum_3d_mm']]},ESTILO_GRAFICOS),
+        FiguraSpec(_fig6_perfil,OUTPUT_DIR/'fig6_perfil_temporal.png',{'df_full':df_f},ESTILO_GRAFICOS),
+    ]
+    estado=renderizar_figuras(specs)
+    n_ger=sum(1 for v in estado.values() if v=='gerada')
+    print(f"  {n_ger} graficos gerados, {len(specs)-n_ger} reaproveitados/falhados.")
 
 # ============================================================================
 # MODULO 6: VALIDACAO E RELATORIO
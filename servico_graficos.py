@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+============================================================================
+Servico de Graficos — renderizacao headless e paralela (matplotlib/Agg)
+============================================================================
+
+Partilhado por script_simulacao_v11.py, benchmark_script.py,
+cold_start_v8.py, cold_start_v9.py e C_Rasp/main_hil.py.
+
+Cada figura e descrita por uma FiguraSpec:
+    funcao  : funcao de modulo (picklavel) com assinatura
+              funcao(caminho, **dados) — desenha, faz savefig(caminho)
+    caminho : PNG de saida
+    dados   : dict com os dados de entrada (DataFrames, arrays, listas...)
+    estilo  : rcParams aplicados so a esta figura (opcional)
+
+renderizar_figuras(specs):
+  1. calcula um hash por figura (dados + estilo + bytecode da funcao +
+     valores das globais de dados que a funcao le, ex. limiares de classe)
+  2. salta as figuras cujo PNG existe e cujo hash nao mudou
+     (manifesto .manifesto_graficos.json na pasta de cada PNG)
+  3. renderiza as restantes num ProcessPoolExecutor com backend Agg
+     (em serie se so houver uma figura ou se o pool falhar)
+
+Uso:
+    from servico_graficos import FiguraSpec, renderizar_figuras
+    specs = [FiguraSpec(fig_distribuicao, 'out/fig1.png', {'df': df})]
+    renderizar_figuras(specs)
+============================================================================
+"""
+
+import os
+import json
+import types
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:  # Raspberry Pi: so numpy
+    HAS_PANDAS = False
+
+MANIFESTO = '.manifesto_graficos.json'
+
+
+class FiguraSpec:
+    """Descricao de uma figura: funcao de desenho + caminho + dados."""
+
+    def __init__(self, funcao, caminho, dados=None, estilo=None):
+        self.funcao  = funcao
+        self.caminho = str(caminho)
+        self.dados   = dados or {}
+        self.estilo  = estilo or {}
+
+    def __repr__(self):
+        return f"FiguraSpec({self.funcao.__name__}, {self.caminho!r})"
+
+
+# ============================================================================
+# HASH DOS DADOS DE ENTRADA
+# ============================================================================
+
+def _atualizar_hash(h, obj):
+    """Alimenta o hash com obj de forma deterministica (recursivo)."""
+    if HAS_PANDAS and isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            h.update(repr(list(obj.columns)).encode())
+        h.update(pd.util.hash_pandas_object(obj, index=True).values.tobytes())
+    elif isinstance(obj, np.ndarray):
+        h.update(f"{obj.dtype}{obj.shape}".encode())
+        if obj.dtype == object:
+            h.update(repr(obj.tolist()).encode())
+        else:
+            h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        for k in sorted(obj, key=str):
+            h.update(repr(k).encode())
+            _atualizar_hash(h, obj[k])
+    elif isinstance(obj, (list, tuple)):
+        h.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for v in obj:
+            _atualizar_hash(h, v)
+    else:
+        h.update(repr(obj).encode())
+
+
+def _codigos(codigo):
+    """O objecto de codigo e os aninhados (lambdas, comprehensions)."""
+    yield codigo
+    for c in codigo.co_consts:
+        if isinstance(c, types.CodeType):
+            yield from _codigos(c)
+
+
+def _globais_lidas(funcao):
+    """
+    {nome: valor} das globais de dados que a funcao le (limiares, rotulos
+    de cenarios...). Modulos, funcoes e classes ficam de fora.
+    """
+    globais = getattr(funcao, '__globals__', {})
+    lidas = {}
+    for codigo in _codigos(funcao.__code__):
+        for nome in codigo.co_names:
+            if nome not in globais or nome in lidas:
+                continue
+            valor = globais[nome]
+            if isinstance(valor, (types.ModuleType, type)) or callable(valor):
+                continue
+            lidas[nome] = valor
+    return lidas
+
+
+def hash_figura(spec):
+    """Hash de uma figura: dados + estilo + codigo e globais da funcao de desenho."""
+    h = hashlib.sha1()
+    codigo = spec.funcao.__code__
+    h.update(f"{spec.funcao.__module__}.{spec.funcao.__qualname__}".encode())
+    h.update(codigo.co_code)
+    # Constantes (titulos, cores, dpi...) sem objectos de codigo aninhados,
+    # cujo repr inclui enderecos de memoria
+    h.update(repr([c for c in codigo.co_consts
+                   if not hasattr(c, 'co_code')]).encode())
+    # Globais lidas pela funcao (ex.: IRR_MIN_MM, CLASSE_C1_MAX, CENARIOS) —
+    # muda-las tem de refazer a figura mesmo com os mesmos dados
+    _atualizar_hash(h, _globais_lidas(spec.funcao))
+    _atualizar_hash(h, spec.estilo)
+    _atualizar_hash(h, spec.dados)
+    return h.hexdigest()
+
+
+# ============================================================================
+# MANIFESTO (um por pasta de saida)
+# ============================================================================
+
+def _carregar_manifesto(pasta):
+    try:
+        with open(os.path.join(pasta, MANIFESTO), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _guardar_manifesto(pasta, manifesto):
+    os.makedirs(pasta, exist_ok=True)
+    with open(os.path.join(pasta, MANIFESTO), 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1, sort_keys=True)
+
+
+# ============================================================================
+# RENDERIZACAO
+# ============================================================================
+
+def _iniciar_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _renderizar(funcao, caminho, dados, estilo):
+    """Executado no worker (ou em serie). Fecha todas as figuras no fim."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    try:
+        with plt.rc_context(estilo):
+            funcao(caminho, **dados)
+    finally:
+        plt.close('all')
+    return caminho
+
+
+def _renderizar_no_worker(funcao, caminho, dados, estilo):
+    """
+    Versao do pool: devolve None ou a mensagem do erro de render, para que
+    qualquer excepcao vinda de fut.result() seja do pool (processo morto,
+    argumentos nao picklaveis) e nao da figura.
+    """
+    try:
+        _renderizar(funcao, caminho, dados, estilo)
+    except Exception as e:
+        return str(e)
+    return None
+
+
+def renderizar_figuras(specs, n_workers=None, forcar=False, usar_manifesto=True,
+                       verbose=True):
+    """
+    Renderiza as figuras em specs, saltando as inalteradas.
+
+    Args:
+        specs          : list[FiguraSpec]
+        n_workers      : processos do pool (None = min(figuras, cpu_count))
+        forcar         : ignora o manifesto e refaz todas
+        usar_manifesto : False para quem ja controla o cache por conta propria
+        verbose        : imprime uma linha por figura
+
+    Returns:
+        dict caminho -> 'gerada' | 'inalterada' | 'erro: <mensagem>'
+    """
+    estado    = {}
+    hashes    = {}
+    pendentes = []
+    manifestos = {}
+
+    for spec in specs:
+        pasta = os.path.dirname(os.path.abspath(spec.caminho))
+        if usar_manifesto and pasta not in manifestos:
+            manifestos[pasta] = _carregar_manifesto(pasta)
+        nome = os.path.basename(spec.caminho)
+        hashes[spec.caminho] = hash_figura(spec) if usar_manifesto else None
+
+        if (usar_manifesto and not forcar
+                and os.path.exists(spec.caminho)
+                and manifestos[pasta].get(nome) == hashes[spec.caminho]):
+            estado[spec.caminho] = 'inalterada'
+            if verbose:
+                print(f"  = {spec.caminho} (inalterada)")
+            continue
+        pendentes.append(spec)
+
+    def _concluir(spec, erro=None):
+        if erro is not None:
+            estado[spec.caminho] = f"erro: {erro}"
+            if verbose:
+                print(f"  ✗ {spec.caminho}: {erro}")
+            return
+        estado[spec.caminho] = 'gerada'
+        if usar_manifesto:
+            pasta = os.path.dirname(os.path.abspath(spec.caminho))
+            manifestos[pasta][os.path.basename(spec.caminho)] = hashes[spec.caminho]
+        if verbose:
+            print(f"  ✓ {spec.caminho}")
+
+    n = n_workers or min(len(pendentes), os.cpu_count() or 1)
+    em_serie = list(pendentes)
+
+    if n > 1 and len(pendentes) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=n, initializer=_iniciar_worker) as pool:
+                futuros = {pool.submit(_renderizar_no_worker, s.funcao, s.caminho,
+                                       s.dados, s.estilo): s
+                           for s in pendentes}
+                em_serie = []
+                for fut in as_completed(futuros):
+                    spec = futuros[fut]
+                    try:
+                        erro = fut.result()
+                    except Exception:
+                        # BrokenProcessPool / PicklingError: a figura nao
+                        # chegou a ser renderizada — fica para a serie
+                        em_serie.append(spec)
+                        continue
+                    _concluir(spec, erro)
+        except Exception as e:
+            # Pool indisponivel (ex.: funcao nao picklavel) — seguir em serie
+            if verbose:
+                print(f"  [graficos] pool indisponivel ({e}) — render em serie")
+            em_serie = [s for s in pendentes if s.caminho not in estado]
+
+    for spec in em_serie:
+        try:
+            _renderizar(spec.funcao, spec.caminho, spec.dados, spec.estilo)
+            _concluir(spec)
+        except Exception as e:
+            _concluir(spec, e)
+
+    if usar_manifesto:
+        for pasta, manifesto in manifestos.items():
+            _guardar_manifesto(pasta, manifesto)
+
+    return estado
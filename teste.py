@@ -21,6 +21,7 @@ import seaborn as sns
 from imblearn.combine import SMOTETomek 
 from collections import Counter
 from imblearn.over_sampling import ADASYN
+from divisao_grupos import detectar_grupos, dividir
     
     
     
@@ -40,9 +41,8 @@ for c in range(3):
     # ── 2. SPLIT ─────────────────────────────────────────────────────────
 
 
-dap_vals = df['dap'].values
-resets = [0] + [i for i in range(1, len(dap_vals)) if dap_vals[i] < dap_vals[i-1]] + [len(dap_vals)]
-n_groups = len(resets) - 1
+grupos = detectar_grupos(df)
+n_groups = int(grupos.max()) + 1
 print(f"  {n_groups} grupos detectados")
 
     # Select test groups: pick groups that have C1 or C2, spread across dataset
@@ -51,13 +51,7 @@ print(f"  {n_groups} grupos detectados")
     # This gives diverse coverage
 test_group_ids = [5, 9, 13, 17, 21, 27]  # 0-indexed (groups 6,10,14,18,22,28 in 1-indexed)
 
-test_idx = []
-for g in test_group_ids:
-    test_idx.extend(range(resets[g], resets[g+1]))
-train_idx = [i for i in range(len(df)) if i not in test_idx]
-
-X_train, y_train = X[train_idx], y[train_idx]
-X_test, y_test = X[test_idx], y[test_idx]
+X_train, X_test, y_train, y_test = dividir(X, y, grupos, test_group_ids)
 
 print(f"  Grupos de teste (1-indexed): {[g+1 for g in test_group_ids]}")
 print(f"  Treino: {len(X_train)}  |  Teste: {len(X_test)}")